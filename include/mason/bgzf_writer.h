@@ -0,0 +1,126 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+// Writing of BGZF files with block compression in parallel.
+//
+// BGZF files are a series of gzip members with at most 64 KiB of data each,
+// as used for BAM files.  Since the blocks are independent, they can be
+// compressed in parallel and the result is still a valid gzip file.
+// ==========================================================================
+
+#ifndef APPS_MASON2_BGZF_WRITER_H_
+#define APPS_MASON2_BGZF_WRITER_H_
+
+#include <cstddef>
+#include <deque>
+#include <fstream>
+#include <future>
+#include <memory>
+#include <string>
+#include <thread>
+#include <vector>
+
+#include <mason/concurrent_queue.h>
+
+// ============================================================================
+// Forwards
+// ============================================================================
+
+// ============================================================================
+// Tags, Classes, Enums
+// ============================================================================
+
+// ----------------------------------------------------------------------------
+// Class BgzfWriter
+// ----------------------------------------------------------------------------
+
+// Writes data to a BGZF file, compressing the blocks with numThreads threads.
+//
+// The data passed to write() is cut into blocks of BLOCK_SIZE bytes that are compressed by a pool of threads and
+// written out in order.  close() writes out the last block and the BGZF end-of-file marker.  Only the order of
+// the calls to write() defines the output, the number of threads does not.
+
+class BgzfWriter
+{
+public:
+    // Maximal number of uncompressed bytes in a block, such that the compressed block is never larger than 64 KiB.
+    static const unsigned BLOCK_SIZE = 0xff00;
+
+    BgzfWriter() : numThreads(0), level(-1)
+    {}
+
+    ~BgzfWriter()
+    {
+        close();
+    }
+
+    // Open the file fileName for writing with numThreads compression threads and the zlib compression level.
+    bool open(char const * fileName, int numThreads = 1, int level = -1);
+
+    // Append n bytes from data to the file.
+    void write(char const * data, size_t n);
+
+    // Write out all pending data and the end-of-file marker and close the file.
+    void close();
+
+    bool isOpen() const
+    {
+        return out.is_open();
+    }
+
+    // Compress the data to a complete BGZF block.
+    static std::string compressBlock(std::string const & data, int level);
+
+    // The BGZF end-of-file marker, an empty block.
+    static std::string const & eofBlock();
+
+private:
+    typedef std::packaged_task<std::string()> TTask;
+
+    // Submit the current buffer for compression and write out finished blocks.
+    void _submitBlock();
+    // Write out the first pending block, waiting for it if necessary.
+    void _writeFront();
+
+    int numThreads;
+    int level;
+    std::ofstream out;
+    // Uncompressed data of the current block.
+    std::string buffer;
+    // Queue of compression jobs for the threads and the results in the order of the blocks.
+    std::unique_ptr<ConcurrentQueue<TTask> > tasks;
+    std::deque<std::future<std::string> > pending;
+    std::vector<std::thread> workers;
+};
+
+#endif  // #ifndef APPS_MASON2_BGZF_WRITER_H_
@@ -0,0 +1,127 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+// Bounded queue for passing work between pipeline stages running in their
+// own threads.
+// ==========================================================================
+
+#ifndef APPS_MASON2_CONCURRENT_QUEUE_H_
+#define APPS_MASON2_CONCURRENT_QUEUE_H_
+
+#include <condition_variable>
+#include <cstddef>
+#include <deque>
+#include <mutex>
+#include <utility>
+
+// ============================================================================
+// Forwards
+// ============================================================================
+
+// ============================================================================
+// Tags, Classes, Enums
+// ============================================================================
+
+// ----------------------------------------------------------------------------
+// Class ConcurrentQueue
+// ----------------------------------------------------------------------------
+
+// A FIFO queue with a bounded capacity that can be used from multiple threads.
+//
+// push() blocks while the queue is full and pop() blocks while the queue is empty.  After close(), push() fails and
+// pop() fails as soon as the queue has been drained.  This allows the producer to signal the end of the input and
+// the consumer to stop the producer early, e.g. after an error.
+
+template <typename TValue>
+class ConcurrentQueue
+{
+public:
+    explicit ConcurrentQueue(std::size_t capacity = 1) : capacity(capacity ? capacity : 1), closed(false)
+    {}
+
+    // Append value to the queue, blocks while the queue is full.  Returns false if the queue has been closed.
+    bool push(TValue value)
+    {
+        std::unique_lock<std::mutex> lock(mutex);
+        notFull.wait(lock, [this] { return closed || items.size() < capacity; });
+        if (closed)
+            return false;
+        items.push_back(std::move(value));
+        notEmpty.notify_one();
+        return true;
+    }
+
+    // Remove first value from the queue into value, blocks while the queue is empty.  Returns false if the queue has
+    // been closed and all values have been removed.
+    bool pop(TValue & value)
+    {
+        std::unique_lock<std::mutex> lock(mutex);
+        notEmpty.wait(lock, [this] { return closed || !items.empty(); });
+        if (items.empty())
+            return false;
+        value = std::move(items.front());
+        items.pop_front();
+        notFull.notify_one();
+        return true;
+    }
+
+    // Remove first value from the queue into value without blocking.  Returns false if the queue is empty.
+    bool tryPop(TValue & value)
+    {
+        std::lock_guard<std::mutex> lock(mutex);
+        if (items.empty())
+            return false;
+        value = std::move(items.front());
+        items.pop_front();
+        notFull.notify_one();
+        return true;
+    }
+
+    // Close the queue, wakes up all waiting threads.
+    void close()
+    {
+        std::lock_guard<std::mutex> lock(mutex);
+        closed = true;
+        notEmpty.notify_all();
+        notFull.notify_all();
+    }
+
+private:
+    std::size_t capacity;
+    bool closed;
+    std::deque<TValue> items;
+    std::mutex mutex;
+    std::condition_variable notEmpty, notFull;
+};
+
+#endif  // #ifndef APPS_MASON2_CONCURRENT_QUEUE_H_
@@ -46,12 +46,18 @@
 #ifndef APPS_MASON2_EXTERNAL_SPLIT_MERGE_H_
 #define APPS_MASON2_EXTERNAL_SPLIT_MERGE_H_
 
+#include <cstdint>
+#include <cstring>
+#include <string>
 #include <vector>
 #include <iostream>
 
+#include <zlib.h>
+
 #include <seqan/bam_io.h>
 #include <seqan/seq_io.h>
 
+#include <mason/loser_tree.h>
 #include <mason/mason_types.h>
 
 // ============================================================================
@@ -98,6 +104,33 @@ public:
     }
 };
 
+// --------------------------------------------------------------------------
+// Class FragmentAllocator
+// --------------------------------------------------------------------------
+
+// Distribute all fragments to contigs and haplotypes at once.
+//
+// The number of fragments for each contig/haplotype pair is drawn from the multinomial distribution with probabilities
+// proportional to the contig lengths, haplotypes being equally likely, as a sequence of binomial draws.  The fragment
+// ids are distributed with a pseudorandom permutation of 0..(numFragments-1): the pair with index idx gets the images
+// of the positions firstIds[idx]..(firstIds[idx] + counts[idx] - 1).  This yields the same distribution as picking
+// each fragment's contig and haplotype with ContigPicker but the ids of a pair can be computed when it is simulated.
+
+class FragmentAllocator
+{
+public:
+    // The number of fragments and the first position in the permutation for each contig/haplotype pair.
+    std::vector<int> counts, firstIds;
+    // The permutation of the fragment ids.
+    FeistelPermutation permutation;
+
+    // Draw the fragment counts for the contigs with the given length prefix sums and the permutation.
+    void allocate(TRng & rng, std::vector<int64_t> const & lengthSums, int numHaplotypes, int numFragments);
+
+    // Write the ids of the fragments of pair idx to ids in ascending order.
+    void getIds(std::vector<int> & ids, unsigned idx) const;
+};
+
 // ----------------------------------------------------------------------------
 // Class IdSplitter
 // ----------------------------------------------------------------------------
@@ -112,24 +145,41 @@ public:
 // * reset()
 // * read ids, contig-wise
 // * close()
+//
+// When compressionLevel is set, the data is written in zlib compressed blocks and the files must be accessed through
+// write() and read() instead of directly through files.  The blocks are compressed by numThreads threads.
 
 // TODO(holtgrew): Name bogus, FileBundle would be better.
 
 class IdSplitter
 {
 public:
+    // Number of uncompressed bytes in a compressed block.
+    static const unsigned BLOCK_SIZE = 64 * 1024;
+
     // The number of contigs to split to.
     unsigned numContigs;
+    // The zlib compression level, 0 for writing uncompressed files.
+    int compressionLevel;
+    // The number of threads to use for compressing blocks.
+    int numThreads;
 
     // The file pointers for each contig.
     std::vector<std::fstream *> files;
     // The names of the temporary files (required on Windows).
     std::vector<std::string> fileNames;
+    // Uncompressed data that is not written yet or not read yet for each file and read position in it.
+    std::vector<std::string> buffers;
+    std::vector<size_t> bufferPos;
 
-    IdSplitter() : numContigs(0)
+    // Number of bytes passed to write() and number of bytes written to the files.
+    uint64_t rawBytes, storedBytes;
+
+    IdSplitter() : numContigs(0), compressionLevel(0), numThreads(1), rawBytes(0), storedBytes(0)
     {}
 
-    IdSplitter(unsigned numContigs) : numContigs(numContigs)
+    IdSplitter(unsigned numContigs) :
+            numContigs(numContigs), compressionLevel(0), numThreads(1), rawBytes(0), storedBytes(0)
     {}
 
     ~IdSplitter()
@@ -140,11 +190,27 @@ public:
     // Open files in the splitter.
     void open();
 
+    // Open the existing files fileNames for reading instead of temporary files, e.g. the output files of simulation
+    // shards, returns false if one of them could not be opened.  The files are not removed on close().
+    bool openExisting(std::vector<std::string> const & fileNames);
+
     // Reset all files in the splitter, ready for reading.
     void reset();
 
     // Close splitter.
     void close();
+
+    // Write n bytes from data to the file with the given index.
+    void write(unsigned idx, char const * data, size_t n);
+
+    // Read up to n bytes from the file with the given index to data, returns the number of bytes read.
+    size_t read(unsigned idx, char * data, size_t n);
+
+    // Compress and write out the full blocks from buffers[idx], all data if flushAll.
+    void _writeBlocks(unsigned idx, bool flushAll);
+
+    // Read and uncompress the next block into buffers[idx], returns false at the end of file.
+    bool _readBlock(unsigned idx);
 };
 
 // ----------------------------------------------------------------------------
@@ -153,9 +219,7 @@ public:
 
 // Allows joining by id name from FASTA data stored in a IdSplitter.
 //
-// Construct with IdSplitter after reset() call.
-
-// TODO(holtgrew): Could use a heap/tournament tree.
+// Construct with IdSplitter after reset() call.  The next record is selected with a LoserTree over the files.
 
 template <typename TTag>
 class FastxJoiner
@@ -174,6 +238,10 @@ public:
     std::vector<bool> active;
     // Input iterators, one for each input file.
     std::vector<TInputIterator> inputIterators;
+    // Sort keys of the buffered ids.
+    std::vector<NaturalNameKey> keys;
+    // Tournament tree over the input files.
+    LoserTree tree;
 
     FastxJoiner() : splitter(), numActive(0)
     {}
@@ -188,6 +256,15 @@ public:
     template <typename TSeq>
     bool _loadNext(TSeq & id, TSeq & seq, TSeq & qual, unsigned idx);
 
+    // Returns whether the buffered record of file a is to be written before the one of file b.
+    bool _beats(unsigned a, unsigned b) const
+    {
+        if (!active[a] || !active[b])
+            return active[a] || (!active[b] && a < b);
+        int res = compare(keys[a], keys[b]);
+        return (res < 0) || (res == 0 && a < b);
+    }
+
     bool atEnd() const
     {
         return (numActive == 0);
@@ -202,11 +279,8 @@ public:
 
 // Allows joining by id name from FASTA data stored in a IdSplitter.
 //
-// Construct with IdSplitter after reset() call.
-
-// TODO(holtgrew): Could use a heap/tournament tree.
-
-// Compare two BAM alignment records by query name, tie is broken by first/last flag, first < last.
+// Construct with IdSplitter after reset() call.  The next record is selected with a LoserTree over the files, records
+// are compared by query name, tie is broken by first/last flag, first < last.
 
 class SamJoiner
 {
@@ -221,6 +295,10 @@ public:
     std::vector<bool> active;
     // Input BAM files, one for each input file.
     std::vector<seqan2::BamFileIn *> bamFileIns;
+    // Sort keys of the buffered query names.
+    std::vector<NaturalNameKey> keys;
+    // Tournament tree over the input files.
+    LoserTree tree;
 
     // One of the identical BAM headers.
     seqan2::BamHeader header;
@@ -244,6 +322,9 @@ public:
 
     bool _loadNext(seqan2::BamAlignmentRecord & record, unsigned idx);
 
+    // Returns whether the buffered record of file a is to be written before the one of file b.
+    bool _beats(unsigned a, unsigned b) const;
+
     bool atEnd() const
     {
         return (numActive == 0);
@@ -253,6 +334,63 @@ public:
     int get(seqan2::BamAlignmentRecord & record);
 };
 
+// ----------------------------------------------------------------------------
+// Class SpillJoiner
+// ----------------------------------------------------------------------------
+
+// Allows joining by key from records in the binary temporary file format stored in an IdSplitter.
+//
+// Each record consists of a 64 bit key (see spillKey()), the 32 bit length of the payload, and the payload.  The
+// payload is not interpreted here, it is written by appendSpillRead() or appendSpillAlignment() and decoded by the
+// corresponding decode*() function.  Ordering by key yields the same order as ordering the read names with
+// strnum_cmp() in FastxJoiner/SamJoiner.
+//
+// Construct with IdSplitter after reset() call.
+
+class SpillJoiner
+{
+public:
+    // The IdSplitter to use.
+    IdSplitter * splitter;
+    // Number of active files.
+    unsigned numActive;
+    // Key and payload of the buffered record for each input file.
+    std::vector<uint64_t> keys;
+    seqan2::StringSet<seqan2::CharString> payloads;
+    // Maps files for activeness.
+    std::vector<bool> active;
+    // Tournament tree over the input files.
+    LoserTree tree;
+
+    SpillJoiner() : splitter(), numActive(0)
+    {}
+
+    SpillJoiner(IdSplitter & splitter) : splitter(&splitter), numActive(0)
+    {
+        _init();
+    }
+
+    void _init();
+
+    bool _loadNext(uint64_t & key, seqan2::CharString & payload, unsigned idx);
+
+    // Returns whether the buffered record of file a is to be written before the one of file b.
+    bool _beats(unsigned a, unsigned b) const
+    {
+        if (!active[a] || !active[b])
+            return active[a] || (!active[b] && a < b);
+        return (keys[a] < keys[b]) || (keys[a] == keys[b] && a < b);
+    }
+
+    bool atEnd() const
+    {
+        return (numActive == 0);
+    }
+
+    // Get payload of the next record.
+    int get(seqan2::CharString & payload);
+};
+
 // ============================================================================
 // Metafunctions
 // ============================================================================
@@ -272,13 +410,18 @@ void FastxJoiner<TTag>::_init()
     resize(seqs, splitter->files.size());
     resize(quals, splitter->files.size());
     active.resize(splitter->files.size());
+    keys.resize(splitter->files.size());
 
     for (unsigned i = 0; i < splitter->files.size(); ++i)
     {
         inputIterators.push_back(directionIterator(*splitter->files[i], seqan2::Input()));
         active[i] = _loadNext(ids[i], seqs[i], quals[i], i);
         numActive += (active[i] != false);
+        if (active[i])
+            keys[i].assign(toCString(ids[i]));
     }
+
+    tree.build(splitter->files.size(), [this](unsigned a, unsigned b) { return _beats(a, b); });
 }
 
 // ----------------------------------------------------------------------------
@@ -302,15 +445,10 @@ bool FastxJoiner<TTag>::_loadNext(TSeq & id, TSeq & seq, TSeq & qual, unsigned i
 template <typename TTag>
 int FastxJoiner<TTag>::get(seqan2::CharString & id, seqan2::CharString & seq, seqan2::CharString & qual)
 {
-    unsigned idx = std::numeric_limits<unsigned>::max();
-    for (unsigned i = 0; i < length(ids); ++i)
-    {
-        if (!active[i])
-            continue;
-        if (idx == std::numeric_limits<unsigned>::max() || strnum_cmp(toCString(ids[i]), toCString(ids[idx])) < 0)
-            idx = i;
-    }
-    if (idx == std::numeric_limits<unsigned>::max())
+    if (empty(ids))
+        return 1;
+    unsigned idx = tree.winner();
+    if (!active[idx])
         return 1;
 
     // We use double-buffering and the input parameters as buffers.
@@ -319,10 +457,102 @@ int FastxJoiner<TTag>::get(seqan2::CharString & id, seqan2::CharString & seq, se
     swap(seq, seqs[idx]);
     swap(qual, quals[idx]);
     numActive -= !active[idx];
+    if (active[idx])
+        keys[idx].assign(toCString(ids[idx]));
+    tree.update([this](unsigned a, unsigned b) { return _beats(a, b); });
 
     return 0;
 }
 
+// ----------------------------------------------------------------------------
+// Function assignShards()
+// ----------------------------------------------------------------------------
+
+// Assign the contig/haplotype pairs to numShards shards, shards[idx] is the shard of the pair with index idx (see
+// ContigPicker::toId()).
+//
+// The pairs are assigned by decreasing contig length to the shard with the smallest total length so far, such that the
+// expected number of fragments is balanced.  The assignment only depends on the arguments.
+
+void assignShards(std::vector<int> & shards,
+                  std::vector<int64_t> const & lengthSums,
+                  int numHaplotypes,
+                  int numShards);
+
+// ----------------------------------------------------------------------------
+// Function spillKey()
+// ----------------------------------------------------------------------------
+
+// Returns the key of a record in the binary temporary files, mate is 0 for single-end reads and 1/2 for the
+// left/right mate.
+
+inline uint64_t spillKey(unsigned fragId, unsigned mate)
+{
+    return (static_cast<uint64_t>(fragId) << 2) | mate;
+}
+
+// ----------------------------------------------------------------------------
+// Function appendSpillRead()
+// ----------------------------------------------------------------------------
+
+// Append record for read to buffer, bases are packed into four bits each.
+
+void appendSpillRead(seqan2::CharString & buffer,
+                     uint64_t key,
+                     seqan2::CharString const & id,
+                     seqan2::Dna5String const & seq,
+                     seqan2::CharString const & qual);
+
+// ----------------------------------------------------------------------------
+// Function decodeSpillRead()
+// ----------------------------------------------------------------------------
+
+// Decode payload of a record written with appendSpillRead().
+
+void decodeSpillRead(seqan2::CharString & id,
+                     seqan2::CharString & seq,
+                     seqan2::CharString & qual,
+                     seqan2::CharString const & payload);
+
+// ----------------------------------------------------------------------------
+// Function appendSpillAlignment()
+// ----------------------------------------------------------------------------
+
+// Append record for alignment to buffer, the payload is the BAM encoding of record.
+
+template <typename TContext>
+void appendSpillAlignment(seqan2::CharString & buffer,
+                          uint64_t key,
+                          seqan2::BamAlignmentRecord const & record,
+                          TContext & bamIOContext)
+{
+    unsigned pos = length(buffer);
+    uint32_t len = 0;
+    resize(buffer, pos + sizeof(key) + sizeof(len));
+    memcpy(&buffer[pos], &key, sizeof(key));
+
+    writeRecord(buffer, bamIOContext, record, seqan2::Bam());
+
+    len = length(buffer) - pos - sizeof(key) - sizeof(len);
+    memcpy(&buffer[pos + sizeof(key)], &len, sizeof(len));
+}
+
+// ----------------------------------------------------------------------------
+// Function decodeSpillAlignment()
+// ----------------------------------------------------------------------------
+
+// Decode payload of a record written with appendSpillAlignment().
+
+template <typename TContext>
+void decodeSpillAlignment(seqan2::BamAlignmentRecord & record,
+                          seqan2::CharString & payload,
+                          TContext & bamIOContext)
+{
+    typename seqan2::DirectionIterator<seqan2::CharString, seqan2::Input>::Type iter =
+            directionIterator(payload, seqan2::Input());
+    readRecord(record, bamIOContext, iter, seqan2::Bam());
+}
+
 // ----------------------------------------------------------------------------
 // Function ltBamAlignmentRecord()
 // ----------------------------------------------------------------------------
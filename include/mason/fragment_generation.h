@@ -42,6 +42,8 @@
 #ifndef APPS_MASON2_FRAGMENT_GENERATION_H_
 #define APPS_MASON2_FRAGMENT_GENERATION_H_
 
+#include <algorithm>
+#include <cstdint>
 #include <sstream>
 #include <fstream>
 #include <vector>
@@ -58,8 +60,6 @@
 // Forwards
 // ============================================================================
 
-typedef std::mt19937 TRng;
-
 inline void trimAfterSpace(seqan2::CharString & s);
 
 // ============================================================================
@@ -82,6 +82,48 @@ public:
     {}
 };
 
+// ----------------------------------------------------------------------------
+// Class FragmentPlacementIndex
+// ----------------------------------------------------------------------------
+
+// Index of the start positions of fragments that do not overlap with a gap.
+//
+// The gap-free segments of the contig are kept sorted by their length.  For a fragment length, the segments that are
+// long enough form a suffix of this array and the number of valid start positions in them can be computed from prefix
+// sums of the segment lengths.  Thus, the k-th valid start position is found with a binary search.  The index is
+// built once per contig and only read afterwards, such that it can be shared by all threads.
+
+class FragmentPlacementIndex
+{
+public:
+    // The gap-free segments (length, begin position), sorted by length.
+    std::vector<std::pair<int, int> > segments;
+    // lengthSums[i] is the total length of segments[0..(i-1)].
+    std::vector<int64_t> lengthSums;
+
+    // Build the index for a contig of the given length and its sorted gap intervals.
+    void build(unsigned contigLength, std::vector<std::pair<int, int> > const & gapIntervals);
+
+    // Return the number of start positions for fragments of length fragLength that do not overlap with a gap.
+    int64_t numStarts(int fragLength) const;
+
+    // Return the rank-th valid start position (in an arbitrary but fixed order) for fragments of length fragLength,
+    // rank must be smaller than numStarts(fragLength).
+    int startPos(int fragLength, int64_t rank) const;
+
+    // Return index of the first segment with at least fragLength characters.
+    unsigned _firstSegment(int fragLength) const
+    {
+        return std::lower_bound(segments.begin(), segments.end(), std::make_pair(fragLength, 0)) - segments.begin();
+    }
+
+    // Return the number of valid start positions in segments[first..(last-1)] for fragments of length fragLength.
+    int64_t _numStarts(unsigned first, unsigned last, int fragLength) const
+    {
+        return (lengthSums[last] - lengthSums[first]) - static_cast<int64_t>(last - first) * (fragLength - 1);
+    }
+};
+
 // ----------------------------------------------------------------------------
 // Class FragmentSamplerImpl
 // ----------------------------------------------------------------------------
@@ -96,6 +138,10 @@ public:
     virtual void generateMany(std::vector<Fragment> & frags, int rId, unsigned contigLength,
                               std::vector<std::pair<int, int> > const & gapIntervals,
                               unsigned count) = 0;
+    // Reset the state of the length distribution, such that the next length only depends on the RNG.
+    virtual void reset() = 0;
+    // Draw a fragment length from the length distribution.
+    virtual int drawLength() = 0;
 
     virtual ~FragmentSamplerImpl() = default;
 };
@@ -133,6 +179,16 @@ public:
                               std::vector<std::pair<int, int> > const & gapIntervals,
                               unsigned count);
 
+    virtual void reset()
+    {
+        dist.reset();
+    }
+
+    virtual int drawLength()
+    {
+        return dist(rng);
+    }
+
     void _generate(Fragment & frag, int rId, unsigned contigLength,
                    std::vector<std::pair<int, int> > const & gapIntervals);
 };
@@ -168,6 +224,16 @@ public:
     virtual void generateMany(std::vector<Fragment> & frags, int rId, unsigned contigLength,
                               std::vector<std::pair<int, int> > const & gapIntervals, unsigned count);
 
+    virtual void reset()
+    {
+        dist.reset();
+    }
+
+    virtual int drawLength()
+    {
+        return static_cast<int>(dist(rng));
+    }
+
     void _generate(Fragment & frag, int rId, unsigned contigLength,
                    std::vector<std::pair<int, int> > const & gapIntervals);
 };
@@ -184,10 +250,13 @@ public:
     // Configuration for the generator.
     FragmentSamplerOptions options;
 
+    // The random number generator to use.
+    TRng & rng;
+
     // The actual generator implementation to use.
     std::unique_ptr<FragmentSamplerImpl> impl;
 
-    FragmentSampler(TRng & rng, FragmentSamplerOptions const & options) : options(options)
+    FragmentSampler(TRng & rng, FragmentSamplerOptions const & options) : options(options), rng(rng)
     {
         if (options.model == FragmentSamplerOptions::UNIFORM)
             impl.reset(new UniformFragmentSamplerImpl(rng, options.minFragmentSize,
@@ -212,6 +281,16 @@ public:
     {
         impl->generateMany(frags, rId, contigLength, gapIntervals, count);
     }
+
+    // Generate a fragment with a start position drawn from the valid start positions in index.  Only fragment lengths
+    // that do not fit into any gap-free segment are drawn again.
+    void generate(Fragment & frag, int rId, FragmentPlacementIndex const & index);
+
+    // Reset the state of the length distribution, required before generating with a reseeded RNG.
+    void reset()
+    {
+        impl->reset();
+    }
 };
 
 // ============================================================================
@@ -307,6 +386,89 @@ void trimAfterSpace(seqan2::CharString & s)
     resize(s, i);
 }
 
+// --------------------------------------------------------------------------
+// Function FragmentPlacementIndex::build()
+// --------------------------------------------------------------------------
+
+inline void FragmentPlacementIndex::build(unsigned contigLength,
+                                          std::vector<std::pair<int, int> > const & gapIntervals)
+{
+    segments.clear();
+    int beginPos = 0;
+    for (unsigned i = 0; i < gapIntervals.size(); ++i)
+    {
+        if (gapIntervals[i].first > beginPos)
+            segments.push_back(std::make_pair(gapIntervals[i].first - beginPos, beginPos));
+        beginPos = std::max(beginPos, gapIntervals[i].second);
+    }
+    if ((int)contigLength > beginPos)
+        segments.push_back(std::make_pair((int)contigLength - beginPos, beginPos));
+    std::sort(segments.begin(), segments.end());
+
+    lengthSums.assign(segments.size() + 1, 0);
+    for (unsigned i = 0; i < segments.size(); ++i)
+        lengthSums[i + 1] = lengthSums[i] + segments[i].first;
+}
+
+// --------------------------------------------------------------------------
+// Function FragmentPlacementIndex::numStarts()
+// --------------------------------------------------------------------------
+
+inline int64_t FragmentPlacementIndex::numStarts(int fragLength) const
+{
+    if (fragLength <= 0)
+        return 0;
+    return _numStarts(_firstSegment(fragLength), segments.size(), fragLength);
+}
+
+// --------------------------------------------------------------------------
+// Function FragmentPlacementIndex::startPos()
+// --------------------------------------------------------------------------
+
+inline int FragmentPlacementIndex::startPos(int fragLength, int64_t rank) const
+{
+    // Find the segment that contains the rank-th start position, i.e. the smallest last with more than rank start
+    // positions in segments[first..last].
+    unsigned first = _firstSegment(fragLength);
+    unsigned lo = first, hi = segments.size() - 1;
+    while (lo < hi)
+    {
+        unsigned mid = lo + (hi - lo) / 2;
+        if (_numStarts(first, mid + 1, fragLength) > rank)
+            hi = mid;
+        else
+            lo = mid + 1;
+    }
+    return segments[lo].second + static_cast<int>(rank - _numStarts(first, lo, fragLength));
+}
+
+// --------------------------------------------------------------------------
+// Function FragmentSampler::generate()
+// --------------------------------------------------------------------------
+
+inline void FragmentSampler::generate(Fragment & frag, int rId, FragmentPlacementIndex const & index)
+{
+    unsigned const MAX_TRIES = 1000;
+    for (unsigned tryNo = 0; tryNo < MAX_TRIES; ++tryNo)
+    {
+        int fragLength = impl->drawLength();
+        if (fragLength <= 0 || (options.fragSizeLowerBound && options.fragSizeLowerBound > fragLength))
+            continue;  // Try again
+        int64_t numStarts = index.numStarts(fragLength);
+        if (numStarts == 0)
+            continue;  // longer than all gap-free segments
+
+        std::uniform_int_distribution<int64_t> posDist(0, numStarts - 1);
+        frag.rId = rId;
+        frag.beginPos = index.startPos(fragLength, posDist(rng));
+        frag.endPos = frag.beginPos + fragLength;
+        return;
+    }
+
+    std::cerr << "WARNING: Tried " << MAX_TRIES << " times to sample fragment length fitting into a gap-free segment "
+              << "of the contig.  Giving up.\n";
+}
+
 // TODO(holtgrew): Too much redundancy here.
 
 void UniformFragmentSamplerImpl::generate(Fragment & frag, int rId, unsigned contigLength,
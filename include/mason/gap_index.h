@@ -0,0 +1,139 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+// Intervals of runs of Ns (gaps) in contigs.
+//
+// Fragments overlapping with a gap are not simulated.  The gaps of the
+// reference contigs can be stored in a sidecar file next to the FAI index
+// such that they do not have to be computed again in later runs.
+// ==========================================================================
+
+#ifndef APPS_MASON2_GAP_INDEX_H_
+#define APPS_MASON2_GAP_INDEX_H_
+
+#include <cstdint>
+#include <string>
+#include <utility>
+#include <vector>
+
+#include <seqan/seq_io.h>
+#include <seqan/sequence.h>
+
+// ============================================================================
+// Forwards
+// ============================================================================
+
+// ============================================================================
+// Tags, Classes, Enums
+// ============================================================================
+
+// ----------------------------------------------------------------------------
+// Class GapIndex
+// ----------------------------------------------------------------------------
+
+// The gap intervals of all contigs of a reference.
+//
+// The sidecar file is a text file starting with the line "#MASON GAPS 2" and a line with "#FASTA" and the fingerprint
+// of the FASTA file, separated by a tab.  For each contig, there is a line with ">", the name, and the length, followed
+// by one line with begin and end position for each gap, separated by tabs.  The file is only used if the FASTA file
+// still has the fingerprint, such that a FASTA file edited without changing the contig lengths is not used with
+// outdated gaps.
+
+class GapIndex
+{
+public:
+    // Names and lengths of the contigs.
+    std::vector<std::string> contigNames;
+    std::vector<unsigned> contigLengths;
+    // Gap intervals for each contig.
+    std::vector<std::vector<std::pair<int, int> > > intervals;
+    // The fingerprint of the FASTA file the gaps were computed from, see computeFastaFingerprint().
+    uint64_t fingerprint;
+
+    GapIndex() : fingerprint(0)
+    {}
+
+    // Compute the gaps of all contigs in faiIndex.
+    void build(seqan2::FaiIndex const & faiIndex);
+
+    // Load the gaps from fileName, returns false if the file could not be read or does not match faiIndex and the
+    // current fingerprint of its FASTA file.
+    bool load(char const * fileName, seqan2::FaiIndex const & faiIndex);
+
+    // Save the gaps to fileName, returns false on errors.  The file is written under a temporary name and renamed such
+    // that concurrent readers never see a partially written file.
+    bool save(char const * fileName) const;
+};
+
+// ============================================================================
+// Metafunctions
+// ============================================================================
+
+// ============================================================================
+// Functions
+// ============================================================================
+
+// ----------------------------------------------------------------------------
+// Function buildGapIntervals()
+// ----------------------------------------------------------------------------
+
+// Build sorted vector of intervals of at least minNs N characters in contigSeq, a run of Ns at the end is always
+// included.
+//
+// Eight characters are checked at a time while skipping over non-N and N characters.
+
+void buildGapIntervals(std::vector<std::pair<int, int> > & intervals,
+                       seqan2::Dna5String const & contigSeq,
+                       unsigned minNs = 3);
+
+// ----------------------------------------------------------------------------
+// Function computeFastaFingerprint()
+// ----------------------------------------------------------------------------
+
+// Compute a fingerprint of the FASTA file fileName from its size and modification time, returns false if the file
+// does not exist.  Used for detecting that the sidecar files of a FASTA file are outdated.
+
+bool computeFastaFingerprint(uint64_t & fingerprint, char const * fileName);
+
+// ----------------------------------------------------------------------------
+// Function gapIndexFileName()
+// ----------------------------------------------------------------------------
+
+// Returns the path of the gap sidecar file for the given FASTA file.
+
+inline std::string gapIndexFileName(char const * fastaFileName)
+{
+    return std::string(fastaFileName) + ".gaps";
+}
+
+#endif  // #ifndef APPS_MASON2_GAP_INDEX_H_
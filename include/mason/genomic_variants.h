@@ -429,6 +429,8 @@ public:
 
     // Gap anchors for gaps for translating between original and small variant coordinate system.
     TGapAnchors refGapAnchors, smallVarGapAnchors;
+    // The intervals on the sequence with SVs that the interval trees are built from.
+    seqan2::String<GenomicInterval> svIntervals;
     // The mapping from the genome with large variants to the one with small variants.
     TIntervalTree svIntervalTree;
     // The mapping from the genome with small variants to the one with large variants.
@@ -467,6 +469,9 @@ public:
 
     // Reset the PositionMap with the length of the original sequence.
     void reinit(TJournalEntries const & journal);
+
+    // Build svIntervalTree and svIntervalTreeSTL from svIntervals.
+    void buildIntervalTrees();
 };
 
 // --------------------------------------------------------------------------
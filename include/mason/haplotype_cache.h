@@ -0,0 +1,183 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+// On-disk cache of materialized haplotypes.
+//
+// Materializing the haplotypes of a VCF file, including the construction of
+// the PositionMap, is repeated by every simulation run with the same
+// reference and variants.  The cache stores the haplotypes of one run in a
+// file named by a hash of the content of the FASTA and VCF files, such that
+// later runs can memory-map and decode them instead.
+// ==========================================================================
+
+#ifndef APPS_MASON2_HAPLOTYPE_CACHE_H_
+#define APPS_MASON2_HAPLOTYPE_CACHE_H_
+
+#include <cstdint>
+#include <fstream>
+#include <string>
+#include <utility>
+#include <vector>
+
+#include <seqan/file.h>
+#include <seqan/sequence.h>
+
+#include <mason/genomic_variants.h>
+
+// ============================================================================
+// Forwards
+// ============================================================================
+
+// ============================================================================
+// Tags, Classes, Enums
+// ============================================================================
+
+// ----------------------------------------------------------------------------
+// Class HaplotypeCacheWriter
+// ----------------------------------------------------------------------------
+
+// Writes the haplotypes to a cache file.
+//
+// The file starts with the eight characters "MSNHAPL1", the value 0x0102030405060708 for detecting the byte order, and
+// the key, all as 64 bit words.  It is followed by one record for each haplotype in the order of materialization:
+// the reference and haplotype id, the sequence with two bits per base and its runs of Ns, the small variant infos,
+// the breakpoints, and the gap anchors, intervals, and breakpoints of the PositionMap.
+//
+// The records are written to a temporary file that is renamed to the cache file by commit(), such that incomplete
+// files are never read.
+
+class HaplotypeCacheWriter
+{
+public:
+    // The path of the cache file and of the temporary file written to.
+    std::string fileName, tmpFileName;
+    // The temporary file.
+    std::ofstream out;
+    // Buffers for encoding a record.
+    std::string buffer;
+    std::vector<uint64_t> words;
+    std::vector<std::pair<int, int> > nRuns;
+
+    ~HaplotypeCacheWriter()
+    {
+        abort();
+    }
+
+    // Open a temporary file for the cache file fileName with the given key, returns false on errors.
+    bool open(char const * fileName, uint64_t key);
+
+    // Returns whether a file is open.
+    bool isOpen() const
+    {
+        return out.is_open();
+    }
+
+    // Append the record of a haplotype, returns false on errors.
+    bool write(int rID, int hID,
+               seqan2::Dna5String const & seq,
+               std::vector<SmallVarInfo> const & varInfos,
+               std::vector<std::pair<int, int> > const & breakpoints,
+               PositionMap const & posMap);
+
+    // Close the temporary file and rename it to the cache file, returns false on errors.
+    bool commit();
+
+    // Close and remove the temporary file.
+    void abort();
+};
+
+// ----------------------------------------------------------------------------
+// Class HaplotypeCacheReader
+// ----------------------------------------------------------------------------
+
+// Reads the haplotypes from a memory-mapped cache file written by HaplotypeCacheWriter.
+
+class HaplotypeCacheReader
+{
+public:
+    // The memory-mapped cache file.
+    seqan2::String<char, seqan2::MMap<> > mappedFile;
+    // The position of the next record in mappedFile and its end, null if no file is open.
+    char const * ptr;
+    char const * endPtr;
+    // Buffer for the runs of Ns.
+    std::vector<std::pair<int, int> > nRuns;
+
+    HaplotypeCacheReader() : ptr(), endPtr()
+    {}
+
+    // Map the cache file fileName, returns false if it does not exist or does not have the given key.
+    bool open(char const * fileName, uint64_t key);
+
+    // Returns whether a file is open.
+    bool isOpen() const
+    {
+        return ptr != 0;
+    }
+
+    // Read the next haplotype, returns false if there is none left.
+    //
+    // Throws: MasonIOException if the file is truncated.
+    bool readNext(int & rID, int & hID,
+                  seqan2::Dna5String & seq,
+                  std::vector<SmallVarInfo> & varInfos,
+                  std::vector<std::pair<int, int> > & breakpoints,
+                  PositionMap & posMap);
+};
+
+// ============================================================================
+// Metafunctions
+// ============================================================================
+
+// ============================================================================
+// Functions
+// ============================================================================
+
+// ----------------------------------------------------------------------------
+// Function computeHaplotypeCacheKey()
+// ----------------------------------------------------------------------------
+
+// Compute the cache key from the content of the FASTA file and the VCF file, if any, returns false if they could not
+// be read.
+
+bool computeHaplotypeCacheKey(uint64_t & key, char const * fastaFileName, char const * vcfFileName);
+
+// ----------------------------------------------------------------------------
+// Function haplotypeCacheFileName()
+// ----------------------------------------------------------------------------
+
+// Returns the path of the cache file with the given key in the directory cacheDir.
+
+std::string haplotypeCacheFileName(char const * cacheDir, uint64_t key);
+
+#endif  // #ifndef APPS_MASON2_HAPLOTYPE_CACHE_H_
@@ -0,0 +1,256 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+// k-way merging with a loser tree and read names with cached sort keys.
+//
+// The joiners in external_split_merge.h merge the temporary files for all
+// contig/haplotype pairs by read name.  The loser tree selects the smallest
+// of k inputs in O(log k) comparisons and the NaturalNameKey avoids parsing
+// the numbers in the read names on each comparison.
+// ==========================================================================
+
+#ifndef APPS_MASON2_LOSER_TREE_H_
+#define APPS_MASON2_LOSER_TREE_H_
+
+#include <cctype>
+#include <cstdlib>
+#include <cstring>
+#include <string>
+#include <utility>
+#include <vector>
+
+// ============================================================================
+// Forwards
+// ============================================================================
+
+// ============================================================================
+// Tags, Classes, Enums
+// ============================================================================
+
+// ----------------------------------------------------------------------------
+// Class NaturalNameKey
+// ----------------------------------------------------------------------------
+
+// Sort key for a read name that orders like strnum_cmp() from external_split_merge.h.
+//
+// The name is split into runs of digits and runs of other characters when assigning, the numbers are parsed once.
+// compare() then walks the tokens instead of the characters and does not call strtol().
+
+class NaturalNameKey
+{
+public:
+    // A run of digits or a run of other characters in name.
+    struct Token
+    {
+        // Begin position and length in name.
+        unsigned beginPos, len;
+        // Whether this is a run of digits and, if so, the parsed number.
+        bool isNumber;
+        long value;
+
+        Token() : beginPos(0), len(0), isNumber(false), value(0)
+        {}
+    };
+
+    // The name, tokens refer to it.
+    std::string name;
+    // The tokens of name.
+    std::vector<Token> tokens;
+
+    NaturalNameKey()
+    {}
+
+    explicit NaturalNameKey(char const * str)
+    {
+        assign(str);
+    }
+
+    // Set key to the name str, reuses the buffers.
+    void assign(char const * str)
+    {
+        name.assign(str);
+        tokens.clear();
+        char const * first = name.c_str();
+        char const * ptr = first;
+        while (*ptr)
+        {
+            Token token;
+            token.beginPos = ptr - first;
+            if (isdigit(*ptr))
+            {
+                char * end = 0;
+                token.isNumber = true;
+                token.value = strtol(ptr, &end, 10);  // same parsing and overflow behaviour as strnum_cmp
+                ptr = end;
+            }
+            else
+            {
+                while (*ptr && !isdigit(*ptr))
+                    ++ptr;
+            }
+            token.len = (ptr - first) - token.beginPos;
+            tokens.push_back(token);
+        }
+    }
+
+    // Returns first character of the token with the given index, 0 if idx is behind the last token.
+    char charAt(unsigned idx) const
+    {
+        return (idx < tokens.size()) ? name[tokens[idx].beginPos] : '\0';
+    }
+};
+
+// ----------------------------------------------------------------------------
+// Class LoserTree
+// ----------------------------------------------------------------------------
+
+// Tournament tree for selecting the smallest head element of k input streams.
+//
+// The tree only stores input indices.  The comparison is given as a functor beats(a, b) that returns true if the
+// current element of input a is to be taken before the one of input b.  Exhausted inputs should lose against all
+// other inputs.  Leaf i is at position k + i, the internal nodes 1..k-1 store the loser of the match at the node,
+// node 0 stores the overall winner.
+//
+// Protocol:
+//
+// * build()
+// * winner() to get the input with the smallest element
+// * advance the winning input, then call update()
+
+class LoserTree
+{
+public:
+    // The number of inputs.
+    unsigned numLeaves;
+    // The loser of each internal node, the winner in nodes[0].
+    std::vector<unsigned> nodes;
+
+    LoserTree() : numLeaves(0)
+    {}
+
+    // Play the complete tournament for k inputs.
+    template <typename TBeats>
+    void build(unsigned k, TBeats beats)
+    {
+        numLeaves = k;
+        nodes.assign(k ? k : 1, 0);
+        if (k == 0)
+            return;
+
+        std::vector<unsigned> winners(2 * k);
+        for (unsigned i = 0; i < k; ++i)
+            winners[k + i] = i;
+        for (unsigned node = k - 1; node >= 1; --node)
+        {
+            unsigned a = winners[2 * node], b = winners[2 * node + 1];
+            if (beats(b, a))
+                std::swap(a, b);
+            winners[node] = a;
+            nodes[node] = b;
+        }
+        nodes[0] = (k == 1) ? 0 : winners[1];
+    }
+
+    // Returns the input index with the smallest element.
+    unsigned winner() const
+    {
+        return nodes[0];
+    }
+
+    // Replay the matches on the path of the winner after its input has advanced.
+    template <typename TBeats>
+    void update(TBeats beats)
+    {
+        unsigned current = nodes[0];
+        for (unsigned node = (numLeaves + current) / 2; node >= 1; node /= 2)
+            if (beats(nodes[node], current))
+                std::swap(nodes[node], current);
+        nodes[0] = current;
+    }
+};
+
+// ============================================================================
+// Metafunctions
+// ============================================================================
+
+// ============================================================================
+// Functions
+// ============================================================================
+
+// ----------------------------------------------------------------------------
+// Function compare()
+// ----------------------------------------------------------------------------
+
+// Compare two keys, returns -1, 0, or 1 like strnum_cmp() for the names.
+
+inline int compare(NaturalNameKey const & lhs, NaturalNameKey const & rhs)
+{
+    unsigned const lhsCount = lhs.tokens.size(), rhsCount = rhs.tokens.size();
+    unsigned i = 0;
+    for (; i < lhsCount && i < rhsCount; ++i)
+    {
+        NaturalNameKey::Token const & l = lhs.tokens[i];
+        NaturalNameKey::Token const & r = rhs.tokens[i];
+        if (l.isNumber && r.isNumber)
+        {
+            if (l.value != r.value)
+                return (l.value < r.value) ? -1 : 1;
+            continue;
+        }
+        if (l.isNumber != r.isNumber)  // digit against non-digit
+        {
+            char a = lhs.name[l.beginPos], b = rhs.name[r.beginPos];
+            return (a < b) ? -1 : 1;
+        }
+
+        // Two runs of non-digits, the character after the shorter run is a digit or the end of the name.
+        char const * a = lhs.name.c_str() + l.beginPos;
+        char const * b = rhs.name.c_str() + r.beginPos;
+        unsigned len = (l.len < r.len) ? l.len : r.len;
+        for (unsigned j = 0; j < len; ++j)
+            if (a[j] != b[j])
+                return (a[j] < b[j]) ? -1 : 1;
+        if (l.len != r.len)
+        {
+            char ca = (l.len < r.len) ? lhs.charAt(i + 1) : a[len];
+            char cb = (r.len < l.len) ? rhs.charAt(i + 1) : b[len];
+            return (ca < cb) ? -1 : 1;
+        }
+    }
+    if (i == lhsCount && i == rhsCount)  // tie on all tokens, shorter name first
+        return (lhs.name.size() < rhs.name.size()) ? -1 : (lhs.name.size() > rhs.name.size()) ? 1 : 0;
+    char a = lhs.charAt(i), b = rhs.charAt(i);
+    return (a < b) ? -1 : 1;
+}
+
+#endif  // #ifndef APPS_MASON2_LOSER_TREE_H_
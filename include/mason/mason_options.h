@@ -48,6 +48,9 @@
 #ifndef APPS_MASON2_MASON_OPTIONS_H_
 #define APPS_MASON2_MASON_OPTIONS_H_
 
+#include <string>
+#include <vector>
+
 #include <seqan/arg_parse.h>
 #include <seqan/sequence.h>
 #include <seqan/seq_io.h>
@@ -181,10 +184,13 @@ struct MaterializerOptions
     seqan2::CharString fastaFileName;
     // Path to VCF file.  No variation is applied if empty.
     seqan2::CharString vcfFileName;
+    // Whether to load the contigs from a memory-mapped file with two bits per base next to the reference, created if
+    // necessary.
+    bool usePackedReference;
 
     // TODO(holtgrew): Add options for methylation levels FASTA input here?
 
-    MaterializerOptions() : verbosity(1)
+    MaterializerOptions() : verbosity(1), usePackedReference(false)
     {}
 
     // Add options to the argument parser.
@@ -320,6 +326,9 @@ struct SequencingOptions
     bool simulateMatePairs;
     // Whether or not to gather read information.
     bool embedReadInfo;
+    // Whether to sample the Illumina qualities from precomputed tables and the Sanger qualities from batched normal
+    // distributed numbers.  Yields the same quality distribution but not the same qualities for a given seed.
+    bool qualityTables;
     // Mate orientation.
     MateOrientation mateOrientation;
     // Whether to simulate from forward/reverse strand or both.
@@ -328,7 +337,7 @@ struct SequencingOptions
     SequencingTechnology sequencingTechnology;
 
     SequencingOptions() :
-            verbosity(1), simulateQualities(false), simulateMatePairs(false), embedReadInfo(false),
+            verbosity(1), simulateQualities(false), simulateMatePairs(false), embedReadInfo(false), qualityTables(false),
             mateOrientation(FORWARD_REVERSE), strands(BOTH), sequencingTechnology(ILLUMINA)
     {}
 
@@ -392,12 +401,18 @@ struct IlluminaSequencingOptions
     // Relative position in the read between 0 and 1 where the steeper curve begins.
     double positionRaise;
 
+    // Whether to draw the distance to the next sequencing error instead of deciding per base.  Yields the same error
+    // distribution with fewer random numbers but not the same reads for a given seed.
+    bool skipAheadErrors;
+
     // // If set then no Ns will be introduced into the read.
     // bool illuminaNoN;
 
     // Paths to left/right template FASTQ files.  The qualities will be used to compute positional qualities, patterns
     // of Ns will be applied to the simulated reads.  If set, this will be used instead of the built-in model.
     seqan2::CharString leftTemplateFastq, rightTemplateFastq;
+    // Path to a model file written by mason_train_model, used instead of the template FASTQ files if set.
+    seqan2::CharString modelFile;
 
     // -----------------------------------------------------------------------
     // Base Calling Quality Model Parameters.
@@ -433,6 +448,7 @@ struct IlluminaSequencingOptions
             probabilityMismatchBegin(0.002),
             probabilityMismatchEnd(0.012),
             positionRaise(0.66),
+            skipAheadErrors(false),
             // illuminaNoN(false),
             // Base Calling Quality Model Parameters
             meanQualityBegin(40),
@@ -631,6 +647,27 @@ struct Roche454SequencingOptions
     void print(std::ostream & out) const;
 };
 
+// ----------------------------------------------------------------------------
+// Class RunStatsOptions
+// ----------------------------------------------------------------------------
+
+// Configuration for writing the run statistics, shared by all programs.
+
+struct RunStatsOptions
+{
+    // Path to the JSON file to write the run statistics to, none are written if empty.
+    seqan2::CharString statsJsonFile;
+
+    // Add options to the argument parser.
+    void addOptions(seqan2::ArgumentParser & parser) const;
+
+    // Get option values from the argument parser.
+    void getOptionValues(seqan2::ArgumentParser const & parser);
+
+    // Print settings to out.
+    void print(std::ostream & out) const;
+};
+
 // ----------------------------------------------------------------------------
 // Class MasonSimulatorOptions
 // ----------------------------------------------------------------------------
@@ -646,6 +683,65 @@ struct Roche454SequencingOptions
 
 struct MasonSimulatorOptions
 {
+    // Enum for selecting how the simulation threads draw random numbers.
+    enum RngMode
+    {
+        THREAD_RNG,   // one Mersenne Twister per thread, seeded with seed + i * seedSpacing
+        FRAGMENT_RNG  // counter-based stream per fragment, independent of thread count and chunk size
+    };
+
+    // Enum for selecting how the fragments are distributed to the simulation threads.
+    enum Scheduling
+    {
+        STATIC_SCHEDULING,  // one chunk per thread, all threads wait for the slowest one
+        DYNAMIC_SCHEDULING  // small batches pulled by the threads as they become idle, requires FRAGMENT_RNG
+    };
+
+    // Enum for selecting how CIGAR string, MD string, and edit distance of the simulated alignments are computed.
+    enum AlignmentMode
+    {
+        REALIGN,  // banded re-alignment against the original reference
+        TRACE,    // from the error CIGAR string and the small variants without alignment
+        CHECK     // compute both, write out re-alignment result, and report differences
+    };
+
+    // Enum for selecting the format of the temporary files that the reads and alignments are written to before
+    // joining them by fragment id.
+    enum TempFormat
+    {
+        TEXT,    // FASTQ and SAM
+        BINARY   // fragment id, packed bases, qualities, and BAM records
+    };
+
+    // Enum for selecting how the reads are brought into the order of their ids.
+    enum OutputMode
+    {
+        JOIN,    // random fragment ids per contig/haplotype, written to temporary files and joined by id
+        STREAM   // contiguous fragment ids per contig/haplotype, written directly in id order
+    };
+
+    // Enum for selecting how the fragments are distributed to the contigs/haplotypes.
+    enum FragmentAllocation
+    {
+        PICK_ALLOCATION,        // contig/haplotype picked for each fragment, ids written to temporary files
+        MULTINOMIAL_ALLOCATION  // multinomial counts, ids from a pseudorandom permutation
+    };
+
+    // Enum for selecting how the fragment positions are sampled such that they do not overlap with gaps.
+    enum FragmentPlacement
+    {
+        REJECTION_PLACEMENT,  // draw length and position, draw again on overlap with a gap
+        INDEX_PLACEMENT       // draw position from an index of the valid start positions for the length
+    };
+
+    // Enum for selecting the compression of the temporary files.
+    enum TempCompression
+    {
+        NO_COMPRESSION,
+        FAST_COMPRESSION,
+        BEST_COMPRESSION
+    };
+
     // Verbosity: 0 -- quiet, 1 -- normal, 2 -- verbose, 3 -- very verbose.
     int verbosity;
     // The seed for the random number generator.
@@ -655,10 +751,44 @@ struct MasonSimulatorOptions
     // The spacing of the see when using multi-threading.  Thread i (beginning with 0) will get (seed + i) as its
     // initial seed.  While not crytographically safe, this should be OK for read simulation.
     int seedSpacing;
+    // How the simulation threads draw random numbers.
+    RngMode rngMode;
     // The number of threads to use for the simulation.
     int numThreads;
     // Number of reads/pairs to simulate in one chunk
     int chunkSize;
+    // How the fragments are distributed to the simulation threads.
+    Scheduling scheduling;
+    // Number of reads/pairs in one batch for scheduling == DYNAMIC_SCHEDULING.
+    int batchSize;
+    // Number of haplotypes to materialize in a background thread ahead of the read simulation, 0 for materializing
+    // them in turn with the simulation.
+    int prefetchHaplotypes;
+    // Number of simulated chunks that can wait for being written to the temporary files by a background thread, 0 for
+    // writing them in turn with the simulation.
+    int writerQueueSize;
+    // Number of threads for compressing BAM and gzip-compressed FASTA/FASTQ output in parallel, 0 for the sequential
+    // writers of SeqAn.
+    int ioThreads;
+    // How the fragments are distributed to the contigs/haplotypes.
+    FragmentAllocation fragmentAllocation;
+    // How the fragment positions are sampled.
+    FragmentPlacement fragmentPlacement;
+    // Whether to load the gaps of the reference from a sidecar file next to it, created if necessary.  Only used
+    // without VCF file, when the haplotypes equal the reference.
+    bool useGapIndex;
+    // Directory with the cache files of materialized haplotypes, empty for no cache.
+    seqan2::CharString haplotypeCacheDir;
+    // How the output is brought into the order of the ids.
+    OutputMode outputMode;
+    // Format of the temporary files.
+    TempFormat tempFormat;
+    // Compression of the temporary files, implies tempFormat == BINARY if enabled.
+    TempCompression tempCompression;
+    // The shard of the contig/haplotype pairs to simulate the reads of (beginning with 0) and the number of shards,
+    // numShards == 0 if the value of --shard is invalid.
+    int shardIndex;
+    int numShards;
 
     // Number of reads/pairs to simulate.
     int numFragments;
@@ -673,6 +803,9 @@ struct MasonSimulatorOptions
     // Path to output SAM file.
     seqan2::CharString outFileNameSam;
 
+    // How to compute the alignments written to outFileNameSam.
+    AlignmentMode alignmentMode;
+
     // Configuration for the reading of the reference and application of the variants from the VCF file.
     MaterializerOptions matOptions;
     // Configuration for the methylation simulation.  Required for repairing methylation levels after variation.
@@ -690,9 +823,17 @@ struct MasonSimulatorOptions
     // Configuration of the Roche 454 read simulation.
     Roche454SequencingOptions rocheOptions;
 
+    // Configuration of the run statistics.
+    RunStatsOptions statsOptions;
+
     MasonSimulatorOptions() :
-            verbosity(1), seed(0), methSeed(0), seedSpacing(2048), numThreads(1), chunkSize(64*1024), numFragments(0),
-            forceSingleEnd(false)
+            verbosity(1), seed(0), methSeed(0), seedSpacing(2048), rngMode(THREAD_RNG), numThreads(1), chunkSize(64*1024),
+            scheduling(STATIC_SCHEDULING), batchSize(1024),
+            prefetchHaplotypes(0), writerQueueSize(0), ioThreads(0),
+            fragmentAllocation(PICK_ALLOCATION), fragmentPlacement(REJECTION_PLACEMENT), useGapIndex(false),
+            outputMode(JOIN), tempFormat(TEXT),
+            tempCompression(NO_COMPRESSION), shardIndex(0), numShards(1),
+            numFragments(0), forceSingleEnd(false), alignmentMode(REALIGN)
     {}
 
     // Add options to the argument parser.  Calls addOptions() on the nested *Options objects.
@@ -728,6 +869,8 @@ struct MasonMaterializerOptions
     MaterializerOptions matOptions;
     // Options for the methylation simulation.
     MethylationLevelSimulatorOptions methOptions;
+    // Options for the run statistics.
+    RunStatsOptions statsOptions;
 
     // Path to output file.
     seqan2::CharString outputFileName;
@@ -739,8 +882,10 @@ struct MasonMaterializerOptions
     seqan2::CharString methFastaInFile;
     // FASTA file to write the methylation levels to.
     seqan2::CharString methFastaOutFile;
+    // Number of threads for compressing gzip-compressed output in parallel, 0 for the sequential writer of SeqAn.
+    int ioThreads;
 
-    MasonMaterializerOptions() : verbosity(1), seed(0), methSeed(0)
+    MasonMaterializerOptions() : verbosity(1), seed(0), methSeed(0), ioThreads(0)
     {}
 
     // Add options to the argument parser.
@@ -772,6 +917,8 @@ struct MasonSplicingOptions
 
     // Options for the materializer.
     MaterializerOptions matOptions;
+    // Options for the run statistics.
+    RunStatsOptions statsOptions;
 
     // Path to input GFF/GTF file.
     seqan2::CharString inputGffFile;
@@ -784,8 +931,10 @@ struct MasonSplicingOptions
     seqan2::CharString outputFileName;
     // Separator between contig names and haplotype number.
     seqan2::CharString haplotypeNameSep;
+    // Number of threads for compressing gzip-compressed output in parallel, 0 for the sequential writer of SeqAn.
+    int ioThreads;
 
-    MasonSplicingOptions() : verbosity(1), seed(0)
+    MasonSplicingOptions() : verbosity(1), seed(0), ioThreads(0)
     {}
 
     // Add options to the argument parser.
@@ -823,6 +972,8 @@ struct MasonFragmentSequencingOptions
 
     // Path to output sequence files for left (and single end) and right reads.
     seqan2::CharString outFileNameLeft, outFileNameRight;
+    // Number of threads for compressing gzip-compressed output in parallel, 0 for the sequential writer of SeqAn.
+    int ioThreads;
 
     // Generic sequencing configuration.
     SequencingOptions seqOptions;
@@ -833,7 +984,10 @@ struct MasonFragmentSequencingOptions
     // Configuration of the Roche 454 read simulation.
     Roche454SequencingOptions rocheOptions;
 
-    MasonFragmentSequencingOptions() : verbosity(1), seed(0)
+    // Configuration of the run statistics.
+    RunStatsOptions statsOptions;
+
+    MasonFragmentSequencingOptions() : verbosity(1), seed(0), ioThreads(0)
     {}
 
     // Add options to the argument parser.  Calls addOptions() on the nested *Options objects.
@@ -867,6 +1021,8 @@ struct MasonMethylationOptions
 
     // Methylation simulation options.
     MethylationLevelSimulatorOptions methOptions;
+    // Run statistics options.
+    RunStatsOptions statsOptions;
 
     // FASTA file to import.
     seqan2::CharString fastaInFile;
@@ -889,6 +1045,76 @@ struct MasonMethylationOptions
     void print(std::ostream & out) const;
 };
 
+// --------------------------------------------------------------------------
+// Class MasonMergeShardsOptions
+// --------------------------------------------------------------------------
+
+// This struct stores the options from the command line for merging the output of simulation shards.
+
+struct MasonMergeShardsOptions
+{
+    // Verbosity level.  0 -- quiet, 1 -- normal, 2 -- verbose, 3 -- very verbose.
+    int verbosity;
+
+    // Number of threads for compressing gzip-compressed FASTA/FASTQ output, 0 for the default writer.
+    int ioThreads;
+
+    // Run statistics options.
+    RunStatsOptions statsOptions;
+
+    // The left/single-end read files, right read files, and SAM/BAM files of the shards.
+    std::vector<std::string> inFileNamesLeft, inFileNamesRight, inFileNamesSam;
+    // The merged output files.
+    seqan2::CharString outFileNameLeft, outFileNameRight, outFileNameSam;
+
+    MasonMergeShardsOptions() : verbosity(1), ioThreads(0)
+    {}
+
+    // Add options to the argument parser.  Calls addOptions() on the nested *Options objects.
+    void addOptions(seqan2::ArgumentParser & parser) const;
+
+    // Get option values from the argument parser.  Calls getOptionValues() on the nested *Option objects.
+    void getOptionValues(seqan2::ArgumentParser const & parser);
+
+    // Print settings to out.
+    void print(std::ostream & out) const;
+};
+
+// --------------------------------------------------------------------------
+// Class MasonTrainModelOptions
+// --------------------------------------------------------------------------
+
+// This struct stores the options from the command line for training the empirical Illumina model.
+
+struct MasonTrainModelOptions
+{
+    // Verbosity level.  0 -- quiet, 1 -- normal, 2 -- verbose, 3 -- very verbose.
+    int verbosity;
+
+    // Maximal number of reads to use from each input file, 0 for all.
+    int maxReads;
+
+    // Run statistics options.
+    RunStatsOptions statsOptions;
+
+    // The template reads of the left and right mates.
+    seqan2::CharString inFileNameLeft, inFileNameRight;
+    // The model file to write.
+    seqan2::CharString outFileName;
+
+    MasonTrainModelOptions() : verbosity(1), maxReads(0)
+    {}
+
+    // Add options to the argument parser.  Calls addOptions() on the nested *Options objects.
+    void addOptions(seqan2::ArgumentParser & parser) const;
+
+    // Get option values from the argument parser.  Calls getOptionValues() on the nested *Option objects.
+    void getOptionValues(seqan2::ArgumentParser const & parser);
+
+    // Print settings to out.
+    void print(std::ostream & out) const;
+};
+
 // ============================================================================
 // Metafunctions
 // ============================================================================
@@ -904,6 +1130,15 @@ char const * getMateOrientationStr(SequencingOptions::MateOrientation orientatio
 char const * getSourceStrandsStr(SequencingOptions::SourceStrands strands);
 char const * getSequencingTechnologyStr(SequencingOptions::SequencingTechnology technology);
 char const * getFragmentSizeModelStr(Roche454SequencingOptions::ReadLengthModel model);
+char const * getRngEngineStr();
+char const * getRngModeStr(MasonSimulatorOptions::RngMode mode);
+char const * getSchedulingStr(MasonSimulatorOptions::Scheduling scheduling);
+char const * getAlignmentModeStr(MasonSimulatorOptions::AlignmentMode mode);
+char const * getFragmentAllocationStr(MasonSimulatorOptions::FragmentAllocation allocation);
+char const * getFragmentPlacementStr(MasonSimulatorOptions::FragmentPlacement placement);
+char const * getOutputModeStr(MasonSimulatorOptions::OutputMode mode);
+char const * getTempFormatStr(MasonSimulatorOptions::TempFormat format);
+char const * getTempCompressionStr(MasonSimulatorOptions::TempCompression compression);
 
 // ----------------------------------------------------------------------------
 // Function setDateAndVersion()
@@ -40,6 +40,8 @@
 #include <stdexcept>
 #include <random>
 
+#include <mason/random.h>
+
 // ============================================================================
 // Forwards
 // ============================================================================
@@ -48,9 +50,19 @@
 // Typedef TRng
 // ----------------------------------------------------------------------------
 
-// We use the Mersenne Twister 19937 from the standard library in mason.
+// We use the Mersenne Twister 19937 from the standard library in mason by default.  Define MASON_RNG_XOSHIRO256PP or
+// MASON_RNG_PCG64 (set MASON_RNG_ENGINE in CMake) to build with a faster engine that yields different output for the
+// same seed.  MasonRng can also switch to a counter-based generator per fragment.
+
+#if defined(MASON_RNG_XOSHIRO256PP)
+typedef Xoshiro256pp TRngEngine;
+#elif defined(MASON_RNG_PCG64)
+typedef Pcg64 TRngEngine;
+#else  // #if defined(MASON_RNG_XOSHIRO256PP)
+typedef std::mt19937 TRngEngine;
+#endif  // #if defined(MASON_RNG_XOSHIRO256PP)
 
-typedef std::mt19937 TRng;
+typedef MasonRng<TRngEngine> TRng;
 
 // ============================================================================
 // Tags, Classes, Enums
@@ -0,0 +1,151 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+// Memory-mapped reference with two bits per base.
+//
+// The reference FASTA file is converted once into a file with two bits per
+// base and an N-mask sidecar with the runs of Ns.  Later runs map the packed
+// file read-only instead of parsing the FASTA file, such that the reference
+// is loaded quickly and concurrent processes share it in the page cache.
+// ==========================================================================
+
+#ifndef APPS_MASON2_PACKED_REFERENCE_H_
+#define APPS_MASON2_PACKED_REFERENCE_H_
+
+#include <cstdint>
+#include <string>
+#include <vector>
+
+#include <seqan/file.h>
+#include <seqan/seq_io.h>
+#include <seqan/sequence.h>
+
+#include <mason/gap_index.h>
+
+// ============================================================================
+// Forwards
+// ============================================================================
+
+// ============================================================================
+// Tags, Classes, Enums
+// ============================================================================
+
+// ----------------------------------------------------------------------------
+// Class PackedReference
+// ----------------------------------------------------------------------------
+
+// The contigs of a reference with two bits per base, Ns are stored as A and restored from the N mask.
+//
+// The packed file starts with the eight characters "MSNPACK2", the value 0x0102030405060708 for detecting the byte
+// order, the fingerprint of the FASTA file (see computeFastaFingerprint()), the number of contigs, and their lengths,
+// all as 64 bit words.  It is followed by the bases of each contig, 32 in each 64 bit word, starting with the least
+// significant bits, and each contig starts with a new word.  The N mask is stored in the format of the GapIndex, with
+// runs of one or more Ns.
+//
+// Both files are only used while the FASTA file has the fingerprint stored in them, such that a FASTA file edited
+// without changing the contig lengths is not used with outdated bases.  They are written under temporary names and
+// renamed, such that processes that have mapped the old packed file are not affected by rebuilding it.
+
+class PackedReference
+{
+public:
+    // The memory-mapped packed file.
+    seqan2::String<char, seqan2::MMap<> > mappedFile;
+    // The begin of the packed bases of each contig in mappedFile, empty if not open.
+    std::vector<uint64_t const *> contigData;
+    // The contig lengths.
+    std::vector<uint64_t> contigLengths;
+    // The runs of Ns of each contig.
+    GapIndex nMask;
+
+    // Write the packed file fileName and its N mask for the reference in faiIndex, returns false on errors.
+    static bool build(char const * fileName, seqan2::FaiIndex const & faiIndex);
+
+    // Map the packed file fileName and load its N mask, returns false if they could not be read or do not match
+    // faiIndex and the current fingerprint of its FASTA file.
+    bool open(char const * fileName, seqan2::FaiIndex const & faiIndex);
+
+    // Unmap the packed file.
+    void close();
+
+    // Returns whether a packed file is open.
+    bool isOpen() const
+    {
+        return !contigData.empty();
+    }
+
+    // Unpack the contig with the given rID into seq.
+    void readSequence(seqan2::Dna5String & seq, unsigned rID) const;
+};
+
+// ============================================================================
+// Metafunctions
+// ============================================================================
+
+// ============================================================================
+// Functions
+// ============================================================================
+
+// ----------------------------------------------------------------------------
+// Function packSequence()
+// ----------------------------------------------------------------------------
+
+// Pack seq with two bits per base into words, 32 in each word starting with the least significant bits.  Ns are
+// stored as A.
+
+void packSequence(std::vector<uint64_t> & words, seqan2::Dna5String const & seq);
+
+// ----------------------------------------------------------------------------
+// Function unpackSequence()
+// ----------------------------------------------------------------------------
+
+// Unpack len bases from words into seq and set the runs of Ns in nRuns.  The words do not have to be aligned.
+
+void unpackSequence(seqan2::Dna5String & seq,
+                    void const * words,
+                    uint64_t len,
+                    std::vector<std::pair<int, int> > const & nRuns);
+
+// ----------------------------------------------------------------------------
+// Function packedReferenceFileName()
+// ----------------------------------------------------------------------------
+
+// Returns the path of the packed file for the given FASTA file, the N mask is stored in the same path with the suffix
+// ".nmask".
+
+inline std::string packedReferenceFileName(char const * fastaFileName)
+{
+    return std::string(fastaFileName) + ".packed";
+}
+
+#endif  // #ifndef APPS_MASON2_PACKED_REFERENCE_H_
@@ -0,0 +1,197 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+// Output of FASTA/FASTQ files with parallel block-gzip compression.
+//
+// SeqFileOut compresses .gz output in the writing thread.  For .gz files,
+// ParallelSeqFileOut encodes the records itself and passes them to a
+// BgzfWriter that compresses independent blocks on a pool of threads.
+// ==========================================================================
+
+#ifndef APPS_MASON2_PARALLEL_SEQ_FILE_OUT_H_
+#define APPS_MASON2_PARALLEL_SEQ_FILE_OUT_H_
+
+#include <cctype>
+#include <string>
+
+#include <seqan/seq_io.h>
+#include <seqan/sequence.h>
+
+#include <mason/bgzf_writer.h>
+
+// ============================================================================
+// Forwards
+// ============================================================================
+
+// ============================================================================
+// Tags, Classes, Enums
+// ============================================================================
+
+// ----------------------------------------------------------------------------
+// Class ParallelSeqFileOut
+// ----------------------------------------------------------------------------
+
+// Writes FASTA/FASTQ records like SeqFileOut.
+//
+// When opened with numThreads > 0 for a file with the extension .fa.gz, .fasta.gz, .fna.gz, .fq.gz, or .fastq.gz, the
+// records are compressed in BGZF blocks by numThreads threads, which is a valid multi-member gzip file.  Otherwise,
+// the records are written through a SeqFileOut.  The uncompressed content is the same in both cases.
+
+class ParallelSeqFileOut
+{
+public:
+    // Used if not writing through bgzfWriter.
+    seqan2::SeqFileOut seqFileOut;
+    // Used for gzip-compressed output with numThreads > 0.
+    BgzfWriter bgzfWriter;
+    // Whether to write FASTQ instead of FASTA when using bgzfWriter.
+    bool fastq;
+    // Text format options when using bgzfWriter.
+    seqan2::SequenceOutputOptions options;
+    // Buffer for the records that have not been passed to bgzfWriter yet.
+    seqan2::CharString buffer;
+
+    ParallelSeqFileOut() : fastq(false)
+    {}
+
+    ~ParallelSeqFileOut()
+    {
+        close();
+    }
+
+    // Open fileName for writing, using numThreads compression threads for gzip-compressed output.
+    bool open(char const * fileName, int numThreads);
+
+    // Flush and close the file.
+    void close();
+
+    // Set the line length for FASTA output, 0 for writing each sequence in one line.
+    void setLineLength(unsigned lineLength)
+    {
+        options.lineLength = lineLength;
+        context(seqFileOut).options.lineLength = lineLength;
+    }
+
+    // Write out the record with the given id, sequence, and qualities.  The qualities are ignored for FASTA.
+    template <typename TId, typename TSeq, typename TQual>
+    void write(TId const & id, TSeq const & seq, TQual const & qual)
+    {
+        if (!bgzfWriter.isOpen())
+        {
+            writeRecord(seqFileOut, id, seq, qual);
+            return;
+        }
+        if (fastq)
+            seqan2::writeRecord(buffer, id, seq, qual, seqan2::Fastq(), options);
+        else
+            seqan2::writeRecord(buffer, id, seq, seqan2::Fasta(), options);
+        _flushBuffer(false);
+    }
+
+    // Write out the record with the given id and sequence.
+    template <typename TId, typename TSeq>
+    void write(TId const & id, TSeq const & seq)
+    {
+        if (!bgzfWriter.isOpen())
+        {
+            writeRecord(seqFileOut, id, seq);
+            return;
+        }
+        // Without qualities, the FASTQ writer fills in the qualities as SeqFileOut does.
+        if (fastq)
+            seqan2::writeRecord(buffer, id, seq, seqan2::Fastq(), options);
+        else
+            seqan2::writeRecord(buffer, id, seq, seqan2::Fasta(), options);
+        _flushBuffer(false);
+    }
+
+    // Pass the buffered records to bgzfWriter once there is a block full of them, all records if force.
+    void _flushBuffer(bool force)
+    {
+        if (empty(buffer) || (!force && length(buffer) < BgzfWriter::BLOCK_SIZE))
+            return;
+        bgzfWriter.write(&buffer[0], length(buffer));
+        clear(buffer);
+    }
+};
+
+// ============================================================================
+// Functions
+// ============================================================================
+
+// ----------------------------------------------------------------------------
+// Function ParallelSeqFileOut::open()
+// ----------------------------------------------------------------------------
+
+inline bool ParallelSeqFileOut::open(char const * fileName, int numThreads)
+{
+    close();
+
+    // Guess the format from the extension before .gz, lower case.
+    std::string name(fileName);
+    for (unsigned i = 0; i < name.size(); ++i)
+        name[i] = std::tolower(name[i]);
+    char const * FASTA_EXTENSIONS[] = {".fa.gz", ".fasta.gz", ".fna.gz"};
+    char const * FASTQ_EXTENSIONS[] = {".fq.gz", ".fastq.gz"};
+    bool isFasta = false, isFastq = false;
+    auto endsWith = [&name](std::string const & ext) {
+        return name.size() >= ext.size() && name.compare(name.size() - ext.size(), ext.size(), ext) == 0;
+    };
+    for (char const * ext : FASTA_EXTENSIONS)
+        isFasta = isFasta || endsWith(ext);
+    for (char const * ext : FASTQ_EXTENSIONS)
+        isFastq = isFastq || endsWith(ext);
+
+    if (numThreads <= 0 || (!isFasta && !isFastq))
+        return seqan2::open(seqFileOut, fileName);
+
+    fastq = isFastq;
+    return bgzfWriter.open(fileName, numThreads);
+}
+
+// ----------------------------------------------------------------------------
+// Function ParallelSeqFileOut::close()
+// ----------------------------------------------------------------------------
+
+inline void ParallelSeqFileOut::close()
+{
+    if (!bgzfWriter.isOpen())
+    {
+        seqan2::close(seqFileOut);
+        return;
+    }
+    _flushBuffer(true);
+    bgzfWriter.close();
+}
+
+#endif  // #ifndef APPS_MASON2_PARALLEL_SEQ_FILE_OUT_H_
@@ -0,0 +1,201 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+// Empirical Illumina error and quality model trained from template reads.
+//
+// QualityModelBuilder streams the reads of a FASTQ file and counts the
+// qualities of the called bases and the Ns of each cycle.  By the definition
+// of PHRED qualities, a base with quality q is wrong with probability
+// e(q) = 10^(-q/10).  Thus, the mismatch probability of a cycle is the mean
+// of e(q) and the qualities of the mismatch and non-mismatch bases have the
+// distributions P(q) e(q) and P(q) (1 - e(q)), normalized.
+//
+// The resulting tables are stored in a binary model file such that the
+// training cost is paid once, the simulators memory-map it at startup.
+// ==========================================================================
+
+#ifndef APPS_MASON2_QUALITY_MODEL_H_
+#define APPS_MASON2_QUALITY_MODEL_H_
+
+#include <cstdint>
+#include <string>
+#include <vector>
+
+#include <seqan/sequence.h>
+
+#include <mason/sequencing.h>
+
+// ============================================================================
+// Forwards
+// ============================================================================
+
+// ============================================================================
+// Tags, Classes, Enums
+// ============================================================================
+
+// ----------------------------------------------------------------------------
+// Class QualityModelCycle
+// ----------------------------------------------------------------------------
+
+// The tables for one cycle of the reads.
+
+struct QualityModelCycle
+{
+    // Probability of a mismatch of a called base.
+    double mismatchProbability;
+    // Probability of an N.
+    double nProbability;
+    // Distributions of the qualities of non-mismatch and mismatch bases.
+    QualityTable matchQualities;
+    QualityTable mismatchQualities;
+
+    QualityModelCycle() : mismatchProbability(0), nProbability(0)
+    {}
+};
+
+// ----------------------------------------------------------------------------
+// Class QualityModel
+// ----------------------------------------------------------------------------
+
+// The tables for the left and right reads.
+
+struct QualityModel
+{
+    // The tables of each cycle of the left and right reads, the latter is empty for models trained from single-end
+    // reads.
+    std::vector<QualityModelCycle> cycles[2];
+    // The quality of the Ns of the left and right reads.
+    int nQualities[2];
+
+    QualityModel() : nQualities()
+    {}
+
+    // Returns whether there are tables for the right reads.
+    bool hasRight() const
+    {
+        return !cycles[1].empty();
+    }
+
+    // Returns the tables of cycle i of the left (0) or right (1) reads.  Cycles beyond the length of the template reads
+    // use the last cycle, the right reads use the tables of the left reads if there are none.
+    QualityModelCycle const & cycle(unsigned mate, unsigned i) const
+    {
+        std::vector<QualityModelCycle> const & mateCycles = cycles[hasRight() ? mate : 0];
+        return mateCycles[std::min(i, (unsigned)mateCycles.size() - 1)];
+    }
+};
+
+// ----------------------------------------------------------------------------
+// Class QualityModelBuilder
+// ----------------------------------------------------------------------------
+
+// Collects the counts for the tables of one mate from template reads.
+
+class QualityModelBuilder
+{
+public:
+    // The number of called bases with quality q in cycle i at i * (QualityTable::MAX_QUALITY + 1) + q.
+    std::vector<uint64_t> qualityCounts;
+    // The number of Ns in each cycle.
+    std::vector<uint64_t> nCounts;
+    // The number of Ns with each quality.
+    std::vector<uint64_t> nQualityCounts;
+    // The number of reads added.
+    uint64_t numReads;
+
+    QualityModelBuilder() : nQualityCounts(QualityTable::MAX_QUALITY + 1, 0), numReads(0)
+    {}
+
+    // Count the bases of a read with PHRED+33 qualities, qualities above QualityTable::MAX_QUALITY count as the
+    // maximal quality.
+    void addRead(seqan2::Dna5String const & seq, seqan2::CharString const & quals);
+
+    // Compute the tables and the quality of the Ns, returns false if no reads were added.
+    bool build(std::vector<QualityModelCycle> & cycles, int & nQuality) const;
+};
+
+// ============================================================================
+// Metafunctions
+// ============================================================================
+
+// ============================================================================
+// Functions
+// ============================================================================
+
+// ----------------------------------------------------------------------------
+// Function trainQualityModel()
+// ----------------------------------------------------------------------------
+
+// Train the tables of one mate from the reads of the FASTQ file fastqFileName, at most maxReads if it is not 0.
+// Returns false if the file could not be read or has no reads.
+
+bool trainQualityModel(std::vector<QualityModelCycle> & cycles, int & nQuality, char const * fastqFileName,
+                       uint64_t maxReads = 0);
+
+// ----------------------------------------------------------------------------
+// Function writeQualityModel()
+// ----------------------------------------------------------------------------
+
+// Write the model to the file fileName.
+//
+// The file starts with the eight characters "MSNQUAL1", the value 0x0102030405060708 for detecting the byte order,
+// and the format version, all as 64 bit words.  For the left and the right reads, the number of cycles and the quality
+// of the Ns follow as 64 bit integers, then for each cycle the mismatch and N probabilities and the cumulative
+// distribution functions of the match and mismatch qualities as doubles.  Returns false on errors.
+
+bool writeQualityModel(char const * fileName, QualityModel const & model);
+
+// ----------------------------------------------------------------------------
+// Function readQualityModel()
+// ----------------------------------------------------------------------------
+
+// Memory-map the model file fileName written by writeQualityModel() and read the tables.  Returns false if it could
+// not be opened or is no valid model file.
+
+bool readQualityModel(QualityModel & model, char const * fileName);
+
+// ----------------------------------------------------------------------------
+// Function sharedQualityModel()
+// ----------------------------------------------------------------------------
+
+// Returns the model read from modelFileName if it is not empty and trained from the template FASTQ files otherwise.
+// Each model is loaded once per process and shared by all callers, such that the simulation threads do not read the
+// files again.
+//
+// Throws: MasonIOException if the files cannot be read.
+
+QualityModel const & sharedQualityModel(std::string const & modelFileName,
+                                        std::string const & leftFastqFileName,
+                                        std::string const & rightFastqFileName);
+
+#endif  // #ifndef APPS_MASON2_QUALITY_MODEL_H_
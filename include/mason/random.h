@@ -0,0 +1,445 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+// Random number generation for the mason tools.
+// ==========================================================================
+
+#ifndef APPS_MASON2_RANDOM_H_
+#define APPS_MASON2_RANDOM_H_
+
+#include <cstdint>
+#include <random>
+#include <type_traits>
+
+// ============================================================================
+// Forwards
+// ============================================================================
+
+// ============================================================================
+// Tags, Classes, Enums
+// ============================================================================
+
+// ----------------------------------------------------------------------------
+// Class Philox4x32
+// ----------------------------------------------------------------------------
+
+// The counter-based Philox4x32-10 generator by Salmon et al. (Parallel Random Numbers: As Easy as 1, 2, 3; SC'11).
+//
+// Encrypts a 128 bit counter with a 64 bit key, the random numbers for a key only depend on the counter and can thus
+// be computed in any order.
+
+class Philox4x32
+{
+public:
+    static const uint32_t MULTIPLIER0 = 0xD2511F53u;
+    static const uint32_t MULTIPLIER1 = 0xCD9E8D57u;
+    static const uint32_t WEYL0 = 0x9E3779B9u;
+    static const uint32_t WEYL1 = 0xBB67AE85u;
+
+    // Compute the 128 bit block for counter with key, ten rounds.
+    static void block(uint32_t (&out)[4], uint32_t const (&counter)[4], uint32_t const (&key)[2])
+    {
+        uint32_t c0 = counter[0], c1 = counter[1], c2 = counter[2], c3 = counter[3];
+        uint32_t k0 = key[0], k1 = key[1];
+        for (unsigned round = 0; round < 10; ++round)
+        {
+            uint64_t p0 = static_cast<uint64_t>(MULTIPLIER0) * c0;
+            uint64_t p1 = static_cast<uint64_t>(MULTIPLIER1) * c2;
+            uint32_t n0 = static_cast<uint32_t>(p1 >> 32) ^ c1 ^ k0;
+            uint32_t n1 = static_cast<uint32_t>(p1);
+            uint32_t n2 = static_cast<uint32_t>(p0 >> 32) ^ c3 ^ k1;
+            uint32_t n3 = static_cast<uint32_t>(p0);
+            c0 = n0;
+            c1 = n1;
+            c2 = n2;
+            c3 = n3;
+            k0 += WEYL0;
+            k1 += WEYL1;
+        }
+        out[0] = c0;
+        out[1] = c1;
+        out[2] = c2;
+        out[3] = c3;
+    }
+};
+
+// ----------------------------------------------------------------------------
+// Class Xoshiro256pp
+// ----------------------------------------------------------------------------
+
+// The xoshiro256++ generator by Blackman and Vigna (Scrambled Linear Pseudorandom Number Generators; TOMS 2021).
+//
+// 256 bits of state, seeded from a 64 bit seed with SplitMix64 as recommended by the authors.
+
+class Xoshiro256pp
+{
+public:
+    typedef uint64_t result_type;
+
+    // The state, must not be all zero.
+    uint64_t s[4];
+
+    explicit Xoshiro256pp(uint64_t seed = 0)
+    {
+        this->seed(seed);
+    }
+
+    static constexpr result_type min()
+    {
+        return 0;
+    }
+
+    static constexpr result_type max()
+    {
+        return ~uint64_t(0);
+    }
+
+    void seed(uint64_t seed)
+    {
+        for (unsigned i = 0; i < 4; ++i)
+        {
+            uint64_t z = (seed += 0x9E3779B97F4A7C15ull);
+            z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ull;
+            z = (z ^ (z >> 27)) * 0x94D049BB133111EBull;
+            s[i] = z ^ (z >> 31);
+        }
+    }
+
+    result_type operator()()
+    {
+        uint64_t result = _rotl(s[0] + s[3], 23) + s[0];
+        uint64_t t = s[1] << 17;
+        s[2] ^= s[0];
+        s[3] ^= s[1];
+        s[1] ^= s[2];
+        s[0] ^= s[3];
+        s[2] ^= t;
+        s[3] = _rotl(s[3], 45);
+        return result;
+    }
+
+private:
+    static uint64_t _rotl(uint64_t x, unsigned k)
+    {
+        return (x << k) | (x >> (64 - k));
+    }
+};
+
+// ----------------------------------------------------------------------------
+// Class Pcg64
+// ----------------------------------------------------------------------------
+
+// The PCG64 generator by O'Neill (PCG: A Family of Simple Fast Space-Efficient Statistically Good Algorithms for
+// Random Number Generation; 2014), a 128 bit LCG with the XSL RR output function.
+//
+// The 128 bit numbers are stored as high and low words such that no compiler support for 128 bit integers is needed.
+// Seeding is the same as pcg64_srandom_r() of the reference implementation.
+
+class Pcg64
+{
+public:
+    typedef uint64_t result_type;
+
+    static const uint64_t MULTIPLIER_HI = 2549297995355413924ull;
+    static const uint64_t MULTIPLIER_LO = 4865540595714422341ull;
+    static const uint64_t INCREMENT_HI = 6364136223846793005ull;
+    static const uint64_t INCREMENT_LO = 1442695040888963407ull;
+
+    // The state and the increment, which must be odd.
+    uint64_t stateHi, stateLo, incHi, incLo;
+
+    explicit Pcg64(uint64_t seed = 0)
+    {
+        this->seed(seed);
+    }
+
+    static constexpr result_type min()
+    {
+        return 0;
+    }
+
+    static constexpr result_type max()
+    {
+        return ~uint64_t(0);
+    }
+
+    // Seed with the default stream.
+    void seed(uint64_t seed)
+    {
+        _seed(seed, INCREMENT_HI, INCREMENT_LO);
+    }
+
+    // Seed with the given stream.
+    void seed(uint64_t seed, uint64_t stream)
+    {
+        _seed(seed, stream >> 63, (stream << 1) | 1);
+    }
+
+    result_type operator()()
+    {
+        _step();
+        uint64_t x = stateHi ^ stateLo;
+        unsigned rot = stateHi >> 58;
+        return (x >> rot) | (x << ((64 - rot) & 63));
+    }
+
+private:
+    void _seed(uint64_t seed, uint64_t incHi, uint64_t incLo)
+    {
+        this->incHi = incHi;
+        this->incLo = incLo;
+        stateHi = stateLo = 0;
+        _step();
+        stateLo += seed;
+        stateHi += (stateLo < seed);
+        _step();
+    }
+
+    // Advance the state, state = state * MULTIPLIER + inc modulo 2^128.
+    void _step()
+    {
+        uint64_t hi;
+        uint64_t lo = _mul(stateLo, MULTIPLIER_LO, hi);
+        hi += stateHi * MULTIPLIER_LO + stateLo * MULTIPLIER_HI;
+        stateLo = lo + incLo;
+        stateHi = hi + incHi + (stateLo < lo);
+    }
+
+    // Returns the low word of the product a * b and writes the high word to hi.
+    static uint64_t _mul(uint64_t a, uint64_t b, uint64_t & hi)
+    {
+#if defined(__SIZEOF_INT128__)
+        __extension__ typedef unsigned __int128 TUInt128;  // keep -pedantic quiet
+        TUInt128 p = static_cast<TUInt128>(a) * b;
+        hi = static_cast<uint64_t>(p >> 64);
+        return static_cast<uint64_t>(p);
+#else  // #if defined(__SIZEOF_INT128__)
+        uint64_t aLo = a & 0xFFFFFFFFu, aHi = a >> 32, bLo = b & 0xFFFFFFFFu, bHi = b >> 32;
+        uint64_t ll = aLo * bLo, lh = aLo * bHi, hl = aHi * bLo, hh = aHi * bHi;
+        uint64_t mid = (ll >> 32) + (lh & 0xFFFFFFFFu) + (hl & 0xFFFFFFFFu);
+        hi = hh + (lh >> 32) + (hl >> 32) + (mid >> 32);
+        return (mid << 32) | (ll & 0xFFFFFFFFu);
+#endif  // #if defined(__SIZEOF_INT128__)
+    }
+};
+
+// ----------------------------------------------------------------------------
+// Class MasonRng
+// ----------------------------------------------------------------------------
+
+// Random number generator used in the mason tools, satisfies the UniformRandomBitGenerator requirements.
+//
+// After construction and seed(), the numbers are those of TEngine with the same seed.  The numbers have 32 bits for
+// std::mt19937 and 64 bits for Xoshiro256pp and Pcg64.  After seedFragment(), the numbers are taken from a Philox4x32
+// stream keyed on the seed, contig, haplotype, fragment id, and phase such that the results of simulating a fragment
+// do not depend on which thread simulates it or on the fragments simulated before.
+//
+// The numbers are drawn into a buffer.  Whether to refill it from TEngine or from the Philox stream is decided once
+// per refill, a draw only takes the next number from the buffer.
+
+template <typename TEngine>
+class MasonRng
+{
+public:
+    typedef typename std::conditional<(TEngine::max() > 0xFFFFFFFFu), uint64_t, uint32_t>::type result_type;
+
+    // The number of numbers drawn from TEngine at once.
+    static const unsigned BUFFER_SIZE = 64;
+    // The number of numbers in a block of the Philox stream.
+    static const unsigned BLOCK_SIZE = 16 / sizeof(result_type);
+
+    // The engine of the sequential mode.
+    TEngine engine;
+    // Whether to draw from the Philox stream.
+    bool counterBased;
+    // Key and counter of the Philox stream, counter[0] is the index of the next block.
+    uint32_t key[2];
+    uint32_t counter[4];
+    // The numbers drawn but not returned yet are buffer[pos..BUFFER_SIZE).
+    result_type buffer[BUFFER_SIZE];
+    unsigned pos;
+
+    explicit MasonRng(result_type seed = std::mt19937::default_seed) :
+            engine(seed), counterBased(false), key(), counter(), pos(BUFFER_SIZE)
+    {}
+
+    static constexpr result_type min()
+    {
+        return 0;
+    }
+
+    static constexpr result_type max()
+    {
+        return ~result_type(0);
+    }
+
+    // Switch to the stream of TEngine for seed.
+    void seed(result_type seed)
+    {
+        engine.seed(seed);
+        counterBased = false;
+        pos = BUFFER_SIZE;
+    }
+
+    // Switch to the Philox stream for the given fragment.  Use different values of phase for independent streams of
+    // the same fragment.
+    void seedFragment(uint32_t seed, uint32_t rID, uint32_t hID, uint32_t fragId, uint32_t phase = 0)
+    {
+        key[0] = seed;
+        key[1] = rID;
+        counter[0] = 0;
+        counter[1] = hID;
+        counter[2] = fragId;
+        counter[3] = phase;
+        counterBased = true;
+        pos = BUFFER_SIZE;
+    }
+
+    result_type operator()()
+    {
+        if (pos == BUFFER_SIZE)
+            _refill();
+        return buffer[pos++];
+    }
+
+    void discard(unsigned long long z)
+    {
+        for (; z != 0; --z)
+            (*this)();
+    }
+
+private:
+    void _refill()
+    {
+        if (!counterBased)
+        {
+            for (unsigned i = 0; i < BUFFER_SIZE; ++i)
+                buffer[i] = static_cast<result_type>(engine());
+            pos = 0;
+            return;
+        }
+
+        // Only compute one block of the Philox stream, fragments often take only a few numbers.  The 64 bit numbers
+        // are made from two words, low word first.
+        uint32_t block[4];
+        Philox4x32::block(block, counter, key);
+        counter[0] += 1;
+        pos = BUFFER_SIZE - BLOCK_SIZE;
+        for (unsigned i = 0, j = 0; i < BLOCK_SIZE; ++i)
+        {
+            uint64_t x = 0;
+            for (unsigned shift = 0; shift < 8 * sizeof(result_type); shift += 32, ++j)
+                x |= static_cast<uint64_t>(block[j]) << shift;
+            buffer[pos + i] = static_cast<result_type>(x);
+        }
+    }
+};
+
+// ----------------------------------------------------------------------------
+// Class FeistelPermutation
+// ----------------------------------------------------------------------------
+
+// A pseudorandom permutation of the numbers 0..(n-1) that is computed element-wise without storing it.
+//
+// A balanced Feistel network over the smallest even number of bits that can represent n-1 is a permutation of the
+// numbers below a power of four.  Values outside 0..(n-1) are mapped again until they are inside (cycle walking),
+// which yields a permutation of 0..(n-1).
+
+class FeistelPermutation
+{
+public:
+    static const unsigned ROUNDS = 6;
+
+    FeistelPermutation() : n(1), halfBits(1), halfMask(1)
+    {
+        for (unsigned i = 0; i < ROUNDS; ++i)
+            keys[i] = i;
+    }
+
+    // Initialize the permutation of 0..(n-1) with the given seed.
+    void init(uint64_t n, uint64_t seed)
+    {
+        this->n = n;
+        halfBits = 1;
+        while (halfBits < 32 && (uint64_t(1) << (2 * halfBits)) < n)
+            ++halfBits;
+        halfMask = (uint64_t(1) << halfBits) - 1;
+        for (unsigned i = 0; i < ROUNDS; ++i)
+            keys[i] = _mix(seed + (i + 1) * 0x9E3779B97F4A7C15ull);
+    }
+
+    // Return the image of x < n.
+    uint64_t operator()(uint64_t x) const
+    {
+        do
+            x = _encrypt(x);
+        while (x >= n);
+        return x;
+    }
+
+private:
+    // The SplitMix64 finalizer.
+    static uint64_t _mix(uint64_t x)
+    {
+        x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9ull;
+        x = (x ^ (x >> 27)) * 0x94D049BB133111EBull;
+        return x ^ (x >> 31);
+    }
+
+    uint64_t _encrypt(uint64_t x) const
+    {
+        uint64_t left = x >> halfBits, right = x & halfMask;
+        for (unsigned i = 0; i < ROUNDS; ++i)
+        {
+            uint64_t tmp = right;
+            right = left ^ (_mix(right ^ keys[i]) & halfMask);
+            left = tmp;
+        }
+        return (left << halfBits) | right;
+    }
+
+    uint64_t n;
+    unsigned halfBits;
+    uint64_t halfMask;
+    uint64_t keys[ROUNDS];
+};
+
+// ============================================================================
+// Metafunctions
+// ============================================================================
+
+// ============================================================================
+// Functions
+// ============================================================================
+
+#endif  // #ifndef APPS_MASON2_RANDOM_H_
@@ -0,0 +1,125 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+// Formatting of read names and BAM tags of the simulated reads.
+//
+// The read names, the embedded simulation information, and the fixed set of
+// tags of the simulated alignments are appended directly to the strings of
+// the records.  Since the strings of the records are reused, this does not
+// allocate memory once they have reached their final capacity, as opposed to
+// going through std::stringstream and seqan2::BamTagsDict.
+// ==========================================================================
+
+#ifndef APPS_MASON2_RECORD_FORMATTER_H_
+#define APPS_MASON2_RECORD_FORMATTER_H_
+
+#include <cstdint>
+
+#include <seqan/sequence.h>
+
+#include <mason/sequencing.h>
+
+// ============================================================================
+// Forwards
+// ============================================================================
+
+// ============================================================================
+// Tags, Classes, Enums
+// ============================================================================
+
+// ============================================================================
+// Metafunctions
+// ============================================================================
+
+// ============================================================================
+// Functions
+// ============================================================================
+
+// ----------------------------------------------------------------------------
+// Function appendNumber()
+// ----------------------------------------------------------------------------
+
+// Append the decimal representation of x to target.
+
+inline void appendNumber(seqan2::CharString & target, int64_t x)
+{
+    char buffer[20];
+    uint64_t y = (x < 0) ? -static_cast<uint64_t>(x) : static_cast<uint64_t>(x);
+    int pos = 20;
+    do
+    {
+        buffer[--pos] = '0' + static_cast<char>(y % 10);
+        y /= 10;
+    }
+    while (y != 0u);
+    if (x < 0)
+        appendValue(target, '-');
+    for (; pos < 20; ++pos)
+        appendValue(target, buffer[pos]);
+}
+
+// ----------------------------------------------------------------------------
+// Function appendSimulationInfo()
+// ----------------------------------------------------------------------------
+
+// Append the same text as SequencingSimulationInfo::serialize() to target.
+
+void appendSimulationInfo(seqan2::CharString & target, SequencingSimulationInfo const & info);
+
+// ----------------------------------------------------------------------------
+// Function formatReadName()
+// ----------------------------------------------------------------------------
+
+// Set name to prefix followed by fragId + 1 and "/1" or "/2" for num == 1 or num == 2.  If info is not nullptr then
+// the simulation information is appended, separated by a space.
+
+void formatReadName(seqan2::CharString & name,
+                    seqan2::CharString const & prefix,
+                    int fragId,
+                    int num,
+                    SequencingSimulationInfo const * info = nullptr);
+
+// ----------------------------------------------------------------------------
+// Function appendTagValue()
+// ----------------------------------------------------------------------------
+
+// Append the BAM tag key with the given value to the binary tags of a BAM record.
+//
+// Yields the same bytes as setTagValue() for a tag that is not in tags yet: int values are written as type 'i',
+// characters as type 'A', and strings as type 'Z'.
+
+void appendTagValue(seqan2::CharString & tags, char const * key, int32_t val);
+void appendTagValue(seqan2::CharString & tags, char const * key, char val);
+void appendTagValue(seqan2::CharString & tags, char const * key, seqan2::CharString const & val);
+
+#endif  // #ifndef APPS_MASON2_RECORD_FORMATTER_H_
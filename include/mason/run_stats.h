@@ -0,0 +1,170 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+// Collection of run statistics for the --stats-json option.
+//
+// The programs record the wall and CPU time of their phases, counters such
+// as the number of reads and the bytes read and written, and, for the read
+// simulation, the busy time of each thread.  At the end, the statistics are
+// written to a JSON file together with the total time and the peak resident
+// set size.
+// ==========================================================================
+
+#ifndef APPS_MASON2_RUN_STATS_H_
+#define APPS_MASON2_RUN_STATS_H_
+
+#include <cstdint>
+#include <mutex>
+#include <string>
+#include <utility>
+#include <vector>
+
+// ============================================================================
+// Forwards
+// ============================================================================
+
+// ============================================================================
+// Tags, Classes, Enums
+// ============================================================================
+
+// ----------------------------------------------------------------------------
+// Class RunStats
+// ----------------------------------------------------------------------------
+
+// Statistics of one program run.
+//
+// The phases, counters, and rates are kept in the order in which they were first added.  Adding to an existing phase
+// or counter accumulates, such that phases that are interleaved with others (e.g. the materialization of each
+// haplotype) can be recorded piece by piece.  Adding is thread-safe.
+
+class RunStats
+{
+public:
+    // Wall and CPU time spent in one phase, in seconds.  The CPU time is the one of the whole process while the phase
+    // was running.
+    struct Phase
+    {
+        std::string name;
+        double wallTime, cpuTime;
+
+        Phase() : wallTime(0), cpuTime(0)
+        {}
+    };
+
+    // Name of the program.
+    std::string programName;
+    // Wall and CPU time at construction.
+    double beginWallTime, beginCpuTime;
+    // The phases, counters, and rates.
+    std::vector<Phase> phases;
+    std::vector<std::pair<std::string, int64_t> > counters;
+    std::vector<std::pair<std::string, double> > rates;
+    // Busy time of each simulation thread and the wall time of the simulation that they were part of.
+    std::vector<double> threadBusyTimes;
+    double threadWallTime;
+
+    explicit RunStats(char const * programName);
+
+    // Add wall and CPU time to the phase with the given name.
+    void addPhase(char const * name, double wallTime, double cpuTime);
+
+    // Returns the wall time of the phase with the given name so far, 0 if there is none.
+    double phaseWallTime(char const * name) const;
+
+    // Add value to the counter with the given name.
+    void addCounter(char const * name, int64_t value);
+
+    // Add the size of the regular file fileName to the counter with the given name, files that do not exist or are
+    // not regular files (e.g. FIFOs or "-") are ignored.
+    void addFileSize(char const * name, char const * fileName);
+
+    // Set the rate with the given name.
+    void setRate(char const * name, double value);
+
+    // Write the statistics to fileName, returns false on errors.
+    bool writeJson(char const * fileName) const;
+
+private:
+    mutable std::mutex mutex;
+};
+
+// ----------------------------------------------------------------------------
+// Class PhaseTimer
+// ----------------------------------------------------------------------------
+
+// Adds the wall and CPU time between construction and destruction to a phase of a RunStats object.
+
+class PhaseTimer
+{
+public:
+    RunStats & stats;
+    char const * name;
+    double beginWallTime, beginCpuTime;
+
+    PhaseTimer(RunStats & stats, char const * name);
+    ~PhaseTimer();
+};
+
+// ============================================================================
+// Metafunctions
+// ============================================================================
+
+// ============================================================================
+// Functions
+// ============================================================================
+
+// ----------------------------------------------------------------------------
+// Function wallTime()
+// ----------------------------------------------------------------------------
+
+// Returns a monotonic wall clock time in seconds.
+
+double wallTime();
+
+// ----------------------------------------------------------------------------
+// Function cpuTime()
+// ----------------------------------------------------------------------------
+
+// Returns the CPU time used by the process so far in seconds.
+
+double cpuTime();
+
+// ----------------------------------------------------------------------------
+// Function peakResidentSetSize()
+// ----------------------------------------------------------------------------
+
+// Returns the peak resident set size of the process in bytes, 0 if it is not available on this platform.
+
+int64_t peakResidentSetSize();
+
+#endif  // #ifndef APPS_MASON2_RUN_STATS_H_
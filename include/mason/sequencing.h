@@ -37,8 +37,11 @@
 #ifndef APPS_MASON2_SEQUENCING_H_
 #define APPS_MASON2_SEQUENCING_H_
 
+#include <algorithm>
+#include <cmath>
 #include <stdexcept>
 #include <random>
+#include <vector>
 
 #include <seqan/bam_io.h>
 #include <seqan/seq_io.h>
@@ -53,6 +56,7 @@
 // ============================================================================
 
 class IlluminaModel;
+struct QualityModel;
 class Roche454Model;
 
 // ============================================================================
@@ -61,7 +65,6 @@ class Roche454Model;
 
 typedef seqan2::Dna5String TRead;
 typedef seqan2::CharString TQualities;
-typedef std::mt19937 TRng;
 typedef seqan2::Infix<seqan2::Dna5String const>::Type TFragment;
 typedef seqan2::String<seqan2::CigarElement<> > TCigarString;
 
@@ -119,6 +122,91 @@ struct SequencingSimulationInfo
     }
 };
 
+// ----------------------------------------------------------------------------
+// Class SequencingReadBatch
+// ----------------------------------------------------------------------------
+
+// Reads simulated by SequencingSimulator::simulateReads(), stored as parallel arrays of sequences, qualities, and
+// simulation information.
+//
+// The entries are overwritten, such that a batch that is reused for each chunk of fragments keeps the capacity of its
+// strings and no memory is allocated once the strings are large enough.
+
+struct SequencingReadBatch
+{
+    seqan2::StringSet<TRead> seqs;
+    seqan2::StringSet<TQualities> quals;
+    std::vector<SequencingSimulationInfo> infos;
+
+    // Set the number of reads in the batch, existing entries keep their buffers.
+    void resize(unsigned numReads)
+    {
+        seqan2::resize(seqs, numReads);
+        seqan2::resize(quals, numReads);
+        infos.resize(numReads);
+    }
+};
+
+// ----------------------------------------------------------------------------
+// Class QualityTable
+// ----------------------------------------------------------------------------
+
+// Distribution of the PHRED qualities 0..40 obtained by drawing from a normal distribution, truncating to an integer,
+// and clamping to 0..40 as the quality models do.
+//
+// Sampling takes one uniform random number and a binary search in the cumulative distribution function instead of a
+// normally distributed random number.
+
+class QualityTable
+{
+public:
+    static const int MAX_QUALITY = 40;
+
+    // cdf[q] is the probability of a quality <= q.
+    double cdf[MAX_QUALITY + 1];
+
+    QualityTable()
+    {
+        init(0, 0);
+    }
+
+    // Compute the table for the normal distribution with the given parameters.
+    void init(double mean, double stdDev)
+    {
+        // The truncated value is <= q for all numbers < q + 1, negative numbers are clamped to 0.
+        for (int q = 0; q < MAX_QUALITY; ++q)
+        {
+            if (stdDev > 0)
+                cdf[q] = 0.5 * std::erfc((mean - (q + 1)) / (stdDev * std::sqrt(2.0)));
+            else
+                cdf[q] = (mean < q + 1) ? 1.0 : 0.0;
+        }
+        cdf[MAX_QUALITY] = 1.0;
+    }
+
+    // Compute the table for the distribution with probabilities[q] proportional to the probability of quality q.
+    void initFromProbabilities(double const * probabilities)
+    {
+        double sum = 0;
+        for (int q = 0; q <= MAX_QUALITY; ++q)
+            sum += probabilities[q];
+        double partialSum = 0;
+        for (int q = 0; q < MAX_QUALITY; ++q)
+        {
+            partialSum += probabilities[q];
+            cdf[q] = (sum > 0) ? std::min(1.0, partialSum / sum) : 0.0;
+        }
+        cdf[MAX_QUALITY] = 1.0;
+    }
+
+    // Sample a quality value.
+    int sample(TRng & rng) const
+    {
+        std::uniform_real_distribution<double> dist(0, 1);
+        return std::upper_bound(cdf, cdf + MAX_QUALITY + 1, dist(rng)) - cdf;
+    }
+};
+
 // ----------------------------------------------------------------------------
 // Class SequencingSimulator
 // ----------------------------------------------------------------------------
@@ -163,6 +251,8 @@ public:
 
     // Buffer for the materialization of BS-seq treated fragments.
     seqan2::Dna5String methFrag;
+    // Buffer for the CIGAR string of the read being simulated, reused for all reads.
+    TCigarString cigarBuffer;
 
     SequencingSimulator(TRng & rng, TRng & methRng, SequencingOptions const & _options) :
             rng(rng), methRng(methRng), seqOptions(&_options)
@@ -188,6 +278,16 @@ public:
                            TFragment const & frag,
                            MethylationLevels const * levels = 0);
 
+    // Simulate sequencing of the fragments frags[beginIdx], ..., frags[endIdx - 1] into batch, paired-end if
+    // seqOptions->simulateMatePairs is set.
+    //
+    // The reads of fragment i are written to entry i of batch or to the entries 2 * i and 2 * i + 1 for paired-end
+    // reads, batch must be large enough.  The result is the same as calling simulateSingleEnd() or
+    // simulatePairedEnd() for each fragment.  The built-in simulators override this such that there is one virtual
+    // call per batch instead of one per read.
+    virtual void simulateReads(SequencingReadBatch & batch, std::vector<TFragment> const & frags,
+                               unsigned beginIdx, unsigned endIdx, MethylationLevels const * levels);
+
     // Actually simulate read and qualities from fragment and direction forward/reverse strand.
     //
     // seq -- target sequence of the read to simulate
@@ -198,7 +298,44 @@ public:
     virtual void simulateRead(TRead & seq, TQualities & quals, SequencingSimulationInfo & info,
                               TFragment const & frag, Direction dir, Strand strand) = 0;
 
+protected:
+    // Implementation of simulateReads() for the simulator sim of type TSimulator.  TSimulator::simulateRead() is
+    // called without virtual dispatch.
+    template <typename TSimulator>
+    void _simulateReads(TSimulator & sim, SequencingReadBatch & batch, std::vector<TFragment> const & frags,
+                        unsigned beginIdx, unsigned endIdx, MethylationLevels const * levels)
+    {
+        Direction dirL = LEFT, dirR = RIGHT;
+        Strand strandL = FORWARD, strandR = REVERSE;
+        for (unsigned i = beginIdx; i < endIdx; ++i)
+        {
+            bool isForward = false;
+            TFragment frag = _prepareFragment(isForward, frags[i], levels);
+            if (seqOptions->simulateMatePairs)
+            {
+                _getMateLayout(dirL, strandL, dirR, strandR, isForward);
+                sim.TSimulator::simulateRead(batch.seqs[2 * i], batch.quals[2 * i], batch.infos[2 * i],
+                                             frag, dirL, strandL);
+                sim.TSimulator::simulateRead(batch.seqs[2 * i + 1], batch.quals[2 * i + 1], batch.infos[2 * i + 1],
+                                             frag, dirR, strandR);
+            }
+            else
+            {
+                sim.TSimulator::simulateRead(batch.seqs[i], batch.quals[i], batch.infos[i],
+                                             frag, LEFT, isForward ? FORWARD : REVERSE);
+            }
+        }
+    }
+
 private:
+    // Pick the strand of the fragment and simulate the BS-seq treatment if enabled.  Returns the fragment to
+    // sequence, either frag or the treated fragment in methFrag.
+    TFragment _prepareFragment(bool & isForward, TFragment const & frag, MethylationLevels const * levels);
+
+    // Get the directions and strands of the left and right read from the mate orientation and the fragment strand.
+    void _getMateLayout(Direction & dirL, Strand & strandL, Direction & dirR, Strand & strandR,
+                        bool isForward) const;
+
     // Simulate BS-seq treatment on forward/reverse strand of frag with the given methylation levels.
     //
     // The result is a DNA string with the translations.
@@ -235,6 +372,8 @@ public:
 
     // Storage for the Illumina simulation.
     std::unique_ptr<IlluminaModel> model;
+    // Storage for the right reads if the empirical model has separate tables for them, null otherwise.
+    std::unique_ptr<IlluminaModel> rightModel;
 
     IlluminaSequencingSimulator(TRng & rng, TRng & methRng, SequencingOptions const & seqOptions,
                                 IlluminaSequencingOptions const & illuminaOptions);
@@ -245,6 +384,13 @@ public:
         return illuminaOptions.readLength;
     }
 
+    // Simulate sequencing of a batch of fragments, see SequencingSimulator::simulateReads().
+    virtual void simulateReads(SequencingReadBatch & batch, std::vector<TFragment> const & frags,
+                               unsigned beginIdx, unsigned endIdx, MethylationLevels const * levels)
+    {
+        _simulateReads(*this, batch, frags, beginIdx, endIdx, levels);
+    }
+
     // Actually simulate read and qualities from fragment and direction forward/reverse strand.
     virtual void simulateRead(TRead & seq, TQualities & quals, SequencingSimulationInfo & info,
                               TFragment const & frag, Direction dir, Strand strand);
@@ -253,12 +399,26 @@ private:
     // Initialize the model.
     void _initModel();
 
+    // Initialize mateModel from the tables of the left (0) or right (1) reads of the empirical model.
+    void _initEmpiricalModel(IlluminaModel & mateModel, QualityModel const & qualityModel, unsigned mate);
+
     // Simulate PHRED qualities from the CIGAR string.
-    void _simulateQualities(TQualities & quals, TCigarString const & cigar);
+    void _simulateQualities(TQualities & quals, TCigarString const & cigar, IlluminaModel const & mateModel);
+
+    // Simulate PHRED qualities from the CIGAR string with the precomputed quality tables.
+    void _simulateQualitiesFromTables(TQualities & quals, TCigarString const & cigar,
+                                      IlluminaModel const & mateModel);
 
     // Simulate CIGAR string.  We can do this with position specific parameters only and thus independent of any
     // context.
-    void _simulateCigar(TCigarString & cigar);
+    void _simulateCigar(TCigarString & cigar, IlluminaModel const & mateModel);
+
+    // Simulate CIGAR string with the same distribution as _simulateCigar() but sample the number of matches up to the
+    // next error event at once.
+    void _simulateCigarSkipAhead(TCigarString & cigar, IlluminaModel const & mateModel);
+
+    // Replace bases by Ns with the positional probabilities of the empirical model.
+    void _simulateNs(TRead & seq, TQualities & quals, IlluminaModel const & mateModel);
 };
 
 // ----------------------------------------------------------------------------
@@ -276,6 +436,12 @@ public:
     // Precomputed model data for 454 Sequencing.
     std::unique_ptr<Roche454Model> model;
 
+    // Buffers for the sequenced bases, the flow intensities, and the homopolymer lengths of the read being simulated,
+    // reused for all reads.
+    TRead haplotypeInfix;
+    seqan2::String<double> observedIntensities;
+    seqan2::String<unsigned> realBaseCount;
+
     Roche454SequencingSimulator(TRng & rng, TRng & methRng,
                                 SequencingOptions const & seqOptions,
                                 Roche454SequencingOptions const & roche454Options);
@@ -286,6 +452,13 @@ public:
     // Pick read length for the sequence to be sampled from fragments.
     virtual unsigned readLength();
 
+    // Simulate sequencing of a batch of fragments, see SequencingSimulator::simulateReads().
+    virtual void simulateReads(SequencingReadBatch & batch, std::vector<TFragment> const & frags,
+                               unsigned beginIdx, unsigned endIdx, MethylationLevels const * levels)
+    {
+        _simulateReads(*this, batch, frags, beginIdx, endIdx, levels);
+    }
+
     // Actually simulate read and qualities from fragment and direction forward/reverse strand.
     virtual void simulateRead(TRead & seq, TQualities & quals, SequencingSimulationInfo & info,
                               TFragment const & frag, Direction dir, Strand strand);
@@ -312,6 +485,13 @@ public:
     // Pick read length for the sequence to be sampled from fragments.
     virtual unsigned readLength();
 
+    // Simulate sequencing of a batch of fragments, see SequencingSimulator::simulateReads().
+    virtual void simulateReads(SequencingReadBatch & batch, std::vector<TFragment> const & frags,
+                               unsigned beginIdx, unsigned endIdx, MethylationLevels const * levels)
+    {
+        _simulateReads(*this, batch, frags, beginIdx, endIdx, levels);
+    }
+
     // Actually simulate read and qualities from fragment and direction forward/reverse strand.
     virtual void simulateRead(TRead & seq, TQualities & quals, SequencingSimulationInfo & info,
                               TFragment const & frag, Direction dir, Strand strand);
@@ -0,0 +1,94 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+// Alignment of simulated reads against the original reference from the
+// simulation trace.
+//
+// The sequencing simulation records the errors that it introduced as a CIGAR
+// string relative to the sequence with variants.  The PositionMap knows how
+// the sequence with small variants relates to the original reference.
+// Combining the two yields the CIGAR string, MD string, and edit distance of
+// the read against the original reference without performing an alignment.
+// ==========================================================================
+
+#ifndef APPS_MASON2_TRACE_ALIGNMENT_H_
+#define APPS_MASON2_TRACE_ALIGNMENT_H_
+
+#include <seqan/bam_io.h>
+#include <seqan/sequence.h>
+
+#include <mason/genomic_variants.h>
+
+// ============================================================================
+// Forwards
+// ============================================================================
+
+// ============================================================================
+// Tags, Classes, Enums
+// ============================================================================
+
+// ============================================================================
+// Metafunctions
+// ============================================================================
+
+// ============================================================================
+// Functions
+// ============================================================================
+
+// --------------------------------------------------------------------------
+// Function buildTraceAlignment()
+// --------------------------------------------------------------------------
+
+// Compute the alignment of a simulated read against the original reference from the simulation trace.
+//
+// errorCigar gives the sequencing errors relative to the sequence with small variants and readSeq is the read
+// sequence, both in forward orientation of the sequence with small variants.  The read starts at smallVarBeginPos in
+// the sequence with small variants.  On success, cigar, mdString, and editDistance are set for the alignment against
+// refSeq and beginPos is set to the position of the first aligned reference character.
+//
+// Read characters from insertions (sequencing errors or small variants) become insertions in the resulting CIGAR
+// string, reference characters that are not covered by the read become deletions.  Deletions before the first and
+// after the last aligned character are dropped.  Returns false if no read character could be aligned to the
+// reference, e.g. when the read lies in an insertion completely.
+
+bool buildTraceAlignment(seqan2::String<seqan2::CigarElement<> > & cigar,
+                         seqan2::CharString & mdString,
+                         int & editDistance,
+                         int & beginPos,
+                         seqan2::String<seqan2::CigarElement<> > const & errorCigar,
+                         seqan2::Dna5String const & readSeq,
+                         PositionMap const & posMap,
+                         int smallVarBeginPos,
+                         seqan2::Dna5String const & refSeq);
+
+#endif  // #ifndef APPS_MASON2_TRACE_ALIGNMENT_H_
@@ -43,6 +43,7 @@
 
 #include <mason/genomic_variants.h>
 #include <mason/methylation_levels.h>
+#include <mason/packed_reference.h>
 
 // ============================================================================
 // Forwards
@@ -80,6 +81,8 @@ public:
     seqan2::CharString vcfFileName;
     // Path to methylation FASTA file.
     seqan2::CharString methFastaFileName;
+    // Whether to load the contigs from the packed reference next to fastaFileName, set before calling init().
+    bool usePackedReference;
 
     // ------------------------------------------------------------------------
     // State for position in reference
@@ -104,6 +107,8 @@ public:
 
     // The FAI Index to load the reference sequence from.
     seqan2::FaiIndex faiIndex;
+    // The packed reference to load the reference sequence from instead, only open if usePackedReference.
+    PackedReference packedReference;
     // The FAI Index to load the methylation sequences from.
     seqan2::FaiIndex methFaiIndex;
     // The VCF stream to load from and the VCF heade.r
@@ -112,7 +117,7 @@ public:
     // The current VCF record.  rID == INVALID_REFID if invalid, used for termination.
     seqan2::VcfRecord vcfRecord;
 
-    VcfMaterializer(TRng & rng) : rng(rng), currRID(-1), nextHaplotype(0), numHaplotypes(0)
+    VcfMaterializer(TRng & rng) : rng(rng), usePackedReference(false), currRID(-1), nextHaplotype(0), numHaplotypes(0)
     {}
 
     // If you give methFastaFileName, then you also have to set methOptions.
@@ -124,7 +129,8 @@ public:
                     char const * methFastaFileName = "",
                     MethylationLevelSimulatorOptions const * methOptions = 0) :
             rng(rng), methOptions(methOptions), fastaFileName(fastaFileName), vcfFileName(vcfFileName),
-            methFastaFileName(methFastaFileName), currRID(-1), nextHaplotype(0), numHaplotypes(0)
+            methFastaFileName(methFastaFileName), usePackedReference(false), currRID(-1), nextHaplotype(0),
+            numHaplotypes(0)
     {}
 
     // Call to open all files.
@@ -153,6 +159,9 @@ public:
                          std::vector<std::pair<int, int> > & breakpoints,
                          int & rID, int & haplotype);
 
+    // Load the reference contig with the given rID into seq, from the packed reference if it is open.
+    void readContig(seqan2::Dna5String & seq, int rID);
+
 private:
 
     bool _materializeNext(seqan2::Dna5String & seq, MethylationLevels * levels,
@@ -0,0 +1,212 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+
+#include <mason/bgzf_writer.h>
+
+#include <algorithm>
+#include <chrono>
+#include <cstdint>
+#include <utility>
+
+#include <zlib.h>
+
+#include <mason/mason_types.h>
+
+namespace {
+
+// Append the little-endian representation of value with n bytes to str.
+inline void appendLittleEndian(std::string & str, uint32_t value, unsigned n)
+{
+    for (unsigned i = 0; i < n; ++i)
+        str.push_back(static_cast<char>((value >> (8 * i)) & 0xff));
+}
+
+}  // anonymous namespace
+
+// ---------------------------------------------------------------------------
+// Function BgzfWriter::compressBlock()
+// ---------------------------------------------------------------------------
+
+std::string BgzfWriter::compressBlock(std::string const & data, int level)
+{
+    // Header of gzip member with the BC extra field, the block size is filled in below.
+    static unsigned char const HEADER[18] = {
+        0x1f, 0x8b, 8, 4, 0, 0, 0, 0, 0, 0xff, 6, 0, 'B', 'C', 2, 0, 0, 0
+    };
+    std::string result(reinterpret_cast<char const *>(HEADER), sizeof(HEADER));
+    result.resize(sizeof(HEADER) + compressBound(data.size()) + 8);
+
+    z_stream zs = z_stream();
+    if (deflateInit2(&zs, level, Z_DEFLATED, -15, 8, Z_DEFAULT_STRATEGY) != Z_OK)
+        throw MasonIOException("Could not initialize BGZF compression.");
+    zs.next_in = reinterpret_cast<Bytef *>(const_cast<char *>(data.data()));
+    zs.avail_in = data.size();
+    zs.next_out = reinterpret_cast<Bytef *>(&result[sizeof(HEADER)]);
+    zs.avail_out = result.size() - sizeof(HEADER);
+    int res = deflate(&zs, Z_FINISH);
+    deflateEnd(&zs);
+    if (res != Z_STREAM_END)
+        throw MasonIOException("Could not compress BGZF block.");
+    result.resize(sizeof(HEADER) + zs.total_out);
+
+    uint32_t crc = crc32(crc32(0, Z_NULL, 0), reinterpret_cast<Bytef const *>(data.data()), data.size());
+    appendLittleEndian(result, crc, 4);
+    appendLittleEndian(result, data.size(), 4);
+    if (result.size() > 0x10000u)
+        throw MasonIOException("Compressed BGZF block too large.");
+    result[16] = static_cast<char>((result.size() - 1) & 0xff);
+    result[17] = static_cast<char>((result.size() - 1) >> 8);
+    return result;
+}
+
+// ---------------------------------------------------------------------------
+// Function BgzfWriter::eofBlock()
+// ---------------------------------------------------------------------------
+
+std::string const & BgzfWriter::eofBlock()
+{
+    static unsigned char const EOF_BLOCK[28] = {
+        0x1f, 0x8b, 8, 4, 0, 0, 0, 0, 0, 0xff, 6, 0, 'B', 'C', 2, 0, 0x1b, 0, 3, 0, 0, 0, 0, 0, 0, 0, 0, 0
+    };
+    static std::string const result(reinterpret_cast<char const *>(EOF_BLOCK), sizeof(EOF_BLOCK));
+    return result;
+}
+
+// ---------------------------------------------------------------------------
+// Function BgzfWriter::open()
+// ---------------------------------------------------------------------------
+
+bool BgzfWriter::open(char const * fileName, int numThreads, int level)
+{
+    close();
+    out.open(fileName, std::ios::binary | std::ios::out);
+    if (!out.good())
+        return false;
+    this->numThreads = numThreads;
+    this->level = level;
+    if (numThreads > 1)
+    {
+        tasks.reset(new ConcurrentQueue<TTask>(2 * numThreads));
+        for (int i = 0; i < numThreads; ++i)
+            workers.push_back(std::thread([this]() {
+                        TTask task;
+                        while (tasks->pop(task))
+                            task();
+                    }));
+    }
+    return true;
+}
+
+// ---------------------------------------------------------------------------
+// Function BgzfWriter::write()
+// ---------------------------------------------------------------------------
+
+void BgzfWriter::write(char const * data, size_t n)
+{
+    while (n > 0u)
+    {
+        size_t len = std::min(n, BLOCK_SIZE - buffer.size());
+        buffer.append(data, len);
+        data += len;
+        n -= len;
+        if (buffer.size() == BLOCK_SIZE)
+            _submitBlock();
+    }
+}
+
+// ---------------------------------------------------------------------------
+// Function BgzfWriter::close()
+// ---------------------------------------------------------------------------
+
+void BgzfWriter::close()
+{
+    if (!out.is_open())
+        return;
+
+    if (!buffer.empty())
+        _submitBlock();
+    while (!pending.empty())
+        _writeFront();
+    if (tasks.get())
+        tasks->close();
+    for (unsigned i = 0; i < workers.size(); ++i)
+        workers[i].join();
+    workers.clear();
+    tasks.reset();
+
+    out.write(eofBlock().data(), eofBlock().size());
+    out.close();
+}
+
+// ---------------------------------------------------------------------------
+// Function BgzfWriter::_submitBlock()
+// ---------------------------------------------------------------------------
+
+void BgzfWriter::_submitBlock()
+{
+    if (numThreads <= 1)
+    {
+        std::string block = compressBlock(buffer, level);
+        out.write(block.data(), block.size());
+        if (!out.good())
+            throw MasonIOException("Could not write BGZF block.");
+        buffer.clear();
+        return;
+    }
+
+    int level = this->level;
+    TTask task([data = std::move(buffer), level]() { return compressBlock(data, level); });
+    buffer = std::string();
+    pending.push_back(task.get_future());
+    tasks->push(std::move(task));
+
+    // Write out the finished blocks and limit the number of blocks in memory.
+    while (!pending.empty() &&
+           (pending.size() > 4u * numThreads ||
+            pending.front().wait_for(std::chrono::seconds(0)) == std::future_status::ready))
+        _writeFront();
+}
+
+// ---------------------------------------------------------------------------
+// Function BgzfWriter::_writeFront()
+// ---------------------------------------------------------------------------
+
+void BgzfWriter::_writeFront()
+{
+    std::string block = pending.front().get();
+    pending.pop_front();
+    out.write(block.data(), block.size());
+    if (!out.good())
+        throw MasonIOException("Could not write BGZF block.");
+}
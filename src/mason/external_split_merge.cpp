@@ -34,6 +34,8 @@
 
 #include <mason/external_split_merge.h>
 
+#include <algorithm>
+
 // ---------------------------------------------------------------------------
 // Function IdSplitter::open()
 // ---------------------------------------------------------------------------
@@ -95,6 +97,31 @@ void IdSplitter::open()
             exit(1);
         }
     }
+    buffers.resize(files.size());
+    bufferPos.resize(files.size(), 0);
+}
+
+// ---------------------------------------------------------------------------
+// Function IdSplitter::openExisting()
+// ---------------------------------------------------------------------------
+
+bool IdSplitter::openExisting(std::vector<std::string> const & fileNames)
+{
+    close();
+    numContigs = fileNames.size();
+    for (unsigned i = 0; i < fileNames.size(); ++i)
+    {
+        files.push_back(new std::fstream(fileNames[i].c_str(), std::ios::binary | std::ios::in));
+        if (!files.back()->good())
+        {
+            close();
+            return false;
+        }
+    }
+    // this->fileNames stays empty such that the files are not removed.
+    buffers.resize(files.size());
+    bufferPos.resize(files.size(), 0);
+    return true;
 }
 
 // ---------------------------------------------------------------------------
@@ -106,6 +133,12 @@ void IdSplitter::reset()
     for (unsigned i = 0; i < files.size(); ++i)
         if (files[i] != 0)
         {
+            if (compressionLevel != 0)
+            {
+                _writeBlocks(i, true);
+                buffers[i].clear();
+                bufferPos[i] = 0;
+            }
             SEQAN_ASSERT(files[i]->good());
             files[i]->flush();
             files[i]->seekg(0);
@@ -124,12 +157,125 @@ void IdSplitter::close()
         {
             delete files[i];
 #ifdef STDLIB_VS
-            DeleteFile(fileNames[i].c_str());
+            if (i < fileNames.size())
+                DeleteFile(fileNames[i].c_str());
 #endif  // #ifdef STDLIB_VS
             files[i] = 0;
         }
     files.clear();
     fileNames.clear();
+    buffers.clear();
+    bufferPos.clear();
+}
+
+// ---------------------------------------------------------------------------
+// Function IdSplitter::write()
+// ---------------------------------------------------------------------------
+
+void IdSplitter::write(unsigned idx, char const * data, size_t n)
+{
+    rawBytes += n;
+    if (compressionLevel == 0)
+    {
+        files[idx]->write(data, n);
+        storedBytes += n;
+        return;
+    }
+
+    buffers[idx].append(data, n);
+    if (buffers[idx].size() >= BLOCK_SIZE)
+        _writeBlocks(idx, false);
+}
+
+// ---------------------------------------------------------------------------
+// Function IdSplitter::read()
+// ---------------------------------------------------------------------------
+
+size_t IdSplitter::read(unsigned idx, char * data, size_t n)
+{
+    if (compressionLevel == 0)
+    {
+        files[idx]->read(data, n);
+        return files[idx]->gcount();
+    }
+
+    size_t result = 0;
+    while (result < n)
+    {
+        if (bufferPos[idx] == buffers[idx].size() && !_readBlock(idx))
+            break;
+        size_t len = std::min(n - result, buffers[idx].size() - bufferPos[idx]);
+        memcpy(data + result, &buffers[idx][bufferPos[idx]], len);
+        bufferPos[idx] += len;
+        result += len;
+    }
+    return result;
+}
+
+// ---------------------------------------------------------------------------
+// Function IdSplitter::_writeBlocks()
+// ---------------------------------------------------------------------------
+
+// Blocks are written with a header of the compressed and the uncompressed size as uint32_t.
+
+void IdSplitter::_writeBlocks(unsigned idx, bool flushAll)
+{
+    std::string & buffer = buffers[idx];
+    int numBlocks = flushAll ? (buffer.size() + BLOCK_SIZE - 1) / BLOCK_SIZE : buffer.size() / BLOCK_SIZE;
+    if (numBlocks == 0)
+        return;
+
+    std::vector<std::string> blocks(numBlocks);
+    bool failed = false;
+    SEQAN_OMP_PRAGMA(parallel for num_threads(numThreads) if(numBlocks > 1) reduction(||:failed))
+    for (int i = 0; i < numBlocks; ++i)
+    {
+        uint32_t rawLength = std::min((size_t)BLOCK_SIZE, buffer.size() - i * BLOCK_SIZE);
+        uLongf storedLength = compressBound(rawLength);
+        blocks[i].resize(2 * sizeof(uint32_t) + storedLength);
+        char * header = &blocks[i][0];
+        if (compress2(reinterpret_cast<Bytef *>(header + 2 * sizeof(uint32_t)), &storedLength,
+                      reinterpret_cast<Bytef const *>(&buffer[i * BLOCK_SIZE]), rawLength,
+                      compressionLevel) != Z_OK)
+            failed = true;
+        uint32_t storedLength32 = storedLength;
+        memcpy(header, &storedLength32, sizeof(uint32_t));
+        memcpy(header + sizeof(uint32_t), &rawLength, sizeof(uint32_t));
+        blocks[i].resize(2 * sizeof(uint32_t) + storedLength);
+    }
+    if (failed)
+        throw MasonIOException("Could not compress temporary file block.");
+
+    for (int i = 0; i < numBlocks; ++i)
+    {
+        files[idx]->write(&blocks[i][0], blocks[i].size());
+        storedBytes += blocks[i].size();
+    }
+    buffer.erase(0, std::min(buffer.size(), (size_t)numBlocks * BLOCK_SIZE));
+}
+
+// ---------------------------------------------------------------------------
+// Function IdSplitter::_readBlock()
+// ---------------------------------------------------------------------------
+
+bool IdSplitter::_readBlock(unsigned idx)
+{
+    uint32_t header[2];
+    files[idx]->read(reinterpret_cast<char *>(&header[0]), sizeof(header));
+    if (files[idx]->gcount() != (std::streamsize)sizeof(header))
+        return false;
+
+    std::string stored(header[0], '\0');
+    files[idx]->read(&stored[0], header[0]);
+    buffers[idx].resize(header[1]);
+    bufferPos[idx] = 0;
+    uLongf rawLength = header[1];
+    if (files[idx]->gcount() != (std::streamsize)header[0] ||
+        uncompress(reinterpret_cast<Bytef *>(&buffers[idx][0]), &rawLength,
+                   reinterpret_cast<Bytef const *>(stored.data()), header[0]) != Z_OK ||
+        rawLength != header[1])
+        throw MasonIOException("Corrupt block in temporary file.");
+    return true;
 }
 
 // ---------------------------------------------------------------------------
@@ -140,6 +286,7 @@ void SamJoiner::init(seqan2::BamFileOut * outPtr)
 {
     resize(records, splitter->files.size());
     active.resize(splitter->files.size());
+    keys.resize(splitter->files.size());
 
     for (unsigned i = 0; i < splitter->files.size(); ++i)
     {
@@ -157,7 +304,11 @@ void SamJoiner::init(seqan2::BamFileOut * outPtr)
 
         active[i] = _loadNext(records[i], i);
         numActive += (active[i] != false);
+        if (active[i])
+            keys[i].assign(toCString(records[i].qName));
     }
+
+    tree.build(splitter->files.size(), [this](unsigned a, unsigned b) { return _beats(a, b); });
 }
 
 // ---------------------------------------------------------------------------
@@ -172,21 +323,31 @@ bool SamJoiner::_loadNext(seqan2::BamAlignmentRecord & record, unsigned idx)
     return true;
 }
 
+// ---------------------------------------------------------------------------
+// Function SamJoiner::_beats()
+// ---------------------------------------------------------------------------
+
+bool SamJoiner::_beats(unsigned a, unsigned b) const
+{
+    if (!active[a] || !active[b])
+        return active[a] || (!active[b] && a < b);
+    int res = compare(keys[a], keys[b]);
+    if (res != 0)
+        return (res < 0);
+    bool firstA = hasFlagFirst(records[a]), firstB = hasFlagFirst(records[b]);
+    return (firstA != firstB) ? firstA : (a < b);
+}
+
 // ---------------------------------------------------------------------------
 // Function SamJoiner::get()
 // ---------------------------------------------------------------------------
 
 int SamJoiner::get(seqan2::BamAlignmentRecord & record)
 {
-    unsigned idx = std::numeric_limits<unsigned>::max();
-    for (unsigned i = 0; i < length(records); ++i)
-    {
-        if (!active[i])
-            continue;
-        if (idx == std::numeric_limits<unsigned>::max() || ltBamAlignmentRecord(records[i], records[idx]))
-            idx = i;
-    }
-    if (idx == std::numeric_limits<unsigned>::max())
+    if (empty(records))
+        return 1;
+    unsigned idx = tree.winner();
+    if (!active[idx])
         return 1;
 
     // We use double-buffering and the input parameters as buffers.
@@ -194,10 +355,140 @@ int SamJoiner::get(seqan2::BamAlignmentRecord & record)
     active[idx] = _loadNext(record, idx);
     swap(record, records[idx]);
     numActive -= !active[idx];
+    if (active[idx])
+        keys[idx].assign(toCString(records[idx].qName));
+    tree.update([this](unsigned a, unsigned b) { return _beats(a, b); });
+
+    return 0;
+}
+
+// ---------------------------------------------------------------------------
+// Function SpillJoiner::_init()
+// ---------------------------------------------------------------------------
+
+void SpillJoiner::_init()
+{
+    keys.resize(splitter->files.size());
+    resize(payloads, splitter->files.size());
+    active.resize(splitter->files.size());
+
+    for (unsigned i = 0; i < splitter->files.size(); ++i)
+    {
+        active[i] = _loadNext(keys[i], payloads[i], i);
+        numActive += (active[i] != false);
+    }
+
+    tree.build(splitter->files.size(), [this](unsigned a, unsigned b) { return _beats(a, b); });
+}
+
+// ---------------------------------------------------------------------------
+// Function SpillJoiner::_loadNext()
+// ---------------------------------------------------------------------------
+
+bool SpillJoiner::_loadNext(uint64_t & key, seqan2::CharString & payload, unsigned idx)
+{
+    char header[sizeof(uint64_t) + sizeof(uint32_t)];
+    if (splitter->read(idx, header, sizeof(header)) != sizeof(header))
+        return false;
+
+    uint32_t len = 0;
+    memcpy(&key, header, sizeof(key));
+    memcpy(&len, header + sizeof(key), sizeof(len));
+    resize(payload, len);
+    if (len > 0u && splitter->read(idx, &payload[0], len) != len)
+        throw MasonIOException("Truncated record in temporary file.");
+    return true;
+}
+
+// ---------------------------------------------------------------------------
+// Function SpillJoiner::get()
+// ---------------------------------------------------------------------------
+
+int SpillJoiner::get(seqan2::CharString & payload)
+{
+    if (empty(payloads))
+        return 1;
+    unsigned idx = tree.winner();
+    if (!active[idx])
+        return 1;
+
+    // We use double-buffering and the input parameters as buffers.
+    swap(payload, payloads[idx]);
+    active[idx] = _loadNext(keys[idx], payloads[idx], idx);
+    numActive -= !active[idx];
+    tree.update([this](unsigned a, unsigned b) { return _beats(a, b); });
 
     return 0;
 }
 
+// ---------------------------------------------------------------------------
+// Function appendSpillRead()
+// ---------------------------------------------------------------------------
+
+void appendSpillRead(seqan2::CharString & buffer,
+                     uint64_t key,
+                     seqan2::CharString const & id,
+                     seqan2::Dna5String const & seq,
+                     seqan2::CharString const & qual)
+{
+    // Layout: key, payload length, then the payload with the lengths of id, sequence, and qualities followed by the
+    // id, the packed sequence, and the qualities.
+    uint32_t lengths[3] = {(uint32_t)length(id), (uint32_t)length(seq), (uint32_t)length(qual)};
+    uint32_t packedLength = (lengths[1] + 1) / 2;
+    uint32_t len = sizeof(lengths) + lengths[0] + packedLength + lengths[2];
+
+    unsigned pos = length(buffer);
+    resize(buffer, pos + sizeof(key) + sizeof(len) + len);
+    char * ptr = &buffer[pos];
+    memcpy(ptr, &key, sizeof(key));
+    ptr += sizeof(key);
+    memcpy(ptr, &len, sizeof(len));
+    ptr += sizeof(len);
+    memcpy(ptr, &lengths[0], sizeof(lengths));
+    ptr += sizeof(lengths);
+    if (lengths[0])
+        memcpy(ptr, &id[0], lengths[0]);
+    ptr += lengths[0];
+    for (unsigned i = 0; i < lengths[1]; i += 2)
+    {
+        unsigned char c = ordValue(seq[i]);
+        if (i + 1 < lengths[1])
+            c |= ordValue(seq[i + 1]) << 4;
+        *ptr++ = c;
+    }
+    if (lengths[2])
+        memcpy(ptr, &qual[0], lengths[2]);
+}
+
+// ---------------------------------------------------------------------------
+// Function decodeSpillRead()
+// ---------------------------------------------------------------------------
+
+void decodeSpillRead(seqan2::CharString & id,
+                     seqan2::CharString & seq,
+                     seqan2::CharString & qual,
+                     seqan2::CharString const & payload)
+{
+    static char const DNA5_CHARS[] = "ACGTN";
+
+    uint32_t lengths[3];
+    char const * ptr = &payload[0];
+    memcpy(&lengths[0], ptr, sizeof(lengths));
+    ptr += sizeof(lengths);
+
+    resize(id, lengths[0]);
+    if (lengths[0])
+        memcpy(&id[0], ptr, lengths[0]);
+    ptr += lengths[0];
+    resize(seq, lengths[1]);
+    for (unsigned i = 0; i < lengths[1]; ++i)
+        seq[i] = DNA5_CHARS[(static_cast<unsigned char>(ptr[i / 2]) >> (4 * (i % 2))) & 0x0f];
+    ptr += (lengths[1] + 1) / 2;
+    resize(qual, lengths[2]);
+    if (lengths[2])
+        memcpy(&qual[0], ptr, lengths[2]);
+}
+
 // ---------------------------------------------------------------------------
 // Function ContigPicker::pick()
 // ---------------------------------------------------------------------------
@@ -225,3 +516,82 @@ std::pair<int, int> ContigPicker::pick()
 
     return std::make_pair(rID, hID);
 }
+
+// ---------------------------------------------------------------------------
+// Function FragmentAllocator::allocate()
+// ---------------------------------------------------------------------------
+
+void FragmentAllocator::allocate(TRng & rng, std::vector<int64_t> const & lengthSums, int numHaplotypes,
+                                 int numFragments)
+{
+    unsigned numPairs = lengthSums.size() * numHaplotypes;
+    counts.assign(numPairs, 0);
+    firstIds.assign(numPairs, 0);
+
+    // Draw the count of each pair from the fragments not distributed to the previous ones.
+    int remaining = numFragments;
+    double remainingWeight = static_cast<double>(lengthSums.empty() ? 0 : lengthSums.back()) * numHaplotypes;
+    for (unsigned idx = 0; idx < numPairs && remaining > 0; ++idx)
+    {
+        unsigned rID = idx / numHaplotypes;
+        double weight = static_cast<double>(lengthSums[rID] - (rID ? lengthSums[rID - 1] : 0));
+        if (idx + 1 == numPairs || weight >= remainingWeight)
+        {
+            counts[idx] = remaining;
+        }
+        else if (weight > 0)
+        {
+            std::binomial_distribution<int> dist(remaining, weight / remainingWeight);
+            counts[idx] = dist(rng);
+        }
+        remaining -= counts[idx];
+        remainingWeight -= weight;
+    }
+    for (unsigned idx = 1; idx < numPairs; ++idx)
+        firstIds[idx] = firstIds[idx - 1] + counts[idx - 1];
+
+    uint64_t seed = (static_cast<uint64_t>(rng()) << 32) | static_cast<uint32_t>(rng());
+    permutation.init(numFragments, seed);
+}
+
+// ---------------------------------------------------------------------------
+// Function FragmentAllocator::getIds()
+// ---------------------------------------------------------------------------
+
+void FragmentAllocator::getIds(std::vector<int> & ids, unsigned idx) const
+{
+    ids.resize(counts[idx]);
+    for (int i = 0; i < counts[idx]; ++i)
+        ids[i] = permutation(firstIds[idx] + i);
+    std::sort(ids.begin(), ids.end());
+}
+
+// ---------------------------------------------------------------------------
+// Function assignShards()
+// ---------------------------------------------------------------------------
+
+void assignShards(std::vector<int> & shards,
+                  std::vector<int64_t> const & lengthSums,
+                  int numHaplotypes,
+                  int numShards)
+{
+    // Order the pairs by decreasing contig length, ties by index.
+    std::vector<std::pair<int64_t, int> > pairs;
+    for (unsigned rID = 0; rID < lengthSums.size(); ++rID)
+    {
+        int64_t len = lengthSums[rID] - ((rID > 0u) ? lengthSums[rID - 1] : 0);
+        for (int hID = 0; hID < numHaplotypes; ++hID)
+            pairs.push_back(std::make_pair(-len, (int)(rID * numHaplotypes + hID)));
+    }
+    std::sort(pairs.begin(), pairs.end());
+
+    // Assign each pair to the shard with the smallest total length, the first one on ties.
+    std::vector<int64_t> totals(numShards, 0);
+    shards.assign(pairs.size(), 0);
+    for (unsigned i = 0; i < pairs.size(); ++i)
+    {
+        int shard = std::min_element(totals.begin(), totals.end()) - totals.begin();
+        shards[pairs[i].second] = shard;
+        totals[shard] -= pairs[i].first;
+    }
+}
@@ -0,0 +1,244 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+
+#include <mason/gap_index.h>
+
+#include <chrono>
+#include <cstdint>
+#include <cstdio>
+#include <cstring>
+#include <fstream>
+#include <sstream>
+
+#include <sys/stat.h>
+
+namespace {
+
+// The SplitMix64 finalizer, combines the values of the fingerprint.
+uint64_t mixFingerprint(uint64_t h, uint64_t x)
+{
+    x += h + 0x9E3779B97F4A7C15ull;
+    x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9ull;
+    x = (x ^ (x >> 27)) * 0x94D049BB133111EBull;
+    return x ^ (x >> 31);
+}
+
+}  // namespace
+
+// ---------------------------------------------------------------------------
+// Function buildGapIntervals()
+// ---------------------------------------------------------------------------
+
+void buildGapIntervals(std::vector<std::pair<int, int> > & intervals,
+                       seqan2::Dna5String const & contigSeq,
+                       unsigned minNs)
+{
+    intervals.clear();
+    size_t len = length(contigSeq);
+    if (len == 0u)
+        return;
+
+    // Dna5 characters are stored in one byte each, N has the rank 4.
+    unsigned char const * ptr = reinterpret_cast<unsigned char const *>(&contigSeq[0]);
+    unsigned char const N_RANK = 4;
+    uint64_t const ONES = 0x0101010101010101ull;
+    uint64_t const HIGHS = 0x8080808080808080ull;
+    uint64_t const ALL_N = N_RANK * ONES;
+
+    size_t pos = 0;
+    while (pos < len)
+    {
+        // Skip over the words without N, i.e. without zero byte after XOR with ALL_N.
+        for (uint64_t word; pos + 8 <= len; pos += 8)
+        {
+            memcpy(&word, ptr + pos, 8);
+            word ^= ALL_N;
+            if ((word - ONES) & ~word & HIGHS)
+                break;
+        }
+        while (pos < len && ptr[pos] != N_RANK)
+            ++pos;
+        if (pos == len)
+            break;
+
+        // Skip over the words with only Ns.
+        size_t beginPos = pos;
+        for (uint64_t word; pos + 8 <= len; pos += 8)
+        {
+            memcpy(&word, ptr + pos, 8);
+            if (word != ALL_N)
+                break;
+        }
+        while (pos < len && ptr[pos] == N_RANK)
+            ++pos;
+        if (pos == len || pos - beginPos >= minNs)
+            intervals.push_back(std::make_pair((int)beginPos, (int)pos));
+    }
+}
+
+// ---------------------------------------------------------------------------
+// Function GapIndex::build()
+// ---------------------------------------------------------------------------
+
+void GapIndex::build(seqan2::FaiIndex const & faiIndex)
+{
+    // Take the fingerprint before reading, a FASTA file changed while reading then does not match the saved file.
+    if (!computeFastaFingerprint(fingerprint, toCString(faiIndex.seqFilename)))
+        fingerprint = 0;
+
+    unsigned numContigs = numSeqs(faiIndex);
+    contigNames.resize(numContigs);
+    contigLengths.resize(numContigs);
+    intervals.resize(numContigs);
+
+    seqan2::Dna5String seq;
+    for (unsigned i = 0; i < numContigs; ++i)
+    {
+        contigNames[i] = toCString(sequenceName(faiIndex, i));
+        contigLengths[i] = sequenceLength(faiIndex, i);
+        readSequence(seq, faiIndex, i);
+        buildGapIntervals(intervals[i], seq);
+    }
+}
+
+// ---------------------------------------------------------------------------
+// Function GapIndex::load()
+// ---------------------------------------------------------------------------
+
+bool GapIndex::load(char const * fileName, seqan2::FaiIndex const & faiIndex)
+{
+    contigNames.clear();
+    contigLengths.clear();
+    intervals.clear();
+    fingerprint = 0;
+
+    uint64_t currentFingerprint = 0;
+    if (!computeFastaFingerprint(currentFingerprint, toCString(faiIndex.seqFilename)))
+        return false;
+
+    std::ifstream in(fileName, std::ios::binary | std::ios::in);
+    std::string line;
+    if (!in.good() || !std::getline(in, line) || line != "#MASON GAPS 2" || !std::getline(in, line))
+        return false;
+    std::istringstream header(line);
+    std::string key;
+    if (!std::getline(header, key, '\t') || key != "#FASTA" || !(header >> fingerprint) ||
+        fingerprint != currentFingerprint)
+        return false;
+
+    while (std::getline(in, line))
+    {
+        std::istringstream ss(line);
+        if (!line.empty() && line[0] == '>')
+        {
+            std::string name;
+            unsigned len = 0;
+            ss.get();  // skip '>'
+            if (!std::getline(ss, name, '\t') || !(ss >> len))
+                return false;
+            contigNames.push_back(name);
+            contigLengths.push_back(len);
+            intervals.resize(intervals.size() + 1);
+        }
+        else
+        {
+            std::pair<int, int> interval;
+            if (intervals.empty() || !(ss >> interval.first >> interval.second))
+                return false;
+            intervals.back().push_back(interval);
+        }
+    }
+
+    // Check that the file belongs to the reference.
+    if (contigNames.size() != numSeqs(faiIndex))
+        return false;
+    for (unsigned i = 0; i < contigNames.size(); ++i)
+        if (contigNames[i] != toCString(sequenceName(faiIndex, i)) ||
+            contigLengths[i] != sequenceLength(faiIndex, i))
+            return false;
+    return true;
+}
+
+// ---------------------------------------------------------------------------
+// Function GapIndex::save()
+// ---------------------------------------------------------------------------
+
+bool GapIndex::save(char const * fileName) const
+{
+    // Concurrent runs write to different temporary files, the last rename wins.
+    std::stringstream ss;
+    ss << fileName << ".tmp." << std::chrono::steady_clock::now().time_since_epoch().count();
+    std::string tmpFileName = ss.str();
+
+    std::ofstream out(tmpFileName.c_str(), std::ios::binary | std::ios::out);
+    if (!out.good())
+        return false;
+    out << "#MASON GAPS 2\n"
+        << "#FASTA\t" << fingerprint << '\n';
+    for (unsigned i = 0; i < contigNames.size(); ++i)
+    {
+        out << '>' << contigNames[i] << '\t' << contigLengths[i] << '\n';
+        for (unsigned j = 0; j < intervals[i].size(); ++j)
+            out << intervals[i][j].first << '\t' << intervals[i][j].second << '\n';
+    }
+    out.close();
+
+    if (out.fail() || std::rename(tmpFileName.c_str(), fileName) != 0)
+    {
+        std::remove(tmpFileName.c_str());
+        return false;
+    }
+    return true;
+}
+
+// ---------------------------------------------------------------------------
+// Function computeFastaFingerprint()
+// ---------------------------------------------------------------------------
+
+bool computeFastaFingerprint(uint64_t & fingerprint, char const * fileName)
+{
+    struct stat st;
+    if (stat(fileName, &st) != 0)
+        return false;
+#if defined(__APPLE__)
+    int64_t mtimeNsec = st.st_mtimespec.tv_nsec;
+#else  // #if defined(__APPLE__)
+    int64_t mtimeNsec = st.st_mtim.tv_nsec;
+#endif  // #if defined(__APPLE__)
+    fingerprint = mixFingerprint(0, st.st_size);
+    fingerprint = mixFingerprint(fingerprint, st.st_mtime);
+    fingerprint = mixFingerprint(fingerprint, mtimeNsec);
+    fingerprint = mixFingerprint(fingerprint, st.st_ino);
+    return true;
+}
@@ -684,16 +684,8 @@ int VariantMaterializer::_materializeLargeVariants(
     }
 
     // Build the interval trees of the positionMap.
-    seqan2::String<PositionMap::TInterval> svIntervals, svIntervalsSTL;
-    for (unsigned i = 0; i < length(intervals); ++i)
-        appendValue(svIntervals, PositionMap::TInterval(
-                intervals[i].svBeginPos, intervals[i].svEndPos, intervals[i]));
-    for (unsigned i = 0; i < length(intervals); ++i)
-        if (intervals[i].smallVarBeginPos != -1)  // ignore insertions
-            appendValue(svIntervalsSTL, PositionMap::TInterval(
-                    intervals[i].smallVarBeginPos, intervals[i].smallVarEndPos, intervals[i]));
-    createIntervalTree(positionMap.svIntervalTree, svIntervals);
-    createIntervalTree(positionMap.svIntervalTreeSTL, svIntervalsSTL);
+    swap(positionMap.svIntervals, intervals);
+    positionMap.buildIntervalTrees();
 
     return 0;
 }
@@ -827,6 +819,25 @@ std::pair<int, int> PositionMap::toOriginalInterval(int smallVarBeginPos, int sm
     return std::make_pair(smallVarBeginPos3, smallVarEndPos3);
 }
 
+// --------------------------------------------------------------------------
+// Function PositionMap::buildIntervalTrees()
+// --------------------------------------------------------------------------
+
+void PositionMap::buildIntervalTrees()
+{
+    svIntervalTree = TIntervalTree();
+    svIntervalTreeSTL = TIntervalTree();
+    seqan2::String<TInterval> intervals, intervalsSTL;
+    for (unsigned i = 0; i < length(svIntervals); ++i)
+        appendValue(intervals, TInterval(svIntervals[i].svBeginPos, svIntervals[i].svEndPos, svIntervals[i]));
+    for (unsigned i = 0; i < length(svIntervals); ++i)
+        if (svIntervals[i].smallVarBeginPos != -1)  // ignore insertions
+            appendValue(intervalsSTL, TInterval(svIntervals[i].smallVarBeginPos, svIntervals[i].smallVarEndPos,
+                                                svIntervals[i]));
+    createIntervalTree(svIntervalTree, intervals);
+    createIntervalTree(svIntervalTreeSTL, intervalsSTL);
+}
+
 // --------------------------------------------------------------------------
 // Function PositionMap::reinit()
 // --------------------------------------------------------------------------
@@ -837,6 +848,7 @@ void PositionMap::reinit(TJournalEntries const & journal)
     // TODO(holtgrew): Better API support for IntervalTree?
     svIntervalTree = TIntervalTree();
     svIntervalTreeSTL = TIntervalTree();
+    clear(svIntervals);
     svBreakpoints.clear();
     clear(refGapAnchors);
     clear(smallVarGapAnchors);
@@ -0,0 +1,391 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+
+#include <mason/haplotype_cache.h>
+
+#include <chrono>
+#include <cstdio>
+#include <cstring>
+#include <iomanip>
+#include <sstream>
+
+#include <mason/gap_index.h>
+#include <mason/mason_types.h>
+#include <mason/packed_reference.h>
+
+namespace {
+
+// Magic string at the begin of the cache file and value for detecting a different byte order.
+char const CACHE_MAGIC[8] = {'M', 'S', 'N', 'H', 'A', 'P', 'L', '1'};
+uint64_t const BYTE_ORDER_MARK = 0x0102030405060708ull;
+// Version of the record format, part of the key such that files of other versions are not used.
+uint64_t const CACHE_VERSION = 1;
+
+// Returns hash with the 64 bit value x mixed in.
+inline uint64_t mixHash(uint64_t hash, uint64_t x)
+{
+    hash ^= x;
+    hash *= 0x9e3779b97f4a7c15ull;
+    return hash ^ (hash >> 32);
+}
+
+// Mix the content of the file fileName into hash, returns false if it could not be read.
+bool hashFile(uint64_t & hash, char const * fileName)
+{
+    std::ifstream in(fileName, std::ios::binary | std::ios::in);
+    if (!in.good())
+        return false;
+
+    // The block size is a multiple of eight such that the last word can be padded with zeroes.
+    std::vector<char> block(1024 * 1024);
+    uint64_t fileSize = 0;
+    while (in)
+    {
+        in.read(&block[0], block.size());
+        size_t numBytes = in.gcount();
+        size_t numWords = (numBytes + 7) / 8;
+        memset(&block[0] + numBytes, 0, numWords * 8 - numBytes);
+        for (size_t i = 0; i < numWords; ++i)
+        {
+            uint64_t word;
+            memcpy(&word, &block[8 * i], 8);
+            hash = mixHash(hash, word);
+        }
+        fileSize += numBytes;
+    }
+    hash = mixHash(hash, fileSize);
+    return !in.bad();
+}
+
+// Append the bytes of value to buffer.
+template <typename T>
+void appendRaw(std::string & buffer, T value)
+{
+    buffer.append(reinterpret_cast<char const *>(&value), sizeof(T));
+}
+
+// Append the number of pairs and the pairs in [it, itEnd) to buffer.
+template <typename TIter>
+void appendPairs(std::string & buffer, TIter it, TIter itEnd, size_t num)
+{
+    appendRaw<uint64_t>(buffer, num);
+    for (; it != itEnd; ++it)
+    {
+        appendRaw<int32_t>(buffer, it->first);
+        appendRaw<int32_t>(buffer, it->second);
+    }
+}
+
+// Throw if there are less than numBytes bytes left in [ptr, endPtr).
+inline void checkAvailable(char const * ptr, char const * endPtr, uint64_t numBytes)
+{
+    if ((uint64_t)(endPtr - ptr) < numBytes)
+        throw MasonIOException("Truncated haplotype cache file.");
+}
+
+// Read value from ptr and advance ptr.
+template <typename T>
+T readRaw(char const *& ptr, char const * endPtr)
+{
+    T value;
+    checkAvailable(ptr, endPtr, sizeof(T));
+    memcpy(&value, ptr, sizeof(T));
+    ptr += sizeof(T);
+    return value;
+}
+
+// Read pairs written by appendPairs() from ptr into pairs and advance ptr.
+void readPairs(std::vector<std::pair<int, int> > & pairs, char const *& ptr, char const * endPtr)
+{
+    uint64_t num = readRaw<uint64_t>(ptr, endPtr);
+    checkAvailable(ptr, endPtr, num * 2 * sizeof(int32_t));
+    pairs.resize(num);
+    for (uint64_t i = 0; i < num; ++i)
+    {
+        pairs[i].first = readRaw<int32_t>(ptr, endPtr);
+        pairs[i].second = readRaw<int32_t>(ptr, endPtr);
+    }
+}
+
+// Append the gap anchors to buffer.
+void appendGapAnchors(std::string & buffer, PositionMap::TGapAnchors const & anchors)
+{
+    appendRaw<uint64_t>(buffer, length(anchors));
+    for (unsigned i = 0; i < length(anchors); ++i)
+    {
+        appendRaw<int32_t>(buffer, anchors[i].seqPos);
+        appendRaw<int32_t>(buffer, anchors[i].gapPos);
+    }
+}
+
+// Read gap anchors written by appendGapAnchors() from ptr into anchors and advance ptr.
+void readGapAnchors(PositionMap::TGapAnchors & anchors, char const *& ptr, char const * endPtr)
+{
+    uint64_t num = readRaw<uint64_t>(ptr, endPtr);
+    checkAvailable(ptr, endPtr, num * 2 * sizeof(int32_t));
+    clear(anchors);
+    reserve(anchors, num, seqan2::Exact());
+    for (uint64_t i = 0; i < num; ++i)
+    {
+        int seqPos = readRaw<int32_t>(ptr, endPtr);
+        int gapPos = readRaw<int32_t>(ptr, endPtr);
+        appendValue(anchors, seqan2::GapAnchor<int>(seqPos, gapPos));
+    }
+}
+
+}  // namespace
+
+// ---------------------------------------------------------------------------
+// Function HaplotypeCacheWriter::open()
+// ---------------------------------------------------------------------------
+
+bool HaplotypeCacheWriter::open(char const * fileName, uint64_t key)
+{
+    abort();
+
+    // Concurrent runs write to different temporary files, the last rename wins.
+    this->fileName = fileName;
+    std::stringstream ss;
+    ss << fileName << ".tmp." << std::chrono::steady_clock::now().time_since_epoch().count();
+    tmpFileName = ss.str();
+    out.open(tmpFileName.c_str(), std::ios::binary | std::ios::out);
+    if (!out.is_open())
+        return false;
+
+    buffer.assign(CACHE_MAGIC, sizeof(CACHE_MAGIC));
+    appendRaw<uint64_t>(buffer, BYTE_ORDER_MARK);
+    appendRaw<uint64_t>(buffer, key);
+    out.write(buffer.data(), buffer.size());
+    if (!out.good())
+    {
+        abort();
+        return false;
+    }
+    return true;
+}
+
+// ---------------------------------------------------------------------------
+// Function HaplotypeCacheWriter::write()
+// ---------------------------------------------------------------------------
+
+bool HaplotypeCacheWriter::write(int rID, int hID,
+                                 seqan2::Dna5String const & seq,
+                                 std::vector<SmallVarInfo> const & varInfos,
+                                 std::vector<std::pair<int, int> > const & breakpoints,
+                                 PositionMap const & posMap)
+{
+    buffer.clear();
+    appendRaw<int32_t>(buffer, rID);
+    appendRaw<int32_t>(buffer, hID);
+
+    // Sequence with two bits per base and its runs of Ns.
+    packSequence(words, seq);
+    buildGapIntervals(nRuns, seq, 1);
+    appendRaw<uint64_t>(buffer, length(seq));
+    appendPairs(buffer, nRuns.begin(), nRuns.end(), nRuns.size());
+    if (!words.empty())
+        buffer.append(reinterpret_cast<char const *>(&words[0]), words.size() * sizeof(uint64_t));
+
+    // Small variant infos and breakpoints.
+    appendRaw<uint64_t>(buffer, varInfos.size());
+    for (unsigned i = 0; i < varInfos.size(); ++i)
+    {
+        appendRaw<int32_t>(buffer, varInfos[i].kind);
+        appendRaw<int32_t>(buffer, varInfos[i].pos);
+        appendRaw<int32_t>(buffer, varInfos[i].count);
+    }
+    appendPairs(buffer, breakpoints.begin(), breakpoints.end(), breakpoints.size());
+
+    // The PositionMap, the interval trees are rebuilt from the intervals when reading.
+    appendGapAnchors(buffer, posMap.refGapAnchors);
+    appendGapAnchors(buffer, posMap.smallVarGapAnchors);
+    appendRaw<uint64_t>(buffer, length(posMap.svIntervals));
+    for (unsigned i = 0; i < length(posMap.svIntervals); ++i)
+    {
+        GenomicInterval const & interval = posMap.svIntervals[i];
+        appendRaw<int32_t>(buffer, interval.svBeginPos);
+        appendRaw<int32_t>(buffer, interval.svEndPos);
+        appendRaw<int32_t>(buffer, interval.smallVarBeginPos);
+        appendRaw<int32_t>(buffer, interval.smallVarEndPos);
+        appendRaw<int32_t>(buffer, interval.strand);
+        appendRaw<int32_t>(buffer, interval.kind);
+    }
+    appendPairs(buffer, posMap.svBreakpoints.begin(), posMap.svBreakpoints.end(), posMap.svBreakpoints.size());
+
+    out.write(buffer.data(), buffer.size());
+    return out.good();
+}
+
+// ---------------------------------------------------------------------------
+// Function HaplotypeCacheWriter::commit()
+// ---------------------------------------------------------------------------
+
+bool HaplotypeCacheWriter::commit()
+{
+    out.close();
+    if (out.fail() || std::rename(tmpFileName.c_str(), fileName.c_str()) != 0)
+    {
+        std::remove(tmpFileName.c_str());
+        return false;
+    }
+    return true;
+}
+
+// ---------------------------------------------------------------------------
+// Function HaplotypeCacheWriter::abort()
+// ---------------------------------------------------------------------------
+
+void HaplotypeCacheWriter::abort()
+{
+    if (!out.is_open())
+        return;
+    out.close();
+    std::remove(tmpFileName.c_str());
+}
+
+// ---------------------------------------------------------------------------
+// Function HaplotypeCacheReader::open()
+// ---------------------------------------------------------------------------
+
+bool HaplotypeCacheReader::open(char const * fileName, uint64_t key)
+{
+    ptr = endPtr = 0;
+    seqan2::close(mappedFile);
+    if (!seqan2::open(mappedFile, fileName, seqan2::OPEN_RDONLY))
+        return false;
+
+    size_t const HEADER_SIZE = sizeof(CACHE_MAGIC) + 2 * sizeof(uint64_t);
+    char const * data = begin(mappedFile, seqan2::Standard());
+    uint64_t byteOrderMark = 0, fileKey = 0;
+    if (length(mappedFile) >= HEADER_SIZE)
+    {
+        memcpy(&byteOrderMark, data + sizeof(CACHE_MAGIC), sizeof(uint64_t));
+        memcpy(&fileKey, data + sizeof(CACHE_MAGIC) + sizeof(uint64_t), sizeof(uint64_t));
+    }
+    if (length(mappedFile) < HEADER_SIZE || memcmp(data, CACHE_MAGIC, sizeof(CACHE_MAGIC)) != 0 ||
+        byteOrderMark != BYTE_ORDER_MARK || fileKey != key)
+    {
+        seqan2::close(mappedFile);
+        return false;
+    }
+
+    ptr = data + HEADER_SIZE;
+    endPtr = data + length(mappedFile);
+    return true;
+}
+
+// ---------------------------------------------------------------------------
+// Function HaplotypeCacheReader::readNext()
+// ---------------------------------------------------------------------------
+
+bool HaplotypeCacheReader::readNext(int & rID, int & hID,
+                                    seqan2::Dna5String & seq,
+                                    std::vector<SmallVarInfo> & varInfos,
+                                    std::vector<std::pair<int, int> > & breakpoints,
+                                    PositionMap & posMap)
+{
+    if (ptr == endPtr)
+        return false;
+
+    rID = readRaw<int32_t>(ptr, endPtr);
+    hID = readRaw<int32_t>(ptr, endPtr);
+
+    // Sequence with two bits per base and its runs of Ns.
+    uint64_t len = readRaw<uint64_t>(ptr, endPtr);
+    readPairs(nRuns, ptr, endPtr);
+    uint64_t numBytes = (len + 31) / 32 * sizeof(uint64_t);
+    checkAvailable(ptr, endPtr, numBytes);
+    unpackSequence(seq, ptr, len, nRuns);
+    ptr += numBytes;
+
+    // Small variant infos and breakpoints.
+    uint64_t num = readRaw<uint64_t>(ptr, endPtr);
+    checkAvailable(ptr, endPtr, num * 3 * sizeof(int32_t));
+    varInfos.resize(num);
+    for (uint64_t i = 0; i < num; ++i)
+    {
+        varInfos[i].kind = static_cast<SmallVarInfo::Kind>(readRaw<int32_t>(ptr, endPtr));
+        varInfos[i].pos = readRaw<int32_t>(ptr, endPtr);
+        varInfos[i].count = readRaw<int32_t>(ptr, endPtr);
+    }
+    readPairs(breakpoints, ptr, endPtr);
+
+    // The PositionMap.
+    readGapAnchors(posMap.refGapAnchors, ptr, endPtr);
+    readGapAnchors(posMap.smallVarGapAnchors, ptr, endPtr);
+    num = readRaw<uint64_t>(ptr, endPtr);
+    checkAvailable(ptr, endPtr, num * 6 * sizeof(int32_t));
+    clear(posMap.svIntervals);
+    reserve(posMap.svIntervals, num, seqan2::Exact());
+    for (uint64_t i = 0; i < num; ++i)
+    {
+        GenomicInterval interval;
+        interval.svBeginPos = readRaw<int32_t>(ptr, endPtr);
+        interval.svEndPos = readRaw<int32_t>(ptr, endPtr);
+        interval.smallVarBeginPos = readRaw<int32_t>(ptr, endPtr);
+        interval.smallVarEndPos = readRaw<int32_t>(ptr, endPtr);
+        interval.strand = static_cast<char>(readRaw<int32_t>(ptr, endPtr));
+        interval.kind = static_cast<GenomicInterval::Kind>(readRaw<int32_t>(ptr, endPtr));
+        appendValue(posMap.svIntervals, interval);
+    }
+    readPairs(nRuns, ptr, endPtr);
+    posMap.svBreakpoints.clear();
+    posMap.svBreakpoints.insert(nRuns.begin(), nRuns.end());
+    posMap.buildIntervalTrees();
+
+    return true;
+}
+
+// ---------------------------------------------------------------------------
+// Function computeHaplotypeCacheKey()
+// ---------------------------------------------------------------------------
+
+bool computeHaplotypeCacheKey(uint64_t & key, char const * fastaFileName, char const * vcfFileName)
+{
+    key = mixHash(0, CACHE_VERSION);
+    if (!hashFile(key, fastaFileName))
+        return false;
+    return !*vcfFileName || hashFile(key, vcfFileName);
+}
+
+// ---------------------------------------------------------------------------
+// Function haplotypeCacheFileName()
+// ---------------------------------------------------------------------------
+
+std::string haplotypeCacheFileName(char const * cacheDir, uint64_t key)
+{
+    std::stringstream ss;
+    ss << cacheDir << "/" << std::hex << std::setw(16) << std::setfill('0') << key << ".haplotypes";
+    return ss.str();
+}
@@ -0,0 +1,301 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+// Micro-benchmarks for library functionality of the simulator: the k-way merge of the read names, the random
+// number generator engines, and the per-fragment and batched sequencing simulation.
+//
+// Usage: mason_benchmarks [NUM_RECORDS]
+// ==========================================================================
+
+#include <algorithm>
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <memory>
+#include <random>
+#include <string>
+#include <vector>
+
+#include <mason/external_split_merge.h>
+#include <mason/random.h>
+#include <mason/sequencing.h>
+
+// ==========================================================================
+// Functions
+// ==========================================================================
+
+// --------------------------------------------------------------------------
+// Function buildMergeInputs()
+// --------------------------------------------------------------------------
+
+// Distribute the read names for numRecords fragments randomly to k inputs, each input is sorted as it is the case
+// for the temporary files of the IdSplitter.
+
+void buildMergeInputs(std::vector<std::vector<std::string> > & inputs, unsigned k, unsigned numRecords)
+{
+    std::mt19937 rng(42);
+    std::uniform_int_distribution<unsigned> dist(0, k - 1);
+    inputs.assign(k, std::vector<std::string>());
+    for (unsigned i = 0; i < numRecords; ++i)
+        inputs[dist(rng)].push_back("simulated." + std::to_string(i + 1) + "/1");
+}
+
+// --------------------------------------------------------------------------
+// Function benchmarkLinearScan()
+// --------------------------------------------------------------------------
+
+// Select the next name with a linear scan over all inputs as the joiners did before.
+
+double benchmarkLinearScan(std::vector<std::vector<std::string> > const & inputs, unsigned numRecords)
+{
+    auto start = std::chrono::steady_clock::now();
+
+    std::vector<unsigned> pos(inputs.size(), 0);
+    for (unsigned r = 0; r < numRecords; ++r)
+    {
+        unsigned idx = (unsigned)-1;
+        for (unsigned i = 0; i < inputs.size(); ++i)
+        {
+            if (pos[i] == inputs[i].size())
+                continue;
+            if (idx == (unsigned)-1 || strnum_cmp(inputs[i][pos[i]].c_str(), inputs[idx][pos[idx]].c_str()) < 0)
+                idx = i;
+        }
+        ++pos[idx];
+    }
+
+    std::chrono::duration<double> elapsed = std::chrono::steady_clock::now() - start;
+    return elapsed.count();
+}
+
+// --------------------------------------------------------------------------
+// Function benchmarkLoserTree()
+// --------------------------------------------------------------------------
+
+// Select the next name with a LoserTree on NaturalNameKey objects, the keys are built when an input advances.
+
+double benchmarkLoserTree(std::vector<std::vector<std::string> > const & inputs, unsigned numRecords)
+{
+    auto start = std::chrono::steady_clock::now();
+
+    unsigned const k = inputs.size();
+    std::vector<unsigned> pos(k, 0);
+    std::vector<NaturalNameKey> keys(k);
+    for (unsigned i = 0; i < k; ++i)
+        if (!inputs[i].empty())
+            keys[i].assign(inputs[i][0].c_str());
+
+    auto beats = [&](unsigned a, unsigned b) {
+        bool activeA = pos[a] < inputs[a].size(), activeB = pos[b] < inputs[b].size();
+        if (!activeA || !activeB)
+            return activeA || (!activeB && a < b);
+        int res = compare(keys[a], keys[b]);
+        return (res < 0) || (res == 0 && a < b);
+    };
+
+    LoserTree tree;
+    tree.build(k, beats);
+    for (unsigned r = 0; r < numRecords; ++r)
+    {
+        unsigned idx = tree.winner();
+        if (++pos[idx] < inputs[idx].size())
+            keys[idx].assign(inputs[idx][pos[idx]].c_str());
+        tree.update(beats);
+    }
+
+    std::chrono::duration<double> elapsed = std::chrono::steady_clock::now() - start;
+    return elapsed.count();
+}
+
+// --------------------------------------------------------------------------
+// Function benchmarkRng()
+// --------------------------------------------------------------------------
+
+// Draw numDraws numbers in the way of the given hot loop of the simulator with MasonRng<TEngine> and return the
+// number of draws per second.
+//
+// The loops are: 0 -- raw numbers, 1 -- uniform doubles as in the per-base error decisions, 2 -- normally distributed
+// numbers as for fragment sizes and qualities, 3 -- uniform integers as for fragment positions.
+
+template <typename TEngine>
+double benchmarkRng(unsigned loop, unsigned numDraws)
+{
+    MasonRng<TEngine> rng(42);
+    std::uniform_real_distribution<double> realDist(0, 1);
+    std::normal_distribution<double> normalDist(300, 30);
+    std::uniform_int_distribution<int> intDist(0, 100 * 1000 * 1000);
+
+    auto start = std::chrono::steady_clock::now();
+
+    double sink = 0;
+    for (unsigned i = 0; i < numDraws; ++i)
+    {
+        switch (loop)
+        {
+            case 0:
+                sink += rng();
+                break;
+            case 1:
+                sink += (realDist(rng) < 0.01);
+                break;
+            case 2:
+                sink += normalDist(rng);
+                break;
+            default:
+                sink += intDist(rng);
+        }
+    }
+
+    std::chrono::duration<double> elapsed = std::chrono::steady_clock::now() - start;
+    if (sink == -1)  // keep the compiler from removing the loop
+        printf("#\n");
+    return numDraws / elapsed.count();
+}
+
+// --------------------------------------------------------------------------
+// Function printRngBenchmark()
+// --------------------------------------------------------------------------
+
+// Print a row with the million draws per second of MasonRng<TEngine> in each loop of benchmarkRng().
+
+template <typename TEngine>
+void printRngBenchmark(char const * name, unsigned numDraws)
+{
+    printf("%s", name);
+    for (unsigned loop = 0; loop < 4u; ++loop)
+        printf("\t%.1f", 1e-6 * benchmarkRng<TEngine>(loop, numDraws));
+    printf("\n");
+}
+
+// --------------------------------------------------------------------------
+// Function benchmarkSequencing()
+// --------------------------------------------------------------------------
+
+// Simulate paired-end sequencing of numFragments fragments with the given technology, one call per fragment or one
+// batch per 1000 fragments, and return the number of reads per second.
+
+double benchmarkSequencing(SequencingOptions::SequencingTechnology technology, bool batched, unsigned numFragments)
+{
+    seqan2::Dna5String contig;
+    std::mt19937 contigRng(0);
+    for (unsigned i = 0; i < 100 * 1000; ++i)
+        appendValue(contig, seqan2::Dna5(contigRng() % 4));
+
+    SequencingOptions seqOptions;
+    seqOptions.sequencingTechnology = technology;
+    seqOptions.simulateQualities = true;
+    seqOptions.simulateMatePairs = true;
+    IlluminaSequencingOptions illuminaOptions;
+    illuminaOptions.readLength = 100;
+    Roche454SequencingOptions roche454Options;
+    roche454Options.lengthModel = Roche454SequencingOptions::UNIFORM;
+    roche454Options.minReadLength = 300;
+    roche454Options.maxReadLength = 500;
+    roche454Options.k = 0.15;
+    roche454Options.backgroundNoiseMean = 0.23;
+    roche454Options.backgroundNoiseStdDev = 0.15;
+    SangerSequencingOptions sangerOptions;
+    TRng rng(42), methRng(43);
+    SequencingSimulatorFactory factory(rng, methRng, seqOptions, illuminaOptions, roche454Options, sangerOptions);
+    std::unique_ptr<SequencingSimulator> sim = factory.make();
+
+    unsigned const batchSize = 1000;
+    std::vector<TFragment> frags;
+    for (unsigned i = 0; i < batchSize; ++i)
+    {
+        unsigned beginPos = (i * 97) % (length(contig) - 1000);
+        frags.push_back(infix(contig, beginPos, beginPos + 1000));
+    }
+    SequencingReadBatch batch;
+    batch.resize(2 * batchSize);
+
+    auto start = std::chrono::steady_clock::now();
+
+    for (unsigned done = 0; done < numFragments; done += batchSize)
+    {
+        if (batched)
+            sim->simulateReads(batch, frags, 0, batchSize, 0);
+        else
+            for (unsigned i = 0; i < batchSize; ++i)
+                sim->simulatePairedEnd(batch.seqs[2 * i], batch.quals[2 * i], batch.infos[2 * i],
+                                       batch.seqs[2 * i + 1], batch.quals[2 * i + 1], batch.infos[2 * i + 1],
+                                       frags[i]);
+    }
+
+    std::chrono::duration<double> elapsed = std::chrono::steady_clock::now() - start;
+    return 2.0 * ((numFragments + batchSize - 1) / batchSize * batchSize) / elapsed.count();
+}
+
+// --------------------------------------------------------------------------
+// Function main()
+// --------------------------------------------------------------------------
+
+int main(int argc, char const ** argv)
+{
+    unsigned numRecords = (argc > 1) ? atoi(argv[1]) : 1000 * 1000;
+
+    printf("# k-way merge of %u read names\n", numRecords);
+    printf("inputs\tlinear_ns_per_record\tloser_tree_ns_per_record\n");
+    unsigned const ks[] = {10, 100, 1000, 10 * 1000, 100 * 1000};
+    for (unsigned k : ks)
+    {
+        std::vector<std::vector<std::string> > inputs;
+        buildMergeInputs(inputs, k, numRecords);
+
+        // The linear scan is quadratic, limit the number of records such that it finishes in reasonable time.
+        unsigned linearRecords = std::min(numRecords, std::max(1000u, 200u * 1000 * 1000 / k / 10));
+        double linear = benchmarkLinearScan(inputs, linearRecords);
+        double tree = benchmarkLoserTree(inputs, numRecords);
+        printf("%u\t%.1f\t%.1f\n", k, 1e9 * linear / linearRecords, 1e9 * tree / numRecords);
+    }
+
+    unsigned numDraws = 10 * numRecords;
+    printf("\n# random number generation, %u draws per engine and loop, million draws per second\n", numDraws);
+    printf("engine\traw\tuniform_real\tnormal\tuniform_int\n");
+    printRngBenchmark<std::mt19937>("mt19937", numDraws);
+    printRngBenchmark<Xoshiro256pp>("xoshiro256pp", numDraws);
+    printRngBenchmark<Pcg64>("pcg64", numDraws);
+
+    unsigned numFragments = numRecords / 10;
+    printf("\n# paired-end sequencing of %u fragments, thousand reads per second\n", numFragments);
+    printf("technology\tper_fragment\tbatched\n");
+    SequencingOptions::SequencingTechnology const technologies[] = {
+        SequencingOptions::ILLUMINA, SequencingOptions::ROCHE_454, SequencingOptions::SANGER
+    };
+    for (SequencingOptions::SequencingTechnology technology : technologies)
+        printf("%s\t%.1f\t%.1f\n", getSequencingTechnologyStr(technology),
+               1e-3 * benchmarkSequencing(technology, false, numFragments),
+               1e-3 * benchmarkSequencing(technology, true, numFragments));
+
+    return 0;
+}
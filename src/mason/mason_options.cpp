@@ -34,6 +34,8 @@
 
 #include <mason/mason_options.h>
 
+#include <cstdio>
+
 // ----------------------------------------------------------------------------
 // Function getYesNoStr()
 // ----------------------------------------------------------------------------
@@ -157,6 +159,159 @@ char const * getFragmentSizeModelStr(Roche454SequencingOptions::ReadLengthModel
     }
 }
 
+// ----------------------------------------------------------------------------
+// Function getRngEngineStr()
+// ----------------------------------------------------------------------------
+
+char const * getRngEngineStr()
+{
+    if (std::is_same<TRngEngine, Xoshiro256pp>::value)
+        return "XOSHIRO256PP";
+    if (std::is_same<TRngEngine, Pcg64>::value)
+        return "PCG64";
+    return "MT19937";
+}
+
+// ----------------------------------------------------------------------------
+// Function getRngModeStr()
+// ----------------------------------------------------------------------------
+
+char const * getRngModeStr(MasonSimulatorOptions::RngMode mode)
+{
+    switch (mode)
+    {
+        case MasonSimulatorOptions::THREAD_RNG:
+            return "THREAD";
+        case MasonSimulatorOptions::FRAGMENT_RNG:
+            return "FRAGMENT";
+        default:
+            return "<invalid>";
+    }
+}
+
+// ----------------------------------------------------------------------------
+// Function getSchedulingStr()
+// ----------------------------------------------------------------------------
+
+char const * getSchedulingStr(MasonSimulatorOptions::Scheduling scheduling)
+{
+    switch (scheduling)
+    {
+        case MasonSimulatorOptions::STATIC_SCHEDULING:
+            return "STATIC";
+        case MasonSimulatorOptions::DYNAMIC_SCHEDULING:
+            return "DYNAMIC";
+        default:
+            return "<invalid>";
+    }
+}
+
+// ----------------------------------------------------------------------------
+// Function getAlignmentModeStr()
+// ----------------------------------------------------------------------------
+
+char const * getAlignmentModeStr(MasonSimulatorOptions::AlignmentMode mode)
+{
+    switch (mode)
+    {
+        case MasonSimulatorOptions::REALIGN:
+            return "REALIGN";
+        case MasonSimulatorOptions::TRACE:
+            return "TRACE";
+        case MasonSimulatorOptions::CHECK:
+            return "CHECK";
+        default:
+            return "<invalid>";
+    }
+}
+
+// ----------------------------------------------------------------------------
+// Function getFragmentAllocationStr()
+// ----------------------------------------------------------------------------
+
+char const * getFragmentAllocationStr(MasonSimulatorOptions::FragmentAllocation allocation)
+{
+    switch (allocation)
+    {
+        case MasonSimulatorOptions::PICK_ALLOCATION:
+            return "PICK";
+        case MasonSimulatorOptions::MULTINOMIAL_ALLOCATION:
+            return "MULTINOMIAL";
+        default:
+            return "<invalid>";
+    }
+}
+
+// ----------------------------------------------------------------------------
+// Function getFragmentPlacementStr()
+// ----------------------------------------------------------------------------
+
+char const * getFragmentPlacementStr(MasonSimulatorOptions::FragmentPlacement placement)
+{
+    switch (placement)
+    {
+        case MasonSimulatorOptions::REJECTION_PLACEMENT:
+            return "REJECTION";
+        case MasonSimulatorOptions::INDEX_PLACEMENT:
+            return "INDEX";
+        default:
+            return "<invalid>";
+    }
+}
+
+// ----------------------------------------------------------------------------
+// Function getOutputModeStr()
+// ----------------------------------------------------------------------------
+
+char const * getOutputModeStr(MasonSimulatorOptions::OutputMode mode)
+{
+    switch (mode)
+    {
+        case MasonSimulatorOptions::JOIN:
+            return "JOIN";
+        case MasonSimulatorOptions::STREAM:
+            return "STREAM";
+        default:
+            return "<invalid>";
+    }
+}
+
+// ----------------------------------------------------------------------------
+// Function getTempFormatStr()
+// ----------------------------------------------------------------------------
+
+char const * getTempFormatStr(MasonSimulatorOptions::TempFormat format)
+{
+    switch (format)
+    {
+        case MasonSimulatorOptions::TEXT:
+            return "TEXT";
+        case MasonSimulatorOptions::BINARY:
+            return "BINARY";
+        default:
+            return "<invalid>";
+    }
+}
+
+// ----------------------------------------------------------------------------
+// Function getTempCompressionStr()
+// ----------------------------------------------------------------------------
+
+char const * getTempCompressionStr(MasonSimulatorOptions::TempCompression compression)
+{
+    switch (compression)
+    {
+        case MasonSimulatorOptions::NO_COMPRESSION:
+            return "NONE";
+        case MasonSimulatorOptions::FAST_COMPRESSION:
+            return "FAST";
+        case MasonSimulatorOptions::BEST_COMPRESSION:
+            return "BEST";
+        default:
+            return "<invalid>";
+    }
+}
+
 // ----------------------------------------------------------------------------
 // Function getBSSeqProtocolStr()
 // ----------------------------------------------------------------------------
@@ -346,6 +501,11 @@ void MaterializerOptions::addOptions(seqan2::ArgumentParser & parser) const
     addOption(parser, seqan2::ArgParseOption("iv", "input-vcf", "Path to the VCF file with variants to apply.",
                                             seqan2::ArgParseOption::INPUT_FILE, "IN.vcf"));
     setValidValues(parser, "input-vcf", seqan2::VcfFileIn::getFileExtensions());
+
+    addOption(parser, seqan2::ArgParseOption("", "packed-reference", "Load the reference contigs from the "
+                                            "memory-mapped file \\fIREF\\fP.packed with two bits per base and the "
+                                            "runs of Ns from \\fIREF\\fP.packed.nmask.  Both files are created next "
+                                            "to the reference if they do not exist or do not match it."));
 }
 
 // ----------------------------------------------------------------------------
@@ -376,6 +536,7 @@ void MaterializerOptions::getOptionValues(seqan2::ArgumentParser const & parser)
 {
     getOptionValue(fastaFileName, parser, "input-reference");
     getOptionValue(vcfFileName, parser, "input-vcf");
+    getOptionValue(usePackedReference, parser, "packed-reference");
 }
 
 // ----------------------------------------------------------------------------
@@ -387,7 +548,8 @@ void MaterializerOptions::print(std::ostream & out) const
     out << "MATERIALIZER OPTIONS\n"
         << "  VERBOSITY         \t" << getVerbosityStr(verbosity) << "\n"
         << "  REFERENCE FASTA   \t" << fastaFileName << "\n"
-        << "  VARIANTS VCF      \t" << vcfFileName << "\n";
+        << "  VARIANTS VCF      \t" << vcfFileName << "\n"
+        << "  PACKED REFERENCE  \t" << getYesNoStr(usePackedReference) << "\n";
 }
 
 // ----------------------------------------------------------------------------
@@ -497,6 +659,11 @@ void SequencingOptions::addOptions(seqan2::ArgumentParser & parser) const
 
     addOption(parser, seqan2::ArgParseOption("", "embed-read-info", "Whether or not to embed read information."));
 
+    addOption(parser, seqan2::ArgParseOption("", "seq-quality-tables", "Sample the Illumina base qualities from "
+                                            "tables precomputed for each cycle and the Sanger base qualities from "
+                                            "batched normal random numbers.  The quality distribution is the same "
+                                            "but the qualities differ from the ones simulated without this flag."));
+
     addOption(parser, seqan2::ArgParseOption("", "read-name-prefix", "Read names will have this prefix.",
                                             seqan2::ArgParseOption::STRING, "STR"));
     setDefaultValue(parser, "read-name-prefix", "simulated.");
@@ -570,6 +737,7 @@ void SequencingOptions::getOptionValues(seqan2::ArgumentParser const & parser)
         sequencingTechnology = SequencingOptions::SANGER;
 
     getOptionValue(embedReadInfo, parser, "embed-read-info");
+    getOptionValue(qualityTables, parser, "seq-quality-tables");
     getOptionValue(readNamePrefix, parser, "read-name-prefix");
 
     // Get option values for nested options.
@@ -588,6 +756,7 @@ void SequencingOptions::print(std::ostream & out) const
         << "  MATE ORIENTATION   \t" << getMateOrientationStr(mateOrientation) << "\n"
         << "  SOURCE STRANDS     \t" << getSourceStrandsStr(strands) << "\n"
         << "  SEQUENCING TECH    \t" << getSequencingTechnologyStr(sequencingTechnology) << "\n"
+        << "  QUALITY TABLES     \t" << getYesNoStr(qualityTables) << "\n"
         << "\n";
 
     // Print options for nested options.
@@ -662,6 +831,12 @@ void IlluminaSequencingOptions::addOptions(seqan2::ArgumentParser & parser) cons
     setMaxValue(parser, "illumina-position-raise", "1.0");
     setDefaultValue(parser, "illumina-position-raise", "0.66");
 
+    addOption(parser, seqan2::ArgParseOption("", "illumina-skip-ahead-errors",
+                                            "Sample the distance to the next sequencing error from the positional "
+                                            "error profile instead of drawing a random number for each base.  The "
+                                            "error distribution is the same but the reads differ from the ones "
+                                            "simulated without this flag."));
+
     addOption(parser, seqan2::ArgParseOption("", "illumina-quality-mean-begin",
                                             "Mean PHRED quality for non-mismatch bases of first base in Illumina sequencing.",
                                             seqan2::ArgParseOption::DOUBLE, "QUAL"));
@@ -711,6 +886,11 @@ void IlluminaSequencingOptions::addOptions(seqan2::ArgumentParser & parser) cons
                                             "FASTQ file to use for a template for right-end reads.",
                                             seqan2::ArgParseOption::INPUT_FILE, "IN.fq"));
     setValidValues(parser, "illumina-right-template-fastq", seqan2::SeqFileIn::getFileExtensions());
+
+    addOption(parser, seqan2::ArgParseOption("", "illumina-model-file",
+                                            "Error and quality model file written by mason_train_model.  Used "
+                                            "instead of the template FASTQ files.",
+                                            seqan2::ArgParseOption::INPUT_FILE, "IN.model"));
 }
 
 // ----------------------------------------------------------------------------
@@ -739,6 +919,7 @@ void IlluminaSequencingOptions::getOptionValues(seqan2::ArgumentParser const & p
     getOptionValue(probabilityMismatchBegin, parser, "illumina-prob-mismatch-begin");
     getOptionValue(probabilityMismatchEnd, parser, "illumina-prob-mismatch-end");
     getOptionValue(positionRaise, parser, "illumina-position-raise");
+    skipAheadErrors = isSet(parser, "illumina-skip-ahead-errors");
 
     getOptionValue(meanQualityBegin, parser, "illumina-quality-mean-begin");
     getOptionValue(meanQualityEnd, parser, "illumina-quality-mean-end");
@@ -752,6 +933,7 @@ void IlluminaSequencingOptions::getOptionValues(seqan2::ArgumentParser const & p
 
     getOptionValue(leftTemplateFastq, parser, "illumina-left-template-fastq");
     getOptionValue(rightTemplateFastq, parser, "illumina-right-template-fastq");
+    getOptionValue(modelFile, parser, "illumina-model-file");
 }
 // ----------------------------------------------------------------------------
 // Function IlluminaSequencingOptions::print()
@@ -771,6 +953,7 @@ void IlluminaSequencingOptions::print(std::ostream & out) const
         << "  PROBABILITY MISMATCH BEGIN   \t" << probabilityMismatchBegin << "\n"
         << "  PROBABILITY MISMATCH END     \t" << probabilityMismatchEnd << "\n"
         << "  MISMATCH RAISE POINT         \t" << positionRaise << "\n"
+        << "  SKIP AHEAD ERRORS            \t" << getYesNoStr(skipAheadErrors) << "\n"
         << "\n"
         << "  MEAN QUALITY BEGIN           \t" << meanQualityBegin << "\n"
         << "  MEAN QUALITY END             \t" << meanQualityEnd << "\n"
@@ -783,7 +966,8 @@ void IlluminaSequencingOptions::print(std::ostream & out) const
         << "  STDDEV MISMATCH QUALITY END  \t" << stdDevMismatchQualityEnd << "\n"
         << "\n"
         << "  LEFT TEMPLATE FASTQ          \t" << leftTemplateFastq << "\n"
-        << "  RIGHT TEMPLATE FASTQ         \t" << rightTemplateFastq << "\n";
+        << "  RIGHT TEMPLATE FASTQ         \t" << rightTemplateFastq << "\n"
+        << "  MODEL FILE                   \t" << modelFile << "\n";
 }
 
 // ----------------------------------------------------------------------------
@@ -1074,6 +1258,40 @@ void Roche454SequencingOptions::print(std::ostream & out) const
         << "  STDDEV READ LENGTH\t" << stdDevReadLength << "\n";
 }
 
+// ----------------------------------------------------------------------------
+// Function RunStatsOptions::addOptions()
+// ----------------------------------------------------------------------------
+
+void RunStatsOptions::addOptions(seqan2::ArgumentParser & parser) const
+{
+    addSection(parser, "Run Statistics");
+
+    addOption(parser, seqan2::ArgParseOption("", "stats-json", "Write the wall and CPU time of the phases of the run, "
+                                            "throughput, bytes read and written, and peak memory usage to this JSON "
+                                            "file.  mason_simulator also writes the busy and idle time of each "
+                                            "simulation thread.", seqan2::ArgParseOption::OUTPUT_FILE, "FILE"));
+    setValidValues(parser, "stats-json", "json");
+}
+
+// ----------------------------------------------------------------------------
+// Function RunStatsOptions::getOptionValues()
+// ----------------------------------------------------------------------------
+
+void RunStatsOptions::getOptionValues(seqan2::ArgumentParser const & parser)
+{
+    getOptionValue(statsJsonFile, parser, "stats-json");
+}
+
+// ----------------------------------------------------------------------------
+// Function RunStatsOptions::print()
+// ----------------------------------------------------------------------------
+
+void RunStatsOptions::print(std::ostream & out) const
+{
+    out << "RUN STATISTICS OPTIONS\n"
+        << "  STATS JSON\t" << statsJsonFile << "\n";
+}
+
 // ----------------------------------------------------------------------------
 // Function MasonSimulatorOptions::addOptions()
 // ----------------------------------------------------------------------------
@@ -1098,6 +1316,16 @@ void MasonSimulatorOptions::addOptions(seqan2::ArgumentParser & parser) const
                                             seqan2::ArgParseOption::INTEGER, "NUM"));
     setDefaultValue(parser, "seed-spacing", "2048");
 
+    addOption(parser, seqan2::ArgParseOption("", "rng-mode", "How the simulation threads draw random numbers.  "
+                                            "\\fIthread\\fP uses one generator per thread, seeded using "
+                                            "\\fB--seed-spacing\\fP, such that the output depends on the number "
+                                            "of threads and the chunk size.  \\fIfragment\\fP uses a counter-based "
+                                            "generator keyed on seed, contig, haplotype, and fragment id, such that "
+                                            "the output is the same for all numbers of threads and chunk sizes.",
+                                            seqan2::ArgParseOption::STRING, "MODE"));
+    setValidValues(parser, "rng-mode", "thread fragment");
+    setDefaultValue(parser, "rng-mode", "thread");
+
     addOption(parser, seqan2::ArgParseOption("", "num-threads", "Number of threads to use.",
                                             seqan2::ArgParseOption::INTEGER, "NUM"));
     setMinValue(parser, "num-threads", "1");
@@ -1111,6 +1339,110 @@ void MasonSimulatorOptions::addOptions(seqan2::ArgumentParser & parser) const
     setMinValue(parser, "chunk-size", "65536");
     setDefaultValue(parser, "chunk-size", "65536");
 
+    addOption(parser, seqan2::ArgParseOption("", "scheduling", "How the fragments are distributed to the threads.  "
+                                            "\\fIstatic\\fP gives one chunk to each thread and waits for the "
+                                            "slowest one.  With \\fIdynamic\\fP, idle threads pull batches of "
+                                            "\\fB--batch-size\\fP fragments, the reads are written in the order "
+                                            "of the batches while the other threads continue simulating.  "
+                                            "\\fIdynamic\\fP implies \\fB--rng-mode\\fP "
+                                            "\\fIfragment\\fP such that the output does not depend on which "
+                                            "thread simulated which batch.", seqan2::ArgParseOption::STRING, "METHOD"));
+    setValidValues(parser, "scheduling", "static dynamic");
+    setDefaultValue(parser, "scheduling", "static");
+
+    addOption(parser, seqan2::ArgParseOption("", "batch-size", "Number of fragments in one batch for "
+                                            "\\fB--scheduling\\fP \\fIdynamic\\fP.",
+                                            seqan2::ArgParseOption::INTEGER, "NUM"));
+    setMinValue(parser, "batch-size", "1");
+    setDefaultValue(parser, "batch-size", "1024");
+
+    addOption(parser, seqan2::ArgParseOption("", "prefetch-haplotypes", "Number of contig haplotypes to materialize in "
+                                            "a background thread while reads are simulated from the current one.  "
+                                            "Each of them is kept in memory.  Use 0 for materializing haplotypes "
+                                            "in turn with the simulation.", seqan2::ArgParseOption::INTEGER, "NUM"));
+    setMinValue(parser, "prefetch-haplotypes", "0");
+    setDefaultValue(parser, "prefetch-haplotypes", "0");
+
+    addOption(parser, seqan2::ArgParseOption("", "writer-queue", "Number of simulated per-thread chunks that can wait "
+                                            "for being written to the temporary files by a background thread, such "
+                                            "that writing overlaps with the simulation of the next chunk.  Use 0 for "
+                                            "writing chunks in turn with the simulation.",
+                                            seqan2::ArgParseOption::INTEGER, "NUM"));
+    setMinValue(parser, "writer-queue", "0");
+    setDefaultValue(parser, "writer-queue", "0");
+
+    addOption(parser, seqan2::ArgParseOption("", "io-threads", "Number of threads for compressing BAM and "
+                                            "gzip-compressed FASTA/FASTQ output in independent BGZF blocks, "
+                                            "independent of \\fB--num-threads\\fP.  Use 0 for the default "
+                                            "writers.", seqan2::ArgParseOption::INTEGER, "NUM"));
+    setMinValue(parser, "io-threads", "0");
+    setDefaultValue(parser, "io-threads", "0");
+
+    addOption(parser, seqan2::ArgParseOption("", "fragment-allocation", "How the fragments are distributed to the "
+                                            "contigs/haplotypes.  \\fIpick\\fP draws the contig/haplotype for each "
+                                            "fragment and stores the ids in temporary files.  \\fImultinomial\\fP "
+                                            "draws the number of fragments for all contigs/haplotypes at once and "
+                                            "computes their ids from a pseudorandom permutation, which is much "
+                                            "faster for many contigs.", seqan2::ArgParseOption::STRING, "METHOD"));
+    setValidValues(parser, "fragment-allocation", "pick multinomial");
+    setDefaultValue(parser, "fragment-allocation", "pick");
+
+    addOption(parser, seqan2::ArgParseOption("", "fragment-placement", "How fragment positions that do not overlap "
+                                            "with runs of Ns are sampled.  \\fIrejection\\fP draws length and "
+                                            "position again on overlap.  \\fIindex\\fP draws the position from an "
+                                            "index of the valid start positions for the drawn length, built once per "
+                                            "contig, such that only lengths longer than all N-free segments are "
+                                            "drawn again.", seqan2::ArgParseOption::STRING, "METHOD"));
+    setValidValues(parser, "fragment-placement", "rejection index");
+    setDefaultValue(parser, "fragment-placement", "rejection");
+
+    addOption(parser, seqan2::ArgParseOption("", "gap-index", "Load the runs of Ns of the reference contigs from the "
+                                            "file \\fIREF\\fP.gaps next to the reference and create it if it does "
+                                            "not exist or does not match the reference.  Only used without "
+                                            "\\fB--input-vcf\\fP, otherwise the runs of Ns are computed for each "
+                                            "haplotype."));
+
+    addOption(parser, seqan2::ArgParseOption("", "haplotype-cache", "Directory for caching the materialized "
+                                            "haplotypes.  The haplotypes are read from the cache file for the "
+                                            "content of the reference and \\fB--input-vcf\\fP if it exists and "
+                                            "written to it otherwise.  Not used with \\fB--enable-bs-seq\\fP since "
+                                            "the methylation levels are not cached.",
+                                            seqan2::ArgParseOption::STRING, "DIR"));
+
+    addOption(parser, seqan2::ArgParseOption("", "shard", "Only simulate the reads of the contig/haplotype pairs in "
+                                            "shard \\fII\\fP of \\fIN\\fP, for splitting a simulation across "
+                                            "processes or nodes.  The pairs are assigned to the shards by their "
+                                            "length, the fragments and their ids are the same as without sharding.  "
+                                            "Implies \\fB--rng-mode\\fP \\fIfragment\\fP.  The output files "
+                                            "of all shards can be merged with \\fBmason_merge_shards\\fP into "
+                                            "the output of a single run.", seqan2::ArgParseOption::STRING, "I/N"));
+    setDefaultValue(parser, "shard", "1/1");
+
+    addOption(parser, seqan2::ArgParseOption("", "output-mode", "How the reads are brought into the order of their "
+                                            "ids.  \\fIjoin\\fP distributes the fragment ids randomly to the "
+                                            "contigs/haplotypes, writes the reads to temporary files, and joins them "
+                                            "by id.  \\fIstream\\fP assigns a contiguous range of ids to each "
+                                            "contig/haplotype and writes the reads in id order directly to the "
+                                            "output files without temporary files, such that the output can be a "
+                                            "FIFO.", seqan2::ArgParseOption::STRING, "MODE"));
+    setValidValues(parser, "output-mode", "join stream");
+    setDefaultValue(parser, "output-mode", "join");
+
+    addOption(parser, seqan2::ArgParseOption("", "temp-format", "Format of the temporary files the simulated reads "
+                                            "and alignments are written to before they are joined by fragment id.  "
+                                            "\\fItext\\fP uses FASTQ and SAM, \\fIbinary\\fP uses a compact "
+                                            "record format with packed bases and BAM-encoded alignments that is "
+                                            "faster to join.", seqan2::ArgParseOption::STRING, "FORMAT"));
+    setValidValues(parser, "temp-format", "text binary");
+    setDefaultValue(parser, "temp-format", "text");
+
+    addOption(parser, seqan2::ArgParseOption("", "temp-compression", "Compress the temporary files in blocks with zlib "
+                                            "using \\fB--num-threads\\fP threads.  Implies \\fB--temp-format\\fP "
+                                            "\\fIbinary\\fP unless \\fInone\\fP.",
+                                            seqan2::ArgParseOption::STRING, "LEVEL"));
+    setValidValues(parser, "temp-compression", "none fast best");
+    setDefaultValue(parser, "temp-compression", "none");
+
     addOption(parser, seqan2::ArgParseOption("n", "num-fragments", "Number of reads/pairs to simulate.",
                                             seqan2::ArgParseOption::INTEGER, "NUM"));
     setRequired(parser, "num-fragments");
@@ -1133,6 +1465,15 @@ void MasonSimulatorOptions::addOptions(seqan2::ArgumentParser & parser) const
                                             seqan2::ArgParseOption::OUTPUT_FILE, "OUT"));
     setValidValues(parser, "out-alignment", seqan2::BamFileOut::getFileExtensions());
 
+    addOption(parser, seqan2::ArgParseOption("", "alignment-mode", "How to compute CIGAR string, MD string, and edit "
+                                            "distance of the alignments.  \\fIrealign\\fP aligns each read against "
+                                            "the original reference, \\fItrace\\fP derives them from the simulated "
+                                            "errors and variants, \\fIcheck\\fP computes both and reports the "
+                                            "number of differences.",
+                                            seqan2::ArgParseOption::STRING, "MODE"));
+    setValidValues(parser, "alignment-mode", "realign trace check");
+    setDefaultValue(parser, "alignment-mode", "realign");
+
     // Add options of the component options.
     matOptions.addOptions(parser);
     methOptions.addOptions(parser);
@@ -1141,6 +1482,7 @@ void MasonSimulatorOptions::addOptions(seqan2::ArgumentParser & parser) const
     illuminaOptions.addOptions(parser);
     sangerOptions.addOptions(parser);
     rocheOptions.addOptions(parser);
+    statsOptions.addOptions(parser);
 }
 
 // ----------------------------------------------------------------------------
@@ -1219,18 +1561,66 @@ void MasonSimulatorOptions::getOptionValues(seqan2::ArgumentParser const & parse
     getOptionValue(seed, parser, "seed");
     getOptionValue(methSeed, parser, "meth-seed");
     getOptionValue(seedSpacing, parser, "seed-spacing");
+    seqan2::CharString rngModeStr;
+    getOptionValue(rngModeStr, parser, "rng-mode");
+    rngMode = (rngModeStr == "fragment") ? FRAGMENT_RNG : THREAD_RNG;
 #if SEQAN_HAS_OPENMP
     getOptionValue(numThreads, parser, "num-threads");
 #else  // #if SEQAN_HAS_OPENMP
     numThreads = 1;
 #endif  // #if SEQAN_HAS_OPENMP
     getOptionValue(chunkSize, parser, "chunk-size");
+    seqan2::CharString schedulingStr;
+    getOptionValue(schedulingStr, parser, "scheduling");
+    scheduling = (schedulingStr == "dynamic") ? DYNAMIC_SCHEDULING : STATIC_SCHEDULING;
+    if (scheduling == DYNAMIC_SCHEDULING)
+        rngMode = FRAGMENT_RNG;  // the batches are simulated by arbitrary threads
+    getOptionValue(batchSize, parser, "batch-size");
+    getOptionValue(prefetchHaplotypes, parser, "prefetch-haplotypes");
+    getOptionValue(writerQueueSize, parser, "writer-queue");
+    getOptionValue(ioThreads, parser, "io-threads");
     getOptionValue(numFragments, parser, "num-fragments");
     getOptionValue(forceSingleEnd, parser, "force-single-end");
     getOptionValue(methFastaInFile, parser, "meth-fasta-in");
     getOptionValue(outFileNameLeft, parser, "out");
     getOptionValue(outFileNameRight, parser, "out-right");
     getOptionValue(outFileNameSam, parser, "out-alignment");
+    seqan2::CharString tmp;
+    getOptionValue(tmp, parser, "fragment-allocation");
+    fragmentAllocation = (tmp == "multinomial") ? MULTINOMIAL_ALLOCATION : PICK_ALLOCATION;
+    getOptionValue(tmp, parser, "fragment-placement");
+    fragmentPlacement = (tmp == "index") ? INDEX_PLACEMENT : REJECTION_PLACEMENT;
+    getOptionValue(useGapIndex, parser, "gap-index");
+    getOptionValue(haplotypeCacheDir, parser, "haplotype-cache");
+    getOptionValue(tmp, parser, "shard");
+    int shardNo = 0;
+    char trailing = 0;
+    if (std::sscanf(toCString(tmp), "%d/%d%c", &shardNo, &numShards, &trailing) != 2 || shardNo < 1 ||
+        shardNo > numShards)
+        numShards = 0;  // rejected in parseCommandLine()
+    shardIndex = shardNo - 1;
+    if (numShards > 1)
+        rngMode = FRAGMENT_RNG;  // the reads of a pair must not depend on the pairs simulated before
+    getOptionValue(tmp, parser, "output-mode");
+    outputMode = (tmp == "stream") ? STREAM : JOIN;
+    getOptionValue(tmp, parser, "temp-format");
+    tempFormat = (tmp == "binary") ? BINARY : TEXT;
+    getOptionValue(tmp, parser, "temp-compression");
+    if (tmp == "fast")
+        tempCompression = FAST_COMPRESSION;
+    else if (tmp == "best")
+        tempCompression = BEST_COMPRESSION;
+    else
+        tempCompression = NO_COMPRESSION;
+    if (tempCompression != NO_COMPRESSION)
+        tempFormat = BINARY;  // only the binary records are read through the block decompression
+    getOptionValue(tmp, parser, "alignment-mode");
+    if (tmp == "trace")
+        alignmentMode = TRACE;
+    else if (tmp == "check")
+        alignmentMode = CHECK;
+    else
+        alignmentMode = REALIGN;
 
     // Get options for the other components that we use.
     methOptions.getOptionValues(parser);
@@ -1240,6 +1630,7 @@ void MasonSimulatorOptions::getOptionValues(seqan2::ArgumentParser const & parse
     illuminaOptions.getOptionValues(parser);
     sangerOptions.getOptionValues(parser);
     rocheOptions.getOptionValues(parser);
+    statsOptions.getOptionValues(parser);
 
     // Copy in the verbosity flag into the component options.
     matOptions.verbosity = verbosity;
@@ -1251,7 +1642,8 @@ void MasonSimulatorOptions::getOptionValues(seqan2::ArgumentParser const & parse
     rocheOptions.verbosity = verbosity;
 
     // Configure simulation of pairs and mates depending on output files.
-    seqOptions.simulateQualities = (endsWith(outFileNameLeft, ".fastq") || endsWith(outFileNameLeft, ".fq"));
+    seqOptions.simulateQualities = (endsWith(outFileNameLeft, ".fastq") || endsWith(outFileNameLeft, ".fq") ||
+                                    endsWith(outFileNameLeft, ".fastq.gz") || endsWith(outFileNameLeft, ".fq.gz"));
     seqOptions.simulateMatePairs = !forceSingleEnd && !empty(outFileNameRight);
     methOptions.simulateMethylationLevels = !empty(methFastaInFile);
 }
@@ -1270,17 +1662,32 @@ void MasonSimulatorOptions::print(std::ostream & out) const
         << "SEED\t" << seed << "\n"
         << "METHYLATION SEED\t" << methSeed << "\n"
         << "SEED SPACING\t" << seedSpacing << "\n"
+        << "RNG MODE\t" << getRngModeStr(rngMode) << "\n"
         << "\n"
         << "FORCE SINGLE END\t" << getYesNoStr(forceSingleEnd) << "\n"
         << "NUM FRAGMENTS\t" << numFragments << "\n"
         << "\n"
         << "NUM THREADS\t" << numThreads << "\n"
         << "CHUNK SIZE\t" << chunkSize << "\n"
+        << "SCHEDULING\t" << getSchedulingStr(scheduling) << "\n"
+        << "BATCH SIZE\t" << batchSize << "\n"
+        << "PREFETCH HAPLOTYPES\t" << prefetchHaplotypes << "\n"
+        << "WRITER QUEUE\t" << writerQueueSize << "\n"
+        << "IO THREADS\t" << ioThreads << "\n"
+        << "FRAGMENT ALLOCATION\t" << getFragmentAllocationStr(fragmentAllocation) << "\n"
+        << "FRAGMENT PLACEMENT\t" << getFragmentPlacementStr(fragmentPlacement) << "\n"
+        << "GAP INDEX\t" << getYesNoStr(useGapIndex) << "\n"
+        << "HAPLOTYPE CACHE\t" << haplotypeCacheDir << "\n"
+        << "SHARD\t" << (shardIndex + 1) << "/" << numShards << "\n"
+        << "OUTPUT MODE\t" << getOutputModeStr(outputMode) << "\n"
+        << "TEMP FORMAT\t" << getTempFormatStr(tempFormat) << "\n"
+        << "TEMP COMPRESSION\t" << getTempCompressionStr(tempCompression) << "\n"
         << "\n"
         << "METHYLATION FASTA IN\t" << methFastaInFile << "\n"
         << "OUTPUT FILE LEFT\t" << outFileNameLeft << "\n"
         << "OUTPUT FILE RIGHT\t" << outFileNameRight << "\n"
         << "PAIRED END SIMULATION\t" << getYesNoStr(!forceSingleEnd && !empty(outFileNameRight)) << "\n"
+        << "ALIGNMENT MODE\t" << getAlignmentModeStr(alignmentMode) << "\n"
         << "\n";
     matOptions.print(out);
     out << "\n";
@@ -1295,6 +1702,11 @@ void MasonSimulatorOptions::print(std::ostream & out) const
     sangerOptions.print(out);
     out << "\n";
     rocheOptions.print(out);
+    out << "\n";
+    statsOptions.print(out);
+    out << "\n"
+        << "RANDOM NUMBER GENERATOR OPTIONS\n"
+        << "  RNG ENGINE\t" << getRngEngineStr() << "\n";
 }
 
 // ----------------------------------------------------------------------------
@@ -1339,9 +1751,16 @@ void MasonMaterializerOptions::addOptions(seqan2::ArgumentParser & parser) const
                                             seqan2::ArgParseOption::OUTPUT_FILE, "OUT"));
     setValidValues(parser, "meth-fasta-out", seqan2::SeqFileOut::getFileExtensions());
 
+    addOption(parser, seqan2::ArgParseOption("", "io-threads", "Number of threads for compressing gzip-compressed "
+                                            "output in independent blocks.  Use 0 for the default writer.",
+                                            seqan2::ArgParseOption::INTEGER, "NUM"));
+    setMinValue(parser, "io-threads", "0");
+    setDefaultValue(parser, "io-threads", "0");
+
     // Add options of the component options.
     matOptions.addOptions(parser);
     methOptions.addOptions(parser);
+    statsOptions.addOptions(parser);
 }
 
 // ----------------------------------------------------------------------------
@@ -1375,10 +1794,12 @@ void MasonMaterializerOptions::getOptionValues(seqan2::ArgumentParser const & pa
     getOptionValue(haplotypeNameSep, parser, "haplotype-name-sep");
     getOptionValue(methFastaInFile, parser, "meth-fasta-in");
     getOptionValue(methFastaOutFile, parser, "meth-fasta-out");
+    getOptionValue(ioThreads, parser, "io-threads");
 
     // Get options for the other components that we use.
     matOptions.getOptionValues(parser);
     methOptions.getOptionValues(parser);
+    statsOptions.getOptionValues(parser);
 
     // Copy in the verbosity flag into the component options.
     matOptions.verbosity = verbosity;
@@ -1406,6 +1827,7 @@ void MasonMaterializerOptions::print(std::ostream & out) const
         << "BREAKPOINT TSV OUT      \t" << outputBreakpointFile << "\n"
         << "METHYLATION LEVEL INPUT \t" << methFastaInFile << "\n"
         << "METHYLATION LEVEL OUTPUT\t" << methFastaOutFile << "\n"
+        << "IO THREADS              \t" << ioThreads << "\n"
         << "\n"
         << "HAPLOTYPE NAME SEP      \t" << haplotypeNameSep << "\n"
         << "\n";
@@ -1413,6 +1835,11 @@ void MasonMaterializerOptions::print(std::ostream & out) const
     out << "\n";
     methOptions.print(out);
     out << "\n";
+    statsOptions.print(out);
+    out << "\n"
+        << "RANDOM NUMBER GENERATOR OPTIONS\n"
+        << "  RNG ENGINE\t" << getRngEngineStr() << "\n"
+        << "\n";
 }
 
 // ----------------------------------------------------------------------------
@@ -1455,8 +1882,15 @@ void MasonSplicingOptions::addOptions(seqan2::ArgumentParser & parser) const
                                             "with this name.", seqan2::ArgParseOption::INPUT_FILE, "KEY"));
     setDefaultValue(parser, "gff-group-by", "Parent");
 
+    addOption(parser, seqan2::ArgParseOption("", "io-threads", "Number of threads for compressing gzip-compressed "
+                                            "output in independent blocks.  Use 0 for the default writer.",
+                                            seqan2::ArgParseOption::INTEGER, "NUM"));
+    setMinValue(parser, "io-threads", "0");
+    setDefaultValue(parser, "io-threads", "0");
+
     // Add options of the component options.
     matOptions.addOptions(parser);
+    statsOptions.addOptions(parser);
 }
 
 // ----------------------------------------------------------------------------
@@ -1488,9 +1922,11 @@ void MasonSplicingOptions::getOptionValues(seqan2::ArgumentParser const & parser
     getOptionValue(inputGffFile, parser, "in-gff");
     getOptionValue(gffType, parser, "gff-type");
     getOptionValue(gffGroupBy, parser, "gff-group-by");
+    getOptionValue(ioThreads, parser, "io-threads");
 
     // Get options for the other components that we use.
     matOptions.getOptionValues(parser);
+    statsOptions.getOptionValues(parser);
 
     // Copy in the verbosity flag into the component options.
     matOptions.verbosity = verbosity;
@@ -1510,6 +1946,7 @@ void MasonSplicingOptions::print(std::ostream & out) const
         << "SEED                    \t" << seed << "\n"
         << "\n"
         << "OUTPUT FILE             \t" << outputFileName << "\n"
+        << "IO THREADS              \t" << ioThreads << "\n"
         << "\n"
         << "HAPLOTYPE NAME SEP      \t" << haplotypeNameSep << "\n"
         << "\n"
@@ -1519,6 +1956,11 @@ void MasonSplicingOptions::print(std::ostream & out) const
         << "\n";
     matOptions.print(out);
     out << "\n";
+    statsOptions.print(out);
+    out << "\n"
+        << "RANDOM NUMBER GENERATOR OPTIONS\n"
+        << "  RNG ENGINE\t" << getRngEngineStr() << "\n"
+        << "\n";
 }
 
 // ----------------------------------------------------------------------------
@@ -1554,11 +1996,18 @@ void MasonFragmentSequencingOptions::addOptions(seqan2::ArgumentParser & parser)
     addOption(parser, seqan2::ArgParseOption("", "force-single-end", "Force single-end simulation although --out-right "
                                             "is given."));
 
+    addOption(parser, seqan2::ArgParseOption("", "io-threads", "Number of threads for compressing gzip-compressed "
+                                            "output in independent blocks.  Use 0 for the default writer.",
+                                            seqan2::ArgParseOption::INTEGER, "NUM"));
+    setMinValue(parser, "io-threads", "0");
+    setDefaultValue(parser, "io-threads", "0");
+
     // Add options of the component options.
     seqOptions.addOptions(parser);
     illuminaOptions.addOptions(parser);
     sangerOptions.addOptions(parser);
     rocheOptions.addOptions(parser);
+    statsOptions.addOptions(parser);
 }
 
 // ----------------------------------------------------------------------------
@@ -1592,12 +2041,14 @@ void MasonFragmentSequencingOptions::getOptionValues(seqan2::ArgumentParser cons
     getOptionValue(outFileNameLeft, parser, "out");
     getOptionValue(outFileNameRight, parser, "out-right");
     getOptionValue(forceSingleEnd, parser, "force-single-end");
+    getOptionValue(ioThreads, parser, "io-threads");
 
     // Get options for the other components that we use.
     seqOptions.getOptionValues(parser);
     illuminaOptions.getOptionValues(parser);
     sangerOptions.getOptionValues(parser);
     rocheOptions.getOptionValues(parser);
+    statsOptions.getOptionValues(parser);
 
     // Copy in the verbosity flag into the component options.
     seqOptions.verbosity = verbosity;
@@ -1606,7 +2057,8 @@ void MasonFragmentSequencingOptions::getOptionValues(seqan2::ArgumentParser cons
     rocheOptions.verbosity = verbosity;
 
     // Configure simulation of pairs and mates depending on output files.
-    seqOptions.simulateQualities = (endsWith(outFileNameLeft, ".fastq") || endsWith(outFileNameLeft, ".fq"));
+    seqOptions.simulateQualities = (endsWith(outFileNameLeft, ".fastq") || endsWith(outFileNameLeft, ".fq") ||
+                                    endsWith(outFileNameLeft, ".fastq.gz") || endsWith(outFileNameLeft, ".fq.gz"));
     seqOptions.simulateMatePairs = !forceSingleEnd && !empty(outFileNameRight);
 }
 
@@ -1627,6 +2079,7 @@ void MasonFragmentSequencingOptions::print(std::ostream & out) const
         << "\n"
         << "OUTPUT FILE LEFT \t" << outFileNameLeft << "\n"
         << "OUTPUT FILE RIGHT\t" << outFileNameRight << "\n"
+        << "IO THREADS       \t" << ioThreads << "\n"
         << "\n";
     seqOptions.print(out);
     out << "\n";
@@ -1635,6 +2088,11 @@ void MasonFragmentSequencingOptions::print(std::ostream & out) const
     sangerOptions.print(out);
     out << "\n";
     rocheOptions.print(out);
+    out << "\n";
+    statsOptions.print(out);
+    out << "\n"
+        << "RANDOM NUMBER GENERATOR OPTIONS\n"
+        << "  RNG ENGINE\t" << getRngEngineStr() << "\n";
 }
 
 // ----------------------------------------------------------------------------
@@ -1665,6 +2123,7 @@ void MasonMethylationOptions::addOptions(seqan2::ArgumentParser & parser) const
 
     // Add options of the component options.
     methOptions.addOptions(parser);
+    statsOptions.addOptions(parser);
 }
 
 // ----------------------------------------------------------------------------
@@ -1697,6 +2156,7 @@ void MasonMethylationOptions::getOptionValues(seqan2::ArgumentParser const & par
 
     // Get options for the other components that we use.
     methOptions.getOptionValues(parser);
+    statsOptions.getOptionValues(parser);
 
     // Copy in the verbosity flag into the component options.
     methOptions.verbosity = verbosity;
@@ -1720,4 +2180,197 @@ void MasonMethylationOptions::print(std::ostream & out) const
         << "\n";
     methOptions.print(out);
     out << "\n";
+    statsOptions.print(out);
+    out << "\n"
+        << "RANDOM NUMBER GENERATOR OPTIONS\n"
+        << "  RNG ENGINE\t" << getRngEngineStr() << "\n"
+        << "\n";
+}
+
+// ----------------------------------------------------------------------------
+// Function MasonMergeShardsOptions::addOptions()
+// ----------------------------------------------------------------------------
+
+void MasonMergeShardsOptions::addOptions(seqan2::ArgumentParser & parser) const
+{
+    // Add top-level options.
+
+    addOption(parser, seqan2::ArgParseOption("q", "quiet", "Low verbosity."));
+    addOption(parser, seqan2::ArgParseOption("v", "verbose", "Higher verbosity."));
+    addOption(parser, seqan2::ArgParseOption("vv", "very-verbose", "Highest verbosity."));
+
+    addOption(parser, seqan2::ArgParseOption("i", "in", "Single-end/left end reads of a shard, uncompressed.  Give "
+                                            "once for each shard.", seqan2::ArgParseOption::INPUT_FILE, "IN",
+                                            true));
+    setRequired(parser, "in");
+    setValidValues(parser, "in", "fa fasta fq fastq");
+
+    addOption(parser, seqan2::ArgParseOption("ir", "in-right", "Right reads of a shard, uncompressed.  Give once for "
+                                            "each shard.", seqan2::ArgParseOption::INPUT_FILE, "IN2", true));
+    setValidValues(parser, "in-right", "fa fasta fq fastq");
+
+    addOption(parser, seqan2::ArgParseOption("ia", "in-alignment", "SAM/BAM file with the alignments of a shard.  "
+                                            "Give once for each shard.", seqan2::ArgParseOption::INPUT_FILE, "IN",
+                                            true));
+    setValidValues(parser, "in-alignment", seqan2::BamFileIn::getFileExtensions());
+
+    addOption(parser, seqan2::ArgParseOption("o", "out", "Output of single-end/left end reads.",
+                                            seqan2::ArgParseOption::OUTPUT_FILE, "OUT"));
+    setRequired(parser, "out");
+    setValidValues(parser, "out", seqan2::SeqFileOut::getFileExtensions());
+
+    addOption(parser, seqan2::ArgParseOption("or", "out-right", "Output of right reads, required with "
+                                            "\\fB--in-right\\fP.", seqan2::ArgParseOption::OUTPUT_FILE, "OUT2"));
+    setValidValues(parser, "out-right", seqan2::SeqFileOut::getFileExtensions());
+
+    addOption(parser, seqan2::ArgParseOption("oa", "out-alignment", "SAM/BAM file with alignments, required with "
+                                            "\\fB--in-alignment\\fP.", seqan2::ArgParseOption::OUTPUT_FILE, "OUT"));
+    setValidValues(parser, "out-alignment", seqan2::BamFileOut::getFileExtensions());
+
+    addOption(parser, seqan2::ArgParseOption("", "io-threads", "Number of threads for compressing gzip-compressed "
+                                            "FASTA/FASTQ output in independent blocks.  Use 0 for the default "
+                                            "writer.", seqan2::ArgParseOption::INTEGER, "NUM"));
+    setMinValue(parser, "io-threads", "0");
+    setDefaultValue(parser, "io-threads", "0");
+
+    // Add options of the component options.
+    statsOptions.addOptions(parser);
+}
+
+// ----------------------------------------------------------------------------
+// Function MasonMergeShardsOptions::getOptionValues()
+// ----------------------------------------------------------------------------
+
+void MasonMergeShardsOptions::getOptionValues(seqan2::ArgumentParser const & parser)
+{
+    // Get top-level options.
+    if (isSet(parser, "quiet"))
+        verbosity = 0;
+    if (isSet(parser, "verbose"))
+        verbosity = 2;
+    if (isSet(parser, "very-verbose"))
+        verbosity = 3;
+
+    seqan2::CharString fileName;
+    for (unsigned i = 0; i < getOptionValueCount(parser, "in"); ++i)
+        if (getOptionValue(fileName, parser, "in", i))
+            inFileNamesLeft.push_back(toCString(fileName));
+    for (unsigned i = 0; i < getOptionValueCount(parser, "in-right"); ++i)
+        if (getOptionValue(fileName, parser, "in-right", i))
+            inFileNamesRight.push_back(toCString(fileName));
+    for (unsigned i = 0; i < getOptionValueCount(parser, "in-alignment"); ++i)
+        if (getOptionValue(fileName, parser, "in-alignment", i))
+            inFileNamesSam.push_back(toCString(fileName));
+    getOptionValue(outFileNameLeft, parser, "out");
+    getOptionValue(outFileNameRight, parser, "out-right");
+    getOptionValue(outFileNameSam, parser, "out-alignment");
+    getOptionValue(ioThreads, parser, "io-threads");
+
+    // Get options for the other components that we use.
+    statsOptions.getOptionValues(parser);
+}
+
+// ----------------------------------------------------------------------------
+// Function MasonMergeShardsOptions::print()
+// ----------------------------------------------------------------------------
+
+void MasonMergeShardsOptions::print(std::ostream & out) const
+{
+    out << "MASON MERGE SHARDS OPTIONS\n"
+        << "--------------------------\n"
+        << "\n"
+        << "VERBOSITY      \t" << getVerbosityStr(verbosity) << "\n"
+        << "\n";
+    for (unsigned i = 0; i < inFileNamesLeft.size(); ++i)
+        out << "IN FILE LEFT   \t" << inFileNamesLeft[i] << "\n";
+    for (unsigned i = 0; i < inFileNamesRight.size(); ++i)
+        out << "IN FILE RIGHT  \t" << inFileNamesRight[i] << "\n";
+    for (unsigned i = 0; i < inFileNamesSam.size(); ++i)
+        out << "IN FILE SAM    \t" << inFileNamesSam[i] << "\n";
+    out << "OUT FILE LEFT  \t" << outFileNameLeft << "\n"
+        << "OUT FILE RIGHT \t" << outFileNameRight << "\n"
+        << "OUT FILE SAM   \t" << outFileNameSam << "\n"
+        << "IO THREADS     \t" << ioThreads << "\n"
+        << "\n";
+    statsOptions.print(out);
+    out << "\n";
+}
+
+// ----------------------------------------------------------------------------
+// Function MasonTrainModelOptions::addOptions()
+// ----------------------------------------------------------------------------
+
+void MasonTrainModelOptions::addOptions(seqan2::ArgumentParser & parser) const
+{
+    // Add top-level options.
+
+    addOption(parser, seqan2::ArgParseOption("q", "quiet", "Low verbosity."));
+    addOption(parser, seqan2::ArgParseOption("v", "verbose", "Higher verbosity."));
+    addOption(parser, seqan2::ArgParseOption("vv", "very-verbose", "Highest verbosity."));
+
+    addOption(parser, seqan2::ArgParseOption("i", "in", "Template single-end/left end reads.",
+                                            seqan2::ArgParseOption::INPUT_FILE, "IN"));
+    setRequired(parser, "in");
+    setValidValues(parser, "in", seqan2::SeqFileIn::getFileExtensions());
+
+    addOption(parser, seqan2::ArgParseOption("ir", "in-right", "Template right reads.  If not given, the right reads "
+                                            "are simulated with the tables of the left reads.",
+                                            seqan2::ArgParseOption::INPUT_FILE, "IN2"));
+    setValidValues(parser, "in-right", seqan2::SeqFileIn::getFileExtensions());
+
+    addOption(parser, seqan2::ArgParseOption("o", "out", "Model file to write, give to \\fBmason_simulator\\fP with "
+                                            "\\fB--illumina-model-file\\fP.", seqan2::ArgParseOption::OUTPUT_FILE,
+                                            "OUT"));
+    setRequired(parser, "out");
+
+    addOption(parser, seqan2::ArgParseOption("", "max-reads", "Maximal number of reads to use from each input file, "
+                                            "0 for all.", seqan2::ArgParseOption::INTEGER, "NUM"));
+    setMinValue(parser, "max-reads", "0");
+    setDefaultValue(parser, "max-reads", "0");
+
+    // Add options of the component options.
+    statsOptions.addOptions(parser);
+}
+
+// ----------------------------------------------------------------------------
+// Function MasonTrainModelOptions::getOptionValues()
+// ----------------------------------------------------------------------------
+
+void MasonTrainModelOptions::getOptionValues(seqan2::ArgumentParser const & parser)
+{
+    // Get top-level options.
+    if (isSet(parser, "quiet"))
+        verbosity = 0;
+    if (isSet(parser, "verbose"))
+        verbosity = 2;
+    if (isSet(parser, "very-verbose"))
+        verbosity = 3;
+
+    getOptionValue(inFileNameLeft, parser, "in");
+    getOptionValue(inFileNameRight, parser, "in-right");
+    getOptionValue(outFileName, parser, "out");
+    getOptionValue(maxReads, parser, "max-reads");
+
+    // Get options for the other components that we use.
+    statsOptions.getOptionValues(parser);
+}
+
+// ----------------------------------------------------------------------------
+// Function MasonTrainModelOptions::print()
+// ----------------------------------------------------------------------------
+
+void MasonTrainModelOptions::print(std::ostream & out) const
+{
+    out << "MASON TRAIN MODEL OPTIONS\n"
+        << "-------------------------\n"
+        << "\n"
+        << "VERBOSITY      \t" << getVerbosityStr(verbosity) << "\n"
+        << "\n"
+        << "IN FILE LEFT   \t" << inFileNameLeft << "\n"
+        << "IN FILE RIGHT  \t" << inFileNameRight << "\n"
+        << "OUT FILE       \t" << outFileName << "\n"
+        << "MAX READS      \t" << maxReads << "\n"
+        << "\n";
+    statsOptions.print(out);
+    out << "\n";
 }
@@ -35,10 +35,36 @@
 #undef SEQAN_ENABLE_TESTING
 #define SEQAN_ENABLE_TESTING 1
 
+#include <cmath>
+#include <fstream>
+#include <sstream>
+
+#include <utime.h>
+
 #include <seqan/basic.h>
 
+#include <mason/bgzf_writer.h>
+#include <mason/fragment_generation.h>
+#include <mason/gap_index.h>
+#include <mason/haplotype_cache.h>
+#include <mason/packed_reference.h>
+#include <mason/parallel_seq_file_out.h>
+#include <mason/quality_model.h>
+#include <mason/record_formatter.h>
+#include <mason/run_stats.h>
 #include <mason/sequencing.h>
 #include <mason/genomic_variants.h>
+#include <mason/trace_alignment.h>
+#include <mason/external_split_merge.h>
+
+// Helper for converting a CIGAR string to its textual representation.
+std::string cigarToString(TCigarString const & cigar)
+{
+    std::stringstream ss;
+    for (unsigned i = 0; i < length(cigar); ++i)
+        ss << cigar[i].count << cigar[i].operation;
+    return ss.str();
+}
 
 SEQAN_DEFINE_TEST(mason_tests_append_orientation_elementary_operations)
 {
@@ -167,6 +193,302 @@ SEQAN_DEFINE_TEST(mason_tests_append_orientation_canceling_out)
     }
 }
 
+SEQAN_DEFINE_TEST(mason_tests_illumina_skip_ahead_errors)
+{
+    // Simulate reads with per-base and with skip-ahead error placement and high error rates.
+    SequencingOptions seqOptions;
+    IlluminaSequencingOptions illuminaOptions;
+    illuminaOptions.readLength = 50;
+    illuminaOptions.probabilityInsert = 0.01;
+    illuminaOptions.probabilityDelete = 0.01;
+    illuminaOptions.probabilityMismatch = 0.05;
+    illuminaOptions.probabilityMismatchBegin = 0.01;
+    illuminaOptions.probabilityMismatchEnd = 0.11;
+
+    seqan2::Dna5String const contig = "CGATCGATCGATCGATCGATCGATCGATCGATCGATCGATCGATCGATCG"
+                                      "CGATCGATCGATCGATCGATCGATCGATCGATCGATCGATCGATCGATCG"
+                                      "CGATCGATCGATCGATCGATCGATCGATCGATCGATCGATCGATCGATCG"
+                                      "CGATCGATCGATCGATCGATCGATCGATCGATCGATCGATCGATCGATCG";
+    TFragment frag = infix(contig, 0, length(contig));
+
+    // Count the operations of each kind at each read position.
+    unsigned const numReads = 20 * 1000;
+    unsigned const len = illuminaOptions.readLength;
+    std::vector<double> counts[2];
+    for (unsigned m = 0; m < 2u; ++m)
+    {
+        counts[m].assign(4 * (len + 1), 0);
+        TRng rng(m), methRng(0);
+        illuminaOptions.skipAheadErrors = (m == 1u);
+        IlluminaSequencingSimulator sim(rng, methRng, seqOptions, illuminaOptions);
+
+        TRead seq;
+        TQualities quals;
+        SequencingSimulationInfo info;
+        for (unsigned i = 0; i < numReads; ++i)
+        {
+            sim.simulateRead(seq, quals, info, frag, SequencingSimulator::LEFT, SequencingSimulator::FORWARD);
+            SEQAN_ASSERT_EQ(length(seq), len);
+            unsigned pos = 0;
+            for (unsigned j = 0; j < length(info.cigar); ++j)
+            {
+                char op = info.cigar[j].operation;
+                unsigned kind = (op == 'M') ? 0 : (op == 'X') ? 1 : (op == 'I') ? 2 : 3;
+                for (unsigned k = 0; k < info.cigar[j].count; ++k)
+                {
+                    counts[m][kind * (len + 1) + pos] += 1;
+                    pos += (op != 'D');
+                }
+            }
+            SEQAN_ASSERT_EQ(pos, len);
+        }
+    }
+
+    // The counts must be equal up to random variation, two-sample chi-square test on the cells with enough counts,
+    // rejecting at df + 5 standard deviations of the chi-square distribution.
+    double chiSquare = 0;
+    unsigned df = 0;
+    for (unsigned i = 0; i < counts[0].size(); ++i)
+    {
+        double a = counts[0][i], b = counts[1][i];
+        if (a + b < 10)
+            continue;
+        chiSquare += (a - b) * (a - b) / (a + b);
+        ++df;
+    }
+    SEQAN_ASSERT_GT(df, 100u);
+    SEQAN_ASSERT_LT(chiSquare, df + 5 * std::sqrt(2.0 * df));
+}
+
+SEQAN_DEFINE_TEST(mason_tests_quality_table)
+{
+    // The tables yield the distribution of the qualities drawn from std::normal_distribution, chi-square test of the
+    // drawn qualities against the table probabilities.
+    int const maxQuality = QualityTable::MAX_QUALITY;
+    double const params[4][2] = {{40, 0.05}, {39.5, 10}, {30, 15}, {2, 3}};
+    for (unsigned k = 0; k < 4u; ++k)
+    {
+        QualityTable table;
+        table.init(params[k][0], params[k][1]);
+        SEQAN_ASSERT_EQ(table.cdf[QualityTable::MAX_QUALITY], 1.0);
+
+        unsigned const numDraws = 100 * 1000;
+        std::vector<double> counts(QualityTable::MAX_QUALITY + 1, 0);
+        TRng rng(k);
+        for (unsigned i = 0; i < numDraws; ++i)
+        {
+            std::normal_distribution<double> dist(params[k][0], params[k][1]);
+            int q = static_cast<int>(dist(rng));
+            counts[std::max(0, std::min(maxQuality, q))] += 1;
+        }
+
+        double chiSquare = 0;
+        unsigned df = 0;
+        for (int q = 0; q <= maxQuality; ++q)
+        {
+            double expected = numDraws * (table.cdf[q] - ((q > 0) ? table.cdf[q - 1] : 0.0));
+            if (expected < 5)
+                continue;
+            chiSquare += (counts[q] - expected) * (counts[q] - expected) / expected;
+            ++df;
+        }
+        SEQAN_ASSERT_LT(chiSquare, df + 5 * std::sqrt(2.0 * df));
+    }
+
+    // Degenerate distribution.
+    QualityTable table;
+    table.init(35.5, 0);
+    TRng rng(0);
+    for (unsigned i = 0; i < 10u; ++i)
+        SEQAN_ASSERT_EQ(table.sample(rng), 35);
+
+    // Illumina simulation with the tables yields one quality per read character.
+    SequencingOptions seqOptions;
+    seqOptions.qualityTables = true;
+    IlluminaSequencingOptions illuminaOptions;
+    illuminaOptions.readLength = 100;
+    IlluminaSequencingSimulator sim(rng, rng, seqOptions, illuminaOptions);
+    seqan2::Dna5String const contig = "CGATCGATCGATCGATCGATCGATCGATCGATCGATCGATCGATCGATCG"
+                                      "CGATCGATCGATCGATCGATCGATCGATCGATCGATCGATCGATCGATCG"
+                                      "CGATCGATCGATCGATCGATCGATCGATCGATCGATCGATCGATCGATCG";
+    TFragment frag = infix(contig, 0, length(contig));
+    TRead seq;
+    TQualities quals;
+    SequencingSimulationInfo info;
+    for (unsigned i = 0; i < 100u; ++i)
+    {
+        sim.simulateRead(seq, quals, info, frag, SequencingSimulator::LEFT, SequencingSimulator::FORWARD);
+        SEQAN_ASSERT_EQ(length(quals), length(seq));
+        for (unsigned j = 0; j < length(quals); ++j)
+        {
+            SEQAN_ASSERT_GEQ(quals[j], '!');
+            SEQAN_ASSERT_LEQ(quals[j], '!' + QualityTable::MAX_QUALITY);
+        }
+    }
+}
+
+SEQAN_DEFINE_TEST(mason_tests_quality_model)
+{
+    // Cycle 0 has quality 10, cycle 1 quality 20, cycle 2 Ns with quality 2 and called bases with quality 30.
+    std::string fastqFileName = SEQAN_TEMP_FILENAME();
+    fastqFileName += ".fq";
+    {
+        std::ofstream out(fastqFileName.c_str());
+        out << "@r1\nACN\n+\n+5#\n"
+            << "@r2\nACG\n+\n+5?\n"
+            << "@r3\nACN\n+\n+5#\n"
+            << "@r4\nACG\n+\n+5?\n";
+    }
+    QualityModel model;
+    SEQAN_ASSERT(trainQualityModel(model.cycles[0], model.nQualities[0], fastqFileName.c_str()));
+    SEQAN_ASSERT_NOT(trainQualityModel(model.cycles[1], model.nQualities[1], (fastqFileName + ".missing").c_str()));
+    SEQAN_ASSERT_EQ(model.cycles[0].size(), 3u);
+    SEQAN_ASSERT_NOT(model.hasRight());
+    SEQAN_ASSERT_EQ(model.nQualities[0], 2);
+
+    // The mismatch probabilities follow from the PHRED qualities.
+    SEQAN_ASSERT_IN_DELTA(model.cycles[0][0].mismatchProbability, 0.1, 1e-9);
+    SEQAN_ASSERT_IN_DELTA(model.cycles[0][1].mismatchProbability, 0.01, 1e-9);
+    SEQAN_ASSERT_IN_DELTA(model.cycles[0][2].mismatchProbability, 0.001, 1e-9);
+    SEQAN_ASSERT_EQ(model.cycles[0][0].nProbability, 0.0);
+    SEQAN_ASSERT_EQ(model.cycles[0][2].nProbability, 0.5);
+    TRng rng(0);
+    for (unsigned i = 0; i < 10u; ++i)
+    {
+        SEQAN_ASSERT_EQ(model.cycle(0, 0).matchQualities.sample(rng), 10);
+        SEQAN_ASSERT_EQ(model.cycle(0, 1).mismatchQualities.sample(rng), 20);
+        // Cycles beyond the template reads and the right reads use the last cycle of the left reads.
+        SEQAN_ASSERT_EQ(model.cycle(1, 7).matchQualities.sample(rng), 30);
+    }
+
+    // Roundtrip through the model file.
+    std::string modelFileName = SEQAN_TEMP_FILENAME();
+    SEQAN_ASSERT(writeQualityModel(modelFileName.c_str(), model));
+    QualityModel model2;
+    SEQAN_ASSERT_NOT(readQualityModel(model2, fastqFileName.c_str()));
+    SEQAN_ASSERT(readQualityModel(model2, modelFileName.c_str()));
+    SEQAN_ASSERT_EQ(model2.cycles[0].size(), 3u);
+    SEQAN_ASSERT_NOT(model2.hasRight());
+    SEQAN_ASSERT_EQ(model2.nQualities[0], 2);
+    for (unsigned i = 0; i < 3u; ++i)
+    {
+        SEQAN_ASSERT_EQ(model2.cycles[0][i].mismatchProbability, model.cycles[0][i].mismatchProbability);
+        SEQAN_ASSERT_EQ(model2.cycles[0][i].nProbability, model.cycles[0][i].nProbability);
+        for (int q = 0; q <= QualityTable::MAX_QUALITY; ++q)
+        {
+            SEQAN_ASSERT_EQ(model2.cycles[0][i].matchQualities.cdf[q], model.cycles[0][i].matchQualities.cdf[q]);
+            SEQAN_ASSERT_EQ(model2.cycles[0][i].mismatchQualities.cdf[q],
+                            model.cycles[0][i].mismatchQualities.cdf[q]);
+        }
+    }
+
+    // The shared model is loaded once.
+    QualityModel const & shared = sharedQualityModel(modelFileName, "", "");
+    SEQAN_ASSERT(&shared == &sharedQualityModel(modelFileName, "", ""));
+    SEQAN_ASSERT_EQ(shared.cycles[0].size(), 3u);
+
+    // Illumina simulation with the model yields the qualities of the template reads, the Ns get their quality.
+    SequencingOptions seqOptions;
+    IlluminaSequencingOptions illuminaOptions;
+    illuminaOptions.readLength = 6;
+    illuminaOptions.modelFile = modelFileName;
+    IlluminaSequencingSimulator sim(rng, rng, seqOptions, illuminaOptions);
+    seqan2::Dna5String const contig = "CGATCGATCGATCGATCGAT";
+    TFragment frag = infix(contig, 0, length(contig));
+    TRead seq;
+    TQualities quals;
+    SequencingSimulationInfo info;
+    unsigned numNs = 0;
+    for (unsigned i = 0; i < 100u; ++i)
+    {
+        sim.simulateRead(seq, quals, info, frag, SequencingSimulator::RIGHT, SequencingSimulator::REVERSE);
+        SEQAN_ASSERT_EQ(length(seq), 6u);
+        SEQAN_ASSERT_EQ(length(quals), 6u);
+        SEQAN_ASSERT_EQ(quals[0], '+');
+        SEQAN_ASSERT_EQ(quals[1], '5');
+        for (unsigned j = 2; j < 6u; ++j)
+        {
+            SEQAN_ASSERT(quals[j] == '#' || quals[j] == '?');
+            if (quals[j] == '#')
+            {
+                SEQAN_ASSERT_EQ(seq[j], 'N');
+                ++numNs;
+            }
+        }
+    }
+    SEQAN_ASSERT_GT(numNs, 100u);
+    SEQAN_ASSERT_LT(numNs, 300u);
+}
+
+SEQAN_DEFINE_TEST(mason_tests_sequencing_batch)
+{
+    // The batch interface yields the same reads as simulating each fragment on its own.
+    seqan2::Dna5String contig;
+    for (unsigned i = 0; i < 100u; ++i)
+        append(contig, "CGATTGCAAGTC");
+    std::vector<TFragment> frags;
+    for (unsigned i = 0; i < 20u; ++i)
+        frags.push_back(infix(contig, 10 * i, 10 * i + 800));
+
+    SequencingOptions::SequencingTechnology const technologies[3] = {
+        SequencingOptions::ILLUMINA, SequencingOptions::ROCHE_454, SequencingOptions::SANGER
+    };
+    IlluminaSequencingOptions illuminaOptions;
+    illuminaOptions.readLength = 100;
+    Roche454SequencingOptions roche454Options;
+    roche454Options.lengthModel = Roche454SequencingOptions::UNIFORM;
+    roche454Options.minReadLength = 100;
+    roche454Options.maxReadLength = 300;
+    roche454Options.k = 0.15;
+    roche454Options.backgroundNoiseMean = 0.23;
+    roche454Options.backgroundNoiseStdDev = 0.15;
+    SangerSequencingOptions sangerOptions;
+    for (unsigned t = 0; t < 3u; ++t)
+    {
+        for (unsigned pairs = 0; pairs < 2u; ++pairs)
+        {
+            SequencingOptions seqOptions;
+            seqOptions.sequencingTechnology = technologies[t];
+            seqOptions.simulateQualities = true;
+            seqOptions.simulateMatePairs = (pairs == 1u);
+            unsigned numReads = (pairs + 1) * frags.size();
+
+            TRng rng(t), methRng(t + 10);
+            SequencingSimulatorFactory factory(rng, methRng, seqOptions, illuminaOptions, roche454Options,
+                                               sangerOptions);
+            std::unique_ptr<SequencingSimulator> sim = factory.make();
+            SequencingReadBatch batch;
+            batch.resize(numReads);
+            sim->simulateReads(batch, frags, 0, 5, 0);
+            sim->simulateReads(batch, frags, 5, frags.size(), 0);
+
+            TRng rng2(t), methRng2(t + 10);
+            SequencingSimulatorFactory factory2(rng2, methRng2, seqOptions, illuminaOptions, roche454Options,
+                                                sangerOptions);
+            std::unique_ptr<SequencingSimulator> sim2 = factory2.make();
+            SequencingReadBatch expected;
+            expected.resize(numReads);
+            for (unsigned i = 0; i < frags.size(); ++i)
+            {
+                if (pairs)
+                    sim2->simulatePairedEnd(expected.seqs[2 * i], expected.quals[2 * i], expected.infos[2 * i],
+                                            expected.seqs[2 * i + 1], expected.quals[2 * i + 1],
+                                            expected.infos[2 * i + 1], frags[i]);
+                else
+                    sim2->simulateSingleEnd(expected.seqs[i], expected.quals[i], expected.infos[i], frags[i]);
+            }
+
+            for (unsigned i = 0; i < numReads; ++i)
+            {
+                SEQAN_ASSERT_GT(length(batch.seqs[i]), 0u);
+                SEQAN_ASSERT_EQ(batch.seqs[i], expected.seqs[i]);
+                SEQAN_ASSERT_EQ(batch.quals[i], expected.quals[i]);
+                SEQAN_ASSERT_EQ(batch.infos[i].isForward, expected.infos[i].isForward);
+            }
+        }
+    }
+}
+
 SEQAN_DEFINE_TEST(mason_tests_position_map_inversion)
 {
     typedef PositionMap::TInterval TInterval;
@@ -413,16 +735,841 @@ SEQAN_DEFINE_TEST(mason_tests_position_map_original_to_small_var)
     }
 }
 
+SEQAN_DEFINE_TEST(mason_tests_trace_alignment_sequencing_errors)
+{
+    //          0         1
+    //          0123456789012345678
+    //      REF ACGTACGTACGTACGTACGT
+    //     READ   GAACTGTA-GT
+    //             X  I   D
+    seqan2::Dna5String refSeq = "ACGTACGTACGTACGTACGT";
+    TJournalEntries journal;
+    reinit(journal, length(refSeq));
+    PositionMap positionMap;
+    positionMap.reinit(journal);
+
+    TCigarString errorCigar;
+    appendValue(errorCigar, seqan2::CigarElement<>('M', 1));
+    appendValue(errorCigar, seqan2::CigarElement<>('X', 1));
+    appendValue(errorCigar, seqan2::CigarElement<>('M', 2));
+    appendValue(errorCigar, seqan2::CigarElement<>('I', 1));
+    appendValue(errorCigar, seqan2::CigarElement<>('M', 3));
+    appendValue(errorCigar, seqan2::CigarElement<>('D', 1));
+    appendValue(errorCigar, seqan2::CigarElement<>('M', 2));
+    seqan2::Dna5String readSeq = "GAACTGTAGT";
+
+    TCigarString cigar;
+    seqan2::CharString mdString;
+    int editDistance = 0, beginPos = 0;
+    SEQAN_ASSERT(buildTraceAlignment(cigar, mdString, editDistance, beginPos, errorCigar, readSeq, positionMap, 2,
+                                     refSeq));
+    SEQAN_ASSERT_EQ(cigarToString(cigar), "4M1I3M1D2M");
+    SEQAN_ASSERT_EQ(mdString, "1T5^C2");
+    SEQAN_ASSERT_EQ(editDistance, 3);
+    SEQAN_ASSERT_EQ(beginPos, 2);
+}
+
+SEQAN_DEFINE_TEST(mason_tests_trace_alignment_small_variants)
+{
+    // Deletion in the variant.
+    {
+        //          0         1
+        //          0123456789012345678
+        //      REF AACCGGTTAACCGGTTAACC
+        // SMALLVAR AA--GGTTAACCGGTTAACC
+        seqan2::Dna5String refSeq = "AACCGGTTAACCGGTTAACC";
+        TJournalEntries journal;
+        reinit(journal, length(refSeq));
+        recordErase(journal, 2, 4);
+        PositionMap positionMap;
+        positionMap.reinit(journal);
+
+        TCigarString errorCigar;
+        appendValue(errorCigar, seqan2::CigarElement<>('M', 6));
+        seqan2::Dna5String readSeq = "AAGGTT";
+
+        TCigarString cigar;
+        seqan2::CharString mdString;
+        int editDistance = 0, beginPos = 0;
+        SEQAN_ASSERT(buildTraceAlignment(cigar, mdString, editDistance, beginPos, errorCigar, readSeq, positionMap,
+                                         0, refSeq));
+        SEQAN_ASSERT_EQ(cigarToString(cigar), "2M2D4M");
+        SEQAN_ASSERT_EQ(mdString, "2^CC4");
+        SEQAN_ASSERT_EQ(editDistance, 2);
+        SEQAN_ASSERT_EQ(beginPos, 0);
+    }
+
+    // Insertion in the variant.
+    {
+        //          0         1
+        //          0123456789012345678
+        //      REF AA--CCGGTTAACCGGTTAACC
+        // SMALLVAR AATTCCGGTTAACCGGTTAACC
+        seqan2::Dna5String refSeq = "AACCGGTTAACCGGTTAACC";
+        TJournalEntries journal;
+        reinit(journal, length(refSeq));
+        recordInsertion(journal, 2, 0, 2);
+        PositionMap positionMap;
+        positionMap.reinit(journal);
+
+        TCigarString errorCigar;
+        appendValue(errorCigar, seqan2::CigarElement<>('M', 6));
+        seqan2::Dna5String readSeq = "AATTCC";
+
+        TCigarString cigar;
+        seqan2::CharString mdString;
+        int editDistance = 0, beginPos = 0;
+        SEQAN_ASSERT(buildTraceAlignment(cigar, mdString, editDistance, beginPos, errorCigar, readSeq, positionMap,
+                                         0, refSeq));
+        SEQAN_ASSERT_EQ(cigarToString(cigar), "2M2I2M");
+        SEQAN_ASSERT_EQ(mdString, "4");
+        SEQAN_ASSERT_EQ(editDistance, 2);
+        SEQAN_ASSERT_EQ(beginPos, 0);
+
+        // Read beginning in the insertion.
+        clear(errorCigar);
+        appendValue(errorCigar, seqan2::CigarElement<>('M', 4));
+        readSeq = "TTCC";
+        SEQAN_ASSERT(buildTraceAlignment(cigar, mdString, editDistance, beginPos, errorCigar, readSeq, positionMap,
+                                         2, refSeq));
+        SEQAN_ASSERT_EQ(cigarToString(cigar), "2I2M");
+        SEQAN_ASSERT_EQ(mdString, "2");
+        SEQAN_ASSERT_EQ(editDistance, 2);
+        SEQAN_ASSERT_EQ(beginPos, 2);
+
+        // Read lying in the insertion completely cannot be aligned.
+        clear(errorCigar);
+        appendValue(errorCigar, seqan2::CigarElement<>('M', 2));
+        readSeq = "TT";
+        SEQAN_ASSERT_NOT(buildTraceAlignment(cigar, mdString, editDistance, beginPos, errorCigar, readSeq,
+                                             positionMap, 2, refSeq));
+    }
+}
+
+SEQAN_DEFINE_TEST(mason_tests_natural_name_key_compare)
+{
+    char const * names[] = {
+        "", "1", "01", "10", "9", "a", "a1", "a01", "a10", "a9", "ab", "ab1", "a/1", "a/2", "sim.1/1", "sim.1/2",
+        "sim.2/1", "sim.10/1", "sim.10", "sim.10 info", "sim.", "sim", "simulated.100", "simulated.99", "x1y2",
+        "x1y10", "x01y2", "99999999999999999999999", "99999999999999999999998a"
+    };
+    unsigned const numNames = sizeof(names) / sizeof(names[0]);
+
+    for (unsigned i = 0; i < numNames; ++i)
+    {
+        NaturalNameKey lhs(names[i]);
+        for (unsigned j = 0; j < numNames; ++j)
+        {
+            NaturalNameKey rhs(names[j]);
+            SEQAN_ASSERT_EQ(compare(lhs, rhs), strnum_cmp(names[i], names[j]));
+        }
+    }
+}
+
+SEQAN_DEFINE_TEST(mason_tests_loser_tree_merge)
+{
+    for (unsigned k = 1; k <= 9; ++k)
+    {
+        // Input i contains the numbers congruent to i modulo k, sorted.
+        std::vector<std::vector<int> > inputs(k);
+        for (int x = 0; x < 100; ++x)
+            inputs[x % k].push_back(x);
+        std::vector<unsigned> pos(k, 0);
+
+        auto beats = [&](unsigned a, unsigned b) {
+            bool activeA = pos[a] < inputs[a].size(), activeB = pos[b] < inputs[b].size();
+            if (!activeA || !activeB)
+                return activeA || (!activeB && a < b);
+            return inputs[a][pos[a]] < inputs[b][pos[b]];
+        };
+
+        LoserTree tree;
+        tree.build(k, beats);
+        for (int x = 0; x < 100; ++x)
+        {
+            unsigned idx = tree.winner();
+            SEQAN_ASSERT_LT(pos[idx], inputs[idx].size());
+            SEQAN_ASSERT_EQ(inputs[idx][pos[idx]], x);
+            ++pos[idx];
+            tree.update(beats);
+        }
+        SEQAN_ASSERT_EQ(pos[tree.winner()], inputs[tree.winner()].size());
+    }
+}
+
+SEQAN_DEFINE_TEST(mason_tests_spill_read)
+{
+    seqan2::CharString buffer;
+    appendSpillRead(buffer, spillKey(4, 1), "sim.5/1", "ACGTN", "IIIII");
+    appendSpillRead(buffer, spillKey(4, 2), "sim.5/2", "NACGTT", "");
+
+    uint64_t key = 0;
+    uint32_t len = 0;
+    unsigned pos = 0;
+    seqan2::CharString id, seq, qual;
+
+    memcpy(&key, &buffer[pos], sizeof(key));
+    memcpy(&len, &buffer[pos + sizeof(key)], sizeof(len));
+    pos += sizeof(key) + sizeof(len);
+    SEQAN_ASSERT_EQ(key, spillKey(4, 1));
+    decodeSpillRead(id, seq, qual, seqan2::CharString(infix(buffer, pos, pos + len)));
+    SEQAN_ASSERT_EQ(id, "sim.5/1");
+    SEQAN_ASSERT_EQ(seq, "ACGTN");
+    SEQAN_ASSERT_EQ(qual, "IIIII");
+    pos += len;
+
+    memcpy(&key, &buffer[pos], sizeof(key));
+    memcpy(&len, &buffer[pos + sizeof(key)], sizeof(len));
+    pos += sizeof(key) + sizeof(len);
+    SEQAN_ASSERT_EQ(key, spillKey(4, 2));
+    decodeSpillRead(id, seq, qual, seqan2::CharString(infix(buffer, pos, pos + len)));
+    SEQAN_ASSERT_EQ(id, "sim.5/2");
+    SEQAN_ASSERT_EQ(seq, "NACGTT");
+    SEQAN_ASSERT_EQ(qual, "");
+    SEQAN_ASSERT_EQ(pos + len, length(buffer));
+
+    // Keys order like the read names.
+    SEQAN_ASSERT_LT(spillKey(4, 2), spillKey(9, 1));
+    SEQAN_ASSERT_LT(strnum_cmp("sim.5/2", "sim.10/1"), 0);
+}
+
+SEQAN_DEFINE_TEST(mason_tests_id_splitter_compression)
+{
+    IdSplitter splitter(2);
+    splitter.compressionLevel = 1;
+    splitter.open();
+
+    // Write more than one block to the first file and a short string to the second one.
+    std::string data0, data1 = "short";
+    for (unsigned i = 0; i < 3 * IdSplitter::BLOCK_SIZE / 10; ++i)
+        data0 += std::to_string(i % 1000) + ",";
+    splitter.write(0, &data0[0], data0.size() / 2);
+    splitter.write(1, &data1[0], data1.size());
+    splitter.write(0, &data0[data0.size() / 2], data0.size() - data0.size() / 2);
+    splitter.reset();
+    SEQAN_ASSERT_EQ(splitter.rawBytes, data0.size() + data1.size());
+    SEQAN_ASSERT_LT(splitter.storedBytes, splitter.rawBytes);
+
+    std::string buffer(data0.size() + 10, '\0');
+    SEQAN_ASSERT_EQ(splitter.read(0, &buffer[0], buffer.size()), data0.size());
+    buffer.resize(data0.size());
+    SEQAN_ASSERT(buffer == data0);
+    buffer.assign(10, '\0');
+    SEQAN_ASSERT_EQ(splitter.read(1, &buffer[0], 3), 3u);
+    SEQAN_ASSERT_EQ(splitter.read(1, &buffer[3], 7), 2u);
+    SEQAN_ASSERT(buffer.substr(0, 5) == data1);
+    SEQAN_ASSERT_EQ(splitter.read(1, &buffer[0], 1), 0u);
+}
+
+SEQAN_DEFINE_TEST(mason_tests_shard_merge)
+{
+    // Contigs of length 100, 50, 30, and 20 with two haplotypes each, assigned to three shards by length.
+    std::vector<int64_t> lengthSums = {100, 150, 180, 200};
+    std::vector<int> shards;
+    assignShards(shards, lengthSums, 2, 3);
+    std::vector<int> expected = {0, 1, 2, 2, 0, 1, 2, 2};
+    SEQAN_ASSERT(shards == expected);
+    assignShards(shards, lengthSums, 2, 1);
+    SEQAN_ASSERT(shards == std::vector<int>(8, 0));
+
+    // The reads of the shards are joined by id.
+    std::string fileName0 = SEQAN_TEMP_FILENAME(), fileName1 = SEQAN_TEMP_FILENAME();
+    {
+        std::ofstream out0(fileName0.c_str()), out1(fileName1.c_str());
+        out0 << "@sim_1\nACGT\n+\nIIII\n@sim_4\nCCCC\n+\nIIII\n";
+        out1 << "@sim_2\nGGGG\n+\nIIII\n@sim_3\nTTTT\n+\nIIII\n@sim_10\nAAAA\n+\nIIII\n";
+    }
+    IdSplitter splitter;
+    SEQAN_ASSERT_NOT(splitter.openExisting({fileName0, fileName1 + ".missing"}));
+    SEQAN_ASSERT(splitter.openExisting({fileName0, fileName1}));
+    FastxJoiner<seqan2::Fastq> joiner(splitter);
+    seqan2::CharString id, seq, qual, ids;
+    while (!joiner.atEnd())
+    {
+        joiner.get(id, seq, qual);
+        append(ids, id);
+        appendValue(ids, ' ');
+    }
+    SEQAN_ASSERT_EQ(ids, "sim_1 sim_2 sim_3 sim_4 sim_10 ");
+    splitter.close();
+
+    // The files of the shards are not removed.
+    std::ifstream in(fileName0.c_str());
+    SEQAN_ASSERT(in.good());
+}
+
+SEQAN_DEFINE_TEST(mason_tests_rng_philox)
+{
+    // Known answers from the Random123 distribution.
+    uint32_t out[4];
+    uint32_t const zeroCounter[4] = {0, 0, 0, 0};
+    uint32_t const zeroKey[2] = {0, 0};
+    Philox4x32::block(out, zeroCounter, zeroKey);
+    SEQAN_ASSERT_EQ(out[0], 0x6627e8d5u);
+    SEQAN_ASSERT_EQ(out[1], 0xe169c58du);
+    SEQAN_ASSERT_EQ(out[2], 0xbc57ac4cu);
+    SEQAN_ASSERT_EQ(out[3], 0x9b00dbd8u);
+
+    uint32_t const piCounter[4] = {0x243f6a88u, 0x85a308d3u, 0x13198a2eu, 0x03707344u};
+    uint32_t const piKey[2] = {0xa4093822u, 0x299f31d0u};
+    Philox4x32::block(out, piCounter, piKey);
+    SEQAN_ASSERT_EQ(out[0], 0xd16cfe09u);
+    SEQAN_ASSERT_EQ(out[1], 0x94fdccebu);
+    SEQAN_ASSERT_EQ(out[2], 0x5001e420u);
+    SEQAN_ASSERT_EQ(out[3], 0x24126ea1u);
+}
+
+SEQAN_DEFINE_TEST(mason_tests_rng_modes)
+{
+    // Sequential mode yields the numbers of std::mt19937, also after reseeding.
+    MasonRng<std::mt19937> rng(42);
+    std::mt19937 mt(42);
+    for (unsigned i = 0; i < 1000; ++i)
+        SEQAN_ASSERT_EQ(rng(), mt());
+    rng.seed(7);
+    mt.seed(7);
+    for (unsigned i = 0; i < 1000; ++i)
+        SEQAN_ASSERT_EQ(rng(), mt());
+
+    // The stream of a fragment does not depend on the numbers drawn before.
+    std::vector<uint32_t> expected;
+    rng.seedFragment(42, 1, 0, 17);
+    for (unsigned i = 0; i < 10; ++i)
+        expected.push_back(rng());
+    rng.seed(7);
+    rng.discard(13);
+    rng.seedFragment(42, 1, 0, 16);
+    rng.discard(5);
+    rng.seedFragment(42, 1, 0, 17);
+    for (unsigned i = 0; i < 10; ++i)
+        SEQAN_ASSERT_EQ(rng(), expected[i]);
+
+    // Different fragments and phases yield different streams.
+    rng.seedFragment(42, 1, 0, 17, 1);
+    SEQAN_ASSERT_NEQ(rng(), expected[0]);
+    rng.seedFragment(42, 1, 1, 17);
+    SEQAN_ASSERT_NEQ(rng(), expected[0]);
+}
+
+SEQAN_DEFINE_TEST(mason_tests_rng_engines)
+{
+    // Known answers of the reference implementations.
+    Xoshiro256pp xoshiro;
+    xoshiro.s[0] = 1;
+    xoshiro.s[1] = 2;
+    xoshiro.s[2] = 3;
+    xoshiro.s[3] = 4;
+    SEQAN_ASSERT_EQ(xoshiro(), 41943041ull);
+    SEQAN_ASSERT_EQ(xoshiro(), 58720359ull);
+
+    Pcg64 pcg;
+    pcg.seed(42, 54);
+    SEQAN_ASSERT_EQ(pcg(), 0x86b1da1d72062b68ull);
+    SEQAN_ASSERT_EQ(pcg(), 0x1304aa46c9853d39ull);
+    SEQAN_ASSERT_EQ(pcg(), 0xa3670e9e0dd50358ull);
+
+    // MasonRng yields the 64 bit numbers of the engines, also after reseeding.
+    MasonRng<Xoshiro256pp> xoshiroRng(7);
+    Xoshiro256pp xoshiroRef(7);
+    MasonRng<Pcg64> pcgRng(7);
+    Pcg64 pcgRef(7);
+    for (unsigned i = 0; i < 100; ++i)
+    {
+        SEQAN_ASSERT_EQ(xoshiroRng(), xoshiroRef());
+        SEQAN_ASSERT_EQ(pcgRng(), pcgRef());
+    }
+    xoshiroRng.seed(7);
+    SEQAN_ASSERT_EQ(xoshiroRng(), Xoshiro256pp(7)());
+    SEQAN_ASSERT_EQ(MasonRng<Pcg64>::max(), ~uint64_t(0));
+    SEQAN_ASSERT_EQ(MasonRng<std::mt19937>::max(), 0xFFFFFFFFu);
+
+    // The Philox stream of the 64 bit engines joins two words, low word first.
+    MasonRng<std::mt19937> narrowRng;
+    narrowRng.seedFragment(42, 1, 0, 17);
+    pcgRng.seedFragment(42, 1, 0, 17);
+    for (unsigned i = 0; i < 10; ++i)
+    {
+        uint64_t x = narrowRng();
+        SEQAN_ASSERT_EQ(pcgRng(), x | (static_cast<uint64_t>(narrowRng()) << 32));
+    }
+}
+
+SEQAN_DEFINE_TEST(mason_tests_bgzf_writer)
+{
+    std::string data;
+    for (unsigned i = 0; i < 3 * BgzfWriter::BLOCK_SIZE / 5; ++i)
+        data += std::to_string(i % 997) + "\n";
+
+    // Write the data in pieces with one and three threads.
+    std::string fileNames[2] = {SEQAN_TEMP_FILENAME(), SEQAN_TEMP_FILENAME()};
+    std::string contents[2];
+    for (unsigned j = 0; j < 2u; ++j)
+    {
+        BgzfWriter writer;
+        SEQAN_ASSERT(writer.open(fileNames[j].c_str(), 1 + 2 * j));
+        for (size_t pos = 0; pos < data.size(); pos += 1000)
+            writer.write(&data[pos], std::min<size_t>(1000, data.size() - pos));
+        writer.close();
+
+        std::ifstream in(fileNames[j].c_str(), std::ios::binary);
+        std::stringstream ss;
+        ss << in.rdbuf();
+        contents[j] = ss.str();
+    }
+    SEQAN_ASSERT(contents[0] == contents[1]);
+    SEQAN_ASSERT(contents[0].substr(contents[0].size() - BgzfWriter::eofBlock().size()) == BgzfWriter::eofBlock());
+
+    // The file is a valid gzip file.
+    gzFile file = gzopen(fileNames[0].c_str(), "rb");
+    SEQAN_ASSERT(file != 0);
+    std::string buffer(data.size() + 10, '\0');
+    SEQAN_ASSERT_EQ(gzread(file, &buffer[0], buffer.size()), static_cast<int>(data.size()));
+    gzclose(file);
+    buffer.resize(data.size());
+    SEQAN_ASSERT(buffer == data);
+}
+
+SEQAN_DEFINE_TEST(mason_tests_parallel_seq_file_out_fastq)
+{
+    // FASTQ records without qualities are the same with and without the parallel compression.
+    std::string fileNames[2] = {std::string(SEQAN_TEMP_FILENAME()) + ".fq",
+                                std::string(SEQAN_TEMP_FILENAME()) + ".fq.gz"};
+    std::string contents[2];
+    for (unsigned j = 0; j < 2u; ++j)
+    {
+        {
+            ParallelSeqFileOut out;
+            SEQAN_ASSERT(out.open(fileNames[j].c_str(), 2 * j));
+            SEQAN_ASSERT_EQ(out.bgzfWriter.isOpen(), j == 1u);
+            for (unsigned i = 0; i < 100; ++i)
+                out.write(seqan2::CharString("read"), seqan2::Dna5String("CGATNACGTT"));
+        }
+
+        gzFile file = gzopen(fileNames[j].c_str(), "rb");
+        SEQAN_ASSERT(file != 0);
+        char buffer[4096];
+        int len = 0;
+        while ((len = gzread(file, buffer, sizeof(buffer))) > 0)
+            contents[j].append(buffer, len);
+        gzclose(file);
+    }
+    SEQAN_ASSERT(contents[0] == contents[1]);
+
+    // Each record has a quality line as long as the sequence.
+    std::istringstream in(contents[1]);
+    std::string lines[4];
+    SEQAN_ASSERT(std::getline(in, lines[0]) && std::getline(in, lines[1]) && std::getline(in, lines[2]) &&
+                 std::getline(in, lines[3]));
+    SEQAN_ASSERT(lines[0] == "@read");
+    SEQAN_ASSERT_EQ(lines[3].size(), lines[1].size());
+}
+
+SEQAN_DEFINE_TEST(mason_tests_fragment_allocator)
+{
+    // The permutation is a bijection.
+    for (uint64_t n = 1; n < 200; n += 17)
+    {
+        FeistelPermutation permutation;
+        permutation.init(n, n);
+        std::vector<bool> seen(n, false);
+        for (uint64_t i = 0; i < n; ++i)
+        {
+            uint64_t x = permutation(i);
+            SEQAN_ASSERT_LT(x, n);
+            SEQAN_ASSERT_NOT(seen[x]);
+            seen[x] = true;
+        }
+    }
+
+    // Each fragment id is allocated exactly once, the empty contig gets no fragments.
+    TRng rng(42);
+    std::vector<int64_t> lengthSums = {1000, 1000, 3000, 3500};
+    FragmentAllocator allocator;
+    allocator.allocate(rng, lengthSums, 2, 10000);
+    SEQAN_ASSERT_EQ(allocator.counts.size(), 8u);
+    SEQAN_ASSERT_EQ(allocator.counts[2], 0);
+    SEQAN_ASSERT_EQ(allocator.counts[3], 0);
+    std::vector<int> allIds, ids;
+    for (unsigned idx = 0; idx < allocator.counts.size(); ++idx)
+    {
+        allocator.getIds(ids, idx);
+        SEQAN_ASSERT_EQ(ids.size(), static_cast<size_t>(allocator.counts[idx]));
+        SEQAN_ASSERT(std::is_sorted(ids.begin(), ids.end()));
+        allIds.insert(allIds.end(), ids.begin(), ids.end());
+    }
+    std::sort(allIds.begin(), allIds.end());
+    SEQAN_ASSERT_EQ(allIds.size(), 10000u);
+    for (int i = 0; i < 10000; ++i)
+        SEQAN_ASSERT_EQ(allIds[i], i);
+    // The second contig is twice as long as the first one.
+    SEQAN_ASSERT_GT(allocator.counts[4] + allocator.counts[5], allocator.counts[0] + allocator.counts[1]);
+}
+
+SEQAN_DEFINE_TEST(mason_tests_fragment_placement_index)
+{
+    // Contig of length 100 with gaps [10, 20) and [60, 65), segments of length 10, 40, and 35.
+    std::vector<std::pair<int, int> > gapIntervals = {{10, 20}, {60, 65}};
+    FragmentPlacementIndex index;
+    index.build(100, gapIntervals);
+
+    // The start positions enumerated by rank are exactly those of the fragments not overlapping with a gap.
+    for (int fragLength = 1; fragLength <= 41; ++fragLength)
+    {
+        std::vector<int> expected, starts;
+        for (int beginPos = 0; beginPos + fragLength <= 100; ++beginPos)
+            if (!overlapsWithInterval(gapIntervals, beginPos, beginPos + fragLength))
+                expected.push_back(beginPos);
+        SEQAN_ASSERT_EQ(index.numStarts(fragLength), static_cast<int64_t>(expected.size()));
+        for (int64_t rank = 0; rank < index.numStarts(fragLength); ++rank)
+            starts.push_back(index.startPos(fragLength, rank));
+        std::sort(starts.begin(), starts.end());
+        SEQAN_ASSERT(starts == expected);
+    }
+
+    // All sampled fragments are accepted and do not overlap with a gap.
+    TRng rng(42);
+    FragmentSamplerOptions options;
+    options.model = FragmentSamplerOptions::UNIFORM;
+    options.minFragmentSize = 5;
+    options.maxFragmentSize = 30;
+    FragmentSampler sampler(rng, options);
+    Fragment frag;
+    for (unsigned i = 0; i < 1000; ++i)
+    {
+        sampler.generate(frag, 0, index);
+        SEQAN_ASSERT_EQ(frag.rId, 0);
+        SEQAN_ASSERT_LEQ(frag.endPos, 100);
+        SEQAN_ASSERT_NOT(overlapsWithInterval(gapIntervals, frag.beginPos, frag.endPos));
+    }
+}
+
+SEQAN_DEFINE_TEST(mason_tests_gap_index)
+{
+    // Runs of less than three Ns are ignored except at the end, also runs crossing 8 character words are found.
+    std::vector<std::pair<int, int> > intervals;
+    seqan2::Dna5String seq = "NNNCGTACGTNNACGTACGTNNNNNNNNNNNNACGTACGTAN";
+    buildGapIntervals(intervals, seq);
+    std::vector<std::pair<int, int> > expected = {{0, 3}, {20, 32}, {41, 42}};
+    SEQAN_ASSERT(intervals == expected);
+
+    buildGapIntervals(intervals, seqan2::Dna5String("ACGTACGTACGTACGTACGT"));
+    SEQAN_ASSERT(intervals.empty());
+
+    // Round trip through the sidecar file, which must match the reference.
+    std::string fastaFileName = SEQAN_TEMP_FILENAME();
+    fastaFileName += ".fa";
+    {
+        std::ofstream out(fastaFileName.c_str());
+        out << ">chr1\nACGTNNNNACGT\n>chr2\nACGTACGTNN\n";
+    }
+    seqan2::FaiIndex faiIndex;
+    SEQAN_ASSERT(build(faiIndex, fastaFileName.c_str()));
+
+    GapIndex gapIndex;
+    gapIndex.build(faiIndex);
+    std::string gapsFileName = gapIndexFileName(fastaFileName.c_str());
+    SEQAN_ASSERT(gapIndex.save(gapsFileName.c_str()));
+
+    GapIndex loaded;
+    SEQAN_ASSERT(loaded.load(gapsFileName.c_str(), faiIndex));
+    SEQAN_ASSERT(loaded.contigNames == gapIndex.contigNames);
+    SEQAN_ASSERT(loaded.contigLengths == gapIndex.contigLengths);
+    SEQAN_ASSERT(loaded.intervals == gapIndex.intervals);
+    SEQAN_ASSERT_EQ(loaded.intervals[0].size(), 1u);
+    SEQAN_ASSERT(loaded.intervals[0][0] == std::make_pair(4, 8));
+    SEQAN_ASSERT(loaded.intervals[1][0] == std::make_pair(8, 10));
+
+    // A missing file is rejected.
+    SEQAN_ASSERT_NOT(loaded.load((gapsFileName + ".missing").c_str(), faiIndex));
+
+    // The file is rejected after the FASTA file was edited in place, even if the contig lengths did not change.
+    {
+        std::ofstream out(fastaFileName.c_str());
+        out << ">chr1\nNNNNNNNNACGT\n>chr2\nACGTACGTNN\n";
+    }
+    struct utimbuf times;
+    times.actime = times.modtime = 1000000000;
+    SEQAN_ASSERT_EQ(utime(fastaFileName.c_str(), &times), 0);
+    SEQAN_ASSERT_NOT(loaded.load(gapsFileName.c_str(), faiIndex));
+    gapIndex.build(faiIndex);
+    SEQAN_ASSERT(gapIndex.save(gapsFileName.c_str()));
+    SEQAN_ASSERT(loaded.load(gapsFileName.c_str(), faiIndex));
+    SEQAN_ASSERT(loaded.intervals[0][0] == std::make_pair(0, 8));
+}
+
+SEQAN_DEFINE_TEST(mason_tests_haplotype_cache)
+{
+    // The key depends on the content of the reference.
+    std::string fastaFileName = SEQAN_TEMP_FILENAME();
+    fastaFileName += ".fa";
+    {
+        std::ofstream out(fastaFileName.c_str());
+        out << ">chr1\nACGTACGT\n";
+    }
+    uint64_t key = 0, otherKey = 0;
+    SEQAN_ASSERT(computeHaplotypeCacheKey(key, fastaFileName.c_str(), ""));
+    {
+        std::ofstream out(fastaFileName.c_str());
+        out << ">chr1\nACGTACGA\n";
+    }
+    SEQAN_ASSERT(computeHaplotypeCacheKey(otherKey, fastaFileName.c_str(), ""));
+    SEQAN_ASSERT_NEQ(key, otherKey);
+    SEQAN_ASSERT_NOT(computeHaplotypeCacheKey(otherKey, (fastaFileName + ".missing").c_str(), ""));
+    SEQAN_ASSERT_EQ(haplotypeCacheFileName("cache", 0xabcull), std::string("cache/0000000000000abc.haplotypes"));
+
+    // Haplotype with an inversion: --40-->|<--40--|
+    seqan2::Dna5String seq = "ACGTNNNNNACGTACGTACGTACGTACGTACGTACGTACGTTTGGCCAANACGTACGTACGTACGTACGTACGTACGTAC";
+    std::vector<SmallVarInfo> varInfos = {SmallVarInfo(SmallVarInfo::SNP, 3, 1),
+                                          SmallVarInfo(SmallVarInfo::INS, 17, 2)};
+    std::vector<std::pair<int, int> > breakpoints = {{40, 0}, {80, 1}};
+    PositionMap posMap;
+    appendValue(posMap.refGapAnchors, seqan2::GapAnchor<int>(0, 0));
+    appendValue(posMap.refGapAnchors, seqan2::GapAnchor<int>(17, 19));
+    appendValue(posMap.smallVarGapAnchors, seqan2::GapAnchor<int>(17, 17));
+    appendValue(posMap.svIntervals, GenomicInterval( 0, 40,  0, 40, '+', GenomicInterval::NORMAL));
+    appendValue(posMap.svIntervals, GenomicInterval(40, 80, 40, 80, '-', GenomicInterval::INVERTED));
+    posMap.svBreakpoints.insert(std::make_pair(0, 0));
+    posMap.svBreakpoints.insert(std::make_pair(40, 1));
+    posMap.svBreakpoints.insert(std::make_pair(80, 2));
+
+    std::string cacheFileName = SEQAN_TEMP_FILENAME();
+    cacheFileName += ".haplotypes";
+    HaplotypeCacheReader reader;
+    SEQAN_ASSERT_NOT(reader.open(cacheFileName.c_str(), key));
+    {
+        HaplotypeCacheWriter writer;
+        SEQAN_ASSERT(writer.open(cacheFileName.c_str(), key));
+        SEQAN_ASSERT(writer.write(0, 1, seq, varInfos, breakpoints, posMap));
+        PositionMap identityMap;
+        appendValue(identityMap.svIntervals, GenomicInterval(0, 4, 0, 4));
+        identityMap.buildIntervalTrees();
+        SEQAN_ASSERT(writer.write(2, 0, seqan2::Dna5String("ACGT"), std::vector<SmallVarInfo>(),
+                                  std::vector<std::pair<int, int> >(), identityMap));
+        // Nothing can be read before the commit.
+        SEQAN_ASSERT_NOT(reader.open(cacheFileName.c_str(), key));
+        SEQAN_ASSERT(writer.commit());
+    }
+
+    // A different key is rejected.
+    SEQAN_ASSERT_NOT(reader.open(cacheFileName.c_str(), otherKey));
+    SEQAN_ASSERT(reader.open(cacheFileName.c_str(), key));
+
+    int rID = -1, hID = -1;
+    seqan2::Dna5String loadedSeq;
+    std::vector<SmallVarInfo> loadedVarInfos;
+    std::vector<std::pair<int, int> > loadedBreakpoints;
+    PositionMap loadedPosMap;
+    SEQAN_ASSERT(reader.readNext(rID, hID, loadedSeq, loadedVarInfos, loadedBreakpoints, loadedPosMap));
+    SEQAN_ASSERT_EQ(rID, 0);
+    SEQAN_ASSERT_EQ(hID, 1);
+    SEQAN_ASSERT_EQ(loadedSeq, seq);
+    SEQAN_ASSERT_EQ(loadedVarInfos.size(), 2u);
+    SEQAN_ASSERT_EQ(loadedVarInfos[1].kind, SmallVarInfo::INS);
+    SEQAN_ASSERT_EQ(loadedVarInfos[1].pos, 17);
+    SEQAN_ASSERT_EQ(loadedVarInfos[1].count, 2);
+    SEQAN_ASSERT(loadedBreakpoints == breakpoints);
+    SEQAN_ASSERT(loadedPosMap.refGapAnchors == posMap.refGapAnchors);
+    SEQAN_ASSERT(loadedPosMap.smallVarGapAnchors == posMap.smallVarGapAnchors);
+    SEQAN_ASSERT(loadedPosMap.svIntervals == posMap.svIntervals);
+    SEQAN_ASSERT(loadedPosMap.svBreakpoints == posMap.svBreakpoints);
+    // The interval trees are rebuilt.
+    SEQAN_ASSERT(posMap.svIntervals[1] == loadedPosMap.getGenomicInterval(50));
+    SEQAN_ASSERT(loadedPosMap.overlapsWithBreakpoint(39, 41));
+
+    SEQAN_ASSERT(reader.readNext(rID, hID, loadedSeq, loadedVarInfos, loadedBreakpoints, loadedPosMap));
+    SEQAN_ASSERT_EQ(rID, 2);
+    SEQAN_ASSERT_EQ(hID, 0);
+    SEQAN_ASSERT_EQ(loadedSeq, "ACGT");
+    SEQAN_ASSERT(loadedVarInfos.empty());
+    SEQAN_ASSERT(loadedPosMap.svBreakpoints.empty());
+    SEQAN_ASSERT_NOT(reader.readNext(rID, hID, loadedSeq, loadedVarInfos, loadedBreakpoints, loadedPosMap));
+}
+
+SEQAN_DEFINE_TEST(mason_tests_packed_reference)
+{
+    // Contigs with Ns at the begin, the end, and across words of 32 bases.
+    std::string fastaFileName = SEQAN_TEMP_FILENAME();
+    fastaFileName += ".fa";
+    {
+        std::ofstream out(fastaFileName.c_str());
+        out << ">chr1\nNACGTACGTACGTACGTACGTACGTACGTANNNNTTGCA\n"
+            << ">chr2\nGATTACA\n"
+            << ">chr3\nACGTACGTACGTACGTACGTACGTACGTACGTNN\n";
+    }
+    seqan2::FaiIndex faiIndex;
+    SEQAN_ASSERT(build(faiIndex, fastaFileName.c_str()));
+
+    std::string packedFileName = packedReferenceFileName(fastaFileName.c_str());
+    PackedReference packedReference;
+    SEQAN_ASSERT_NOT(packedReference.open(packedFileName.c_str(), faiIndex));
+    SEQAN_ASSERT(PackedReference::build(packedFileName.c_str(), faiIndex));
+    SEQAN_ASSERT(packedReference.open(packedFileName.c_str(), faiIndex));
+    SEQAN_ASSERT(packedReference.isOpen());
+
+    seqan2::Dna5String expected, seq;
+    for (unsigned i = 0; i < numSeqs(faiIndex); ++i)
+    {
+        readSequence(expected, faiIndex, i);
+        packedReference.readSequence(seq, i);
+        SEQAN_ASSERT_EQ(seq, expected);
+    }
+    packedReference.close();
+    SEQAN_ASSERT_NOT(packedReference.isOpen());
+
+    // The packed file does not match after hard-masking bases in place, which keeps the lengths and the FAI index.
+    // Rebuilding while the old file is mapped does not change the mapped bases.
+    SEQAN_ASSERT(packedReference.open(packedFileName.c_str(), faiIndex));
+    {
+        std::ofstream out(fastaFileName.c_str());
+        out << ">chr1\nNACGTACGTACGTACGTACGTACGTACGTANNNNTTGCA\n"
+            << ">chr2\nGANNACA\n"
+            << ">chr3\nACGTACGTACGTACGTACGTACGTACGTACGTNN\n";
+    }
+    struct utimbuf times;
+    times.actime = times.modtime = 1000000000;
+    SEQAN_ASSERT_EQ(utime(fastaFileName.c_str(), &times), 0);
+    PackedReference other;
+    SEQAN_ASSERT_NOT(other.open(packedFileName.c_str(), faiIndex));
+    SEQAN_ASSERT(PackedReference::build(packedFileName.c_str(), faiIndex));
+    packedReference.readSequence(seq, 1);
+    SEQAN_ASSERT_EQ(seq, seqan2::Dna5String("GATTACA"));
+    SEQAN_ASSERT(other.open(packedFileName.c_str(), faiIndex));
+    other.readSequence(seq, 1);
+    SEQAN_ASSERT_EQ(seq, seqan2::Dna5String("GANNACA"));
+    packedReference.close();
+
+    // The packed file does not match a different reference.
+    {
+        std::ofstream out(fastaFileName.c_str());
+        out << ">chr1\nACGT\n";
+    }
+    SEQAN_ASSERT(build(faiIndex, fastaFileName.c_str()));
+    SEQAN_ASSERT_NOT(packedReference.open(packedFileName.c_str(), faiIndex));
+}
+
+SEQAN_DEFINE_TEST(mason_tests_record_formatter)
+{
+    seqan2::CharString str;
+    appendNumber(str, 0);
+    appendValue(str, ' ');
+    appendNumber(str, -17);
+    appendValue(str, ' ');
+    appendNumber(str, 1234567890123ll);
+    SEQAN_ASSERT_EQ(str, "0 -17 1234567890123");
+
+    // Read names and embedded information are the same as with serialize().
+    SequencingSimulationInfo info;
+    info.sampleSequence = "CGTTA";
+    appendValue(info.cigar, seqan2::CigarElement<>('M', 3));
+    appendValue(info.cigar, seqan2::CigarElement<>('I', 2));
+    info.isForward = true;
+    info.rID = 1;
+    info.hID = 0;
+    info.beginPos = 100;
+    info.snpCount = 2;
+    info.indelCount = 1;
+    std::stringstream ss;
+    ss << "sim_42/2 ";
+    info.serialize(ss);
+    formatReadName(str, "sim_", 41, 2, &info);
+    SEQAN_ASSERT_EQ(str, ss.str());
+    formatReadName(str, "", 41, 0);
+    SEQAN_ASSERT_EQ(str, "42");
+    formatReadName(str, "", 9, 1);
+    SEQAN_ASSERT_EQ(str, "10/1");
+
+    // The tags are the same as with setTagValue().
+    seqan2::CharString expected, tags;
+    seqan2::BamTagsDict tagsDict(expected);
+    setTagValue(tagsDict, "NM", 3);
+    setTagValue(tagsDict, "MD", "10A5");
+    setTagValue(tagsDict, "oP", -1);
+    setTagValue(tagsDict, "XE", 70000);
+    setTagValue(tagsDict, "oS", 'R', 'A');
+    appendTagValue(tags, "NM", 3);
+    appendTagValue(tags, "MD", seqan2::CharString("10A5"));
+    appendTagValue(tags, "oP", -1);
+    appendTagValue(tags, "XE", 70000);
+    appendTagValue(tags, "oS", 'R');
+    SEQAN_ASSERT_EQ(tags, expected);
+}
+
+SEQAN_DEFINE_TEST(mason_tests_run_stats)
+{
+    RunStats stats("mason_test");
+
+    // Phases and counters accumulate and keep the order in which they were first added.
+    stats.addPhase("materialization", 1.5, 1.0);
+    stats.addPhase("simulation", 2.0, 7.5);
+    stats.addPhase("materialization", 0.5, 0.25);
+    SEQAN_ASSERT_EQ(stats.phases.size(), 2u);
+    SEQAN_ASSERT_EQ(stats.phases[0].name, "materialization");
+    SEQAN_ASSERT_EQ(stats.phaseWallTime("materialization"), 2.0);
+    SEQAN_ASSERT_EQ(stats.phases[0].cpuTime, 1.25);
+    SEQAN_ASSERT_EQ(stats.phaseWallTime("join"), 0.0);
+
+    stats.addCounter("reads", 10);
+    stats.addCounter("reads", 5);
+    stats.addFileSize("bytes_read", "does/not/exist");
+    SEQAN_ASSERT_EQ(stats.counters.size(), 2u);
+    SEQAN_ASSERT_EQ(stats.counters[0].second, 15);
+    SEQAN_ASSERT_EQ(stats.counters[1].second, 0);
+
+    stats.setRate("reads_per_second", 7.5);
+    stats.threadWallTime = 2.0;
+    stats.threadBusyTimes.push_back(1.5);
+
+    std::string fileName = SEQAN_TEMP_FILENAME();
+    SEQAN_ASSERT(stats.writeJson(fileName.c_str()));
+    std::ifstream in(fileName.c_str(), std::ios::binary);
+    std::stringstream ss;
+    ss << in.rdbuf();
+    std::string json = ss.str();
+    SEQAN_ASSERT_NEQ(json.find("\"program\": \"mason_test\""), std::string::npos);
+    SEQAN_ASSERT_NEQ(json.find("{\"name\": \"simulation\", \"wall_time\": 2.000000, \"cpu_time\": 7.500000}"),
+                     std::string::npos);
+    SEQAN_ASSERT_NEQ(json.find("\"reads\": 15"), std::string::npos);
+    SEQAN_ASSERT_NEQ(json.find("\"reads_per_second\": 7.500"), std::string::npos);
+    SEQAN_ASSERT_NEQ(json.find("{\"busy_time\": 1.500000, \"idle_time\": 0.500000}"), std::string::npos);
+}
+
 SEQAN_BEGIN_TESTSUITE(mason_tests)
 {
     SEQAN_CALL_TEST(mason_tests_append_orientation_elementary_operations);
     SEQAN_CALL_TEST(mason_tests_append_orientation_combination);
     SEQAN_CALL_TEST(mason_tests_append_orientation_canceling_out);
+    SEQAN_CALL_TEST(mason_tests_illumina_skip_ahead_errors);
+    SEQAN_CALL_TEST(mason_tests_quality_table);
+    SEQAN_CALL_TEST(mason_tests_quality_model);
+    SEQAN_CALL_TEST(mason_tests_sequencing_batch);
 
     SEQAN_CALL_TEST(mason_tests_position_map_inversion);
     SEQAN_CALL_TEST(mason_tests_position_map_translocation);
     SEQAN_CALL_TEST(mason_tests_position_map_to_original_interval);
 
     SEQAN_CALL_TEST(mason_tests_position_map_original_to_small_var);
+
+    SEQAN_CALL_TEST(mason_tests_trace_alignment_sequencing_errors);
+    SEQAN_CALL_TEST(mason_tests_trace_alignment_small_variants);
+
+    SEQAN_CALL_TEST(mason_tests_natural_name_key_compare);
+    SEQAN_CALL_TEST(mason_tests_loser_tree_merge);
+    SEQAN_CALL_TEST(mason_tests_spill_read);
+    SEQAN_CALL_TEST(mason_tests_id_splitter_compression);
+    SEQAN_CALL_TEST(mason_tests_shard_merge);
+
+    SEQAN_CALL_TEST(mason_tests_rng_philox);
+    SEQAN_CALL_TEST(mason_tests_rng_modes);
+    SEQAN_CALL_TEST(mason_tests_rng_engines);
+
+    SEQAN_CALL_TEST(mason_tests_bgzf_writer);
+    SEQAN_CALL_TEST(mason_tests_parallel_seq_file_out_fastq);
+    SEQAN_CALL_TEST(mason_tests_fragment_allocator);
+    SEQAN_CALL_TEST(mason_tests_fragment_placement_index);
+    SEQAN_CALL_TEST(mason_tests_gap_index);
+    SEQAN_CALL_TEST(mason_tests_haplotype_cache);
+    SEQAN_CALL_TEST(mason_tests_packed_reference);
+    SEQAN_CALL_TEST(mason_tests_record_formatter);
+    SEQAN_CALL_TEST(mason_tests_run_stats);
 }
 SEQAN_END_TESTSUITE
@@ -0,0 +1,223 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+
+#include <mason/packed_reference.h>
+
+#include <algorithm>
+#include <chrono>
+#include <cstdio>
+#include <cstring>
+#include <fstream>
+#include <sstream>
+
+namespace {
+
+// Magic string at the begin of the packed file and value for detecting a different byte order.
+char const PACKED_MAGIC[8] = {'M', 'S', 'N', 'P', 'A', 'C', 'K', '2'};
+uint64_t const BYTE_ORDER_MARK = 0x0102030405060708ull;
+
+// Returns the path of the N mask of the packed file fileName.
+std::string nMaskFileName(char const * fileName)
+{
+    return std::string(fileName) + ".nmask";
+}
+
+// The number of words before the contig lengths in the header.
+unsigned const HEADER_WORDS = 4;
+
+}  // namespace
+
+// ---------------------------------------------------------------------------
+// Function PackedReference::build()
+// ---------------------------------------------------------------------------
+
+bool PackedReference::build(char const * fileName, seqan2::FaiIndex const & faiIndex)
+{
+    // Take the fingerprint before reading, a FASTA file changed while reading then does not match the packed file.
+    GapIndex nMask;
+    if (!computeFastaFingerprint(nMask.fingerprint, toCString(faiIndex.seqFilename)))
+        return false;
+
+    // Other processes may have mapped the packed file, write a temporary file and rename it such that they keep the
+    // old file.  Concurrent runs write to different temporary files, the last rename wins.
+    std::stringstream ss;
+    ss << fileName << ".tmp." << std::chrono::steady_clock::now().time_since_epoch().count();
+    std::string tmpFileName = ss.str();
+    std::ofstream out(tmpFileName.c_str(), std::ios::binary | std::ios::out);
+    if (!out.good())
+        return false;
+
+    // Write header.
+    unsigned numContigs = numSeqs(faiIndex);
+    std::vector<uint64_t> words(HEADER_WORDS + numContigs);
+    memcpy(&words[0], PACKED_MAGIC, sizeof(uint64_t));
+    words[1] = BYTE_ORDER_MARK;
+    words[2] = nMask.fingerprint;
+    words[3] = numContigs;
+    for (unsigned i = 0; i < numContigs; ++i)
+        words[HEADER_WORDS + i] = sequenceLength(faiIndex, i);
+    out.write(reinterpret_cast<char const *>(&words[0]), words.size() * sizeof(uint64_t));
+
+    // Write the packed bases of each contig and collect the runs of Ns.
+    seqan2::Dna5String seq;
+    for (unsigned i = 0; i < numContigs; ++i)
+    {
+        seqan2::readSequence(seq, faiIndex, i);
+        packSequence(words, seq);
+        if (!words.empty())
+            out.write(reinterpret_cast<char const *>(&words[0]), words.size() * sizeof(uint64_t));
+
+        nMask.contigNames.push_back(toCString(sequenceName(faiIndex, i)));
+        nMask.contigLengths.push_back(length(seq));
+        nMask.intervals.resize(i + 1);
+        buildGapIntervals(nMask.intervals.back(), seq, 1);
+    }
+    out.close();
+
+    // Both files carry the fingerprint, a reader that sees the new N mask and the old packed file or vice versa
+    // rejects them unless they were built from the same FASTA file.
+    if (out.fail() || !nMask.save(nMaskFileName(fileName).c_str()) ||
+        std::rename(tmpFileName.c_str(), fileName) != 0)
+    {
+        std::remove(tmpFileName.c_str());
+        return false;
+    }
+    return true;
+}
+
+// ---------------------------------------------------------------------------
+// Function PackedReference::open()
+// ---------------------------------------------------------------------------
+
+bool PackedReference::open(char const * fileName, seqan2::FaiIndex const & faiIndex)
+{
+    close();
+
+    unsigned numContigs = numSeqs(faiIndex);
+    if (numContigs == 0u || !nMask.load(nMaskFileName(fileName).c_str(), faiIndex))
+        return false;
+    if (!seqan2::open(mappedFile, fileName, seqan2::OPEN_RDONLY))
+        return false;
+
+    // Check the header, the mapping is page-aligned such that the words can be accessed directly.  The N mask was
+    // checked against the current fingerprint of the FASTA file when loading.
+    size_t fileSize = length(mappedFile);
+    size_t headerSize = (HEADER_WORDS + numContigs) * sizeof(uint64_t);
+    uint64_t const * words = reinterpret_cast<uint64_t const *>(begin(mappedFile, seqan2::Standard()));
+    if (fileSize < headerSize || memcmp(words, PACKED_MAGIC, sizeof(uint64_t)) != 0 ||
+        words[1] != BYTE_ORDER_MARK || words[2] != nMask.fingerprint || words[3] != numContigs)
+    {
+        close();
+        return false;
+    }
+
+    // Locate the contigs and check their lengths against the FAI index and the file size.
+    uint64_t const * ptr = words + HEADER_WORDS + numContigs;
+    for (unsigned i = 0; i < numContigs; ++i)
+    {
+        uint64_t len = words[HEADER_WORDS + i];
+        if (len != sequenceLength(faiIndex, i))
+        {
+            close();
+            return false;
+        }
+        contigLengths.push_back(len);
+        contigData.push_back(ptr);
+        ptr += (len + 31) / 32;
+    }
+    if ((size_t)(ptr - words) * sizeof(uint64_t) != fileSize)
+    {
+        close();
+        return false;
+    }
+    return true;
+}
+
+// ---------------------------------------------------------------------------
+// Function PackedReference::close()
+// ---------------------------------------------------------------------------
+
+void PackedReference::close()
+{
+    contigData.clear();
+    contigLengths.clear();
+    seqan2::close(mappedFile);
+}
+
+// ---------------------------------------------------------------------------
+// Function PackedReference::readSequence()
+// ---------------------------------------------------------------------------
+
+void PackedReference::readSequence(seqan2::Dna5String & seq, unsigned rID) const
+{
+    unpackSequence(seq, contigData[rID], contigLengths[rID], nMask.intervals[rID]);
+}
+
+// ---------------------------------------------------------------------------
+// Function packSequence()
+// ---------------------------------------------------------------------------
+
+void packSequence(std::vector<uint64_t> & words, seqan2::Dna5String const & seq)
+{
+    words.assign((length(seq) + 31) / 32, 0);
+    for (size_t j = 0; j < length(seq); ++j)
+        words[j / 32] |= static_cast<uint64_t>(seqan2::ordValue(seq[j]) & 3) << (2 * (j % 32));
+}
+
+// ---------------------------------------------------------------------------
+// Function unpackSequence()
+// ---------------------------------------------------------------------------
+
+void unpackSequence(seqan2::Dna5String & seq,
+                    void const * words,
+                    uint64_t len,
+                    std::vector<std::pair<int, int> > const & nRuns)
+{
+    resize(seq, len, seqan2::Exact());
+
+    // Dna5 characters are stored in one byte each with the ranks A=0, C=1, G=2, T=3, N=4.
+    char const * ptr = static_cast<char const *>(words);
+    for (uint64_t pos = 0; pos < len; pos += 32, ptr += sizeof(uint64_t))
+    {
+        uint64_t word;
+        memcpy(&word, ptr, sizeof(uint64_t));
+        uint64_t endPos = std::min(len, pos + 32);
+        for (uint64_t j = pos; j < endPos; ++j, word >>= 2)
+            seq[j].value = word & 3;
+    }
+
+    for (unsigned i = 0; i < nRuns.size(); ++i)
+        std::fill(begin(seq, seqan2::Standard()) + nRuns[i].first, begin(seq, seqan2::Standard()) + nRuns[i].second,
+                  seqan2::Dna5('N'));
+}
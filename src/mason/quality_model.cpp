@@ -0,0 +1,306 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+
+#include <mason/quality_model.h>
+
+#include <algorithm>
+#include <cmath>
+#include <cstring>
+#include <fstream>
+#include <map>
+#include <memory>
+#include <mutex>
+
+#include <seqan/file.h>
+#include <seqan/seq_io.h>
+
+#include <mason/mason_types.h>
+
+namespace {
+
+// Magic string at the begin of the model file and value for detecting a different byte order.
+char const MODEL_MAGIC[8] = {'M', 'S', 'N', 'Q', 'U', 'A', 'L', '1'};
+uint64_t const BYTE_ORDER_MARK = 0x0102030405060708ull;
+// Version of the file format.
+uint64_t const MODEL_VERSION = 1;
+// Number of quality values and number of doubles stored for each cycle.
+unsigned const NUM_QUALITIES = QualityTable::MAX_QUALITY + 1;
+unsigned const CYCLE_WORDS = 2 + 2 * NUM_QUALITIES;
+
+// Append the bytes of value to buffer.
+template <typename T>
+void appendRaw(std::string & buffer, T value)
+{
+    buffer.append(reinterpret_cast<char const *>(&value), sizeof(T));
+}
+
+// Read value from ptr and advance ptr, the caller checks that there are enough bytes left.
+template <typename T>
+T readRaw(char const *& ptr)
+{
+    T value;
+    memcpy(&value, ptr, sizeof(T));
+    ptr += sizeof(T);
+    return value;
+}
+
+}  // namespace (anonymous)
+
+// ---------------------------------------------------------------------------
+// Function QualityModelBuilder::addRead()
+// ---------------------------------------------------------------------------
+
+void QualityModelBuilder::addRead(seqan2::Dna5String const & seq, seqan2::CharString const & quals)
+{
+    unsigned len = std::min(length(seq), length(quals));
+    if (nCounts.size() < len)
+    {
+        nCounts.resize(len, 0);
+        qualityCounts.resize(len * NUM_QUALITIES, 0);
+    }
+
+    int const maxQuality = QualityTable::MAX_QUALITY;
+    for (unsigned i = 0; i < len; ++i)
+    {
+        int q = std::max(0, std::min(maxQuality, quals[i] - '!'));
+        if (seq[i] == 'N')
+        {
+            nCounts[i] += 1;
+            nQualityCounts[q] += 1;
+        }
+        else
+        {
+            qualityCounts[i * NUM_QUALITIES + q] += 1;
+        }
+    }
+    ++numReads;
+}
+
+// ---------------------------------------------------------------------------
+// Function QualityModelBuilder::build()
+// ---------------------------------------------------------------------------
+
+bool QualityModelBuilder::build(std::vector<QualityModelCycle> & cycles, int & nQuality) const
+{
+    if (nCounts.empty())
+        return false;
+
+    // The error probability of each quality and the counts of all cycles, used for cycles without called bases.
+    double errorProbabilities[NUM_QUALITIES];
+    std::vector<uint64_t> totalCounts(NUM_QUALITIES, 0);
+    for (unsigned q = 0; q < NUM_QUALITIES; ++q)
+    {
+        errorProbabilities[q] = std::pow(10.0, -(double)q / 10.0);
+        for (unsigned i = 0; i < nCounts.size(); ++i)
+            totalCounts[q] += qualityCounts[i * NUM_QUALITIES + q];
+    }
+
+    cycles.resize(nCounts.size());
+    double probabilities[NUM_QUALITIES], matchProbabilities[NUM_QUALITIES], mismatchProbabilities[NUM_QUALITIES];
+    for (unsigned i = 0; i < nCounts.size(); ++i)
+    {
+        uint64_t const * counts = &qualityCounts[i * NUM_QUALITIES];
+        uint64_t numCalled = 0;
+        for (unsigned q = 0; q < NUM_QUALITIES; ++q)
+            numCalled += counts[q];
+        QualityModelCycle & cycle = cycles[i];
+        cycle.nProbability = (double)nCounts[i] / (numCalled + nCounts[i]);
+
+        if (numCalled == 0)
+            counts = &totalCounts[0];
+        double sum = 0;
+        for (unsigned q = 0; q < NUM_QUALITIES; ++q)
+            sum += counts[q];
+
+        // Split the quality distribution into the parts of the non-mismatch and mismatch bases.
+        double sumMatch = 0, sumMismatch = 0;
+        for (unsigned q = 0; q < NUM_QUALITIES; ++q)
+        {
+            probabilities[q] = (sum > 0) ? counts[q] / sum : 0.0;
+            matchProbabilities[q] = probabilities[q] * (1 - errorProbabilities[q]);
+            mismatchProbabilities[q] = probabilities[q] * errorProbabilities[q];
+            sumMatch += matchProbabilities[q];
+            sumMismatch += mismatchProbabilities[q];
+        }
+        cycle.mismatchProbability = sumMismatch;
+        cycle.matchQualities.initFromProbabilities((sumMatch > 0) ? matchProbabilities : probabilities);
+        cycle.mismatchQualities.initFromProbabilities((sumMismatch > 0) ? mismatchProbabilities : probabilities);
+    }
+
+    // The Ns get their most frequent quality.
+    nQuality = std::max_element(nQualityCounts.begin(), nQualityCounts.end()) - nQualityCounts.begin();
+    return true;
+}
+
+// ---------------------------------------------------------------------------
+// Function trainQualityModel()
+// ---------------------------------------------------------------------------
+
+bool trainQualityModel(std::vector<QualityModelCycle> & cycles, int & nQuality, char const * fastqFileName,
+                       uint64_t maxReads)
+{
+    seqan2::SeqFileIn in;
+    if (!open(in, fastqFileName))
+        return false;
+
+    QualityModelBuilder builder;
+    seqan2::CharString id, quals;
+    seqan2::Dna5String seq;
+    try
+    {
+        while (!atEnd(in) && (maxReads == 0 || builder.numReads < maxReads))
+        {
+            readRecord(id, seq, quals, in);
+            builder.addRead(seq, quals);
+        }
+    }
+    catch (seqan2::Exception const &)
+    {
+        return false;
+    }
+
+    return builder.build(cycles, nQuality);
+}
+
+// ---------------------------------------------------------------------------
+// Function writeQualityModel()
+// ---------------------------------------------------------------------------
+
+bool writeQualityModel(char const * fileName, QualityModel const & model)
+{
+    std::string buffer(MODEL_MAGIC, sizeof(MODEL_MAGIC));
+    appendRaw<uint64_t>(buffer, BYTE_ORDER_MARK);
+    appendRaw<uint64_t>(buffer, MODEL_VERSION);
+    for (unsigned mate = 0; mate < 2u; ++mate)
+    {
+        appendRaw<uint64_t>(buffer, model.cycles[mate].size());
+        appendRaw<int64_t>(buffer, model.nQualities[mate]);
+        for (QualityModelCycle const & cycle : model.cycles[mate])
+        {
+            appendRaw<double>(buffer, cycle.mismatchProbability);
+            appendRaw<double>(buffer, cycle.nProbability);
+            for (unsigned q = 0; q < NUM_QUALITIES; ++q)
+                appendRaw<double>(buffer, cycle.matchQualities.cdf[q]);
+            for (unsigned q = 0; q < NUM_QUALITIES; ++q)
+                appendRaw<double>(buffer, cycle.mismatchQualities.cdf[q]);
+        }
+    }
+
+    std::ofstream out(fileName, std::ios::binary | std::ios::out);
+    out.write(buffer.data(), buffer.size());
+    out.close();
+    return out.good();
+}
+
+// ---------------------------------------------------------------------------
+// Function readQualityModel()
+// ---------------------------------------------------------------------------
+
+bool readQualityModel(QualityModel & model, char const * fileName)
+{
+    seqan2::String<char, seqan2::MMap<> > mappedFile;
+    if (!seqan2::open(mappedFile, fileName, seqan2::OPEN_RDONLY))
+        return false;
+
+    char const * ptr = begin(mappedFile, seqan2::Standard());
+    char const * endPtr = ptr + length(mappedFile);
+    if (length(mappedFile) < sizeof(MODEL_MAGIC) + 2 * sizeof(uint64_t) ||
+        memcmp(ptr, MODEL_MAGIC, sizeof(MODEL_MAGIC)) != 0)
+        return false;
+    ptr += sizeof(MODEL_MAGIC);
+    if (readRaw<uint64_t>(ptr) != BYTE_ORDER_MARK || readRaw<uint64_t>(ptr) != MODEL_VERSION)
+        return false;
+
+    for (unsigned mate = 0; mate < 2u; ++mate)
+    {
+        if ((uint64_t)(endPtr - ptr) < 2 * sizeof(uint64_t))
+            return false;
+        uint64_t numCycles = readRaw<uint64_t>(ptr);
+        model.nQualities[mate] = readRaw<int64_t>(ptr);
+        if ((uint64_t)(endPtr - ptr) / (CYCLE_WORDS * sizeof(double)) < numCycles)
+            return false;
+
+        model.cycles[mate].resize(numCycles);
+        for (QualityModelCycle & cycle : model.cycles[mate])
+        {
+            cycle.mismatchProbability = readRaw<double>(ptr);
+            cycle.nProbability = readRaw<double>(ptr);
+            for (unsigned q = 0; q < NUM_QUALITIES; ++q)
+                cycle.matchQualities.cdf[q] = readRaw<double>(ptr);
+            for (unsigned q = 0; q < NUM_QUALITIES; ++q)
+                cycle.mismatchQualities.cdf[q] = readRaw<double>(ptr);
+        }
+    }
+
+    // The left reads must have tables and there must be no trailing data.
+    return !model.cycles[0].empty() && ptr == endPtr;
+}
+
+// ---------------------------------------------------------------------------
+// Function sharedQualityModel()
+// ---------------------------------------------------------------------------
+
+QualityModel const & sharedQualityModel(std::string const & modelFileName,
+                                        std::string const & leftFastqFileName,
+                                        std::string const & rightFastqFileName)
+{
+    static std::mutex mutex;
+    static std::map<std::string, std::unique_ptr<QualityModel> > models;
+
+    std::lock_guard<std::mutex> lock(mutex);
+    std::string key = modelFileName + '\n' + leftFastqFileName + '\n' + rightFastqFileName;
+    std::unique_ptr<QualityModel> & model = models[key];
+    if (model)
+        return *model;
+
+    std::unique_ptr<QualityModel> result(new QualityModel);
+    if (!modelFileName.empty())
+    {
+        if (!readQualityModel(*result, modelFileName.c_str()))
+            throw MasonIOException("Could not read quality model file " + modelFileName + ".");
+    }
+    else
+    {
+        std::string const fileNames[2] = {leftFastqFileName, rightFastqFileName};
+        for (unsigned mate = 0; mate < 2u; ++mate)
+            if (!fileNames[mate].empty() &&
+                !trainQualityModel(result->cycles[mate], result->nQualities[mate], fileNames[mate].c_str()))
+                throw MasonIOException("Could not train quality model from " + fileNames[mate] + ".");
+        if (result->cycles[0].empty())
+            throw MasonIOException("No template FASTQ file for the left reads.");
+    }
+
+    model = std::move(result);
+    return *model;
+}
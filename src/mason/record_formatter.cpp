@@ -0,0 +1,125 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+
+#include <mason/record_formatter.h>
+
+namespace {
+
+// Append the key and the type character of a BAM tag to tags.
+void appendTagKey(seqan2::CharString & tags, char const * key, char typeC)
+{
+    appendValue(tags, key[0]);
+    appendValue(tags, key[1]);
+    appendValue(tags, typeC);
+}
+
+}  // namespace
+
+// ---------------------------------------------------------------------------
+// Function appendSimulationInfo()
+// ---------------------------------------------------------------------------
+
+void appendSimulationInfo(seqan2::CharString & target, SequencingSimulationInfo const & info)
+{
+    append(target, "SEQUENCE=");
+    appendNumber(target, info.rID);
+    append(target, " HAPLOTYPE=");
+    appendNumber(target, info.hID);
+    append(target, " BEGIN_POS=");
+    appendNumber(target, info.beginPos);
+    append(target, " SAMPLE_SEQUENCE=");
+    for (unsigned i = 0; i < length(info.sampleSequence); ++i)
+        appendValue(target, static_cast<char>(info.sampleSequence[i]));
+    append(target, " CIGAR=");
+    for (unsigned i = 0; i < length(info.cigar); ++i)
+    {
+        appendNumber(target, info.cigar[i].count);
+        appendValue(target, info.cigar[i].operation);
+    }
+    append(target, " STRAND=");
+    appendValue(target, info.isForward ? 'F' : 'R');
+    append(target, " NUM_SNPS=");
+    appendNumber(target, info.snpCount);
+    append(target, " NUM_INDELS=");
+    appendNumber(target, info.indelCount);
+}
+
+// ---------------------------------------------------------------------------
+// Function formatReadName()
+// ---------------------------------------------------------------------------
+
+void formatReadName(seqan2::CharString & name,
+                    seqan2::CharString const & prefix,
+                    int fragId,
+                    int num,
+                    SequencingSimulationInfo const * info)
+{
+    clear(name);
+    append(name, prefix);
+    appendNumber(name, fragId + 1);
+    if (num == 1)
+        append(name, "/1");
+    else if (num == 2)
+        append(name, "/2");
+    if (info)
+    {
+        appendValue(name, ' ');
+        appendSimulationInfo(name, *info);
+    }
+}
+
+// ---------------------------------------------------------------------------
+// Function appendTagValue()
+// ---------------------------------------------------------------------------
+
+void appendTagValue(seqan2::CharString & tags, char const * key, int32_t val)
+{
+    appendTagKey(tags, key, 'i');
+    uint32_t x = static_cast<uint32_t>(val);
+    for (int i = 0; i < 4; ++i, x >>= 8)  // little endian
+        appendValue(tags, static_cast<char>(x & 0xff));
+}
+
+void appendTagValue(seqan2::CharString & tags, char const * key, char val)
+{
+    appendTagKey(tags, key, 'A');
+    appendValue(tags, val);
+}
+
+void appendTagValue(seqan2::CharString & tags, char const * key, seqan2::CharString const & val)
+{
+    appendTagKey(tags, key, 'Z');
+    append(tags, val);
+    appendValue(tags, '\0');
+}
@@ -0,0 +1,231 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+
+#include <mason/run_stats.h>
+
+#include <chrono>
+#include <cstdio>
+#include <ctime>
+
+#include <sys/stat.h>
+#if !defined(_WIN32)
+#include <sys/resource.h>
+#endif  // #if !defined(_WIN32)
+
+namespace {
+
+// Write str to out as a JSON string.
+void writeJsonString(FILE * out, std::string const & str)
+{
+    fputc('"', out);
+    for (unsigned i = 0; i < str.size(); ++i)
+    {
+        if (str[i] == '"' || str[i] == '\\')
+            fputc('\\', out);
+        if (static_cast<unsigned char>(str[i]) < 0x20)
+            fprintf(out, "\\u%04x", static_cast<unsigned>(str[i]));
+        else
+            fputc(str[i], out);
+    }
+    fputc('"', out);
+}
+
+}  // namespace
+
+// ---------------------------------------------------------------------------
+// Function wallTime()
+// ---------------------------------------------------------------------------
+
+double wallTime()
+{
+    return std::chrono::duration<double>(std::chrono::steady_clock::now().time_since_epoch()).count();
+}
+
+// ---------------------------------------------------------------------------
+// Function cpuTime()
+// ---------------------------------------------------------------------------
+
+double cpuTime()
+{
+    return static_cast<double>(std::clock()) / CLOCKS_PER_SEC;
+}
+
+// ---------------------------------------------------------------------------
+// Function peakResidentSetSize()
+// ---------------------------------------------------------------------------
+
+int64_t peakResidentSetSize()
+{
+#if defined(_WIN32)
+    return 0;
+#else  // #if defined(_WIN32)
+    struct rusage usage;
+    if (getrusage(RUSAGE_SELF, &usage) != 0)
+        return 0;
+#if defined(__APPLE__)
+    return usage.ru_maxrss;  // bytes
+#else  // #if defined(__APPLE__)
+    return static_cast<int64_t>(usage.ru_maxrss) * 1024;  // kilobytes
+#endif  // #if defined(__APPLE__)
+#endif  // #if defined(_WIN32)
+}
+
+// ---------------------------------------------------------------------------
+// Class RunStats
+// ---------------------------------------------------------------------------
+
+RunStats::RunStats(char const * programName) :
+        programName(programName), beginWallTime(wallTime()), beginCpuTime(cpuTime()), threadWallTime(0)
+{}
+
+void RunStats::addPhase(char const * name, double wallTime, double cpuTime)
+{
+    std::lock_guard<std::mutex> lock(mutex);
+    unsigned i = 0;
+    while (i < phases.size() && phases[i].name != name)
+        ++i;
+    if (i == phases.size())
+    {
+        phases.resize(i + 1);
+        phases[i].name = name;
+    }
+    phases[i].wallTime += wallTime;
+    phases[i].cpuTime += cpuTime;
+}
+
+double RunStats::phaseWallTime(char const * name) const
+{
+    std::lock_guard<std::mutex> lock(mutex);
+    for (unsigned i = 0; i < phases.size(); ++i)
+        if (phases[i].name == name)
+            return phases[i].wallTime;
+    return 0;
+}
+
+void RunStats::addCounter(char const * name, int64_t value)
+{
+    std::lock_guard<std::mutex> lock(mutex);
+    unsigned i = 0;
+    while (i < counters.size() && counters[i].first != name)
+        ++i;
+    if (i == counters.size())
+        counters.push_back(std::make_pair(std::string(name), int64_t(0)));
+    counters[i].second += value;
+}
+
+void RunStats::addFileSize(char const * name, char const * fileName)
+{
+    struct stat st;
+    int64_t size = 0;
+    if (fileName && *fileName && stat(fileName, &st) == 0 && (st.st_mode & S_IFMT) == S_IFREG)
+        size = st.st_size;
+    addCounter(name, size);
+}
+
+void RunStats::setRate(char const * name, double value)
+{
+    std::lock_guard<std::mutex> lock(mutex);
+    unsigned i = 0;
+    while (i < rates.size() && rates[i].first != name)
+        ++i;
+    if (i == rates.size())
+        rates.push_back(std::make_pair(std::string(name), 0.0));
+    rates[i].second = value;
+}
+
+bool RunStats::writeJson(char const * fileName) const
+{
+    std::lock_guard<std::mutex> lock(mutex);
+    FILE * out = fopen(fileName, "wb");
+    if (!out)
+        return false;
+
+    fprintf(out, "{\n  \"program\": ");
+    writeJsonString(out, programName);
+    fprintf(out, ",\n  \"wall_time\": %.6f,\n  \"cpu_time\": %.6f,\n  \"peak_rss_bytes\": %lld,\n",
+            wallTime() - beginWallTime, cpuTime() - beginCpuTime, static_cast<long long>(peakResidentSetSize()));
+
+    fprintf(out, "  \"phases\": [");
+    for (unsigned i = 0; i < phases.size(); ++i)
+    {
+        fprintf(out, "%s\n    {\"name\": ", (i == 0u) ? "" : ",");
+        writeJsonString(out, phases[i].name);
+        fprintf(out, ", \"wall_time\": %.6f, \"cpu_time\": %.6f}", phases[i].wallTime, phases[i].cpuTime);
+    }
+    fprintf(out, "%s],\n", phases.empty() ? "" : "\n  ");
+
+    fprintf(out, "  \"counters\": {");
+    for (unsigned i = 0; i < counters.size(); ++i)
+    {
+        fprintf(out, "%s\n    ", (i == 0u) ? "" : ",");
+        writeJsonString(out, counters[i].first);
+        fprintf(out, ": %lld", static_cast<long long>(counters[i].second));
+    }
+    fprintf(out, "%s},\n", counters.empty() ? "" : "\n  ");
+
+    fprintf(out, "  \"rates\": {");
+    for (unsigned i = 0; i < rates.size(); ++i)
+    {
+        fprintf(out, "%s\n    ", (i == 0u) ? "" : ",");
+        writeJsonString(out, rates[i].first);
+        fprintf(out, ": %.3f", rates[i].second);
+    }
+    fprintf(out, "%s},\n", rates.empty() ? "" : "\n  ");
+
+    // The idle time of a thread is the part of the simulation wall time in which it did not simulate reads.
+    fprintf(out, "  \"threads\": [");
+    for (unsigned i = 0; i < threadBusyTimes.size(); ++i)
+    {
+        double idleTime = threadWallTime - threadBusyTimes[i];
+        fprintf(out, "%s\n    {\"busy_time\": %.6f, \"idle_time\": %.6f}", (i == 0u) ? "" : ",",
+                threadBusyTimes[i], (idleTime < 0) ? 0.0 : idleTime);
+    }
+    fprintf(out, "%s]\n}\n", threadBusyTimes.empty() ? "" : "\n  ");
+
+    bool ok = !ferror(out);
+    return (fclose(out) == 0) && ok;
+}
+
+// ---------------------------------------------------------------------------
+// Class PhaseTimer
+// ---------------------------------------------------------------------------
+
+PhaseTimer::PhaseTimer(RunStats & stats, char const * name) :
+        stats(stats), name(name), beginWallTime(wallTime()), beginCpuTime(cpuTime())
+{}
+
+PhaseTimer::~PhaseTimer()
+{
+    stats.addPhase(name, wallTime() - beginWallTime, cpuTime() - beginCpuTime);
+}
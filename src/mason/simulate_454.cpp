@@ -36,6 +36,9 @@
 
 // Maximal homopolymer length we will observe.
 const unsigned MAX_HOMOPOLYMER_LEN = 40;
+// Number of homopolymer lengths to sum the densities over for computing the qualities.  Anecdotally through plot in
+// maple: Enough to sum up to 4 or 2 times the maximal homopolymer length.
+const unsigned NUM_QUALITY_DENSITIES = ((2 * MAX_HOMOPOLYMER_LEN > 4u) ? 2 * MAX_HOMOPOLYMER_LEN : 4u) + 1;
 
 // ===========================================================================
 // Class ThresholdMatrix
@@ -291,7 +294,6 @@ void Roche454SequencingSimulator::simulateRead(
     }
 
     // Get a copy of the to be sequenced base stretch.
-    TRead haplotypeInfix;
     if (dir == LEFT)
         haplotypeInfix = prefix(frag, sampleLength);
     else
@@ -300,11 +302,10 @@ void Roche454SequencingSimulator::simulateRead(
         reverseComplement(haplotypeInfix);
 
     // In the flow cell simulation, we will simulate light intensities which will be stored in observedIntensities.
-    seqan2::String<double> observedIntensities;
+    clear(observedIntensities);
     reserve(observedIntensities, 4 * sampleLength);
-    seqan2::Dna5String observedBases;
     // We also store the real homopolymer length.
-    seqan2::String<unsigned> realBaseCount;
+    clear(realBaseCount);
 
     // Probability density function to use for the background noise.
     std::lognormal_distribution<double> distNoise(seqan2::cvtLogNormalDistParam(roche454Options.backgroundNoiseMean,
@@ -351,7 +352,8 @@ void Roche454SequencingSimulator::simulateRead(
         }
     }
 
-    seqan2::String<seqan2::CigarElement<> > cigar;
+    TCigarString & cigar = cigarBuffer;
+    clear(cigar);
 
     // Call bases, from this build the edit string and maybe qualities.  We only support the "inter" base calling
     // method which was published by the MetaSim authors in the PLOS paper.
@@ -380,13 +382,19 @@ void Roche454SequencingSimulator::simulateRead(
         // Simulate qualities if configured to do so.
         if (seqOptions->simulateQualities)
         {
-            // Compute likelihood for calling the bases, given this intensity and the Phred score from this.
+            // Compute likelihood for calling the bases, given this intensity and the Phred score from this.  The
+            // densities are kept for computing the probabilities below.
+            double densities[NUM_QUALITY_DENSITIES];
             double densitySum = 0;
-            for (unsigned j = 0; j <= std::max(4u, 2 * MAX_HOMOPOLYMER_LEN); ++j)  // Anecdotally through plot in maple: Enough to sum up to 4 or 2 times the maximal homopolymer length.
-                densitySum += model->thresholdMatrix.dispatchDensityFunction(j, *it);
+            for (unsigned j = 0; j < NUM_QUALITY_DENSITIES; ++j)
+            {
+                densities[j] = model->thresholdMatrix.dispatchDensityFunction(j, *it);
+                densitySum += densities[j];
+            }
             double x = 0;  // Probability of seeing < (j+1) bases.
             for (unsigned j = 0; j < calledBaseCount; ++j) {
-                x += model->thresholdMatrix.dispatchDensityFunction(j, *it);
+                x += (j < NUM_QUALITY_DENSITIES) ? densities[j]
+                                                 : model->thresholdMatrix.dispatchDensityFunction(j, *it);
                 int q = -static_cast<int>(10 * ::std::log10(x / densitySum));
                 q = std::max(0, std::min(40, q));
                 appendValue(quals, (char)('!' + q));
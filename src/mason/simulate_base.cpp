@@ -56,28 +56,9 @@ void SequencingSimulator::simulatePairedEnd(TRead & seqL, TQualities & qualsL, S
                                             TFragment const & frag,
                                             MethylationLevels const * levels)
 {
-    bool isForward;
-    std::uniform_int_distribution<int> distBool(0, 1);
-    if (seqOptions->strands == SequencingOptions::BOTH)
-        isForward = (distBool(rng) == 1);
-    else
-        isForward = (seqOptions->strands == SequencingOptions::FORWARD);
-
-    if (!seqOptions->bsSeqOptions.bsSimEnabled)
-    {
-        _simulatePairedEnd(seqL, qualsL, infoL, seqR, qualsR, infoR, frag, isForward);
-    }
-    else
-    {
-        SEQAN_ASSERT(levels);
-        bool bsForward = isForward;
-        // Re-pick strandedness of the BS-treated fragment.
-        if (seqOptions->bsSeqOptions.bsProtocol != BSSeqOptions::DIRECTIONAL)
-            bsForward = (distBool(methRng) == 1);
-        _simulateBSTreatment(methFrag, frag, *levels, !bsForward);
-        _simulatePairedEnd(seqL, qualsL, infoL, seqR, qualsR, infoR,
-                           infix(methFrag, 0, length(methFrag)), isForward);
-    }
+    bool isForward = false;
+    TFragment seqFrag = _prepareFragment(isForward, frag, levels);
+    _simulatePairedEnd(seqL, qualsL, infoL, seqR, qualsR, infoR, seqFrag, isForward);
 }
 
 // ---------------------------------------------------------------------------
@@ -89,7 +70,38 @@ void SequencingSimulator::simulateSingleEnd(TRead & seq, TQualities & quals, Seq
                                             TFragment const & frag,
                                             MethylationLevels const * levels)
 {
-    bool isForward;
+    bool isForward = false;
+    TFragment seqFrag = _prepareFragment(isForward, frag, levels);
+    _simulateSingleEnd(seq, quals, info, seqFrag, isForward);
+}
+
+// ---------------------------------------------------------------------------
+// Function SequencingSimulator::simulateReads()
+// ---------------------------------------------------------------------------
+
+// Simulate sequencing of a batch of fragments, one virtual call per read.
+void SequencingSimulator::simulateReads(SequencingReadBatch & batch, std::vector<TFragment> const & frags,
+                                        unsigned beginIdx, unsigned endIdx, MethylationLevels const * levels)
+{
+    for (unsigned i = beginIdx; i < endIdx; ++i)
+    {
+        if (seqOptions->simulateMatePairs)
+            simulatePairedEnd(batch.seqs[2 * i], batch.quals[2 * i], batch.infos[2 * i],
+                              batch.seqs[2 * i + 1], batch.quals[2 * i + 1], batch.infos[2 * i + 1],
+                              frags[i], levels);
+        else
+            simulateSingleEnd(batch.seqs[i], batch.quals[i], batch.infos[i], frags[i], levels);
+    }
+}
+
+// ---------------------------------------------------------------------------
+// Function SequencingSimulator::_prepareFragment()
+// ---------------------------------------------------------------------------
+
+// Pick the strand and simulate the BS-seq treatment of a fragment.
+TFragment SequencingSimulator::_prepareFragment(bool & isForward, TFragment const & frag,
+                                                MethylationLevels const * levels)
+{
     std::uniform_int_distribution<int> distBool(0, 1);
     if (seqOptions->strands == SequencingOptions::BOTH)
         isForward = (distBool(rng) == 1);
@@ -97,19 +109,15 @@ void SequencingSimulator::simulateSingleEnd(TRead & seq, TQualities & quals, Seq
         isForward = (seqOptions->strands == SequencingOptions::FORWARD);
 
     if (!seqOptions->bsSeqOptions.bsSimEnabled)
-    {
-        _simulateSingleEnd(seq, quals, info, frag, isForward);
-    }
-    else
-    {
-        SEQAN_ASSERT(levels);
-        bool bsForward = isForward;
-        // Re-pick strandedness of the BS-treated fragment.
-        if (seqOptions->bsSeqOptions.bsProtocol != BSSeqOptions::DIRECTIONAL)
-            bsForward = (distBool(methRng) == 1);
-        _simulateBSTreatment(methFrag, frag, *levels, !bsForward);
-        _simulateSingleEnd(seq, quals, info, infix(methFrag, 0, length(methFrag)), isForward);
-    }
+        return frag;
+
+    SEQAN_ASSERT(levels);
+    bool bsForward = isForward;
+    // Re-pick strandedness of the BS-treated fragment.
+    if (seqOptions->bsSeqOptions.bsProtocol != BSSeqOptions::DIRECTIONAL)
+        bsForward = (distBool(methRng) == 1);
+    _simulateBSTreatment(methFrag, frag, *levels, !bsForward);
+    return infix(methFrag, 0, length(methFrag));
 }
 
 // ---------------------------------------------------------------------------
@@ -146,7 +154,38 @@ void SequencingSimulator::_simulateBSTreatment(seqan2::Dna5String & methFragment
 }
 
 // ---------------------------------------------------------------------------
-// Function SequencingSimulator::simulatePairedEnd()
+// Function SequencingSimulator::_getMateLayout()
+// ---------------------------------------------------------------------------
+
+// Get the directions and strands of the left and right read.
+void SequencingSimulator::_getMateLayout(Direction & dirL, Strand & strandL, Direction & dirR, Strand & strandR,
+                                         bool isForward) const
+{
+    // The direction and strand of the left and right read for each mate orientation, if the left read is from the
+    // forward strand (first two entries) or from the reverse strand (last two entries).
+    static Direction const DIRECTIONS[4][4] = {
+        {LEFT, RIGHT, RIGHT, LEFT},  // FORWARD_REVERSE
+        {LEFT, RIGHT, RIGHT, LEFT},  // REVERSE_FORWARD
+        {LEFT, RIGHT, RIGHT, LEFT},  // FORWARD_FORWARD
+        {RIGHT, LEFT, LEFT, RIGHT}   // FORWARD_FORWARD2
+    };
+    static Strand const STRANDS[4][4] = {
+        {FORWARD, REVERSE, REVERSE, FORWARD},  // FORWARD_REVERSE
+        {REVERSE, FORWARD, FORWARD, REVERSE},  // REVERSE_FORWARD
+        {FORWARD, FORWARD, REVERSE, REVERSE},  // FORWARD_FORWARD
+        {FORWARD, FORWARD, REVERSE, REVERSE}   // FORWARD_FORWARD2
+    };
+
+    unsigned row = seqOptions->mateOrientation;
+    unsigned col = isForward ? 0 : 2;
+    dirL = DIRECTIONS[row][col];
+    strandL = STRANDS[row][col];
+    dirR = DIRECTIONS[row][col + 1];
+    strandR = STRANDS[row][col + 1];
+}
+
+// ---------------------------------------------------------------------------
+// Function SequencingSimulator::_simulatePairedEnd()
 // ---------------------------------------------------------------------------
 
 // Simulate paired-end sequencing from a fragment.
@@ -155,60 +194,11 @@ void SequencingSimulator::_simulatePairedEnd(TRead & seqL, TQualities & qualsL,
                                              TFragment const & frag,
                                              bool isForward)
 {
-    // TODO(holtgrew): Use a table for this to simplify things?
-    Strand leftStrand = isForward ? FORWARD : REVERSE;
-    switch (seqOptions->mateOrientation)
-    {
-        case SequencingOptions::FORWARD_REVERSE:
-            if (leftStrand == FORWARD)
-            {
-                this->simulateRead(seqL, qualsL, infoL, frag, LEFT, FORWARD);
-                this->simulateRead(seqR, qualsR, infoR, frag, RIGHT, REVERSE);
-            }
-            else
-            {
-                this->simulateRead(seqL, qualsL, infoL, frag, RIGHT, REVERSE);
-                this->simulateRead(seqR, qualsR, infoR, frag, LEFT, FORWARD);
-            }
-            break;
-        case SequencingOptions::REVERSE_FORWARD:
-            if (leftStrand == FORWARD)
-            {
-                this->simulateRead(seqL, qualsL, infoL, frag, LEFT, REVERSE);
-                this->simulateRead(seqR, qualsR, infoR, frag, RIGHT, FORWARD);
-            }
-            else
-            {
-                this->simulateRead(seqL, qualsL, infoL, frag, RIGHT, FORWARD);
-                this->simulateRead(seqR, qualsR, infoR, frag, LEFT, REVERSE);
-            }
-            break;
-        case SequencingOptions::FORWARD_FORWARD:
-            if (leftStrand == FORWARD)
-            {
-                this->simulateRead(seqL, qualsL, infoL, frag, LEFT, FORWARD);
-                this->simulateRead(seqR, qualsR, infoR, frag, RIGHT, FORWARD);
-            }
-            else
-            {
-                this->simulateRead(seqL, qualsL, infoL, frag, RIGHT, REVERSE);
-                this->simulateRead(seqR, qualsR, infoR, frag, LEFT, REVERSE);
-            }
-            break;
-        case SequencingOptions::FORWARD_FORWARD2:
-            if (leftStrand == FORWARD)
-            {
-                this->simulateRead(seqL, qualsL, infoL, frag, RIGHT, FORWARD);
-                this->simulateRead(seqR, qualsR, infoR, frag, LEFT, FORWARD);
-            }
-            else
-            {
-                this->simulateRead(seqL, qualsL, infoL, frag, LEFT, REVERSE);
-                this->simulateRead(seqR, qualsR, infoR, frag, RIGHT, REVERSE);
-            }
-            break;
-    }
-    // std::cerr << "\n";
+    Direction dirL = LEFT, dirR = RIGHT;
+    Strand strandL = FORWARD, strandR = REVERSE;
+    _getMateLayout(dirL, strandL, dirR, strandR, isForward);
+    this->simulateRead(seqL, qualsL, infoL, frag, dirL, strandL);
+    this->simulateRead(seqR, qualsR, infoR, frag, dirR, strandR);
 }
 
 // ---------------------------------------------------------------------------
@@ -32,6 +32,11 @@
 // Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
 // ==========================================================================
 
+#include <algorithm>
+#include <cmath>
+#include <functional>
+
+#include <mason/quality_model.h>
 #include <mason/sequencing.h>
 
 // ===========================================================================
@@ -43,6 +48,9 @@ class IlluminaModel
 public:
     // Probabilities for a mismatch at a given position.
     seqan2::String<double> mismatchProbabilities;
+    // Cumulative sums of log(1 - p) where p is the probability of any error event at a given position, entry i is the
+    // sum for the positions before i.  Only computed for skip-ahead error placement.
+    seqan2::String<double> logSurvival;
 
     // Standard deviations for the normal distributions of base qualities for the mismatch case.
     seqan2::String<double> mismatchQualityMeans;
@@ -54,10 +62,39 @@ public:
     // Standard deviations for the normal distributions of base qualities for the non-mismatch case.
     seqan2::String<double> qualityStdDevs;
 
-    IlluminaModel()
+    // Tables for sampling the base qualities of the mismatch and non-mismatch case at a given position, only computed
+    // if SequencingOptions::qualityTables is set.
+    seqan2::String<QualityTable> mismatchQualityTables;
+    seqan2::String<QualityTable> qualityTables;
+    // Whether to sample the qualities from the tables instead of the normal distributions.
+    bool useQualityTables;
+
+    // Probabilities for an N at a given position and the quality of the Ns, only used for the empirical model.
+    seqan2::String<double> nProbabilities;
+    int nQuality;
+
+    IlluminaModel() : useQualityTables(false), nQuality(0)
     {}
 };
 
+namespace {
+
+// Compute the cumulative log survival probabilities for skip-ahead error placement.  Positions with an error
+// probability of 1 or more get a large finite penalty instead of -inf such that differences stay defined.
+void _computeLogSurvival(IlluminaModel & model, IlluminaSequencingOptions const & illuminaOptions)
+{
+    resize(model.logSurvival, illuminaOptions.readLength + 1);
+    model.logSurvival[0] = 0;
+    for (unsigned i = 0; i < illuminaOptions.readLength; ++i)
+    {
+        double p = std::max(0.0, model.mismatchProbabilities[i] + illuminaOptions.probabilityInsert +
+                            illuminaOptions.probabilityDelete);
+        model.logSurvival[i + 1] = model.logSurvival[i] + ((p < 1) ? std::log1p(-p) : -1000.0);
+    }
+}
+
+}  // namespace (anonymous)
+
 // ===========================================================================
 // Class IlluminaSequencingSimulator
 // ===========================================================================
@@ -82,6 +119,21 @@ IlluminaSequencingSimulator::IlluminaSequencingSimulator(TRng & rng,
 
 void IlluminaSequencingSimulator::_initModel()
 {
+    // Use the empirical model if a model file or template reads are given.
+    if (!empty(illuminaOptions.modelFile) || !empty(illuminaOptions.leftTemplateFastq))
+    {
+        QualityModel const & qualityModel = sharedQualityModel(toCString(illuminaOptions.modelFile),
+                                                               toCString(illuminaOptions.leftTemplateFastq),
+                                                               toCString(illuminaOptions.rightTemplateFastq));
+        _initEmpiricalModel(*model, qualityModel, 0);
+        if (qualityModel.hasRight())
+        {
+            rightModel.reset(new IlluminaModel());
+            _initEmpiricalModel(*rightModel, qualityModel, 1);
+        }
+        return;
+    }
+
     // Compute mismatch probabilities, piecewise linear function.
     resize(model->mismatchProbabilities, illuminaOptions.readLength);
     // Compute probability at raise point.
@@ -139,6 +191,9 @@ void IlluminaSequencingSimulator::_initModel()
             model->mismatchProbabilities[i] *= illuminaOptions.probabilityMismatchScale;
     }
 
+    if (illuminaOptions.skipAheadErrors)
+        _computeLogSurvival(*model, illuminaOptions);
+
     // Compute match/mismatch means and standard deviations.
     resize(model->mismatchQualityMeans, illuminaOptions.readLength);
     for (unsigned i = 0; i < illuminaOptions.readLength; ++i) {
@@ -172,6 +227,45 @@ void IlluminaSequencingSimulator::_initModel()
         model->qualityStdDevs[i] = m * x + b;
         // std::cout << "model->qualityStdDevs[" << i << "] = " << model->qualityStdDevs[i] << std::endl;
     }
+
+    // Compute the quality sampling tables from the means and standard deviations.
+    model->useQualityTables = seqOptions->qualityTables;
+    if (seqOptions->qualityTables)
+    {
+        resize(model->mismatchQualityTables, illuminaOptions.readLength);
+        resize(model->qualityTables, illuminaOptions.readLength);
+        for (unsigned i = 0; i < illuminaOptions.readLength; ++i)
+        {
+            model->mismatchQualityTables[i].init(model->mismatchQualityMeans[i], model->mismatchQualityStdDevs[i]);
+            model->qualityTables[i].init(model->qualityMeans[i], model->qualityStdDevs[i]);
+        }
+    }
+}
+
+// ---------------------------------------------------------------------------
+// Function IlluminaSequencingSimulator::_initEmpiricalModel()
+// ---------------------------------------------------------------------------
+
+void IlluminaSequencingSimulator::_initEmpiricalModel(IlluminaModel & mateModel, QualityModel const & qualityModel,
+                                                      unsigned mate)
+{
+    resize(mateModel.mismatchProbabilities, illuminaOptions.readLength);
+    resize(mateModel.nProbabilities, illuminaOptions.readLength);
+    resize(mateModel.mismatchQualityTables, illuminaOptions.readLength);
+    resize(mateModel.qualityTables, illuminaOptions.readLength);
+    for (unsigned i = 0; i < illuminaOptions.readLength; ++i)
+    {
+        QualityModelCycle const & cycle = qualityModel.cycle(mate, i);
+        mateModel.mismatchProbabilities[i] = cycle.mismatchProbability * illuminaOptions.probabilityMismatchScale;
+        mateModel.nProbabilities[i] = cycle.nProbability;
+        mateModel.mismatchQualityTables[i] = cycle.mismatchQualities;
+        mateModel.qualityTables[i] = cycle.matchQualities;
+    }
+    mateModel.useQualityTables = true;
+    mateModel.nQuality = qualityModel.nQualities[qualityModel.hasRight() ? mate : 0];
+
+    if (illuminaOptions.skipAheadErrors)
+        _computeLogSurvival(mateModel, illuminaOptions);
 }
 
 // ---------------------------------------------------------------------------
@@ -241,9 +335,15 @@ void IlluminaSequencingSimulator::simulateRead(TRead & seq, TQualities & quals,
                                                TFragment const & frag, Direction dir, Strand strand)
 {
     // std::cerr << "simulateRead(" << (char const *)(dir == LEFT ? "L" : "R") << ", " << (char const *)(strand == FORWARD ? "-->" : "<--") << ")\n";
+    // The right reads use their own tables if the empirical model has them.
+    IlluminaModel const & mateModel = (dir == RIGHT && rightModel.get()) ? *rightModel : *model;
+
     // Simulate sequencing operations.
-    TCigarString cigar;
-    _simulateCigar(cigar);
+    TCigarString & cigar = cigarBuffer;
+    if (illuminaOptions.skipAheadErrors)
+        _simulateCigarSkipAhead(cigar, mateModel);
+    else
+        _simulateCigar(cigar, mateModel);
     unsigned lenInRef = 0;
     _getLengthInRef(lenInRef, cigar);
 
@@ -274,9 +374,13 @@ void IlluminaSequencingSimulator::simulateRead(TRead & seq, TQualities & quals,
     }
 
     // Simulate qualities.
-    _simulateQualities(quals, cigar);
+    _simulateQualities(quals, cigar, mateModel);
     SEQAN_ASSERT_EQ(length(seq), length(quals));
 
+    // Apply the pattern of Ns of the empirical model.
+    if (!empty(mateModel.nProbabilities))
+        _simulateNs(seq, quals, mateModel);
+
     // // Reverse qualities if necessary.
     // if (strand == REVERSE)
     //     reverse(quals);
@@ -309,8 +413,15 @@ void IlluminaSequencingSimulator::simulateRead(TRead & seq, TQualities & quals,
 // ---------------------------------------------------------------------------
 
 // Simulate PHRED qualities from the CIGAR string.
-void IlluminaSequencingSimulator::_simulateQualities(TQualities & quals, TCigarString const & cigar)
+void IlluminaSequencingSimulator::_simulateQualities(TQualities & quals, TCigarString const & cigar,
+                                                     IlluminaModel const & mateModel)
 {
+    if (mateModel.useQualityTables)
+    {
+        _simulateQualitiesFromTables(quals, cigar, mateModel);
+        return;
+    }
+
     clear(quals);
 
     unsigned pos = 0;
@@ -321,13 +432,13 @@ void IlluminaSequencingSimulator::_simulateQualities(TQualities & quals, TCigarS
             int q = 0;
             if (cigar[i].operation == 'M')
             {
-                std::normal_distribution<double> dist(model->qualityMeans[pos], model->qualityStdDevs[pos]);
+                std::normal_distribution<double> dist(mateModel.qualityMeans[pos], mateModel.qualityStdDevs[pos]);
                 q = static_cast<int>(dist(rng));
                 ++pos;
             }
             else if (cigar[i].operation == 'I' || cigar[i].operation == 'X')
             {
-                std::normal_distribution<double> dist(model->mismatchQualityMeans[pos], model->mismatchQualityStdDevs[pos]);
+                std::normal_distribution<double> dist(mateModel.mismatchQualityMeans[pos], mateModel.mismatchQualityStdDevs[pos]);
                 q = static_cast<int>(dist(rng));
                 ++pos;
             }
@@ -342,13 +453,39 @@ void IlluminaSequencingSimulator::_simulateQualities(TQualities & quals, TCigarS
     }
 }
 
+// ---------------------------------------------------------------------------
+// Function IlluminaSequencingSimulator::_simulateQualitiesFromTables()
+// ---------------------------------------------------------------------------
+
+// Simulate PHRED qualities from the CIGAR string with the precomputed tables, all qualities of the read at once.
+void IlluminaSequencingSimulator::_simulateQualitiesFromTables(TQualities & quals, TCigarString const & cigar,
+                                                               IlluminaModel const & mateModel)
+{
+    unsigned len = 0;
+    for (unsigned i = 0; i < length(cigar); ++i)
+        if (cigar[i].operation != 'D')
+            len += cigar[i].count;
+    resize(quals, len);
+
+    unsigned pos = 0;
+    for (unsigned i = 0; i < length(cigar); ++i)
+    {
+        if (cigar[i].operation == 'D')
+            continue;  // Deletion/padding, no quality required.
+        seqan2::String<QualityTable> const & tables =
+                (cigar[i].operation == 'M') ? mateModel.qualityTables : mateModel.mismatchQualityTables;
+        for (unsigned j = 0; j < cigar[i].count; ++j, ++pos)
+            quals[pos] = '!' + tables[pos].sample(rng);
+    }
+}
+
 // ---------------------------------------------------------------------------
 // Function IlluminaSequencingSimulator::_simulateCigar()
 // ---------------------------------------------------------------------------
 
 // Simulate CIGAR string.  We can do this with position specific parameters only and thus independent of any
 // context.
-void IlluminaSequencingSimulator::_simulateCigar(TCigarString & cigar)
+void IlluminaSequencingSimulator::_simulateCigar(TCigarString & cigar, IlluminaModel const & mateModel)
 {
     clear(cigar);
     unsigned len = this->readLength();
@@ -357,7 +494,7 @@ void IlluminaSequencingSimulator::_simulateCigar(TCigarString & cigar)
     for (int i = 0; i < (int)len;)
     {
         double x = dist(rng);
-        double pMismatch = model->mismatchProbabilities[i];
+        double pMismatch = mateModel.mismatchProbabilities[i];
         double pInsert   = illuminaOptions.probabilityInsert;
         double pDelete   = illuminaOptions.probabilityDelete;
         double pMatch    = 1.0 - pMismatch - pInsert - pDelete;
@@ -378,6 +515,75 @@ void IlluminaSequencingSimulator::_simulateCigar(TCigarString & cigar)
     }
 }
 
+// ---------------------------------------------------------------------------
+// Function IlluminaSequencingSimulator::_simulateCigarSkipAhead()
+// ---------------------------------------------------------------------------
+
+// Simulate CIGAR string with the same distribution as _simulateCigar() but sample the number of matches up to the
+// next error event at once.
+//
+// In _simulateCigar(), the step at position j is an error event (mismatch, insertion, or deletion) with probability
+// h(j) and a match otherwise.  Starting at position i, the next event is thus at position j with probability
+// h(j) * prod_{k=i}^{j-1} (1 - h(k)).  We sample j by inversion, i.e. j is the first position with
+// S(i, j) < u for u uniform in (0, 1] and S(i, j) = prod_{k=i}^{j} (1 - h(k)), comparing the sums of logarithms in
+// mateModel.logSurvival.  The kind of the event is then picked proportional to the probabilities at j.
+void IlluminaSequencingSimulator::_simulateCigarSkipAhead(TCigarString & cigar, IlluminaModel const & mateModel)
+{
+    clear(cigar);
+    int len = this->readLength();
+    std::uniform_real_distribution<double> dist(0, 1);
+    double const * logSurvival = &mateModel.logSurvival[0];
+
+    for (int i = 0; i < len;)
+    {
+        // Find position of the next event, len if there is none.
+        double threshold = logSurvival[i] + std::log(1.0 - dist(rng));
+        int j = std::upper_bound(logSurvival + i + 1, logSurvival + len + 1, threshold,
+                                 std::greater<double>()) - logSurvival - 1;
+
+        // Append the matches up to the event at once, matches never cancel out.
+        if (j > i)
+        {
+            if (!empty(cigar) && back(cigar).operation == 'M')
+                back(cigar).count += j - i;
+            else
+                appendValue(cigar, seqan2::CigarElement<>('M', j - i));
+            i = j;
+        }
+        if (i == len)
+            break;
+
+        // Pick the kind of event.
+        double pMismatch = mateModel.mismatchProbabilities[i];
+        double pInsert   = illuminaOptions.probabilityInsert;
+        double pDelete   = illuminaOptions.probabilityDelete;
+        double x = dist(rng) * (pMismatch + pInsert + pDelete);
+
+        if (x < pMismatch)  // point polymorphism
+            i += appendOperation(cigar, 'X').first;
+        else if (x < pMismatch + pInsert)  // insertion
+            i += appendOperation(cigar, 'I').first;
+        else  // deletion
+            i += appendOperation(cigar, 'D').first;
+    }
+}
+
+// ---------------------------------------------------------------------------
+// Function IlluminaSequencingSimulator::_simulateNs()
+// ---------------------------------------------------------------------------
+
+void IlluminaSequencingSimulator::_simulateNs(TRead & seq, TQualities & quals, IlluminaModel const & mateModel)
+{
+    std::uniform_real_distribution<double> dist(0, 1);
+    unsigned numProbabilities = length(mateModel.nProbabilities);
+    for (unsigned i = 0; i < length(seq); ++i)
+        if (dist(rng) < mateModel.nProbabilities[std::min(i, numProbabilities - 1)])
+        {
+            seq[i] = 'N';
+            quals[i] = '!' + mateModel.nQuality;
+        }
+}
+
 // ============================================================================
 // Class SequencingSimulatorFactory
 // ============================================================================
@@ -138,7 +138,7 @@ void SangerSequencingSimulator::simulateRead(
     }
 
     // Simulate CIGAR string.
-    TCigarString cigar;
+    TCigarString & cigar = cigarBuffer;
     this->_simulateCigar(cigar, sampleLength);
 
     // Simulate sequence (materialize mismatches and insertions).
@@ -241,6 +241,10 @@ void SangerSequencingSimulator::_simulateQualities(
 {
     clear(quals);
 
+    // With SequencingOptions::qualityTables, the qualities are drawn from one standard normal distribution for the
+    // whole read such that both numbers of each pair computed by std::normal_distribution are used.
+    std::normal_distribution<double> standardDist(0, 1);
+
     unsigned pos = 0;   // Position in result.
     unsigned rPos = 0;  // Position in fragment.
     for (unsigned i = 0; i < length(cigar); ++i)
@@ -267,8 +271,16 @@ void SangerSequencingSimulator::_simulateQualities(
                 stdDev = sangerOptions.qualityErrorStartStdDev + relPos * (sangerOptions.qualityErrorEndStdDev - sangerOptions.qualityErrorStartStdDev);
             }
 
-            std::normal_distribution<double> dist(mean, stdDev);
-            int q = static_cast<int>(dist(rng));
+            int q = 0;
+            if (seqOptions->qualityTables)
+            {
+                q = static_cast<int>(mean + stdDev * standardDist(rng));
+            }
+            else
+            {
+                std::normal_distribution<double> dist(mean, stdDev);
+                q = static_cast<int>(dist(rng));
+            }
             q = std::max(0, std::min(40, q));
             appendValue(quals, (char)('!' + q));
         }
@@ -0,0 +1,180 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+
+#include <mason/trace_alignment.h>
+
+namespace {
+
+// Append count operations of type op to cigar, extending the last element if possible.
+void appendCigarOperation(seqan2::String<seqan2::CigarElement<> > & cigar, char op, unsigned count)
+{
+    if (!empty(cigar) && back(cigar).operation == op)
+        back(cigar).count += count;
+    else
+        appendValue(cigar, seqan2::CigarElement<>(op, count));
+}
+
+}  // namespace
+
+// ---------------------------------------------------------------------------
+// Function buildTraceAlignment()
+// ---------------------------------------------------------------------------
+
+bool buildTraceAlignment(seqan2::String<seqan2::CigarElement<> > & cigar,
+                         seqan2::CharString & mdString,
+                         int & editDistance,
+                         int & beginPos,
+                         seqan2::String<seqan2::CigarElement<> > const & errorCigar,
+                         seqan2::Dna5String const & readSeq,
+                         PositionMap const & posMap,
+                         int smallVarBeginPos,
+                         seqan2::Dna5String const & refSeq)
+{
+    typedef PositionMap::TGaps TGaps;
+    typedef seqan2::Iterator<TGaps, seqan2::Standard>::Type TGapsIter;
+
+    clear(cigar);
+    clear(mdString);
+    editDistance = 0;
+    beginPos = -1;
+
+    // We walk the columns of the alignment between the original reference and the sequence with small variants in
+    // parallel to the error CIGAR string.  A column has a character in the reference, in the sequence with small
+    // variants, or in both.
+    TGaps refGaps(seqan2::Nothing(), posMap.refGapAnchors);
+    TGaps smallVarGaps(seqan2::Nothing(), posMap.smallVarGapAnchors);
+    int viewPos = toViewPosition(smallVarGaps, smallVarBeginPos);
+    TGapsIter itRef = iter(refGaps, viewPos, seqan2::Standard());
+    TGapsIter itVar = iter(smallVarGaps, viewPos, seqan2::Standard());
+
+    int refPos = toSourcePosition(refGaps, viewPos);  // next character of the reference
+    unsigned readPos = 0;      // next character of the read
+    bool started = false;      // whether a read character has been aligned to the reference yet
+    bool inColumn = true;      // whether the iterators point to the column of the next small variant character
+    int pendingDels = 0;       // number of deleted reference characters not written out yet
+    int pendingDelsBegin = 0;  // position of first pending deleted reference character
+    int matchCount = 0;        // number of matching characters since last MD string event
+
+    for (unsigned i = 0; i < length(errorCigar); ++i)
+    {
+        char op = errorCigar[i].operation;
+        for (unsigned j = 0; j < errorCigar[i].count; ++j)
+        {
+            if (op == 'I')  // read character without character in sequence with small variants
+            {
+                if (readPos >= length(readSeq))
+                    return false;
+                appendCigarOperation(cigar, 'I', 1);
+                editDistance += 1;
+                readPos += 1;
+                continue;
+            }
+
+            // Go to the column of the next character of the sequence with small variants, reference characters on
+            // the way have been deleted by the small variants.
+            if (!inColumn)
+            {
+                ++itRef;
+                ++itVar;
+            }
+            inColumn = false;
+            while (isGap(itVar))
+            {
+                if (!isGap(itRef))
+                {
+                    if (started && pendingDels++ == 0)
+                        pendingDelsBegin = refPos;
+                    refPos += 1;
+                }
+                ++itRef;
+                ++itVar;
+            }
+
+            if (isGap(itRef))  // character inserted by small variant
+            {
+                if (op == 'D')
+                    continue;  // skipped by the read, nothing to align
+                if (readPos >= length(readSeq))
+                    return false;
+                appendCigarOperation(cigar, 'I', 1);
+                editDistance += 1;
+                readPos += 1;
+            }
+            else if (op == 'D')  // reference character skipped by the read
+            {
+                if (started && pendingDels++ == 0)
+                    pendingDelsBegin = refPos;
+                refPos += 1;
+            }
+            else  // read character aligned to reference character
+            {
+                if (readPos >= length(readSeq) || refPos >= (int)length(refSeq))
+                    return false;
+                if (!started)
+                {
+                    started = true;
+                    beginPos = refPos;
+                }
+                if (pendingDels)
+                {
+                    appendCigarOperation(cigar, 'D', pendingDels);
+                    editDistance += pendingDels;
+                    appendNumber(mdString, matchCount);
+                    appendValue(mdString, '^');
+                    append(mdString, infix(refSeq, pendingDelsBegin, pendingDelsBegin + pendingDels));
+                    matchCount = 0;
+                    pendingDels = 0;
+                }
+                appendCigarOperation(cigar, 'M', 1);
+                if (readSeq[readPos] == refSeq[refPos])
+                {
+                    matchCount += 1;
+                }
+                else
+                {
+                    editDistance += 1;
+                    appendNumber(mdString, matchCount);
+                    appendValue(mdString, seqan2::convert<char>(refSeq[refPos]));
+                    matchCount = 0;
+                }
+                readPos += 1;
+                refPos += 1;
+            }
+        }
+    }
+    appendNumber(mdString, matchCount);
+
+    // Trailing pending deletions are dropped, all read characters must have been used.
+    return started && readPos == length(readSeq);
+}
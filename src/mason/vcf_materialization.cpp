@@ -200,6 +200,16 @@ void VcfMaterializer::init()
             throw MasonIOException("Could not write FAI index.");
     }
 
+    // Map the packed reference, create it first if necessary.  The contigs are read through the FAI index if it
+    // cannot be written.
+    if (usePackedReference)
+    {
+        std::string packedFileName = packedReferenceFileName(toCString(fastaFileName));
+        if (!packedReference.open(packedFileName.c_str(), faiIndex) &&
+            PackedReference::build(packedFileName.c_str(), faiIndex))
+            packedReference.open(packedFileName.c_str(), faiIndex);
+    }
+
     // Open methylation FASTA FAI file if given.
     if (!empty(methFastaFileName))
     {
@@ -237,6 +247,18 @@ void VcfMaterializer::init()
     }
 }
 
+// ----------------------------------------------------------------------------
+// Function VcfMaterializer::readContig()
+// ----------------------------------------------------------------------------
+
+void VcfMaterializer::readContig(seqan2::Dna5String & seq, int rID)
+{
+    if (packedReference.isOpen())
+        packedReference.readSequence(seq, rID);
+    else
+        readSequence(seq, faiIndex, rID);
+}
+
 // ----------------------------------------------------------------------------
 // Function VcfMaterializer::_loadLevels()
 // ----------------------------------------------------------------------------
@@ -300,7 +322,7 @@ bool VcfMaterializer::_materializeNext(seqan2::Dna5String & seq,
             return false;
         currRID += 1;
         rID = currRID;
-        readSequence(seq, faiIndex, currRID);
+        readContig(seq, currRID);
         if (levels && !empty(methFastaFileName))
         {
             _loadLevels(currRID);
@@ -311,11 +333,8 @@ bool VcfMaterializer::_materializeNext(seqan2::Dna5String & seq,
         TJournalEntries journal;
         reinit(journal, length(seq));
         posMap.reinit(journal);
-        GenomicInterval gi(0, length(seq), 0, length(seq));
-        seqan2::String<PositionMap::TInterval> intervals;
-        appendValue(intervals, PositionMap::TInterval(gi.svBeginPos, gi.svEndPos, gi));
-        createIntervalTree(posMap.svIntervalTree, intervals);
-        createIntervalTree(posMap.svIntervalTreeSTL, intervals);
+        appendValue(posMap.svIntervals, GenomicInterval(0, length(seq), 0, length(seq)));
+        posMap.buildIntervalTrees();
 
         return true;
     }
@@ -334,7 +353,7 @@ bool VcfMaterializer::_materializeNext(seqan2::Dna5String & seq,
         nextHaplotype = 0;
 
         _loadVariantsForContig(contigVariants, currRID);
-        readSequence(contigSeq, faiIndex, currRID);
+        readContig(contigSeq, currRID);
         if (levels && !empty(methFastaFileName))
             _loadLevels(currRID);
     }
@@ -42,6 +42,8 @@
 
 #include <mason/mason_types.h>
 #include <mason/mason_options.h>
+#include <mason/parallel_seq_file_out.h>
+#include <mason/run_stats.h>
 #include <mason/sequencing.h>
 
 // ==========================================================================
@@ -133,6 +135,8 @@ int main(int argc, char const ** argv)
         options.print(std::cerr);
     }
 
+    RunStats stats("mason_frag_sequencing");
+
     std::cerr << "\n__PREPARATION________________________________________________________________\n"
               << "\n";
 
@@ -149,8 +153,8 @@ int main(int argc, char const ** argv)
 
     // Open reads output file.
     std::cerr << "Opening output file (L) " << options.outFileNameLeft << " ...";
-    seqan2::SeqFileOut outReads;
-    if (!open(outReads, toCString(options.outFileNameLeft)))
+    ParallelSeqFileOut outReads;
+    if (!outReads.open(toCString(options.outFileNameLeft), options.ioThreads))
     {
         std::cerr << " ERROR\n"
                   << "Could not open " << options.outFileNameLeft << "\n";
@@ -159,11 +163,11 @@ int main(int argc, char const ** argv)
     std::cerr << " OK\n";
 
     // Open output file for the right reads.
-    seqan2::SeqFileOut outReadsRight;
+    ParallelSeqFileOut outReadsRight;
     if (!empty(options.outFileNameRight))
     {
         std::cerr << "Opening output file (R) " << options.outFileNameRight << " ...";
-        if (!open(outReadsRight, toCString(options.outFileNameRight)))
+        if (!outReadsRight.open(toCString(options.outFileNameRight), options.ioThreads))
         {
             std::cerr << " ERROR\n"
                       << "Could not open " << options.outFileNameRight << "\n";
@@ -173,14 +177,17 @@ int main(int argc, char const ** argv)
     }
 
     // Configure output streams to write out each sequence in a single line.
-    context(outReads).options.lineLength = 0;
-    context(outReads).options.lineLength = 0;
+    outReads.setLineLength(0);
+    outReadsRight.setLineLength(0);
 
     // Perform genome simulation.
     std::cerr << "\n__SIMULATING READS___________________________________________________________\n"
               << "\n"
               << "Simulating reads ...";
 
+    double wall0 = wallTime(), cpu0 = cpuTime();
+    int64_t numFragments = 0;
+
     TRng rng(options.seed);
     TRng ignoredMethRng(0);
 
@@ -211,6 +218,7 @@ int main(int argc, char const ** argv)
 
         // Read fragment to simulate from.
         readRecord(fragId, fragSeq, inFragments);
+        ++numFragments;
 
         // Trim fragment identifier after first whitespace.
         trimAfterSpace(fragId);
@@ -225,7 +233,7 @@ int main(int argc, char const ** argv)
                 simInfoL.serialize(ssL);
                 ssL << " FRAG_ID=" << fragId;
             }
-            writeRecord(outReads, ssL.str(), seqL, qualsL);
+            outReads.write(ssL.str(), seqL, qualsL);
         }
         else  // Paired sequencing.
         {
@@ -245,13 +253,35 @@ int main(int argc, char const ** argv)
             // std::cerr << seqL << "\t" << qualsL << "\n"
             //           << seqR << "\t" << qualsR << "\n\n";
 
-            writeRecord(outReads, ssL.str(), seqL, qualsL);
-            writeRecord(outReadsRight, ssR.str(), seqR, qualsR);
+            outReads.write(ssL.str(), seqL, qualsL);
+            outReadsRight.write(ssR.str(), seqR, qualsR);
         }
     }
 
+    outReads.close();
+    outReadsRight.close();
+    double simulationWallTime = wallTime() - wall0;
+    stats.addPhase("simulation", simulationWallTime, cpuTime() - cpu0);
     std::cerr << " OK\n";
 
+    // Write out run statistics.
+    if (!empty(options.statsOptions.statsJsonFile))
+    {
+        int64_t numReads = numFragments * (empty(options.outFileNameRight) ? 1 : 2);
+        stats.addCounter("fragments", numFragments);
+        stats.addCounter("reads", numReads);
+        stats.addFileSize("bytes_read", toCString(options.inputFileName));
+        stats.addFileSize("bytes_written", toCString(options.outFileNameLeft));
+        stats.addFileSize("bytes_written", toCString(options.outFileNameRight));
+        if (simulationWallTime > 0)
+            stats.setRate("reads_per_second", numReads / simulationWallTime);
+        if (!stats.writeJson(toCString(options.statsOptions.statsJsonFile)))
+        {
+            std::cerr << "\nERROR: Could not write run statistics to " << options.statsOptions.statsJsonFile << "\n";
+            return 1;
+        }
+    }
+
     std::cerr << "\nDONE.\n";
     return 0;
 }
@@ -39,6 +39,8 @@
 
 #include <seqan/arg_parse.h>
 
+#include <mason/mason_options.h>
+#include <mason/run_stats.h>
 #include <mason/simulate_genome.h>
 
 // ==========================================================================
@@ -67,6 +69,9 @@ struct MasonGenomeOptions
     // The seed to use for the RNG.
     int seed;
 
+    // Configuration of the run statistics.
+    RunStatsOptions statsOptions;
+
     MasonGenomeOptions() : verbosity(1), seed(0)
     {}
 };
@@ -118,6 +123,8 @@ parseCommandLine(MasonGenomeOptions & options, int argc, char const ** argv)
     setValidValues(parser, "out-file", seqan2::SeqFileOut::getFileExtensions());
     setRequired(parser, "out-file");
 
+    options.statsOptions.addOptions(parser);
+
     // Add Examples Section.
     addTextSection(parser, "Examples");
     addListItem(parser, "\\fBmason_genome\\fP \\fB-l\\fP 1000 \\fB-l\\fP 4000 \\fB-o\\fP \\fIgenome.fa\\fP",
@@ -140,6 +147,7 @@ parseCommandLine(MasonGenomeOptions & options, int argc, char const ** argv)
 
     getOptionValue(options.outputFilename, parser, "out-file");
     getOptionValue(options.seed, parser, "seed");
+    options.statsOptions.getOptionValues(parser);
 
     for (unsigned i = 0; i < getOptionValueCount(parser, "contig-length"); ++i)
     {
@@ -183,6 +191,8 @@ int main(int argc, char const ** argv)
                   << "SEED       \t" << options.seed << '\n'
                   << "\n"
                   << "OUTPUT FILE\t" << options.outputFilename << "\n"
+                  << "STATS JSON \t" << options.statsOptions.statsJsonFile << "\n"
+                  << "RNG ENGINE \t" << getRngEngineStr() << "\n"
                   << "CONTIG LENS\t";
         for (unsigned i = 0; i < length(options.contigLengths); ++i)
         {
@@ -200,8 +210,22 @@ int main(int argc, char const ** argv)
     MasonSimulateGenomeOptions simOptions;
     simOptions.contigLengths = options.contigLengths;
     simOptions.seed = options.seed;
-    if (simulateGenome(toCString(options.outputFilename), simOptions) != 0)
-        return 1;
+    RunStats stats("mason_genome");
+    {
+        PhaseTimer timer(stats, "genome_simulation");
+        if (simulateGenome(toCString(options.outputFilename), simOptions) != 0)
+            return 1;
+    }
+
+    if (!empty(options.statsOptions.statsJsonFile))
+    {
+        stats.addFileSize("bytes_written", toCString(options.outputFilename));
+        if (!stats.writeJson(toCString(options.statsOptions.statsJsonFile)))
+        {
+            std::cerr << "\nERROR: Could not write run statistics to " << options.statsOptions.statsJsonFile << "\n";
+            return 1;
+        }
+    }
 
     std::cerr << "\nDone.\n";
     return 0;
@@ -50,7 +50,9 @@
 
 #include <mason/vcf_materialization.h>
 #include <mason/mason_options.h>
+#include <mason/parallel_seq_file_out.h>
 #include <mason/mason_types.h>
+#include <mason/run_stats.h>
 
 // ==========================================================================
 // Classes
@@ -73,12 +75,15 @@ public:
     VcfMaterializer vcfMat;
 
     // Output sequence stream.
-    seqan2::SeqFileOut outStream;
+    ParallelSeqFileOut outStream;
     // Output breakpoints file.
     std::fstream breakpointsOut;
     // Input and output for methylation.
     seqan2::FaiIndex methFaiIndex;
-    seqan2::SeqFileOut outMethLevelStream;
+    ParallelSeqFileOut outMethLevelStream;
+
+    // Statistics for --stats-json.
+    RunStats stats;
 
     MasonMaterializerApp(MasonMaterializerOptions const & _options) :
             options(_options), rng(options.seed), methRng(options.methSeed),
@@ -86,7 +91,8 @@ public:
                    toCString(options.matOptions.fastaFileName),
                    toCString(options.matOptions.vcfFileName),
                    toCString(options.methFastaInFile),
-                   &options.methOptions)
+                   &options.methOptions),
+            stats("mason_materializer")
     {}
 
     int run()
@@ -98,9 +104,11 @@ public:
         std::cerr << "Opening files...";
         try
         {
+            PhaseTimer timer(stats, "fai_load");
+            vcfMat.usePackedReference = options.matOptions.usePackedReference;
             vcfMat.init();
 
-            if (!open(outStream, toCString(options.outputFileName)))
+            if (!outStream.open(toCString(options.outputFileName), options.ioThreads))
                 throw MasonIOException("Could not open output file.");
 
             // Open output breakpoints TSV file.
@@ -114,7 +122,7 @@ public:
 
             if (options.methOptions.simulateMethylationLevels)
             {
-                if (!open(outMethLevelStream, toCString(options.methFastaOutFile)))
+                if (!outMethLevelStream.open(toCString(options.methFastaOutFile), options.ioThreads))
                     throw MasonIOException("Could not open methylation output file.");
             }
         }
@@ -129,6 +137,7 @@ public:
         std::cerr << "\n__MATERIALIZING______________________________________________________________\n"
                   << "\n";
 
+        double wall0 = wallTime(), cpu0 = cpuTime();
         // The identifiers of the just materialized data.
         int rID = 0, hID = 0;
         seqan2::Dna5String seq;
@@ -143,7 +152,7 @@ public:
                 ssName << contigNames(context(vcfMat.vcfFileIn))[rID] << options.haplotypeNameSep << (hID + 1);
                 std::cerr << " " << ssName.str();
 
-                writeRecord(outStream, ssName.str(), seq);
+                outStream.write(ssName.str(), seq);
 
                 if (!empty(options.outputBreakpointFile))
                     for (std::vector<std::pair<int, int> >::const_iterator it = breakpoints.begin(); it != breakpoints.end(); ++it)
@@ -152,10 +161,10 @@ public:
 
                 std::stringstream ssTop;
                 ssTop << ssName.str() << "/TOP";
-                writeRecord(outMethLevelStream, ssTop.str(), levels.forward);
+                outMethLevelStream.write(ssTop.str(), levels.forward);
                 std::stringstream ssBottom;
                 ssBottom << ssName.str() << "/BOT";
-                writeRecord(outMethLevelStream, ssBottom.str(), levels.reverse);
+                outMethLevelStream.write(ssBottom.str(), levels.reverse);
             }
         else  // NO methylation level simulation
             while (vcfMat.materializeNext(seq, varInfos, breakpoints, rID, hID))
@@ -164,17 +173,39 @@ public:
                 ssName << contigNames(context(vcfMat.vcfFileIn))[rID] << options.haplotypeNameSep << (hID + 1);
                 std::cerr << " " << ssName.str();
 
-                writeRecord(outStream, ssName.str(), seq);
+                outStream.write(ssName.str(), seq);
 
                 if (!empty(options.outputBreakpointFile))
                     for (std::vector<std::pair<int, int> >::const_iterator it = breakpoints.begin(); it != breakpoints.end(); ++it)
                         breakpointsOut << ssName.str() << "\t" << vcfMat.contigVariants.getVariantName(it->second)
                                        << "\t" << (it->first + 1) << "\n";
             }
+        outStream.close();
+        outMethLevelStream.close();
+        stats.addPhase("materialization", wallTime() - wall0, cpuTime() - cpu0);
         std::cerr << " DONE\n";
 
         std::cerr << "\nDone materializing VCF file.\n";
 
+        return _writeStats();
+    }
+
+    // Write the run statistics if configured, returns the exit code.
+    int _writeStats()
+    {
+        if (empty(options.statsOptions.statsJsonFile))
+            return 0;
+        stats.addFileSize("bytes_read", toCString(options.matOptions.fastaFileName));
+        stats.addFileSize("bytes_read", toCString(options.matOptions.vcfFileName));
+        stats.addFileSize("bytes_read", toCString(options.methFastaInFile));
+        stats.addFileSize("bytes_written", toCString(options.outputFileName));
+        stats.addFileSize("bytes_written", toCString(options.outputBreakpointFile));
+        stats.addFileSize("bytes_written", toCString(options.methFastaOutFile));
+        if (!stats.writeJson(toCString(options.statsOptions.statsJsonFile)))
+        {
+            std::cerr << "\nERROR: Could not write run statistics to " << options.statsOptions.statsJsonFile << "\n";
+            return 1;
+        }
         return 0;
     }
 };
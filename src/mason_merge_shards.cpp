@@ -0,0 +1,300 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+// Merge the output files of mason_simulator runs with --shard.
+//
+// Each shard writes the reads and alignments of its contig/haplotype pairs
+// in the order of their ids.  Joining the files of all shards by read name
+// yields the output of a single run with the same options.
+// ==========================================================================
+
+#include <string>
+#include <vector>
+
+#include <seqan/arg_parse.h>
+#include <seqan/bam_io.h>
+#include <seqan/seq_io.h>
+#include <seqan/sequence.h>
+
+#include <mason/external_split_merge.h>
+#include <mason/mason_options.h>
+#include <mason/parallel_seq_file_out.h>
+#include <mason/run_stats.h>
+
+// ==========================================================================
+// Classes
+// ==========================================================================
+
+// ==========================================================================
+// Functions
+// ==========================================================================
+
+// --------------------------------------------------------------------------
+// Function isFastqFileName()
+// --------------------------------------------------------------------------
+
+// Returns whether fileName has a FASTQ extension.
+
+bool isFastqFileName(std::string const & fileName)
+{
+    char const * EXTENSIONS[] = {".fq", ".fastq"};
+    for (char const * ext : EXTENSIONS)
+    {
+        std::string extStr(ext);
+        if (fileName.size() >= extStr.size() &&
+            fileName.compare(fileName.size() - extStr.size(), extStr.size(), extStr) == 0)
+            return true;
+    }
+    return false;
+}
+
+// --------------------------------------------------------------------------
+// Function joinReads()
+// --------------------------------------------------------------------------
+
+// Join the reads from the files in splitter by name into out, returns the number of reads.
+
+template <typename TTag>
+int64_t joinReads(ParallelSeqFileOut & out, IdSplitter & splitter)
+{
+    FastxJoiner<TTag> joiner(splitter);
+    seqan2::CharString id, seq, qual;
+    int64_t numReads = 0;
+    while (!joiner.atEnd())
+    {
+        joiner.get(id, seq, qual);
+        out.write(id, seq, qual);
+        ++numReads;
+    }
+    return numReads;
+}
+
+// --------------------------------------------------------------------------
+// Function mergeReadFiles()
+// --------------------------------------------------------------------------
+
+// Merge the read files inFileNames into outFileName and add the number of reads to numReads, returns false on errors.
+
+bool mergeReadFiles(int64_t & numReads,
+                    char const * outFileName,
+                    std::vector<std::string> const & inFileNames,
+                    int ioThreads)
+{
+    std::cerr << "Merging reads into " << outFileName << " ...";
+    IdSplitter splitter;
+    if (!splitter.openExisting(inFileNames))
+    {
+        std::cerr << "\nERROR: Could not open read files of the shards.\n";
+        return false;
+    }
+    ParallelSeqFileOut out;
+    if (!out.open(outFileName, ioThreads))
+    {
+        std::cerr << "\nERROR: Could not open output file " << outFileName << "\n";
+        return false;
+    }
+    out.setLineLength(0);
+
+    // The shards are written in the same format, which is guessed from the first one.
+    if (isFastqFileName(inFileNames[0]))
+        numReads += joinReads<seqan2::Fastq>(out, splitter);
+    else
+        numReads += joinReads<seqan2::Fasta>(out, splitter);
+    out.close();
+    std::cerr << " OK\n";
+    return true;
+}
+
+// --------------------------------------------------------------------------
+// Function mergeAlignmentFiles()
+// --------------------------------------------------------------------------
+
+// Merge the SAM/BAM files inFileNames into outFileName and set numRecords to the number of records, returns false on
+// errors.
+
+bool mergeAlignmentFiles(int64_t & numRecords,
+                         char const * outFileName,
+                         std::vector<std::string> const & inFileNames)
+{
+    std::cerr << "Merging alignments into " << outFileName << " ...";
+    IdSplitter splitter;
+    if (!splitter.openExisting(inFileNames))
+    {
+        std::cerr << "\nERROR: Could not open alignment files of the shards.\n";
+        return false;
+    }
+    seqan2::BamFileOut out;
+    if (!open(out, outFileName))
+    {
+        std::cerr << "\nERROR: Could not open output file " << outFileName << "\n";
+        return false;
+    }
+
+    // The headers of all shards are the same, the joiner registers the contigs of the first one with out.
+    SamJoiner joiner(splitter, &out);
+    writeHeader(out, joiner.header);
+    seqan2::BamAlignmentRecord record;
+    numRecords = 0;
+    while (!joiner.atEnd())
+    {
+        joiner.get(record);
+        writeRecord(out, record);
+        ++numRecords;
+    }
+    close(out);
+    std::cerr << " OK\n";
+    return true;
+}
+
+// --------------------------------------------------------------------------
+// Function parseCommandLine()
+// --------------------------------------------------------------------------
+
+seqan2::ArgumentParser::ParseResult
+parseCommandLine(MasonMergeShardsOptions & options, int argc, char const ** argv)
+{
+    // Setup ArgumentParser.
+    seqan2::ArgumentParser parser("mason_merge_shards");
+    // Set short description, version, and date.
+    setShortDescription(parser, "Merge Simulation Shards");
+    setDateAndVersion(parser);
+    setCategory(parser, "Simulators");
+
+    // Define usage line and long description.
+    addUsageLine(parser,
+                 "[OPTIONS] \\fB-i\\fP \\fISHARD1.fq\\fP \\fB-i\\fP \\fISHARD2.fq\\fP ... \\fB-o\\fP \\fIOUT.fq\\fP");
+    addDescription(parser,
+                   "Merge the output files of \\fBmason_simulator\\fP runs with \\fB--shard\\fP \\fII\\fP/\\fIN\\fP "
+                   "for all \\fII\\fP into the output files of a single run with the same options.  Give the files "
+                   "of the shards in the same order for \\fB-i\\fP, \\fB-ir\\fP, and \\fB-ia\\fP.");
+
+    options.addOptions(parser);
+
+    // Parse command line.
+    seqan2::ArgumentParser::ParseResult res = seqan2::parse(parser, argc, argv);
+
+    // Only extract  options if the program will continue after parseCommandLine()
+    if (res != seqan2::ArgumentParser::PARSE_OK)
+        return res;
+
+    options.getOptionValues(parser);
+
+    // Check that the output files match the input files of the shards.
+    size_t numShards = options.inFileNamesLeft.size();
+    if (!options.inFileNamesRight.empty() != !empty(options.outFileNameRight) ||
+        (!options.inFileNamesRight.empty() && options.inFileNamesRight.size() != numShards))
+    {
+        std::cerr << "ERROR: Give --out-right and one --in-right file for each --in file or neither.\n";
+        return seqan2::ArgumentParser::PARSE_ERROR;
+    }
+    if (!options.inFileNamesSam.empty() != !empty(options.outFileNameSam) ||
+        (!options.inFileNamesSam.empty() && options.inFileNamesSam.size() != numShards))
+    {
+        std::cerr << "ERROR: Give --out-alignment and one --in-alignment file for each --in file or neither.\n";
+        return seqan2::ArgumentParser::PARSE_ERROR;
+    }
+
+    return seqan2::ArgumentParser::PARSE_OK;
+}
+
+// --------------------------------------------------------------------------
+// Function main()
+// --------------------------------------------------------------------------
+
+// Program entry point.
+
+int main(int argc, char const ** argv)
+{
+    // Parse the command line.
+    MasonMergeShardsOptions options;
+    seqan2::ArgumentParser::ParseResult res = parseCommandLine(options, argc, argv);
+
+    // If there was an error parsing or built-in argument parser functionality
+    // was triggered then we exit the program.  The return code is 1 if there
+    // were errors and 0 if there were none.
+    if (res != seqan2::ArgumentParser::PARSE_OK)
+        return res == seqan2::ArgumentParser::PARSE_ERROR;
+
+    std::cerr << "MASON MERGE SHARDS\n"
+              << "==================\n\n";
+
+    // Print the command line arguments back to the user.
+    if (options.verbosity > 0)
+        options.print(std::cerr);
+
+    std::cerr << "\n__MERGING_____________________________________________________________________\n"
+              << "\n";
+
+    RunStats stats("mason_merge_shards");
+    int64_t numReads = 0, numRecords = 0;
+    {
+        PhaseTimer timer(stats, "merge_reads");
+        if (!mergeReadFiles(numReads, toCString(options.outFileNameLeft), options.inFileNamesLeft,
+                            options.ioThreads))
+            return 1;
+        if (!options.inFileNamesRight.empty() &&
+            !mergeReadFiles(numReads, toCString(options.outFileNameRight), options.inFileNamesRight,
+                            options.ioThreads))
+            return 1;
+    }
+    if (!options.inFileNamesSam.empty())
+    {
+        PhaseTimer timer(stats, "merge_alignments");
+        if (!mergeAlignmentFiles(numRecords, toCString(options.outFileNameSam), options.inFileNamesSam))
+            return 1;
+    }
+    std::cerr << "\nDone merging " << options.inFileNamesLeft.size() << " shards.\n";
+
+    // Write out run statistics.
+    if (!empty(options.statsOptions.statsJsonFile))
+    {
+        stats.addCounter("reads", numReads);
+        stats.addCounter("alignments", numRecords);
+        std::vector<std::string> const * inFileNames[] = {
+            &options.inFileNamesLeft, &options.inFileNamesRight, &options.inFileNamesSam
+        };
+        for (std::vector<std::string> const * fileNames : inFileNames)
+            for (unsigned i = 0; i < fileNames->size(); ++i)
+                stats.addFileSize("bytes_read", (*fileNames)[i].c_str());
+        stats.addFileSize("bytes_written", toCString(options.outFileNameLeft));
+        stats.addFileSize("bytes_written", toCString(options.outFileNameRight));
+        stats.addFileSize("bytes_written", toCString(options.outFileNameSam));
+        if (!stats.writeJson(toCString(options.statsOptions.statsJsonFile)))
+        {
+            std::cerr << "\nERROR: Could not write run statistics to " << options.statsOptions.statsJsonFile << "\n";
+            return 1;
+        }
+    }
+
+    return 0;
+}
@@ -41,6 +41,7 @@
 
 #include <mason/mason_options.h>
 #include <mason/methylation_levels.h>
+#include <mason/run_stats.h>
 
 // ==========================================================================
 // Classes
@@ -111,6 +112,9 @@ int main(int argc, char const ** argv)
     std::cerr << "\n__PREPARATION_________________________________________________________________\n"
               << "\n";
 
+    RunStats stats("mason_methylation");
+    double wall0 = wallTime(), cpu0 = cpuTime();
+
     std::cerr << "Loading Reference Index " << options.fastaInFile << " ...";
     seqan2::FaiIndex faiIndex;
     if (!open(faiIndex, toCString(options.fastaInFile)))
@@ -138,6 +142,8 @@ int main(int argc, char const ** argv)
         std::cerr << " OK (" << length(faiIndex.indexEntryStore) << " seqs)\n";
     }
 
+    stats.addPhase("fai_load", wallTime() - wall0, cpuTime() - cpu0);
+
     std::cerr << "Opening output File " << options.methFastaOutFile << " ...";
     seqan2::SeqFileOut outStream;
     if (!open(outStream, toCString(options.methFastaOutFile)))
@@ -150,6 +156,9 @@ int main(int argc, char const ** argv)
     std::cerr << "\n__SIMULATION__________________________________________________________________\n"
               << "\n";
 
+    wall0 = wallTime();
+    cpu0 = cpuTime();
+
     TRng rng(options.seed);
     MethylationLevelSimulator methSim(rng, options.methOptions);
 
@@ -175,7 +184,21 @@ int main(int argc, char const ** argv)
 
         std::cerr << " OK\n";
     }
+    close(outStream);
+    stats.addPhase("methylation_simulation", wallTime() - wall0, cpuTime() - cpu0);
     std::cerr << "\nDone with methylation simulation.\n";
 
+    // Write out run statistics.
+    if (!empty(options.statsOptions.statsJsonFile))
+    {
+        stats.addFileSize("bytes_read", toCString(options.fastaInFile));
+        stats.addFileSize("bytes_written", toCString(options.methFastaOutFile));
+        if (!stats.writeJson(toCString(options.statsOptions.statsJsonFile)))
+        {
+            std::cerr << "\nERROR: Could not write run statistics to " << options.statsOptions.statsJsonFile << "\n";
+            return 1;
+        }
+    }
+
     return 0;
 }
@@ -37,20 +37,175 @@
 // TODO(holtgrew): Because of const holder issues, there are problems with passing strings as const.
 // TODO(holtgrew): We should use bulk-reading calls to avoid indirect/virtual function calls.
 
+#include <algorithm>
+#include <condition_variable>
+#include <exception>
+#include <memory>
+#include <mutex>
+#include <thread>
 #include <vector>
 #include <utility>
 
+#include <mason/bgzf_writer.h>
+#include <mason/concurrent_queue.h>
 #include <mason/fragment_generation.h>
+#include <mason/gap_index.h>
+#include <mason/haplotype_cache.h>
+#include <mason/record_formatter.h>
+#include <mason/run_stats.h>
 #include <mason/sequencing.h>
 #include <mason/mason_options.h>
 #include <mason/mason_types.h>
+#include <mason/parallel_seq_file_out.h>
 #include <mason/vcf_materialization.h>
 #include <mason/external_split_merge.h>
+#include <mason/trace_alignment.h>
 
 // ==========================================================================
 // Classes
 // ==========================================================================
 
+// --------------------------------------------------------------------------
+// Class AlignmentCheckStats
+// --------------------------------------------------------------------------
+
+// Counters for comparing the alignments derived from the simulation trace with the ones from re-alignment.
+
+struct AlignmentCheckStats
+{
+    // Number of aligned records for which trace and re-alignment yield the same/a different alignment.
+    int64_t identical, different;
+    // Number of aligned records for which the trace could not be used and re-alignment was used instead.
+    int64_t fallbacks;
+
+    AlignmentCheckStats() : identical(0), different(0), fallbacks(0)
+    {}
+
+    void add(AlignmentCheckStats const & other)
+    {
+        identical += other.identical;
+        different += other.different;
+        fallbacks += other.fallbacks;
+    }
+};
+
+// --------------------------------------------------------------------------
+// Function equalCigar()
+// --------------------------------------------------------------------------
+
+inline bool equalCigar(TCigarString const & lhs, TCigarString const & rhs)
+{
+    if (length(lhs) != length(rhs))
+        return false;
+    for (unsigned i = 0; i < length(lhs); ++i)
+        if (lhs[i].operation != rhs[i].operation || lhs[i].count != rhs[i].count)
+            return false;
+    return true;
+}
+
+// --------------------------------------------------------------------------
+// Function alignAndSetCigar()
+// --------------------------------------------------------------------------
+
+// Perform the realignment of seq against refSeq[beginPos..endPos) and set cigar string, MD string, and edit distance.
+// beginPos is updated to the begin position of the alignment.
+
+inline void alignAndSetCigar(seqan2::BamAlignmentRecord & record,
+                             int & editDistance,
+                             seqan2::CharString & mdString,
+                             seqan2::Dna5String & seq,
+                             seqan2::Dna5String /*const*/ & refSeq,
+                             int & beginPos,
+                             int endPos)
+{
+    int const PADDING = 5;
+    int const PADDING_BEGIN = std::min(PADDING, beginPos);
+    int const PADDING_END = std::min(PADDING, (int)length(refSeq) - endPos);
+
+    // Realign the read sequence against the original interval.  We add some padding so insertions into the read at
+    // the ends can be converted to matches/mismatches as they appear after the mapping.
+    typedef seqan2::Infix<seqan2::Dna5String>::Type TContigInfix;
+    TContigInfix contigInfix(refSeq, beginPos - PADDING_BEGIN, endPos + PADDING_END);
+    seqan2::Gaps<TContigInfix> gapsContig(contigInfix);
+    seqan2::Gaps<seqan2::Dna5String> gapsRead(seq);
+    seqan2::Score<int, seqan2::Simple> sScheme(0, -1000, -1001, -1002);
+    seqan2::AlignConfig<true, false, false, true> alignConfig;
+
+    int buffer = 3;  // should be unnecessary
+    int uDiag = std::max((int)(length(contigInfix) - length(seq)), 0) + buffer;
+    int lDiag = -std::max((int)(length(seq) - length(contigInfix)), 0) - buffer;
+
+    editDistance = globalAlignment(gapsContig, gapsRead, sScheme, alignConfig, lDiag, uDiag);
+    editDistance /= -1000;  // score to edit distance
+
+    beginPos += countGaps(begin(gapsRead, seqan2::Standard())) - PADDING_BEGIN;
+    while (isGap(gapsRead, length(gapsRead) - 1))
+    {
+        setClippedEndPosition(gapsRead, length(gapsRead) - 1);
+        setClippedEndPosition(gapsContig, length(gapsContig) - 1);
+    }
+    setClippedBeginPosition(gapsContig, countGaps(begin(gapsRead, seqan2::Standard())));
+    setClippedBeginPosition(gapsRead, countGaps(begin(gapsRead, seqan2::Standard())));
+
+    getCigarString(record.cigar, gapsContig, gapsRead, std::numeric_limits<int>::max());
+    getMDString(mdString, gapsContig, gapsRead);
+}
+
+// --------------------------------------------------------------------------
+// Function computeAlignment()
+// --------------------------------------------------------------------------
+
+// Compute CIGAR string, MD string, and edit distance as configured by alignmentMode, shared by the single-end and
+// paired-end record builders.
+//
+// seq and errorCigar must be in forward orientation of the sequence with small variants, beginning at
+// smallVarBeginPos.  beginPos and endPos give the interval on the original reference, beginPos is updated.
+
+inline void computeAlignment(seqan2::BamAlignmentRecord & record,
+                             int & editDistance,
+                             seqan2::CharString & mdString,
+                             seqan2::Dna5String & seq,
+                             TCigarString const & errorCigar,
+                             int smallVarBeginPos,
+                             int & beginPos,
+                             int endPos,
+                             PositionMap const & posMap,
+                             seqan2::Dna5String /*const*/ & refSeq,
+                             MasonSimulatorOptions::AlignmentMode alignmentMode,
+                             AlignmentCheckStats & checkStats)
+{
+    if (alignmentMode == MasonSimulatorOptions::TRACE)
+    {
+        int traceBeginPos = 0;
+        if (buildTraceAlignment(record.cigar, mdString, editDistance, traceBeginPos,
+                                errorCigar, seq, posMap, smallVarBeginPos, refSeq))
+        {
+            beginPos = traceBeginPos;
+            return;
+        }
+        checkStats.fallbacks += 1;
+    }
+    else if (alignmentMode == MasonSimulatorOptions::CHECK)
+    {
+        TCigarString traceCigar;
+        seqan2::CharString traceMDString;
+        int traceEditDistance = 0, traceBeginPos = 0;
+        bool traced = buildTraceAlignment(traceCigar, traceMDString, traceEditDistance, traceBeginPos,
+                                          errorCigar, seq, posMap, smallVarBeginPos, refSeq);
+        alignAndSetCigar(record, editDistance, mdString, seq, refSeq, beginPos, endPos);
+        if (!traced)
+            checkStats.fallbacks += 1;
+        else if (traceBeginPos == beginPos && traceEditDistance == editDistance && traceMDString == mdString &&
+                 equalCigar(traceCigar, record.cigar))
+            checkStats.identical += 1;
+        else
+            checkStats.different += 1;
+        return;
+    }
+
+    alignAndSetCigar(record, editDistance, mdString, seq, refSeq, beginPos, endPos);
+}
+
 // --------------------------------------------------------------------------
 // Class SingleEndRecordBuilder
 // --------------------------------------------------------------------------
@@ -78,6 +233,9 @@ public:
     seqan2::Dna5String /*const*/ & refSeq;
     // ID of reference, haplotype, and fragment.
     int rID, hID, fID;
+    // How to compute the alignments and counters for the comparison of trace and re-alignment.
+    MasonSimulatorOptions::AlignmentMode alignmentMode;
+    AlignmentCheckStats & checkStats;
 
     SingleEndRecordBuilder(SequencingSimulationInfo & info,
                            seqan2::Dna5String & seq,
@@ -87,9 +245,11 @@ public:
                            PositionMap const & posMap,
                            seqan2::CharString const & refName,
                            seqan2::Dna5String /*const*/ & refSeq,
-                           int rID, int hID, int fID) :
+                           int rID, int hID, int fID,
+                           MasonSimulatorOptions::AlignmentMode alignmentMode,
+                           AlignmentCheckStats & checkStats) :
             info(info), seq(seq), ss(ss), buffer(buffer), qual(qual), posMap(posMap), refName(refName), refSeq(refSeq),
-            rID(rID), hID(hID), fID(fID)
+            rID(rID), hID(hID), fID(fID), alignmentMode(alignmentMode), checkStats(checkStats)
     {}
 
     // Fills all members of record except for qName which uses shared logic in ReadSimulatorThread.
@@ -144,15 +304,14 @@ public:
         record.qual = qual;
 
         // Write out some tags with the information.
-        seqan2::BamTagsDict tagsDict(record.tags);
         // Set tag with the eason for begin unmapped: Inserted or over breakpoint.  We only reach here if the alignment
         // does not overlap with a breakpoint in the case that the alignment is in an inserted region.
-        setTagValue(tagsDict, "uR", overlapsWithBreakpoint ? 'B' : 'I', 'A');
+        appendTagValue(record.tags, "uR", overlapsWithBreakpoint ? 'B' : 'I');
         // Set position on original haplotype.
-        setTagValue(tagsDict, "oR", toCString(refName));  // original reference name
-        setTagValue(tagsDict, "oP", info.beginPos);       // original position
-        setTagValue(tagsDict, "oH", hID + 1);             // original haplotype
-        setTagValue(tagsDict, "oS", info.isForward ? 'F' : 'R', 'A');  // original strand
+        appendTagValue(record.tags, "oR", refName);                     // original reference name
+        appendTagValue(record.tags, "oP", info.beginPos);               // original position
+        appendTagValue(record.tags, "oH", hID + 1);                     // original haplotype
+        appendTagValue(record.tags, "oS", info.isForward ? 'F' : 'R');  // original strand
     }
 
     // Fill the record's members for an aligned record.
@@ -173,9 +332,10 @@ public:
         if (info.isForward == isRC)
             record.flag |= seqan2::BAM_FLAG_RC;
 
-        // Perform the alignment to compute the edit distance and the CIGAR string.
+        // Compute the edit distance and the CIGAR string.
         int editDistance = 0;
-        _alignAndSetCigar(record, editDistance, buffer, seq, intOriginal.first, intOriginal.second);
+        computeAlignment(record, editDistance, buffer, seq, info.cigar, intSmallVar.first, intOriginal.first,
+                         intOriginal.second, posMap, refSeq, alignmentMode, checkStats);
 
         // Set the remaining flags.
         record.rID = rID;
@@ -200,72 +360,30 @@ public:
         }
     }
 
-    // Perform the realignment and set cigar string.
-    void _alignAndSetCigar(seqan2::BamAlignmentRecord & record,
-                           int & editDistance,
-                           seqan2::CharString & mdString,
-                           seqan2::Dna5String & seq,
-                           int & beginPos,
-                           int endPos)
-    {
-        int const PADDING = 5;
-        int const PADDING_BEGIN = std::min(PADDING, beginPos);
-        int const PADDING_END = std::min(PADDING, (int)length(refSeq) - endPos);
-
-        // Realign the read sequence against the original interval.  We add some padding so insertions into the read at
-        // the ends can be converted to matches/mismatches as they appear after the mapping.
-        typedef seqan2::Infix<seqan2::Dna5String>::Type TContigInfix;
-        TContigInfix contigInfix(refSeq, beginPos - PADDING_BEGIN, endPos + PADDING_END);
-        seqan2::Gaps<TContigInfix> gapsContig(contigInfix);
-        seqan2::Gaps<seqan2::Dna5String> gapsRead(seq);
-        seqan2::Score<int, seqan2::Simple> sScheme(0, -1000, -1001, -1002);
-        seqan2::AlignConfig<true, false, false, true> alignConfig;
-
-        int buffer = 3;  // should be unnecessary
-        int uDiag = std::max((int)(length(contigInfix) - length(seq)), 0) + buffer;
-        int lDiag = -std::max((int)(length(seq) - length(contigInfix)), 0) - buffer;
-
-        editDistance = globalAlignment(gapsContig, gapsRead, sScheme, alignConfig, lDiag, uDiag);
-        editDistance /= -1000;  // score to edit distance
-
-        beginPos += countGaps(begin(gapsRead, seqan2::Standard())) - PADDING_BEGIN;
-        while (isGap(gapsRead, length(gapsRead) - 1))
-        {
-            setClippedEndPosition(gapsRead, length(gapsRead) - 1);
-            setClippedEndPosition(gapsContig, length(gapsContig) - 1);
-        }
-        setClippedBeginPosition(gapsContig, countGaps(begin(gapsRead, seqan2::Standard())));
-        setClippedBeginPosition(gapsRead, countGaps(begin(gapsRead, seqan2::Standard())));
-
-        getCigarString(record.cigar, gapsContig, gapsRead, std::numeric_limits<int>::max());
-        getMDString(mdString, gapsContig, gapsRead);
-    }
-
     // Fill the tags dict.
     void _fillTags(seqan2::BamAlignmentRecord & record,
                    SequencingSimulationInfo & infoRecord,
                    int editDistance,
                    seqan2::CharString const & mdString)
     {
-        seqan2::BamTagsDict tagsDict(record.tags);
-        setTagValue(tagsDict, "NM", editDistance);        // edit distance to reference
-        setTagValue(tagsDict, "MD", toCString(mdString));
+        appendTagValue(record.tags, "NM", editDistance);  // edit distance to reference
+        appendTagValue(record.tags, "MD", mdString);
 
         // Set position on original haplotype.
-        setTagValue(tagsDict, "oR", toCString(refName));  // original reference name
-        setTagValue(tagsDict, "oH", hID + 1);             // original haplotype
-        setTagValue(tagsDict, "oP", info.beginPos);       // original position
-        setTagValue(tagsDict, "oS", info.isForward ? 'F' : 'R', 'A');  // original strand
+        appendTagValue(record.tags, "oR", refName);                     // original reference name
+        appendTagValue(record.tags, "oH", hID + 1);                     // original haplotype
+        appendTagValue(record.tags, "oP", info.beginPos);               // original position
+        appendTagValue(record.tags, "oS", info.isForward ? 'F' : 'R');  // original strand
 
         // Compute number of errors.
         int numErrors = 0;
         for (unsigned i = 0; i < length(infoRecord.cigar); ++i)
             if (infoRecord.cigar[i].operation != 'M')
                 numErrors += infoRecord.cigar[i].count;
-        setTagValue(tagsDict, "XE", numErrors);
+        appendTagValue(record.tags, "XE", numErrors);
         // Write out number of bases overlapping with snp/indel variants.
-        setTagValue(tagsDict, "XS", infoRecord.snpCount);
-        setTagValue(tagsDict, "XI", infoRecord.indelCount);
+        appendTagValue(record.tags, "XS", infoRecord.snpCount);
+        appendTagValue(record.tags, "XI", infoRecord.indelCount);
     }
 };
 
@@ -299,6 +417,9 @@ public:
     seqan2::Dna5String /*const*/ & refSeq;
     // ID of teh reference, haplotype, and fragment.
     int rID, hID, fID;
+    // How to compute the alignments and counters for the comparison of trace and re-alignment.
+    MasonSimulatorOptions::AlignmentMode alignmentMode;
+    AlignmentCheckStats & checkStats;
 
     PairedEndRecordBuilder(SequencingSimulationInfo & infoL,
                            SequencingSimulationInfo & infoR,
@@ -311,9 +432,12 @@ public:
                            PositionMap const & posMap,
                            seqan2::CharString const & refName,
                            seqan2::Dna5String /*const*/ & refSeq,
-                           int rID, int hID, int fID) :
+                           int rID, int hID, int fID,
+                           MasonSimulatorOptions::AlignmentMode alignmentMode,
+                           AlignmentCheckStats & checkStats) :
             infoL(infoL), infoR(infoR), seqL(seqL), seqR(seqR), ss(ss), buffer(buffer), qualL(qualL), qualR(qualR),
-            posMap(posMap), refName(refName), refSeq(refSeq), rID(rID), hID(hID), fID(fID)
+            posMap(posMap), refName(refName), refSeq(refSeq), rID(rID), hID(hID), fID(fID),
+            alignmentMode(alignmentMode), checkStats(checkStats)
     {}
 
     // Fills all record members, excdept for qName which uses shared logic in ReadSimulatorThread.
@@ -456,17 +580,16 @@ public:
         record.qual = qual;
 
         // Write out some tags with the information.
-        seqan2::BamTagsDict tagsDict(record.tags);
 
         // Set tag with the eason for begin unmapped: Inserted or over breakpoint.  We only reach here if the alignment
         // does not overlap with a breakpoint in the case that the alignment is in an inserted region.
-        setTagValue(tagsDict, "uR", overlapsWithBreakpoint ? 'B' : 'I', 'A');
+        appendTagValue(record.tags, "uR", overlapsWithBreakpoint ? 'B' : 'I');
 
         // Set position on original haplotype.
-        setTagValue(tagsDict, "oR", toCString(refName));  // original reference name
-        setTagValue(tagsDict, "oP", infoRecord.beginPos);       // original position
-        setTagValue(tagsDict, "oH", hID + 1);             // original haplotype
-        setTagValue(tagsDict, "oS", infoRecord.isForward ? 'F' : 'R', 'A');  // original strand
+        appendTagValue(record.tags, "oR", refName);                           // original reference name
+        appendTagValue(record.tags, "oP", infoRecord.beginPos);               // original position
+        appendTagValue(record.tags, "oH", hID + 1);                           // original haplotype
+        appendTagValue(record.tags, "oS", infoRecord.isForward ? 'F' : 'R');  // original strand
     }
 
     // Flip the sequence and quality in case that the record is reverse complemented.
@@ -505,9 +628,10 @@ public:
         if (infoRecord.isForward == isRC)
             record.flag |= seqan2::BAM_FLAG_RC;
 
-        // Perform the alignment to compute the edit distance and the CIGAR string.
+        // Compute the edit distance and the CIGAR string.
         int editDistance = 0;
-        _alignAndSetCigar(record, editDistance, buffer, seq, intOriginal.first, intOriginal.second);
+        computeAlignment(record, editDistance, buffer, seq, infoRecord.cigar, intSmallVar.first, intOriginal.first,
+                         intOriginal.second, posMap, refSeq, alignmentMode, checkStats);
 
         // Set the remaining flags.
         record.rID = rID;
@@ -521,72 +645,30 @@ public:
         _fillTags(record, infoRecord, editDistance, buffer);
     }
 
-    // Perform the realignment and set cigar string.
-    void _alignAndSetCigar(seqan2::BamAlignmentRecord & record,
-                           int & editDistance,
-                           seqan2::CharString & mdString,
-                           seqan2::Dna5String & seq,
-                           int & beginPos,
-                           int endPos)
-    {
-        int const PADDING = 5;
-        int const PADDING_BEGIN = std::min(PADDING, beginPos);
-        int const PADDING_END = std::min(PADDING, (int)length(refSeq) - endPos);
-
-        // Realign the read sequence against the original interval.  We add some padding so insertions into the read at
-        // the ends can be converted to matches/mismatches as they appear after the mapping.
-        typedef seqan2::Infix<seqan2::Dna5String>::Type TContigInfix;
-        TContigInfix contigInfix(refSeq, beginPos - PADDING_BEGIN, endPos + PADDING_END);
-        seqan2::Gaps<TContigInfix> gapsContig(contigInfix);
-        seqan2::Gaps<seqan2::Dna5String> gapsRead(seq);
-        seqan2::Score<int, seqan2::Simple> sScheme(0, -1000, -1001, -1002);
-        seqan2::AlignConfig<true, false, false, true> alignConfig;
-
-        int buffer = 3;  // should be unnecessary
-        int uDiag = std::max((int)(length(contigInfix) - length(seq)), 0) + buffer;
-        int lDiag = -std::max((int)(length(seq) - length(contigInfix)), 0) - buffer;
-
-        editDistance = globalAlignment(gapsContig, gapsRead, sScheme, alignConfig, lDiag, uDiag);
-        editDistance /= -1000;  // score to edit distance
-
-        beginPos += countGaps(begin(gapsRead, seqan2::Standard())) - PADDING_BEGIN;
-        while (isGap(gapsRead, length(gapsRead) - 1))
-        {
-            setClippedEndPosition(gapsRead, length(gapsRead) - 1);
-            setClippedEndPosition(gapsContig, length(gapsContig) - 1);
-        }
-        setClippedBeginPosition(gapsContig, countGaps(begin(gapsRead, seqan2::Standard())));
-        setClippedBeginPosition(gapsRead, countGaps(begin(gapsRead, seqan2::Standard())));
-
-        getCigarString(record.cigar, gapsContig, gapsRead, std::numeric_limits<int>::max());
-        getMDString(mdString, gapsContig, gapsRead);
-    }
-
     // Fill the tags dict.
     void _fillTags(seqan2::BamAlignmentRecord & record,
                    SequencingSimulationInfo & infoRecord,
                    int editDistance,
                    seqan2::CharString const & mdString)
     {
-        seqan2::BamTagsDict tagsDict(record.tags);
-        setTagValue(tagsDict, "NM", editDistance);        // edit distance to reference
-        setTagValue(tagsDict, "MD", toCString(mdString));
+        appendTagValue(record.tags, "NM", editDistance);  // edit distance to reference
+        appendTagValue(record.tags, "MD", mdString);
 
         // Write out original sampling pos info.
-        setTagValue(tagsDict, "oR", toCString(refName));  // original reference name
-        setTagValue(tagsDict, "oH", hID + 1);             // original haplotype
-        setTagValue(tagsDict, "oP", infoRecord.beginPos);       // original position
-        setTagValue(tagsDict, "oS", infoRecord.isForward ? 'F' : 'R', 'A');  // original strand
+        appendTagValue(record.tags, "oR", refName);                           // original reference name
+        appendTagValue(record.tags, "oH", hID + 1);                           // original haplotype
+        appendTagValue(record.tags, "oP", infoRecord.beginPos);               // original position
+        appendTagValue(record.tags, "oS", infoRecord.isForward ? 'F' : 'R');  // original strand
 
         // Compute number of errors.
         int numErrors = 0;
         for (unsigned i = 0; i < length(infoRecord.cigar); ++i)
             if (infoRecord.cigar[i].operation != 'M')
                 numErrors += infoRecord.cigar[i].count;
-        setTagValue(tagsDict, "XE", numErrors);
+        appendTagValue(record.tags, "XE", numErrors);
         // Write out number of bases overlapping with snp/indel variants.
-        setTagValue(tagsDict, "XS", infoRecord.snpCount);
-        setTagValue(tagsDict, "XI", infoRecord.indelCount);
+        appendTagValue(record.tags, "XS", infoRecord.snpCount);
+        appendTagValue(record.tags, "XI", infoRecord.indelCount);
     }
 };
 
@@ -611,6 +693,9 @@ public:
     // The fragment generator and fragment buffer.
     std::vector<Fragment> fragments;
     FragmentSampler * fragSampler;
+    // Index of valid fragment start positions of the current contig, only set for options.fragmentPlacement ==
+    // INDEX_PLACEMENT.
+    FragmentPlacementIndex const * placementIndex;
 
     // Methylation levels to use, points to empty levels if methylation is disabled.
     MethylationLevels const * methLevels;
@@ -618,16 +703,22 @@ public:
     // The sequencing simulator to use.
     SequencingSimulator * seqSimulator;
 
-    // Buffer with ids and sequence of reads simulated in this thread.
+    // The fragments of the current chunk as infixes of the haplotype.
+    std::vector<TFragment> fragmentInfixes;
+    // Buffer with ids and the reads simulated in this thread.
     seqan2::StringSet<seqan2::CharString> ids;
-    seqan2::StringSet<seqan2::Dna5String> seqs;
-    seqan2::StringSet<seqan2::CharString> quals;
-    std::vector<SequencingSimulationInfo> infos;
+    SequencingReadBatch reads;
     // Buffer for the BAM alignment records.
     bool buildAlignments;  // Whether or not compute the BAM alignment records.
     std::vector<seqan2::BamAlignmentRecord> alignmentRecords;
-
-    ReadSimulatorThread() : options(), fragSampler(), methLevels(), seqSimulator(), buildAlignments(false)
+    // Counters for --alignment-mode check.
+    AlignmentCheckStats alignmentCheckStats;
+    // Wall time spent in run() so far, for --stats-json.
+    double busyTime;
+
+    ReadSimulatorThread() :
+            options(), fragSampler(), placementIndex(), methLevels(), seqSimulator(), buildAlignments(false),
+            busyTime(0)
     {}
 
     ~ReadSimulatorThread()
@@ -653,28 +744,43 @@ public:
         seqSimulator = ptr.release();
     }
 
-    void _setId(seqan2::CharString & str, std::stringstream & ss, int fragId, int num,
+    // Switch the RNGs to the streams for the given fragment and phase, options->rngMode must be FRAGMENT_RNG.
+    void _seedFragment(int rID, int hID, int fragId, unsigned phase)
+    {
+        rng.seedFragment(options->seed, rID, hID, fragId, phase);
+        methRng.seedFragment(options->methSeed, rID, hID, fragId, phase);
+    }
+
+    void _setId(seqan2::CharString & str, int fragId, int num,
                 SequencingSimulationInfo const & info, bool forceNoEmbed = false)
     {
-        ss.clear();
-        ss.str("");
-        ss << options->seqOptions.readNamePrefix;
-        if (num == 0 || forceNoEmbed)
-            ss << (fragId + 1);
-        else if (num == 1)
-            ss << (fragId + 1) << "/1";
-        else  // num == 2
-            ss << (fragId + 1) << "/2";
-        if (options->seqOptions.embedReadInfo && !forceNoEmbed)
+        bool embed = options->seqOptions.embedReadInfo && !forceNoEmbed;
+        formatReadName(str, options->seqOptions.readNamePrefix, fragId, forceNoEmbed ? 0 : num,
+                       embed ? &info : nullptr);
+    }
+
+    // Simulate the reads of all fragments into reads, one batch per fragment when using per-fragment RNGs.
+    void _simulateReads(seqan2::Dna5String const & seq, int rID, int hID)
+    {
+        fragmentInfixes.clear();
+        for (unsigned i = 0; i < fragmentIds.size(); ++i)
+            fragmentInfixes.push_back(TFragment(seq, fragments[i].beginPos, fragments[i].endPos));
+
+        if (options->rngMode == MasonSimulatorOptions::FRAGMENT_RNG)
         {
-            ss << ' ';
-            info.serialize(ss);
+            for (unsigned i = 0; i < fragmentIds.size(); ++i)
+            {
+                _seedFragment(rID, hID, fragmentIds[i], 1);
+                seqSimulator->simulateReads(reads, fragmentInfixes, i, i + 1, methLevels);
+            }
+        }
+        else
+        {
+            seqSimulator->simulateReads(reads, fragmentInfixes, 0, fragmentIds.size(), methLevels);
         }
-        str = ss.str();
     }
 
-    void _simulatePairedEnd(seqan2::Dna5String const & seq,
-                            std::vector<SmallVarInfo> const & varInfos,
+    void _simulatePairedEnd(std::vector<SmallVarInfo> const & varInfos,
                             PositionMap const & posMap,
                             seqan2::CharString const & refName,
                             seqan2::Dna5String /*const*/ & refSeq,
@@ -682,18 +788,17 @@ public:
     {
         std::stringstream ss;
         seqan2::CharString buffer;
+        seqan2::StringSet<seqan2::Dna5String> & seqs = reads.seqs;
+        seqan2::StringSet<seqan2::CharString> & quals = reads.quals;
+        std::vector<SequencingSimulationInfo> & infos = reads.infos;
 
         for (unsigned i = 0; i < 2 * fragmentIds.size(); i += 2)
         {
-            TFragment frag(seq, fragments[i / 2].beginPos, fragments[i / 2].endPos);
-            seqSimulator->simulatePairedEnd(seqs[i], quals[i], infos[i],
-                                            seqs[i + 1], quals[i + 1], infos[i + 1],
-                                            frag, methLevels);
             infos[i].rID = infos[i + 1].rID = rID;
             infos[i].hID = infos[i + 1].hID = hID;
             // Set the sequence ids.
-            _setId(ids[i], ss, fragmentIds[i / 2], 1, infos[i]);
-            _setId(ids[i + 1], ss, fragmentIds[i / 2], 2, infos[i + 1]);
+            _setId(ids[i], fragmentIds[i / 2], 1, infos[i]);
+            _setId(ids[i + 1], fragmentIds[i / 2], 2, infos[i + 1]);
             // Compute number of bases overlapping with SNPs/indels.
             int beginPos = infos[i].beginPos, endPos = infos[i].beginPos + infos[i].lengthInRef();
             infos[i].snpCount = countSmallVars(varInfos, beginPos, endPos, SmallVarInfo::SNP);
@@ -712,11 +817,12 @@ public:
                 // Build the alignment records themselves.
                 PairedEndRecordBuilder builder(infos[i], infos[i + 1], seqs[i], seqs[i + 1], ss, buffer,
                                                quals[i], quals[i + 1], posMap, refName, refSeq,
-                                               rID, hID, fragmentIds[i / 2]);
+                                               rID, hID, fragmentIds[i / 2],
+                                               options->alignmentMode, alignmentCheckStats);
                 builder.build(alignmentRecords[i], alignmentRecords[i + 1]);
                 // Set qName members of alignment records.
-                _setId(alignmentRecords[i].qName, ss, fragmentIds[i / 2], 1, infos[i], true);
-                _setId(alignmentRecords[i + 1].qName, ss, fragmentIds[i / 2], 2, infos[i + 1], true);
+                _setId(alignmentRecords[i].qName, fragmentIds[i / 2], 1, infos[i], true);
+                _setId(alignmentRecords[i + 1].qName, fragmentIds[i / 2], 2, infos[i + 1], true);
             }
         }
     }
@@ -740,8 +846,7 @@ public:
         return result;
     }
 
-    void _simulateSingleEnd(seqan2::Dna5String /*const*/ & seq,
-                            std::vector<SmallVarInfo> const & varInfos,
+    void _simulateSingleEnd(std::vector<SmallVarInfo> const & varInfos,
                             PositionMap const & posMap,
                             seqan2::CharString const & refName,
                             seqan2::Dna5String /*const*/ & refSeq,
@@ -749,12 +854,13 @@ public:
     {
         std::stringstream ss;
         seqan2::CharString buffer;
+        seqan2::StringSet<seqan2::Dna5String> & seqs = reads.seqs;
+        seqan2::StringSet<seqan2::CharString> & quals = reads.quals;
+        std::vector<SequencingSimulationInfo> & infos = reads.infos;
 
         for (unsigned i = 0; i < fragmentIds.size(); ++i)
         {
-            TFragment frag(seq, fragments[i].beginPos, fragments[i].endPos);
-            seqSimulator->simulateSingleEnd(seqs[i], quals[i], infos[i], frag, methLevels);
-            _setId(ids[i], ss, fragmentIds[i], 0, infos[i]);
+            _setId(ids[i], fragmentIds[i], 0, infos[i]);
             int beginPos = infos[i].beginPos, endPos = infos[i].beginPos + infos[i].lengthInRef();
             infos[i].snpCount = countSmallVars(varInfos, beginPos, endPos, SmallVarInfo::SNP);
             infos[i].indelCount =
@@ -764,10 +870,11 @@ public:
             {
                 // Build the alignment record itself.
                 SingleEndRecordBuilder builder(infos[i], seqs[i], ss, buffer, quals[i],
-                                               posMap, refName, refSeq, rID, hID, fragmentIds[i]);
+                                               posMap, refName, refSeq, rID, hID, fragmentIds[i],
+                                               options->alignmentMode, alignmentCheckStats);
                 builder.build(alignmentRecords[i]);
                 // Set query name.
-                _setId(alignmentRecords[i].qName, ss, fragmentIds[i], 1, infos[i], true);
+                _setId(alignmentRecords[i].qName, fragmentIds[i], 1, infos[i], true);
             }
         }
     }
@@ -781,27 +888,107 @@ public:
              seqan2::Dna5String /*const*/ & refSeq,
              int rID, int hID)
     {
-        // Sample fragments.
-        fragSampler->generateMany(fragments, rID, length(seq), gapIntervals, fragmentIds.size());
+        double beginTime = wallTime();
+
+        // Sample fragments, each from its own stream when using per-fragment RNGs.
+        if (options->rngMode == MasonSimulatorOptions::FRAGMENT_RNG)
+        {
+            fragments.resize(fragmentIds.size());
+            for (unsigned i = 0; i < fragmentIds.size(); ++i)
+            {
+                _seedFragment(rID, hID, fragmentIds[i], 0);
+                fragSampler->reset();
+                if (placementIndex)
+                    fragSampler->generate(fragments[i], rID, *placementIndex);
+                else
+                    fragSampler->generate(fragments[i], rID, length(seq), gapIntervals);
+            }
+        }
+        else if (placementIndex)
+        {
+            fragments.resize(fragmentIds.size());
+            for (unsigned i = 0; i < fragmentIds.size(); ++i)
+                fragSampler->generate(fragments[i], rID, *placementIndex);
+        }
+        else
+        {
+            fragSampler->generateMany(fragments, rID, length(seq), gapIntervals, fragmentIds.size());
+        }
 
         // Simulate reads.
         int seqCount = (options->seqOptions.simulateMatePairs ? 2 : 1) * fragmentIds.size();
         resize(ids, seqCount);
-        resize(seqs, seqCount);
-        resize(quals, seqCount);
-        infos.resize(seqCount);
+        reads.resize(seqCount);
         if (buildAlignments)
         {
-            alignmentRecords.clear();
-            alignmentRecords.resize(seqCount);
+            alignmentRecords.resize(seqCount);  // the builders clear the records, keeping their buffers
         }
+        _simulateReads(seq, rID, hID);
         if (options->seqOptions.simulateMatePairs)
-            _simulatePairedEnd(seq, varInfos, posMap, refName, refSeq, rID, hID);
+            _simulatePairedEnd(varInfos, posMap, refName, refSeq, rID, hID);
         else
-            _simulateSingleEnd(seq, varInfos, posMap, refName, refSeq, rID, hID);
+            _simulateSingleEnd(varInfos, posMap, refName, refSeq, rID, hID);
+
+        busyTime += wallTime() - beginTime;
     }
 };
 
+// --------------------------------------------------------------------------
+// Class MaterializedHaplotype
+// --------------------------------------------------------------------------
+
+// A materialized contig haplotype together with the information required for simulating reads from it.
+//
+// Used for passing the haplotypes from the materialization to the simulation stage.
+
+struct MaterializedHaplotype
+{
+    // The materialized sequence and its methylation levels, levels are empty if BS-seq simulation is disabled.
+    seqan2::Dna5String seq;
+    MethylationLevels levels;
+    // Small variants for counting in read alignments.
+    std::vector<SmallVarInfo> varInfos;
+    // Breakpoints, unused/ignored.
+    std::vector<std::pair<int, int> > breakpoints;
+    // Mapping between coordinates on the haplotype and the reference.
+    PositionMap posMap;
+    // Sorted intervals of runs of Ns on the haplotype.
+    std::vector<std::pair<int, int> > gapIntervals;
+    // Name and sequence of the reference contig.
+    seqan2::CharString refName;
+    seqan2::Dna5String refSeq;
+    // Reference and haplotype id.
+    int rID, hID;
+
+    MaterializedHaplotype() : rID(0), hID(0)
+    {}
+};
+
+// --------------------------------------------------------------------------
+// Class OutputBatch
+// --------------------------------------------------------------------------
+
+// The reads and alignments simulated by one thread for one chunk.
+//
+// Used for passing the simulation results to the background writer thread.
+
+struct OutputBatch
+{
+    // Index of the contig/haplotype pair, selects the temporary files to write to.
+    unsigned idx;
+    // The ids of the simulated fragments.
+    std::vector<int> fragmentIds;
+    // The ids of the simulated reads and the reads, like the buffers of ReadSimulatorThread.  The infos of reads are
+    // not used.
+    seqan2::StringSet<seqan2::CharString> ids;
+    SequencingReadBatch reads;
+    // The alignment records, empty if no alignments are written.
+    std::vector<seqan2::BamAlignmentRecord> alignmentRecords;
+
+    OutputBatch() : idx(0)
+    {}
+};
+
 // --------------------------------------------------------------------------
 // Class MasonSimulatorApp
 // --------------------------------------------------------------------------
@@ -818,6 +1005,9 @@ public:
 
     // Threads used for simulation.
     std::vector<ReadSimulatorThread> threads;
+    // The output slots of the batches that are simulated but not written yet, used as a ring buffer.  Only used for
+    // options.scheduling == DYNAMIC_SCHEDULING.
+    std::vector<OutputBatch> outputSlots;
 
     // ----------------------------------------------------------------------
     // VCF Materialization
@@ -825,6 +1015,14 @@ public:
 
     // Materialization of the contigs from a VCF file.
     VcfMaterializer vcfMat;
+    // Gaps of the reference contigs, only loaded for options.useGapIndex without variants.
+    GapIndex gapIndex;
+    // Cache of the materialized haplotypes, at most one of them is open for options.haplotypeCacheDir.
+    HaplotypeCacheReader cacheReader;
+    HaplotypeCacheWriter cacheWriter;
+    // The reference contig with id cacheContigRID, loaded for the haplotypes read from the cache.
+    seqan2::Dna5String cacheContigSeq;
+    int cacheContigRID;
     // FAI Index for loading methylation levels.
     seqan2::FaiIndex methFaiIndex;
 
@@ -834,8 +1032,19 @@ public:
 
     // Helper for distributing reads/pairs to contigs/haplotypes.
     ContigPicker contigPicker;
-    // Helper for storing the read ids for each contig/haplotype pair.
+    // Helper for storing the read ids for each contig/haplotype pair, only used for options.fragmentAllocation ==
+    // PICK_ALLOCATION and options.outputMode == JOIN.
     IdSplitter fragmentIdSplitter;
+    // Helper for drawing the fragment counts and ids for all contig/haplotype pairs, only used for
+    // options.fragmentAllocation == MULTINOMIAL_ALLOCATION.
+    FragmentAllocator fragmentAllocator;
+    // The first fragment id and the number of fragments for each contig/haplotype pair, only used for
+    // options.outputMode == STREAM.
+    std::vector<int> firstFragmentIds, fragmentCounts;
+    // The shard of each contig/haplotype pair, the reads are only simulated for the pairs of options.shardIndex.
+    std::vector<int> pairShards;
+    // The number of fragments simulated, less than options.numFragments for sharding.
+    int64_t numSimulatedFragments;
     // Helper for storing the simulated reads for each contig/haplotype pair.  We will write out SAM files with the
     // alignment information relative to the materialized sequence.
     IdSplitter fragmentSplitter;
@@ -848,18 +1057,44 @@ public:
 
     // The BamHeader to use.
     seqan2::BamHeader bamHeader;
-    // BamFileOut and SeqFileOut objects for writing to alignmentSplitter and fragmentSplitter files.
+    // BamFileOut and SeqFileOut objects for writing to alignmentSplitter and fragmentSplitter files.  Only used for
+    // options.tempFormat == TEXT.
     std::vector<seqan2::BamFileOut *> bamFileOuts;
     std::vector<seqan2::SeqFileOut *> seqFileOuts;
+    // Context with the contig names and lengths for encoding/decoding the alignments to/from BAM and buffer for the
+    // records for options.tempFormat == BINARY.
+    seqan2::FormattedFileContext<seqan2::BamFileOut, seqan2::Owner<> >::Type spillBamContext;
+    seqan2::CharString spillBuffer;
+
+    // ----------------------------------------------------------------------
+    // Background Writer
+    // ----------------------------------------------------------------------
+
+    typedef std::unique_ptr<OutputBatch> TOutputBatchPtr;
+
+    // Batches to be written to the temporary files by the writer thread and written batches for reuse.  Only used
+    // if options.writerQueueSize > 0.
+    std::unique_ptr<ConcurrentQueue<TOutputBatchPtr> > writeQueue, freeBatches;
+    // The writer thread and the exception that stopped it, if any.
+    std::thread writerThread;
+    std::exception_ptr writerError;
 
     // ----------------------------------------------------------------------
     // File Output
     // ----------------------------------------------------------------------
 
     // For writing left/right reads.
-    seqan2::SeqFileOut outSeqsLeft, outSeqsRight;
+    ParallelSeqFileOut outSeqsLeft, outSeqsRight;
     // For writing the final SAM/BAM file.
     std::unique_ptr<seqan2::BamFileOut> outBamStream;
+    // For writing the final BAM file with options.ioThreads compression threads instead of outBamStream and buffer
+    // for the BAM-encoded header and records.
+    BgzfWriter outBamWriter;
+    seqan2::CharString outBamBuffer;
+
+    // Statistics for --stats-json, the phases may overlap since materialization and writing can run in background
+    // threads.
+    RunStats stats;
 
     MasonSimulatorApp(MasonSimulatorOptions const & options) :
             options(options), rng(options.seed), methRng(options.methSeed),
@@ -868,11 +1103,16 @@ public:
                    toCString(options.matOptions.vcfFileName),
                    toCString(options.methFastaInFile),
                    &options.methOptions),
-            contigPicker(rng)
+            cacheContigRID(-1), contigPicker(rng), numSimulatedFragments(0), stats("mason_simulator")
     {}
 
     ~MasonSimulatorApp()
     {
+        if (writerThread.joinable())
+        {
+            writeQueue->close();
+            writerThread.join();
+        }
         clearOutFiles();
     }
 
@@ -901,119 +1141,519 @@ public:
         _init();
         // Simulate reads.
         _simulateReads();
+        // Write out the remaining BGZF blocks, the other output files are closed on destruction.
+        outSeqsLeft.close();
+        outSeqsRight.close();
+        outBamWriter.close();
+
+        return _writeStats();
+    }
 
+    // Write the run statistics if configured, returns the exit code.
+    int _writeStats()
+    {
+        if (empty(options.statsOptions.statsJsonFile))
+            return 0;
+
+        // Close the SAM/BAM file such that its size is final.
+        alignmentJoiner.reset();
+        outBamStream.reset();
+
+        int64_t numReads = numSimulatedFragments * (options.seqOptions.simulateMatePairs ? 2 : 1);
+        double simulationWallTime = stats.phaseWallTime("simulation");
+        stats.addCounter("fragments", numSimulatedFragments);
+        stats.addCounter("reads", numReads);
+        stats.addFileSize("bytes_read", toCString(options.matOptions.fastaFileName));
+        stats.addFileSize("bytes_read", toCString(options.matOptions.vcfFileName));
+        stats.addFileSize("bytes_read", toCString(options.methFastaInFile));
+        stats.addFileSize("bytes_written", toCString(options.outFileNameLeft));
+        if (options.seqOptions.simulateMatePairs)
+            stats.addFileSize("bytes_written", toCString(options.outFileNameRight));
+        stats.addFileSize("bytes_written", toCString(options.outFileNameSam));
+        if (simulationWallTime > 0)
+            stats.setRate("reads_per_second", numReads / simulationWallTime);
+        stats.threadWallTime = simulationWallTime;
+        for (unsigned i = 0; i < threads.size(); ++i)
+            stats.threadBusyTimes.push_back(threads[i].busyTime);
+
+        if (!stats.writeJson(toCString(options.statsOptions.statsJsonFile)))
+        {
+            std::cerr << "\nERROR: Could not write run statistics to " << options.statsOptions.statsJsonFile << "\n";
+            return 1;
+        }
         return 0;
     }
 
-    // Build sorted vector of intervals with more than minNs N characters.
-    //
-    // Used for fragment exclusion downstream.
-    void buildGapIntervals(std::vector<std::pair<int, int> > & intervals,
-                           seqan2::Dna5String const & contigSeq,
-                           unsigned minNs = 3)
+    // Returns the total size of the temporary files of splitter.
+    static int64_t _tempFileBytes(IdSplitter & splitter)
     {
-        intervals.clear();
+        int64_t result = 0;
+        for (unsigned i = 0; i < splitter.files.size(); ++i)
+            if (splitter.files[i] != 0)
+            {
+                splitter.files[i]->clear();
+                splitter.files[i]->seekg(0, std::ios::end);
+                result += splitter.files[i]->tellg();
+            }
+        return result;
+    }
 
-        bool inN = false;
-        unsigned beginPos = 0;
-        for (unsigned pos = 0; pos < length(contigSeq); ++pos)
+    // Materialize the next haplotype into hap, returns false if there is none left.
+    bool _materializeNext(MaterializedHaplotype & hap)
+    {
+        PhaseTimer timer(stats, "materialization");
+        if (cacheReader.isOpen())
         {
-            if (contigSeq[pos] == 'N' && !inN)
+            if (!cacheReader.readNext(hap.rID, hap.hID, hap.seq, hap.varInfos, hap.breakpoints, hap.posMap))
+                return false;
+            // The reference contig is only needed with variants, otherwise it is the haplotype.
+            if (empty(options.matOptions.vcfFileName))
             {
-                beginPos = pos;
-                inN = true;
+                hap.refSeq = hap.seq;
             }
-            else if (contigSeq[pos] != 'N' && inN)
+            else
             {
-                if (pos - beginPos >= minNs)
-                    intervals.push_back(std::make_pair(beginPos, pos));
-                inN = false;
+                if (hap.rID != cacheContigRID)
+                    vcfMat.readContig(cacheContigSeq, hap.rID);
+                cacheContigRID = hap.rID;
+                hap.refSeq = cacheContigSeq;
             }
         }
-        if (inN)
-            intervals.push_back(std::make_pair(beginPos, (int)length(contigSeq)));
+        else
+        {
+            bool hasNext;
+            if (options.seqOptions.bsSeqOptions.bsSimEnabled)
+                hasNext = vcfMat.materializeNext(hap.seq, hap.levels, hap.varInfos, hap.breakpoints, hap.rID, hap.hID);
+            else
+                hasNext = vcfMat.materializeNext(hap.seq, hap.varInfos, hap.breakpoints, hap.rID, hap.hID);
+            if (!hasNext)
+            {
+                if (cacheWriter.isOpen() && !cacheWriter.commit())
+                    std::cerr << "\nWARNING: Could not write haplotype cache file " << cacheWriter.fileName << "\n";
+                return false;
+            }
 
-        std::sort(intervals.begin(), intervals.end());
+            hap.posMap = vcfMat.posMap;
+            // The reference contig was already loaded by the materializer, without variants it is the haplotype.
+            if (empty(options.matOptions.vcfFileName))
+                hap.refSeq = hap.seq;
+            else
+                hap.refSeq = vcfMat.contigSeq;
+            if (cacheWriter.isOpen() &&
+                !cacheWriter.write(hap.rID, hap.hID, hap.seq, hap.varInfos, hap.breakpoints, hap.posMap))
+            {
+                std::cerr << "\nWARNING: Could not write haplotype cache file " << cacheWriter.fileName << "\n";
+                cacheWriter.abort();
+            }
+        }
+
+        hap.refName = sequenceName(vcfMat.faiIndex, hap.rID);
+        // Without variants, the haplotype is the reference contig and its gaps can be taken from the index.
+        if (!gapIndex.intervals.empty())
+            hap.gapIntervals = gapIndex.intervals[hap.rID];
+        else
+            buildGapIntervals(hap.gapIntervals, hap.seq);
+        return true;
     }
 
-    void _simulateReadsDoSimulation()
+    // Simulate the reads for the fragments assigned to the haplotype hap.
+    void _simulateHaplotype(MaterializedHaplotype & hap)
     {
-        std::cerr << "\nSimulating Reads:\n";
         int haplotypeCount = vcfMat.numHaplotypes;
-        seqan2::Dna5String contigSeq;  // materialized contig
-        int rID = 0;  // current reference id
-        int hID = 0;  // current haplotype id
+        int rID = hap.rID;  // current reference id
+        int hID = hap.hID;  // current haplotype id
         int contigFragmentCount = 0;  // number of reads on the contig
+        // The reads of pairs in other shards are simulated by other processes.
+        if (pairShards[rID * haplotypeCount + hID] != options.shardIndex)
+            return;
+        bool stream = (options.outputMode == MasonSimulatorOptions::STREAM);
+        // The ids of the fragments on the contig when computing them from the permutation.
+        std::vector<int> contigFragmentIds;
+        if (!stream && options.fragmentAllocation == MasonSimulatorOptions::MULTINOMIAL_ALLOCATION)
+            fragmentAllocator.getIds(contigFragmentIds, rID * haplotypeCount + hID);
+        // The index of the valid fragment start positions, built once and shared by all threads.
+        FragmentPlacementIndex placementIndex;
+        if (options.fragmentPlacement == MasonSimulatorOptions::INDEX_PLACEMENT)
+            placementIndex.build(length(hap.seq), hap.gapIntervals);
         // Note that all shared variables are correctly synchronized by implicit flushes at the critical sections below.
-        MethylationLevels levels;
-        seqan2::Dna5String refSeq;  // reference sequence
-        std::vector<SmallVarInfo> varInfos;  // small variants for counting in read alignments
-        std::vector<std::pair<int, int> > breakpoints;  // unused/ignored
-        while ((options.seqOptions.bsSeqOptions.bsSimEnabled &&
-                vcfMat.materializeNext(contigSeq, levels, varInfos, breakpoints, rID, hID)) ||
-               (!options.seqOptions.bsSeqOptions.bsSimEnabled &&
-                vcfMat.materializeNext(contigSeq, varInfos, breakpoints, rID, hID)))
+
+        std::cerr << "  " << hap.refName << " (allele " << (hID + 1) << ") ";
+
+        unsigned idx = rID * haplotypeCount + hID;
+        for (int tID = 0; tID < options.numThreads; ++tID)
         {
-            std::cerr << "  " << sequenceName(vcfMat.faiIndex, rID) << " (allele " << (hID + 1) << ") ";
-            contigFragmentCount = 0;
-            readSequence(refSeq, vcfMat.faiIndex, rID);
+            threads[tID].methLevels = &hap.levels;
+            threads[tID].placementIndex = (options.fragmentPlacement == MasonSimulatorOptions::INDEX_PLACEMENT) ?
+                    &placementIndex : nullptr;
+        }
+
+        if (options.scheduling == MasonSimulatorOptions::DYNAMIC_SCHEDULING)
+            _simulateBatches(hap, contigFragmentCount, contigFragmentIds);
 
-            while (true)  // Execute as long as there are fragments left.
+        while (options.scheduling == MasonSimulatorOptions::STATIC_SCHEDULING)
+        {
+            bool doBreak = false;
+            for (int tID = 0; tID < options.numThreads; ++tID)
             {
-                bool doBreak = false;
-                for (int tID = 0; tID < options.numThreads; ++tID)
+                // Read in the ids of the fragments to simulate.
+                int numRead = _loadFragmentIds(threads[tID].fragmentIds, options.chunkSize, idx,
+                                               contigFragmentCount, contigFragmentIds);
+                contigFragmentCount += numRead;
+                if (numRead == 0)
+                    doBreak = true;
+            }
+
+            // Perform the simulation.
+            SEQAN_OMP_PRAGMA(parallel num_threads(options.numThreads))
+            {
+                threads[omp_get_thread_num()].run(hap.seq, hap.gapIntervals, hap.varInfos, hap.posMap, hap.refName,
+                                                  hap.refSeq, rID, hID);
+            }
+
+            // Write out the temporary sequence or pass it to the writer thread.
+            for (int tID = 0; tID < options.numThreads; ++tID)
+            {
+                if (writeQueue)
+                    _enqueueOutputBatch(idx, threads[tID]);
+                else
+                    _writeOutputBatch(idx, threads[tID].fragmentIds, threads[tID].ids, threads[tID].reads.seqs,
+                                      threads[tID].reads.quals, threads[tID].alignmentRecords);
+                std::cerr << '.' << std::flush;
+            }
+
+            if (doBreak)
+                break;  // No more work left.
+        }
+
+        numSimulatedFragments += contigFragmentCount;
+        std::cerr << " (" << contigFragmentCount << " fragments) OK\n";
+    }
+
+    // Load up to maxNum ids of the fragments to simulate for the contig/haplotype pair idx into ids, after the first
+    // contigFragmentCount ones.  Returns the number of loaded ids.
+    int _loadFragmentIds(std::vector<int> & ids, int maxNum, unsigned idx, int contigFragmentCount,
+                         std::vector<int> const & contigFragmentIds)
+    {
+        ids.resize(maxNum);  // make space
+
+        // Load the fragment ids to simulate for or take them from the contiguous range when streaming.
+        int numRead = 0;
+        if (options.outputMode == MasonSimulatorOptions::STREAM)
+        {
+            numRead = std::min(maxNum, fragmentCounts[idx] - contigFragmentCount);
+            for (int i = 0; i < numRead; ++i)
+                ids[i] = firstFragmentIds[idx] + contigFragmentCount + i;
+        }
+        else if (options.fragmentAllocation == MasonSimulatorOptions::MULTINOMIAL_ALLOCATION)
+        {
+            numRead = std::min(maxNum, (int)contigFragmentIds.size() - contigFragmentCount);
+            std::copy(contigFragmentIds.begin() + contigFragmentCount,
+                      contigFragmentIds.begin() + contigFragmentCount + numRead,
+                      ids.begin());
+        }
+        else
+        {
+            numRead = fragmentIdSplitter.read(idx, reinterpret_cast<char *>(&ids[0]), sizeof(int) * maxNum) /
+                    sizeof(int);
+        }
+        ids.resize(numRead);
+        return numRead;
+    }
+
+    // Simulate the fragments of hap in batches of options.batchSize fragments that the threads pull as they become
+    // idle, until all fragments are simulated.  contigFragmentCount is increased by the number of fragments.
+    //
+    // The finished batches are kept in the ring buffer outputSlots and written out in the order of the batches by the
+    // thread that finishes the next batch to write, the other threads continue with the next batches meanwhile.  A
+    // thread only pulls a batch if its slot was written, which limits the batches kept in memory.
+    void _simulateBatches(MaterializedHaplotype & hap, int & contigFragmentCount,
+                          std::vector<int> const & contigFragmentIds)
+    {
+        unsigned idx = hap.rID * vcfMat.numHaplotypes + hap.hID;
+        unsigned numSlots = 2 * options.numThreads;
+        if (outputSlots.size() < numSlots)
+            outputSlots.resize(numSlots);
+        std::vector<bool> slotReady(numSlots, false);
+
+        // Guards all of the following and the loading of fragment ids.
+        std::mutex mutex;
+        std::condition_variable slotWritten;
+        int64_t nextBatchID = 0, nextWriteID = 0;
+        // done is set when all fragment ids are pulled, failed when a thread caught an exception.
+        bool done = false, failed = false, writing = false;
+        int64_t numWritten = 0, nextProgress = options.chunkSize;
+        std::exception_ptr error;
+
+        SEQAN_OMP_PRAGMA(parallel num_threads(options.numThreads))
+        {
+            ReadSimulatorThread & thread = threads[omp_get_thread_num()];
+            try
+            {
+                while (true)
                 {
-                    // Read in the ids of the fragments to simulate.
-                    threads[tID].fragmentIds.resize(options.chunkSize);  // make space
-                    threads[tID].methLevels = &levels;
-
-                    // Load the fragment ids to simulate for.
-                    fragmentIdSplitter.files[rID * haplotypeCount + hID]->read(
-                        reinterpret_cast<char *>(&threads[tID].fragmentIds[0]),
-                        sizeof(int) * options.chunkSize);
-                    int numRead = fragmentIdSplitter.files[rID * haplotypeCount + hID]->gcount() / 4;
-                    contigFragmentCount += numRead;
-                    if (numRead == 0)
-                        doBreak = true;
-                    threads[tID].fragmentIds.resize(numRead);
+                    // Pull the next batch once its output slot is free.
+                    int64_t batchID = 0;
+                    {
+                        std::unique_lock<std::mutex> lock(mutex);
+                        slotWritten.wait(lock, [&]() {
+                            return done || failed || nextBatchID < nextWriteID + numSlots;
+                        });
+                        if (done || failed)
+                            break;
+                        int numRead = _loadFragmentIds(thread.fragmentIds, options.batchSize, idx,
+                                                       contigFragmentCount, contigFragmentIds);
+                        if (numRead == 0)
+                        {
+                            done = true;
+                            slotWritten.notify_all();
+                            break;
+                        }
+                        contigFragmentCount += numRead;
+                        batchID = nextBatchID++;
+                    }
+
+                    thread.run(hap.seq, hap.gapIntervals, hap.varInfos, hap.posMap, hap.refName, hap.refSeq,
+                               hap.rID, hap.hID);
+
+                    std::unique_lock<std::mutex> lock(mutex);
+                    // Move the results into the output slot of the batch, the buffers of the slot are reused by the
+                    // thread.
+                    OutputBatch & slot = outputSlots[batchID % numSlots];
+                    slot.fragmentIds.swap(thread.fragmentIds);
+                    swap(slot.ids, thread.ids);
+                    swap(slot.reads.seqs, thread.reads.seqs);
+                    swap(slot.reads.quals, thread.reads.quals);
+                    slot.alignmentRecords.swap(thread.alignmentRecords);
+                    slotReady[batchID % numSlots] = true;
+
+                    // Write out the finished batches in order unless another thread is doing so, it then also writes
+                    // this one.  The lock is released while writing such that the other threads can pull batches.
+                    if (writing)
+                        continue;
+                    writing = true;
+                    while (!failed && slotReady[nextWriteID % numSlots])
+                    {
+                        OutputBatch & next = outputSlots[nextWriteID % numSlots];
+                        lock.unlock();
+                        numWritten += next.fragmentIds.size();
+                        if (writeQueue)
+                            _enqueueOutputBatch(idx, next);
+                        else
+                            _writeOutputBatch(idx, next.fragmentIds, next.ids, next.reads.seqs, next.reads.quals,
+                                              next.alignmentRecords);
+                        for (; numWritten >= nextProgress; nextProgress += options.chunkSize)
+                            std::cerr << '.' << std::flush;
+                        lock.lock();
+                        slotReady[nextWriteID % numSlots] = false;
+                        nextWriteID += 1;
+                        slotWritten.notify_all();
+                    }
+                    writing = false;
                 }
+            }
+            catch (...)
+            {
+                std::lock_guard<std::mutex> lock(mutex);
+                if (!error)
+                    error = std::current_exception();
+                failed = true;
+                slotWritten.notify_all();
+            }
+        }
+        if (error)
+            std::rethrow_exception(error);
+    }
 
-                // Build gap intervals.
-                std::vector<std::pair<int, int> > gapIntervals;
-                buildGapIntervals(gapIntervals, contigSeq);
+    // Write out simulated reads and alignments to the temporary files for the contig/haplotype pair idx.
+    void _writeOutputBatch(unsigned idx,
+                           std::vector<int> const & fragmentIds,
+                           seqan2::StringSet<seqan2::CharString> const & ids,
+                           seqan2::StringSet<seqan2::Dna5String> const & seqs,
+                           seqan2::StringSet<seqan2::CharString> const & quals,
+                           std::vector<seqan2::BamAlignmentRecord> const & alignmentRecords)
+    {
+        PhaseTimer timer(stats, (options.outputMode == MasonSimulatorOptions::STREAM) ? "output" : "temp_io");
+        if (options.outputMode == MasonSimulatorOptions::STREAM)
+        {
+            // The batches arrive in the order of the ids, write them to the output files directly.
+            bool pairs = options.seqOptions.simulateMatePairs;
+            for (unsigned i = 0; i < length(ids); ++i)
+                ((pairs && i % 2) ? outSeqsRight : outSeqsLeft).write(ids[i], seqs[i], quals[i]);
+            if (!empty(options.outFileNameSam))
+                for (unsigned i = 0; i < alignmentRecords.size(); ++i)
+                    _writeAlignmentRecord(alignmentRecords[i]);
+            return;
+        }
+
+        if (options.tempFormat == MasonSimulatorOptions::TEXT)
+        {
+            writeRecords(*seqFileOuts[idx], ids, seqs, quals);
+            if (!empty(options.outFileNameSam))
+                for (unsigned i = 0; i < alignmentRecords.size(); ++i)
+                    writeRecord(*bamFileOuts[idx], alignmentRecords[i]);
+            return;
+        }
+
+        // Binary records, keyed by fragment id and mate.
+        bool pairs = options.seqOptions.simulateMatePairs;
+        clear(spillBuffer);
+        for (unsigned i = 0; i < length(ids); ++i)
+            appendSpillRead(spillBuffer, spillKey(fragmentIds[pairs ? i / 2 : i], pairs ? 1 + i % 2 : 0),
+                            ids[i], seqs[i], quals[i]);
+        if (!empty(spillBuffer))
+            fragmentSplitter.write(idx, &spillBuffer[0], length(spillBuffer));
+        if (!empty(options.outFileNameSam) && !alignmentRecords.empty())
+        {
+            clear(spillBuffer);
+            for (unsigned i = 0; i < alignmentRecords.size(); ++i)
+                appendSpillAlignment(spillBuffer, spillKey(fragmentIds[pairs ? i / 2 : i], pairs ? 1 + i % 2 : 0),
+                                     alignmentRecords[i], spillBamContext);
+            alignmentSplitter.write(idx, &spillBuffer[0], length(spillBuffer));
+        }
+    }
 
-                // Perform the simulation.
-                SEQAN_OMP_PRAGMA(parallel num_threads(options.numThreads))
+    // Start the writer thread if configured.
+    void _startWriter()
+    {
+        if (options.writerQueueSize == 0)
+            return;
+        writeQueue.reset(new ConcurrentQueue<TOutputBatchPtr>(options.writerQueueSize));
+        // At most writerQueueSize + 2 batches exist (queued, being written, being filled), so pushing into freeBatches
+        // never blocks.
+        freeBatches.reset(new ConcurrentQueue<TOutputBatchPtr>(options.writerQueueSize + 2));
+        writerThread = std::thread([this]() {
+            try
+            {
+                TOutputBatchPtr batch;
+                while (writeQueue->pop(batch))
                 {
-                    threads[omp_get_thread_num()].run(contigSeq, gapIntervals, varInfos, vcfMat.posMap,
-                                                      sequenceName(vcfMat.faiIndex, rID),
-                                                      refSeq, rID, hID);
+                    _writeOutputBatch(batch->idx, batch->fragmentIds, batch->ids, batch->reads.seqs,
+                                      batch->reads.quals, batch->alignmentRecords);
+                    freeBatches->push(std::move(batch));
                 }
+            }
+            catch (...)
+            {
+                writerError = std::current_exception();
+                writeQueue->close();
+            }
+        });
+    }
+
+    // Wait for the writer thread to write out all queued batches.
+    void _stopWriter()
+    {
+        if (!writerThread.joinable())
+            return;
+        writeQueue->close();
+        writerThread.join();
+        writeQueue.reset();
+        freeBatches.reset();
+        if (writerError)
+            std::rethrow_exception(writerError);
+    }
 
-                // Write out the temporary sequence.
-                for (int tID = 0; tID < options.numThreads; ++tID)
+    // Pass the output buffers of thread to the writer thread, thread gets the buffers of a written batch in exchange.
+    // TSource is ReadSimulatorThread or OutputBatch for the output slots of options.scheduling == DYNAMIC_SCHEDULING.
+    template <typename TSource>
+    void _enqueueOutputBatch(unsigned idx, TSource & thread)
+    {
+        TOutputBatchPtr batch;
+        if (!freeBatches->tryPop(batch))
+            batch.reset(new OutputBatch);
+        batch->idx = idx;
+        batch->fragmentIds.swap(thread.fragmentIds);
+        swap(batch->ids, thread.ids);
+        swap(batch->reads.seqs, thread.reads.seqs);
+        swap(batch->reads.quals, thread.reads.quals);
+        batch->alignmentRecords.swap(thread.alignmentRecords);
+        if (!writeQueue->push(std::move(batch)))
+            _stopWriter();  // writer failed, rethrows its exception
+    }
+
+    void _simulateReadsDoSimulation()
+    {
+        PhaseTimer timer(stats, "simulation");
+        std::cerr << "\nSimulating Reads:\n";
+        _startWriter();
+        if (options.prefetchHaplotypes == 0)
+        {
+            MaterializedHaplotype hap;
+            while (_materializeNext(hap))
+                _simulateHaplotype(hap);
+        }
+        else
+        {
+            // Materialize the next haplotypes in a background thread while simulating reads from the current one.  The
+            // queue holds up to options.prefetchHaplotypes haplotypes.
+            typedef std::unique_ptr<MaterializedHaplotype> THaplotypePtr;
+            ConcurrentQueue<THaplotypePtr> queue(options.prefetchHaplotypes);
+            std::exception_ptr materializerError;
+            std::thread materializer([this, &queue, &materializerError]() {
+                try
+                {
+                    while (true)
+                    {
+                        THaplotypePtr hap(new MaterializedHaplotype);
+                        if (!_materializeNext(*hap) || !queue.push(std::move(hap)))
+                            break;
+                    }
+                }
+                catch (...)
                 {
-                    unsigned idx = rID * haplotypeCount + hID;
-                    writeRecords(*seqFileOuts[idx], threads[tID].ids, threads[tID].seqs, threads[tID].quals);
-                    if (!empty(options.outFileNameSam))
-                        for (unsigned i = 0; i < length(threads[tID].alignmentRecords); ++i)
-                            writeRecord(*bamFileOuts[idx], threads[tID].alignmentRecords[i]);
-                    std::cerr << '.' << std::flush;
+                    materializerError = std::current_exception();
                 }
+                queue.close();
+            });
 
-                if (doBreak)
-                    break;  // No more work left.
+            try
+            {
+                THaplotypePtr hap;
+                while (queue.pop(hap))
+                    _simulateHaplotype(*hap);
             }
-
-            std::cerr << " (" << contigFragmentCount << " fragments) OK\n";
+            catch (...)
+            {
+                queue.close();  // stops materializer
+                materializer.join();
+                throw;
+            }
+            materializer.join();
+            if (materializerError)
+                std::rethrow_exception(materializerError);
         }
+        _stopWriter();
         std::cerr << "  Done simulating reads.\n";
+
+        if (!empty(options.outFileNameSam) && options.alignmentMode == MasonSimulatorOptions::CHECK)
+        {
+            AlignmentCheckStats checkStats;
+            for (int tID = 0; tID < options.numThreads; ++tID)
+                checkStats.add(threads[tID].alignmentCheckStats);
+            std::cerr << "  Alignment check: " << checkStats.identical << " identical, " << checkStats.different
+                      << " different, " << checkStats.fallbacks << " without trace alignment.\n";
+        }
     }
 
     void _simulateReadsJoin()
     {
         std::cerr << "\nJoining temporary files ...";
         clearOutFiles();  // clear output files such that they are flushed
+        if (options.tempFormat == MasonSimulatorOptions::BINARY)
+        {
+            _simulateReadsJoinBinary();
+            std::cerr << " OK\n";
+            if (options.tempCompression != MasonSimulatorOptions::NO_COMPRESSION)
+            {
+                uint64_t rawBytes = fragmentIdSplitter.rawBytes + fragmentSplitter.rawBytes +
+                        alignmentSplitter.rawBytes;
+                uint64_t storedBytes = fragmentIdSplitter.storedBytes + fragmentSplitter.storedBytes +
+                        alignmentSplitter.storedBytes;
+                std::cerr << "  Temporary files: " << storedBytes << " bytes written for " << rawBytes
+                          << " bytes of data.\n";
+            }
+            return;
+        }
         fragmentSplitter.reset();
         fastxJoiner.reset(new FastxJoiner<seqan2::Fastq>(fragmentSplitter));
         FastxJoiner<seqan2::Fastq> & joiner = *fastxJoiner.get();  // Shortcut
@@ -1022,15 +1662,15 @@ public:
             while (!joiner.atEnd())
             {
                 joiner.get(id, seq, qual);
-                writeRecord(outSeqsLeft, id, seq, qual);
+                outSeqsLeft.write(id, seq, qual);
                 joiner.get(id, seq, qual);
-                writeRecord(outSeqsRight, id, seq, qual);
+                outSeqsRight.write(id, seq, qual);
             }
         else
             while (!joiner.atEnd())
             {
                 joiner.get(id, seq, qual);
-                writeRecord(outSeqsLeft, id, seq, qual);
+                outSeqsLeft.write(id, seq, qual);
             }
         if (!empty(options.outFileNameSam))
         {
@@ -1038,20 +1678,102 @@ public:
             alignmentJoiner.reset(new SamJoiner(alignmentSplitter, outBamStream.get()));
 
             // Write out header.
-            seqan2::BamFileOut & bamFileOut = *outBamStream;
-            writeHeader(bamFileOut, alignmentJoiner->header);
+            if (outBamWriter.isOpen())
+                _writeAlignmentHeader();
+            else
+                writeHeader(*outBamStream, alignmentJoiner->header);
 
             SamJoiner & joiner = *alignmentJoiner.get();  // Shortcut
             seqan2::BamAlignmentRecord record;
             while (!joiner.atEnd())
             {
                 joiner.get(record);
-                writeRecord(bamFileOut, record);
+                _writeAlignmentRecord(record);
             }
         }
         std::cerr << " OK\n";
     }
 
+    // Join the temporary files in the binary format.
+    void _simulateReadsJoinBinary()
+    {
+        fragmentSplitter.reset();
+        SpillJoiner joiner(fragmentSplitter);
+        seqan2::CharString payload, id, seq, qual;
+        if (options.seqOptions.simulateMatePairs)
+            while (!joiner.atEnd())
+            {
+                joiner.get(payload);
+                decodeSpillRead(id, seq, qual, payload);
+                outSeqsLeft.write(id, seq, qual);
+                joiner.get(payload);
+                decodeSpillRead(id, seq, qual, payload);
+                outSeqsRight.write(id, seq, qual);
+            }
+        else
+            while (!joiner.atEnd())
+            {
+                joiner.get(payload);
+                decodeSpillRead(id, seq, qual, payload);
+                outSeqsLeft.write(id, seq, qual);
+            }
+        if (!empty(options.outFileNameSam))
+        {
+            alignmentSplitter.reset();
+            SpillJoiner alignmentJoiner(alignmentSplitter);
+
+            _writeAlignmentHeader();
+
+            seqan2::BamAlignmentRecord record;
+            while (!alignmentJoiner.atEnd())
+            {
+                alignmentJoiner.get(payload);
+                if (outBamWriter.isOpen())
+                {
+                    // The payload already is the BAM encoding of the record.
+                    outBamWriter.write(&payload[0], length(payload));
+                    continue;
+                }
+                decodeSpillAlignment(record, payload, spillBamContext);
+                writeRecord(*outBamStream, record);
+            }
+        }
+    }
+
+    // Register the contigs with the SAM/BAM output file and write out its header.
+    void _writeAlignmentHeader()
+    {
+        if (outBamWriter.isOpen())
+        {
+            clear(outBamBuffer);
+            writeHeader(outBamBuffer, bamHeader, spillBamContext, seqan2::Bam());
+            outBamWriter.write(&outBamBuffer[0], length(outBamBuffer));
+            return;
+        }
+
+        seqan2::BamFileOut & bamFileOut = *outBamStream;
+        for (unsigned i = 0; i < length(contigNames(spillBamContext)); ++i)
+        {
+            appendName(contigNamesCache(context(bamFileOut)), contigNames(spillBamContext)[i]);
+            appendValue(contigLengths(context(bamFileOut)), contigLengths(spillBamContext)[i]);
+        }
+        writeHeader(bamFileOut, bamHeader);
+    }
+
+    // Write out record to the SAM/BAM output file.
+    void _writeAlignmentRecord(seqan2::BamAlignmentRecord const & record)
+    {
+        if (!outBamWriter.isOpen())
+        {
+            writeRecord(*outBamStream, record);
+            return;
+        }
+
+        clear(outBamBuffer);
+        writeRecord(outBamBuffer, spillBamContext, record, seqan2::Bam());
+        outBamWriter.write(&outBamBuffer[0], length(outBamBuffer));
+    }
+
     void _simulateReads()
     {
         std::cerr << "\n____READ SIMULATION___________________________________________________________\n"
@@ -1065,17 +1787,54 @@ public:
         int haplotypeCount = vcfMat.numHaplotypes;
         std::cerr << "Distributing fragments to " << seqCount << " contigs (" << haplotypeCount
                   << " haplotypes each) ...";
-        for (int i = 0; i < options.numFragments; ++i)
-            fragmentIdSplitter.files[contigPicker.toId(contigPicker.pick())]->write(
-                reinterpret_cast<char *>(&i), sizeof(int));
-        fragmentIdSplitter.reset();
+        double wall0 = wallTime(), cpu0 = cpuTime();
+        if (options.fragmentAllocation == MasonSimulatorOptions::MULTINOMIAL_ALLOCATION)
+        {
+            // Draw the counts for all contigs/haplotypes at once, the ids are computed when simulating them.  When
+            // streaming, the contiguous ranges of the permutation positions are used as the ids.
+            fragmentAllocator.allocate(rng, contigPicker.lengthSums, haplotypeCount, options.numFragments);
+            fragmentCounts = fragmentAllocator.counts;
+            firstFragmentIds = fragmentAllocator.firstIds;
+        }
+        else if (options.outputMode == MasonSimulatorOptions::STREAM)
+        {
+            // Only count the fragments and assign contiguous ids in the order of contigs/haplotypes.
+            fragmentCounts.assign(seqCount * haplotypeCount, 0);
+            for (int i = 0; i < options.numFragments; ++i)
+                fragmentCounts[contigPicker.toId(contigPicker.pick())] += 1;
+            firstFragmentIds.assign(fragmentCounts.size(), 0);
+            for (unsigned i = 1; i < fragmentCounts.size(); ++i)
+                firstFragmentIds[i] = firstFragmentIds[i - 1] + fragmentCounts[i - 1];
+        }
+        else
+        {
+            for (int i = 0; i < options.numFragments; ++i)
+                fragmentIdSplitter.write(contigPicker.toId(contigPicker.pick()), reinterpret_cast<char *>(&i),
+                                         sizeof(int));
+            fragmentIdSplitter.reset();
+        }
+        stats.addPhase("fragment_distribution", wallTime() - wall0, cpuTime() - cpu0);
         std::cerr << " OK\n";
 
+        if (options.outputMode == MasonSimulatorOptions::STREAM)
+        {
+            // (2) Simulate the reads in the order of contigs/haplotypes and thus ids, write them out directly.
+            if (!empty(options.outFileNameSam))
+                _writeAlignmentHeader();
+            _simulateReadsDoSimulation();
+            return;
+        }
+
         // (2) Simulate the reads in the order of contigs/haplotypes.
         _simulateReadsDoSimulation();
 
         // (3) Merge the sequences from external files into the output stream.
-        _simulateReadsJoin();
+        {
+            PhaseTimer timer(stats, "join");
+            _simulateReadsJoin();
+        }
+        stats.addCounter("temp_bytes", _tempFileBytes(fragmentIdSplitter) + _tempFileBytes(fragmentSplitter) +
+                         _tempFileBytes(alignmentSplitter));
     }
 
     // Initialize the alignment splitter data structure.
@@ -1083,10 +1842,14 @@ public:
     {
         // Open alignment splitters.
         alignmentSplitter.numContigs = fragmentIdSplitter.numContigs;
-        alignmentSplitter.open();
+        alignmentSplitter.compressionLevel = fragmentIdSplitter.compressionLevel;
+        alignmentSplitter.numThreads = options.numThreads;
+        if (options.outputMode == MasonSimulatorOptions::JOIN)
+            alignmentSplitter.open();
         // Construct output BAM files.
-        for (unsigned i = 0; i < alignmentSplitter.files.size(); ++i)
-            bamFileOuts.push_back(new seqan2::BamFileOut(*alignmentSplitter.files[i], seqan2::Sam()));
+        if (options.outputMode == MasonSimulatorOptions::JOIN && options.tempFormat == MasonSimulatorOptions::TEXT)
+            for (unsigned i = 0; i < alignmentSplitter.files.size(); ++i)
+                bamFileOuts.push_back(new seqan2::BamFileOut(*alignmentSplitter.files[i], seqan2::Sam()));
         // Build and write out header, fill ref name store.
         seqan2::BamHeaderRecord vnHeaderRecord;
         vnHeaderRecord.type = seqan2::BAM_HEADER_FIRST;
@@ -1099,20 +1862,25 @@ public:
                     appendName(contigNamesCache(context(*bamFileOuts[j])), contigNames(context(vcfMat.vcfFileIn))[i]);
                 else
                     appendName(contigNamesCache(context(*bamFileOuts[j])), sequenceName(vcfMat.faiIndex, i));
+            if (!empty(options.matOptions.vcfFileName))
+                appendName(contigNamesCache(spillBamContext), contigNames(context(vcfMat.vcfFileIn))[i]);
+            else
+                appendName(contigNamesCache(spillBamContext), sequenceName(vcfMat.faiIndex, i));
             unsigned idx = 0;
-            if (!getIdByName(idx, vcfMat.faiIndex, contigNames(context(*bamFileOuts[0]))[i]))
+            if (!getIdByName(idx, vcfMat.faiIndex, contigNames(spillBamContext)[i]))
             {
                 std::stringstream ss;
-                ss << "Could not find " << contigNames(context(*bamFileOuts[0]))[i] << " from VCF file in FAI index.";
+                ss << "Could not find " << contigNames(spillBamContext)[i] << " from VCF file in FAI index.";
                 throw MasonIOException(ss.str());
             }
             for (unsigned j = 0; j < bamFileOuts.size(); ++j)
                 appendValue(contigLengths(context(*bamFileOuts[j])), sequenceLength(vcfMat.faiIndex, idx));
+            appendValue(contigLengths(spillBamContext), sequenceLength(vcfMat.faiIndex, idx));
             seqan2::BamHeaderRecord seqHeaderRecord;
             seqHeaderRecord.type = seqan2::BAM_HEADER_REFERENCE;
-            appendValue(seqHeaderRecord.tags, seqan2::Pair<seqan2::CharString>("SN", contigNames(context(*bamFileOuts[0]))[i]));
+            appendValue(seqHeaderRecord.tags, seqan2::Pair<seqan2::CharString>("SN", contigNames(spillBamContext)[i]));
             std::stringstream ss;
-            ss << contigLengths(context(*bamFileOuts[0]))[i];
+            ss << contigLengths(spillBamContext)[i];
             appendValue(seqHeaderRecord.tags, seqan2::Pair<seqan2::CharString>("LN", ss.str().c_str()));
             appendValue(bamHeader, seqHeaderRecord);
         }
@@ -1134,44 +1902,108 @@ public:
             if (i > 0u)
                 contigPicker.lengthSums[i] += contigPicker.lengthSums[i - 1];
         }
+        // Shards of the contig/haplotype pairs, the same in all processes.
+        assignShards(pairShards, contigPicker.lengthSums, vcfMat.numHaplotypes, options.numShards);
         // Fragment id splitter.
         fragmentIdSplitter.numContigs = numSeqs(vcfMat.faiIndex) * vcfMat.numHaplotypes;
-        fragmentIdSplitter.open();
+        if (options.tempCompression == MasonSimulatorOptions::FAST_COMPRESSION)
+            fragmentIdSplitter.compressionLevel = Z_BEST_SPEED;
+        else if (options.tempCompression == MasonSimulatorOptions::BEST_COMPRESSION)
+            fragmentIdSplitter.compressionLevel = Z_BEST_COMPRESSION;
+        fragmentIdSplitter.numThreads = options.numThreads;
         // Splitter for sequence.
         fragmentSplitter.numContigs = fragmentIdSplitter.numContigs;
-        fragmentSplitter.open();
-        for (unsigned i = 0; i < fragmentSplitter.files.size(); ++i)
-            seqFileOuts.push_back(new seqan2::SeqFileOut(*fragmentSplitter.files[i], seqan2::Fastq()));
+        fragmentSplitter.compressionLevel = fragmentIdSplitter.compressionLevel;
+        fragmentSplitter.numThreads = options.numThreads;
+        if (options.outputMode == MasonSimulatorOptions::JOIN)  // no temporary files when streaming
+        {
+            if (options.fragmentAllocation == MasonSimulatorOptions::PICK_ALLOCATION)
+                fragmentIdSplitter.open();
+            fragmentSplitter.open();
+        }
+        if (options.outputMode == MasonSimulatorOptions::JOIN && options.tempFormat == MasonSimulatorOptions::TEXT)
+            for (unsigned i = 0; i < fragmentSplitter.files.size(); ++i)
+                seqFileOuts.push_back(new seqan2::SeqFileOut(*fragmentSplitter.files[i], seqan2::Fastq()));
         // Splitter for alignments, only required when writing out SAM/BAM.
         if (!empty(options.outFileNameSam))
             _initAlignmentSplitter();
         std::cerr << " OK\n";
     }
 
+    // Load the gaps of the reference contigs from the sidecar file or compute and save them.
+    void _initGapIndex()
+    {
+        std::string fileName = gapIndexFileName(toCString(options.matOptions.fastaFileName));
+        std::cerr << "Loading gap index " << fileName << " ...";
+        if (gapIndex.load(fileName.c_str(), vcfMat.faiIndex))
+        {
+            std::cerr << " OK\n";
+            return;
+        }
+        std::cerr << " not found or outdated\n"
+                  << "Building gap index " << fileName << " ...";
+        gapIndex.build(vcfMat.faiIndex);
+        if (!gapIndex.save(fileName.c_str()))
+            std::cerr << " could not write, using it only for this run";
+        std::cerr << " OK\n";
+    }
+
+    // Open the haplotype cache file for the reference and variants for reading or, if it does not exist, for writing.
+    void _initHaplotypeCache()
+    {
+        uint64_t key = 0;
+        if (!computeHaplotypeCacheKey(key, toCString(options.matOptions.fastaFileName),
+                                      toCString(options.matOptions.vcfFileName)))
+            throw MasonIOException("Could not read reference and variants for the haplotype cache key.");
+        std::string fileName = haplotypeCacheFileName(toCString(options.haplotypeCacheDir), key);
+        std::cerr << "Opening haplotype cache " << fileName << " ...";
+        if (cacheReader.open(fileName.c_str(), key))
+        {
+            std::cerr << " OK\n";
+            return;
+        }
+        std::cerr << " not found\n"
+                  << "Creating haplotype cache " << fileName << " ...";
+        if (!cacheWriter.open(fileName.c_str(), key))
+            std::cerr << " could not write, materializing without cache";
+        std::cerr << " OK\n";
+    }
+
     // Open the output files.
     void _initOpenOutputFiles()
     {
         std::cerr << "Opening output file " << options.outFileNameLeft << " ...";
-        if (!open(outSeqsLeft, toCString(options.outFileNameLeft)))
+        if (!outSeqsLeft.open(toCString(options.outFileNameLeft), options.ioThreads))
             throw MasonIOException("Could not open left/single-end output file.");
-        context(outSeqsLeft).options.lineLength = 0;
+        outSeqsLeft.setLineLength(0);
         std::cerr << " OK\n";
 
         if (!options.forceSingleEnd && !empty(options.outFileNameRight))
         {
             std::cerr << "Opening output file " << options.outFileNameRight << " ...";
-            if (!open(outSeqsRight, toCString(options.outFileNameRight)))
+            if (!outSeqsRight.open(toCString(options.outFileNameRight), options.ioThreads))
                 throw MasonIOException("Could not open right/single-end output file.");
-            context(outSeqsRight).options.lineLength = 0;
+            outSeqsRight.setLineLength(0);
             std::cerr << " OK\n";
         }
 
         if (!empty(options.outFileNameSam))
         {
             std::cerr << "Opening output file " << options.outFileNameSam << "...";
-            outBamStream.reset(new seqan2::BamFileOut);
-            if (!open(*outBamStream, toCString(options.outFileNameSam)))
-                throw MasonIOException("Could not open SAM/BAM output file.");
+            std::string fileName = toCString(options.outFileNameSam);
+            bool isBam = fileName.size() >= 4u && fileName.compare(fileName.size() - 4, 4, ".bam") == 0;
+            if (options.ioThreads > 0 && isBam)
+            {
+                // Compress the BGZF blocks with our own threads, the records are encoded with spillBamContext.
+                if (!outBamWriter.open(fileName.c_str(), options.ioThreads))
+                    throw MasonIOException("Could not open SAM/BAM output file.");
+            }
+            else
+            {
+                outBamStream.reset(new seqan2::BamFileOut);
+                if (!open(*outBamStream, toCString(options.outFileNameSam)))
+                    throw MasonIOException("Could not open SAM/BAM output file.");
+            }
             std::cerr << " OK\n";
         }
     }
@@ -1187,9 +2019,19 @@ public:
 
         // Initialize VCF materialization (reference FASTA and input VCF).
         std::cerr << "Opening reference and variants file ...";
+        double wall0 = wallTime(), cpu0 = cpuTime();
+        vcfMat.usePackedReference = options.matOptions.usePackedReference;
         vcfMat.init();
         std::cerr << " OK\n";
 
+        // Load or create the gap index of the reference if it can be used.
+        if (options.useGapIndex && empty(options.matOptions.vcfFileName))
+            _initGapIndex();
+        // Open the haplotype cache, the methylation levels are not cached.
+        if (!empty(options.haplotypeCacheDir) && !options.seqOptions.bsSeqOptions.bsSimEnabled)
+            _initHaplotypeCache();
+        stats.addPhase("fai_load", wallTime() - wall0, cpuTime() - cpu0);
+
         // Configure contigPicker and fragment id splitter.
         _initContigPicker();
 
@@ -1258,6 +2100,12 @@ parseCommandLine(MasonSimulatorOptions & options, int argc, char const ** argv)
 
     options.getOptionValues(parser);
 
+    if (options.numShards == 0)
+    {
+        std::cerr << "ERROR: Invalid value for --shard, expected I/N with 1 <= I <= N.\n";
+        return seqan2::ArgumentParser::PARSE_ERROR;
+    }
+
     return seqan2::ArgumentParser::PARSE_OK;
 }
 
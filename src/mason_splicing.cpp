@@ -48,7 +48,9 @@
 
 #include <mason/vcf_materialization.h>
 #include <mason/mason_options.h>
+#include <mason/parallel_seq_file_out.h>
 #include <mason/mason_types.h>
+#include <mason/run_stats.h>
 
 // ==========================================================================
 // Classes
@@ -128,11 +130,15 @@ public:
     seqan2::GffFileIn gffFileIn;
 
     // Output sequence stream.
-    seqan2::SeqFileOut seqFileOut;
+    ParallelSeqFileOut seqFileOut;
+
+    // Statistics for --stats-json.
+    RunStats stats;
 
     MasonSplicingApp(MasonSplicingOptions const & _options) :
             options(_options), rng(options.seed),
-            vcfMat(rng, toCString(options.matOptions.fastaFileName), toCString(options.matOptions.vcfFileName))
+            vcfMat(rng, toCString(options.matOptions.fastaFileName), toCString(options.matOptions.vcfFileName)),
+            stats("mason_splicing")
     {}
 
     int run()
@@ -144,9 +150,11 @@ public:
         std::cerr << "Opening files...";
         try
         {
+            PhaseTimer timer(stats, "fai_load");
+            vcfMat.usePackedReference = options.matOptions.usePackedReference;
             vcfMat.init();
 
-            if (!open(seqFileOut, toCString(options.outputFileName)))
+            if (!seqFileOut.open(toCString(options.outputFileName), options.ioThreads))
                 throw MasonIOException("Could not open output file.");
 
             if (!open(gffFileIn, toCString(options.inputGffFile)))
@@ -163,11 +171,13 @@ public:
         std::cerr << "\n__COMPUTING TRANSCRIPTS______________________________________________________\n"
                   << "\n";
 
+        double wall0 = wallTime(), cpu0 = cpuTime();
+
         // Read first GFF record.
         MyGffRecord record;
         _readFirstRecord(record);
         if (record.rID == std::numeric_limits<int>::max())
-            return 0;  // at end, could not read any, done
+            return _writeStats();  // at end, could not read any, done
 
         // Transcript names.
         typedef seqan2::StringSet<seqan2::CharString> TNameStore;
@@ -264,8 +274,27 @@ public:
             splicingInstructions.clear();
         }
 
+        seqFileOut.close();
+        stats.addPhase("splicing", wallTime() - wall0, cpuTime() - cpu0);
         std::cerr << "\nDone splicing FASTA.\n";
 
+        return _writeStats();
+    }
+
+    // Write the run statistics if configured, returns the exit code.
+    int _writeStats()
+    {
+        if (empty(options.statsOptions.statsJsonFile))
+            return 0;
+        stats.addFileSize("bytes_read", toCString(options.matOptions.fastaFileName));
+        stats.addFileSize("bytes_read", toCString(options.matOptions.vcfFileName));
+        stats.addFileSize("bytes_read", toCString(options.inputGffFile));
+        stats.addFileSize("bytes_written", toCString(options.outputFileName));
+        if (!stats.writeJson(toCString(options.statsOptions.statsJsonFile)))
+        {
+            std::cerr << "\nERROR: Could not write run statistics to " << options.statsOptions.statsJsonFile << "\n";
+            return 1;
+        }
         return 0;
     }
 
@@ -328,7 +357,7 @@ public:
                 ss << tNames[tID];
                 if (!empty(options.matOptions.vcfFileName))
                     ss << options.haplotypeNameSep << (hID + 1);
-                writeRecord(seqFileOut, ss.str(), transcript);
+                seqFileOut.write(ss.str(), transcript);
             }
 
             // Search next range.
@@ -0,0 +1,162 @@
+// ==========================================================================
+//                         Mason - A Read Simulator
+// ==========================================================================
+// Copyright (c) 2006-2021, Knut Reinert, FU Berlin
+// All rights reserved.
+//
+// Redistribution and use in source and binary forms, with or without
+// modification, are permitted provided that the following conditions are met:
+//
+//     * Redistributions of source code must retain the above copyright
+//       notice, this list of conditions and the following disclaimer.
+//     * Redistributions in binary form must reproduce the above copyright
+//       notice, this list of conditions and the following disclaimer in the
+//       documentation and/or other materials provided with the distribution.
+//     * Neither the name of Knut Reinert or the FU Berlin nor the names of
+//       its contributors may be used to endorse or promote products derived
+//       from this software without specific prior written permission.
+//
+// THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+// AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+// IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+// ARE DISCLAIMED. IN NO EVENT SHALL KNUT REINERT OR THE FU BERLIN BE LIABLE
+// FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+// DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+// SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY
+// OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH
+// DAMAGE.
+//
+// ==========================================================================
+// Author: Manuel Holtgrewe <manuel.holtgrewe@fu-berlin.de>
+// ==========================================================================
+// Train the empirical Illumina error and quality model from template reads.
+//
+// The model is written to a binary file that mason_simulator and
+// mason_frag_sequencing load with --illumina-model-file, such that large
+// template files are read once and not by every simulation run.
+// ==========================================================================
+
+#include <seqan/arg_parse.h>
+#include <seqan/sequence.h>
+
+#include <mason/mason_options.h>
+#include <mason/quality_model.h>
+#include <mason/run_stats.h>
+
+// ==========================================================================
+// Classes
+// ==========================================================================
+
+// ==========================================================================
+// Functions
+// ==========================================================================
+
+// --------------------------------------------------------------------------
+// Function parseCommandLine()
+// --------------------------------------------------------------------------
+
+seqan2::ArgumentParser::ParseResult
+parseCommandLine(MasonTrainModelOptions & options, int argc, char const ** argv)
+{
+    // Setup ArgumentParser.
+    seqan2::ArgumentParser parser("mason_train_model");
+    // Set short description, version, and date.
+    setShortDescription(parser, "Train Illumina Error Model");
+    setDateAndVersion(parser);
+    setCategory(parser, "Simulators");
+
+    // Define usage line and long description.
+    addUsageLine(parser,
+                 "[OPTIONS] \\fB-i\\fP \\fIIN.fq\\fP [\\fB-ir\\fP \\fIIN2.fq\\fP] \\fB-o\\fP \\fIOUT.model\\fP");
+    addDescription(parser,
+                   "Compute the positional mismatch and N probabilities and the quality distributions of the "
+                   "template reads and write them to a model file for \\fBmason_simulator\\fP.  The mismatch "
+                   "probabilities are derived from the PHRED qualities.");
+
+    options.addOptions(parser);
+
+    // Parse command line.
+    seqan2::ArgumentParser::ParseResult res = seqan2::parse(parser, argc, argv);
+
+    // Only extract  options if the program will continue after parseCommandLine()
+    if (res != seqan2::ArgumentParser::PARSE_OK)
+        return res;
+
+    options.getOptionValues(parser);
+
+    return seqan2::ArgumentParser::PARSE_OK;
+}
+
+// --------------------------------------------------------------------------
+// Function main()
+// --------------------------------------------------------------------------
+
+// Program entry point.
+
+int main(int argc, char const ** argv)
+{
+    // Parse the command line.
+    MasonTrainModelOptions options;
+    seqan2::ArgumentParser::ParseResult res = parseCommandLine(options, argc, argv);
+
+    // If there was an error parsing or built-in argument parser functionality
+    // was triggered then we exit the program.  The return code is 1 if there
+    // were errors and 0 if there were none.
+    if (res != seqan2::ArgumentParser::PARSE_OK)
+        return res == seqan2::ArgumentParser::PARSE_ERROR;
+
+    std::cerr << "MASON TRAIN MODEL\n"
+              << "=================\n\n";
+
+    // Print the command line arguments back to the user.
+    if (options.verbosity > 0)
+        options.print(std::cerr);
+
+    std::cerr << "\n__TRAINING____________________________________________________________________\n"
+              << "\n";
+
+    RunStats stats("mason_train_model");
+    QualityModel model;
+    {
+        PhaseTimer timer(stats, "train");
+        seqan2::CharString const * inFileNames[2] = {&options.inFileNameLeft, &options.inFileNameRight};
+        for (unsigned mate = 0; mate < 2u; ++mate)
+        {
+            if (empty(*inFileNames[mate]))
+                continue;
+            std::cerr << "Reading " << *inFileNames[mate] << " ...";
+            if (!trainQualityModel(model.cycles[mate], model.nQualities[mate], toCString(*inFileNames[mate]),
+                                   options.maxReads))
+            {
+                std::cerr << "\nERROR: Could not read template reads from " << *inFileNames[mate] << "\n";
+                return 1;
+            }
+            std::cerr << " OK (" << model.cycles[mate].size() << " cycles)\n";
+        }
+    }
+
+    std::cerr << "Writing " << options.outFileName << " ...";
+    if (!writeQualityModel(toCString(options.outFileName), model))
+    {
+        std::cerr << "\nERROR: Could not write model file " << options.outFileName << "\n";
+        return 1;
+    }
+    std::cerr << " OK\n";
+
+    // Write out run statistics.
+    if (!empty(options.statsOptions.statsJsonFile))
+    {
+        stats.addFileSize("bytes_read", toCString(options.inFileNameLeft));
+        stats.addFileSize("bytes_read", toCString(options.inFileNameRight));
+        stats.addFileSize("bytes_written", toCString(options.outFileName));
+        if (!stats.writeJson(toCString(options.statsOptions.statsJsonFile)))
+        {
+            std::cerr << "\nERROR: Could not write run statistics to " << options.statsOptions.statsJsonFile << "\n";
+            return 1;
+        }
+    }
+
+    return 0;
+}
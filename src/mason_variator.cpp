@@ -49,7 +49,9 @@
 #include <seqan/sequence_journaled.h>
 #include <seqan/index.h>  // for Shape<>
 
+#include <mason/mason_options.h>
 #include <mason/mason_types.h>
+#include <mason/run_stats.h>
 #include <mason/variation_size_tsv.h>
 #include <mason/genomic_variants.h>
 
@@ -61,7 +63,6 @@
 // Classes
 // ==========================================================================
 
-typedef std::mt19937 TRng;
 typedef seqan2::JournalEntries<seqan2::JournalEntry<unsigned, int>, seqan2::SortedArray> TJournalEntries;
 
 // --------------------------------------------------------------------------
@@ -142,6 +143,12 @@ struct MasonVariatorOptions
 
     MethylationLevelSimulatorOptions methSimOptions;
 
+    // ----------------------------------------------------------------------
+    // Run Statistics
+    // ----------------------------------------------------------------------
+
+    RunStatsOptions statsOptions;
+
     MasonVariatorOptions() :
             verbosity(1), seed(0), genVarIDs(true), numHaplotypes(0),
             snpRate(0), smallIndelRate(0), minSmallIndelSize(0), maxSmallIndelSize(0), svIndelRate(0),
@@ -160,6 +167,8 @@ void print(std::ostream & out, MasonVariatorOptions const & options)
         << "FASTA OUT            \t" << options.fastaOutFile << "\n"
         << "BREAKPOINT TSV OUT   \t" << options.outputBreakpointFile << "\n"
         << "METHYLATION IN FILE  \t" << options.methFastaInFile << "\n"
+        << "STATS JSON           \t" << options.statsOptions.statsJsonFile << "\n"
+        << "RNG ENGINE           \t" << getRngEngineStr() << "\n"
         << "\n"
         << "GENERATE VAR IDS     \t" << getYesNoStr(options.genVarIDs) << "\n"
         << "\n"
@@ -1821,6 +1830,7 @@ parseCommandLine(MasonVariatorOptions & options, int argc, char const ** argv)
                                             seqan2::ArgParseOption::OUTPUT_FILE, "FILE"));
     setValidValues(parser, "meth-fasta-out", seqan2::SeqFileOut::getFileExtensions());
 
+    options.statsOptions.addOptions(parser);
 
     // ----------------------------------------------------------------------
     // Simulation Details Section
@@ -1934,6 +1944,7 @@ parseCommandLine(MasonVariatorOptions & options, int argc, char const ** argv)
     getOptionValue(options.methFastaInFile, parser, "meth-fasta-in");
 
     options.methSimOptions.getOptionValues(parser);
+    options.statsOptions.getOptionValues(parser);
 
     options.methSimOptions.simulateMethylationLevels = !empty(options.methFastaOutFile);
 
@@ -1970,6 +1981,8 @@ int main(int argc, char const ** argv)
     std::cerr << "\n__PREPARATION_________________________________________________________________\n"
               << "\n";
 
+    RunStats stats("mason_variator");
+    double beginWallTime = wallTime(), beginCpuTime = cpuTime();
     std::cerr << "Loading Reference Index " << options.fastaInFile << " ...";
     seqan2::FaiIndex faiIndex;
     if (!open(faiIndex, toCString(options.fastaInFile)))
@@ -1996,12 +2009,32 @@ int main(int argc, char const ** argv)
     {
         std::cerr << " OK (" << length(faiIndex.indexEntryStore) << " seqs)\n";
     }
+    stats.addPhase("fai_load", wallTime() - beginWallTime, cpuTime() - beginCpuTime);
 
     std::cerr << "\n__SIMULATION__________________________________________________________________\n"
               << "\n";
 
-    MasonVariatorApp app(rng, methRng, faiIndex, options);
-    app.run();
+    {
+        PhaseTimer timer(stats, "variation_simulation");
+        MasonVariatorApp app(rng, methRng, faiIndex, options);
+        app.run();
+    }  // closes the output files
+
+    if (!empty(options.statsOptions.statsJsonFile))
+    {
+        stats.addFileSize("bytes_read", toCString(options.fastaInFile));
+        stats.addFileSize("bytes_read", toCString(options.inputSVSizeFile));
+        stats.addFileSize("bytes_read", toCString(options.methFastaInFile));
+        stats.addFileSize("bytes_written", toCString(options.vcfOutFile));
+        stats.addFileSize("bytes_written", toCString(options.fastaOutFile));
+        stats.addFileSize("bytes_written", toCString(options.outputBreakpointFile));
+        stats.addFileSize("bytes_written", toCString(options.methFastaOutFile));
+        if (!stats.writeJson(toCString(options.statsOptions.statsJsonFile)))
+        {
+            std::cerr << "\nERROR: Could not write run statistics to " << options.statsOptions.statsJsonFile << "\n";
+            return 1;
+        }
+    }
 
     std::cerr << "\nDONE.\n";
 
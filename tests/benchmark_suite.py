@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+"""Benchmark the mason programs on synthetic references of several scales.
+
+For each scale, a reference is generated with mason_genome and variants with
+mason_variator.  Then mason_simulator, mason_materializer, mason_methylation,
+mason_splicing, and mason_frag_sequencing are run on it for each thread count.
+The thread count is passed as --num-threads to mason_simulator and as
+--io-threads to the programs that support it, which then write
+gzip-compressed output.  mason_methylation is single-threaded and run once.
+
+Each run is done with --stats-json, the wall clock time, the throughput, the
+peak resident set size, and the phase times are written to a JSON file.  When
+a baseline JSON file from an earlier run is given, the results are compared
+against it and runs that are slower or use more memory than the threshold
+allows are reported as regressions, giving exit code 1.
+
+Usage:  benchmark_suite.py [OPTIONS] BINARY_ROOT_PATH
+"""
+import argparse
+import json
+import os
+import os.path
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# The available scales: number of contigs and total length.
+SCALES = {
+    '1m': (1, 1000 * 1000),
+    '1m-many': (1000, 1000 * 1000),
+    '10m': (1, 10 * 1000 * 1000),
+    '10m-many': (1000, 10 * 1000 * 1000),
+    '100m': (4, 100 * 1000 * 1000),
+    '100m-many': (10000, 100 * 1000 * 1000),
+    '1g': (25, 1000 * 1000 * 1000),
+    '1g-many': (10000, 1000 * 1000 * 1000),
+}
+
+# The benchmarked programs.
+TOOLS = ['mason_simulator', 'mason_materializer', 'mason_methylation', 'mason_splicing',
+         'mason_frag_sequencing']
+
+
+def locate_binary(binary_base, name):
+    """Return path to program name below binary_base."""
+    for path in [os.path.join(binary_base, name),
+                 os.path.join(binary_base, 'bin', name)]:
+        if os.path.exists(path):
+            return path
+    raise RuntimeError('Could not find %s below %s' % (name, binary_base))
+
+
+def run_timed(args, tmp_dir, stats_path):
+    """Run the program with --stats-json and return the wall clock time and the statistics."""
+    env = dict(os.environ)
+    env['TMPDIR'] = tmp_dir
+    start = time.time()
+    subprocess.check_call(args + ['--stats-json', stats_path], stdout=subprocess.DEVNULL,
+                          stderr=subprocess.DEVNULL, env=env)
+    seconds = time.time() - start
+    with open(stats_path) as f:
+        stats = json.load(f)
+    return seconds, stats
+
+
+def write_gff(path, num_contigs, contig_length, rng):
+    """Write a GFF file with one transcript of three exons per 10 kbp (or per contig if shorter) on each contig."""
+    span = min(10000, contig_length)
+    exon_length = span // 8
+    with open(path, 'w') as f:
+        num = 0
+        for contig in range(1, num_contigs + 1):
+            for begin in range(0, contig_length - span + 1, span):
+                num += 1
+                for exon in range(3):
+                    exon_begin = begin + exon * (span // 3) + rng.randint(0, span // 3 - exon_length)
+                    f.write('%d\tbenchmark\texon\t%d\t%d\t.\t+\t.\tParent=tx%d\n' %
+                            (contig, exon_begin + 1, exon_begin + exon_length, num))
+
+
+def write_fragments(path, reference, num_fragments, fragment_length, rng):
+    """Write num_fragments fragments without N drawn from the first contig of reference."""
+    # Only the first contig is loaded, at most 10 Mbp of it.
+    parts, length = [], 0
+    with open(reference) as f:
+        f.readline()
+        for line in f:
+            if line.startswith('>') or length >= 10 * 1000 * 1000:
+                break
+            parts.append(line.strip())
+            length += len(parts[-1])
+    contig = ''.join(parts)
+    with open(path, 'w') as f:
+        num = 0
+        while num < num_fragments:
+            pos = rng.randint(0, len(contig) - fragment_length)
+            fragment = contig[pos:pos + fragment_length]
+            if 'N' in fragment:
+                continue
+            num += 1
+            f.write('>frag%d\n%s\n' % (num, fragment))
+
+
+class Workload(object):
+    """Input files and sizes for one scale."""
+
+    def __init__(self, scale, work_dir):
+        self.scale = scale
+        self.work_dir = work_dir
+        self.num_contigs, self.genome_length = SCALES[scale]
+        self.contig_length = self.genome_length // self.num_contigs
+        self.reference = os.path.join(work_dir, 'genome.fa')
+        self.vcf = os.path.join(work_dir, 'variants.vcf')
+        self.gff = os.path.join(work_dir, 'genes.gff')
+        self.fragments = os.path.join(work_dir, 'fragments.fa')
+
+
+def prepare_workload(workload, binaries, args, results):
+    """Generate the input files of workload, the runs of mason_genome and mason_variator are added to results."""
+    rng = random.Random(args.seed)
+    genome_args = [binaries['mason_genome'], '-s', str(args.seed), '-o', workload.reference]
+    for _ in range(workload.num_contigs):
+        genome_args += ['-l', str(workload.contig_length)]
+    add_result(results, 'mason_genome', workload, 1,
+               run_timed(genome_args, workload.work_dir, os.path.join(workload.work_dir, 'stats.json')),
+               workload.genome_length, 'bp/s')
+
+    variator_args = [binaries['mason_variator'], '-s', str(args.seed), '-ir', workload.reference,
+                     '-ov', workload.vcf]
+    add_result(results, 'mason_variator', workload, 1,
+               run_timed(variator_args, workload.work_dir, os.path.join(workload.work_dir, 'stats.json')),
+               workload.genome_length, 'bp/s')
+
+    write_gff(workload.gff, workload.num_contigs, workload.contig_length, rng)
+    write_fragments(workload.fragments, workload.reference, args.num_fragments,
+                    min(args.fragment_length, workload.contig_length // 2), rng)
+
+
+def tool_run_args(tool, workload, binaries, num_threads, args):
+    """Return the arguments of the run of tool with num_threads threads, the amount of work, and its unit.
+
+    Returns None if tool does not support threads and num_threads is not the first thread count.
+    """
+    out_dir = workload.work_dir
+    if tool == 'mason_simulator':
+        return ([binaries[tool], '-ir', workload.reference, '-iv', workload.vcf, '-n', str(args.num_fragments),
+                 '--seed', str(args.seed), '--num-threads', str(num_threads),
+                 '-o', os.path.join(out_dir, 'left.fq'), '-or', os.path.join(out_dir, 'right.fq'),
+                 '-oa', os.path.join(out_dir, 'out.sam')],
+                2 * args.num_fragments, 'reads/s')
+    if tool == 'mason_materializer':
+        return ([binaries[tool], '-ir', workload.reference, '-iv', workload.vcf,
+                 '--io-threads', str(num_threads), '-o', os.path.join(out_dir, 'materialized.fa.gz')],
+                workload.genome_length, 'bp/s')
+    if tool == 'mason_methylation':
+        if num_threads != args.thread_counts[0]:
+            return None
+        return ([binaries[tool], '--seed', str(args.seed), '-i', workload.reference,
+                 '-o', os.path.join(out_dir, 'methylation.fa')],
+                workload.genome_length, 'bp/s')
+    if tool == 'mason_splicing':
+        return ([binaries[tool], '-ir', workload.reference, '-iv', workload.vcf, '-ig', workload.gff,
+                 '--io-threads', str(num_threads), '-o', os.path.join(out_dir, 'transcripts.fa.gz')],
+                workload.genome_length, 'bp/s')
+    if tool == 'mason_frag_sequencing':
+        return ([binaries[tool], '--seed', str(args.seed), '-i', workload.fragments,
+                 '--io-threads', str(num_threads), '-o', os.path.join(out_dir, 'frag_left.fq.gz'),
+                 '-or', os.path.join(out_dir, 'frag_right.fq.gz')],
+                2 * args.num_fragments, 'reads/s')
+    raise RuntimeError('Unknown tool %s' % tool)
+
+
+def add_result(results, tool, workload, num_threads, run, work, unit):
+    """Add the result of run, a pair of wall clock time and statistics, to results."""
+    seconds, stats = run
+    results.append({
+        'tool': tool,
+        'scale': workload.scale,
+        'threads': num_threads,
+        'seconds': seconds,
+        'throughput': work / seconds if seconds > 0 else 0.0,
+        'unit': unit,
+        'peak_rss_bytes': stats.get('peak_rss_bytes', 0),
+        'phases': dict((phase['name'], phase['wall_time']) for phase in stats.get('phases', [])),
+    })
+    print('%s\t%s\t%d\t%.2f\t%.0f %s\t%.1f MiB' % (tool, workload.scale, num_threads, seconds,
+                                                   results[-1]['throughput'], unit,
+                                                   results[-1]['peak_rss_bytes'] / 1024.0 / 1024.0))
+    sys.stdout.flush()
+
+
+def compare_to_baseline(results, baseline, threshold):
+    """Print the comparison of results to baseline and return the number of regressions."""
+    key = lambda r: (r['tool'], r['scale'], r['threads'])
+    base_results = dict((key(r), r) for r in baseline['results'])
+    num_regressions = 0
+    print('\ntool\tscale\tthreads\tseconds\tbaseline\tpeak MiB\tbaseline\tstatus')
+    for result in results:
+        base = base_results.get(key(result))
+        if base is None:
+            continue
+        slower = result['seconds'] > base['seconds'] * (1.0 + threshold)
+        larger = result['peak_rss_bytes'] > base['peak_rss_bytes'] * (1.0 + threshold)
+        status = 'OK'
+        if slower or larger:
+            status = 'REGRESSION (%s)' % ', '.join(x for x, y in [('time', slower), ('memory', larger)] if y)
+            num_regressions += 1
+        print('%s\t%s\t%d\t%.2f\t%.2f\t%.1f\t%.1f\t%s' % (
+            result['tool'], result['scale'], result['threads'], result['seconds'], base['seconds'],
+            result['peak_rss_bytes'] / 1024.0 / 1024.0, base['peak_rss_bytes'] / 1024.0 / 1024.0, status))
+    return num_regressions
+
+
+def main():
+    """Main entry point of the script."""
+    parser = argparse.ArgumentParser(description='Benchmark the mason programs.')
+    parser.add_argument('binary_base', help='directory containing the mason binaries')
+    parser.add_argument('--scales', default='1m,1m-many,10m',
+                        help='comma-separated list of scales, out of %s' % ', '.join(sorted(SCALES)))
+    parser.add_argument('--tools', default=','.join(TOOLS),
+                        help='comma-separated list of programs to benchmark')
+    parser.add_argument('--threads', default='1,2,4,8',
+                        help='comma-separated list of thread counts')
+    parser.add_argument('--num-fragments', type=int, default=1000 * 1000,
+                        help='number of fragments for mason_simulator and mason_frag_sequencing')
+    parser.add_argument('--fragment-length', type=int, default=300,
+                        help='length of the fragments for mason_frag_sequencing')
+    parser.add_argument('--repeats', type=int, default=1,
+                        help='number of runs per configuration, the fastest is reported')
+    parser.add_argument('--seed', type=int, default=0, help='seed for all programs')
+    parser.add_argument('--output', default='benchmark.json', help='JSON file to write the results to')
+    parser.add_argument('--baseline', help='JSON file of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative increase in time or memory over the baseline reported as regression')
+    parser.add_argument('--keep-tmp', action='store_true', help='keep the generated files')
+    args = parser.parse_args()
+
+    args.thread_counts = [int(x) for x in args.threads.split(',')]
+    scales = args.scales.split(',')
+    tools = args.tools.split(',')
+    for scale in scales:
+        if scale not in SCALES:
+            parser.error('unknown scale %s' % scale)
+    for tool in tools:
+        if tool not in TOOLS:
+            parser.error('unknown tool %s' % tool)
+
+    binaries = dict((name, locate_binary(args.binary_base, name))
+                    for name in ['mason_genome', 'mason_variator'] + tools)
+
+    results = []
+    tmp_dir = tempfile.mkdtemp(prefix='mason_benchmark_')
+    try:
+        print('tool\tscale\tthreads\tseconds\tthroughput\tpeak memory')
+        for scale in scales:
+            workload = Workload(scale, os.path.join(tmp_dir, scale))
+            os.mkdir(workload.work_dir)
+            prepare_workload(workload, binaries, args, results)
+            for tool in tools:
+                for num_threads in args.thread_counts:
+                    run = tool_run_args(tool, workload, binaries, num_threads, args)
+                    if run is None:
+                        continue
+                    run_args, work, unit = run
+                    stats_path = os.path.join(workload.work_dir, 'stats.json')
+                    best = min((run_timed(run_args, workload.work_dir, stats_path) for _ in range(args.repeats)),
+                               key=lambda x: x[0])
+                    add_result(results, tool, workload, num_threads, best, work, unit)
+            if not args.keep_tmp:
+                shutil.rmtree(workload.work_dir)
+    finally:
+        if args.keep_tmp:
+            print('Generated files kept in %s' % tmp_dir)
+        else:
+            shutil.rmtree(tmp_dir)
+
+    with open(args.output, 'w') as f:
+        json.dump({'host': platform.node(), 'cpu_count': os.cpu_count(), 'num_fragments': args.num_fragments,
+                   'results': results}, f, indent=2)
+        f.write('\n')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        num_regressions = compare_to_baseline(results, baseline, args.threshold)
+        print('\n%d regression(s) beyond %.0f%%' % (num_regressions, 100 * args.threshold))
+        if num_regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""Compare the throughput of mason_simulator for different thread counts.
+
+The script simulates the same number of fragments with increasing values of
+--num-threads, once with the temporary files written in turn with the
+simulation and once with the background writer (--writer-queue).  It prints
+the wall clock time, the fragments per second, and the speedup relative to
+one thread for each configuration.
+
+If no reference is given, a random genome is generated with mason_genome.
+
+Usage:  compare_thread_scaling.py [OPTIONS] BINARY_ROOT_PATH
+"""
+import argparse
+import os
+import os.path
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def locate_binary(binary_base, name):
+    """Return path to program name below binary_base."""
+    for path in [os.path.join(binary_base, name),
+                 os.path.join(binary_base, 'bin', name)]:
+        if os.path.exists(path):
+            return path
+    raise RuntimeError('Could not find %s below %s' % (name, binary_base))
+
+
+def run_simulator(simulator, reference, tmp_dir, num_fragments, num_threads, writer_queue, extra_args):
+    """Run mason_simulator once and return wall clock time in seconds."""
+    args = [simulator, '-ir', reference, '-n', str(num_fragments),
+            '--num-threads', str(num_threads), '--writer-queue', str(writer_queue),
+            '-o', os.path.join(tmp_dir, 'left.fq'),
+            '-or', os.path.join(tmp_dir, 'right.fq'),
+            '-oa', os.path.join(tmp_dir, 'out.sam')] + extra_args
+    env = dict(os.environ)
+    env['TMPDIR'] = tmp_dir
+    start = time.time()
+    subprocess.check_call(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env)
+    return time.time() - start
+
+
+def main():
+    """Main entry point of the script."""
+    parser = argparse.ArgumentParser(description='Compare mason_simulator thread scaling.')
+    parser.add_argument('binary_base', help='directory containing the mason binaries')
+    parser.add_argument('--reference', help='reference FASTA file, generated if not given')
+    parser.add_argument('--genome-length', type=int, default=10 * 1000 * 1000,
+                        help='length of generated genome')
+    parser.add_argument('--num-fragments', type=int, default=1000 * 1000,
+                        help='number of fragments to simulate')
+    parser.add_argument('--threads', default='1,2,4,8,16',
+                        help='comma-separated list of thread counts')
+    parser.add_argument('--writer-queue', type=int, default=4,
+                        help='value for --writer-queue in the background writer runs')
+    parser.add_argument('--repeats', type=int, default=1,
+                        help='number of runs per configuration, the fastest is reported')
+    parser.add_argument('simulator_args', nargs=argparse.REMAINDER,
+                        help='further arguments to mason_simulator')
+    args = parser.parse_args()
+
+    simulator = locate_binary(args.binary_base, 'mason_simulator')
+    tmp_dir = tempfile.mkdtemp(prefix='mason_scaling_')
+    try:
+        reference = args.reference
+        if not reference:
+            reference = os.path.join(tmp_dir, 'genome.fa')
+            genome = locate_binary(args.binary_base, 'mason_genome')
+            subprocess.check_call([genome, '-l', str(args.genome_length), '-o', reference],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        thread_counts = [int(x) for x in args.threads.split(',')]
+        print('writer\tthreads\tseconds\tfragments/s\tspeedup')
+        for writer_queue in [0, args.writer_queue]:
+            base = None
+            for num_threads in thread_counts:
+                seconds = min(run_simulator(simulator, reference, tmp_dir, args.num_fragments, num_threads,
+                                            writer_queue, args.simulator_args)
+                              for _ in range(args.repeats))
+                if base is None:
+                    base = seconds
+                print('%s\t%d\t%.2f\t%.0f\t%.2f' % ('async' if writer_queue else 'sync', num_threads, seconds,
+                                                     args.num_fragments / seconds, base / seconds))
+                sys.stdout.flush()
+    finally:
+        shutil.rmtree(tmp_dir)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -540,6 +540,46 @@ def main(source_base, binary_base):
     if libcpp:
         conf_list.append(conf)
 
+    # Dynamic Scheduling
+    #
+    # With --rng-mode fragment, the reads must not depend on how the fragments
+    # are distributed to the threads.  The second run is compared against the
+    # output of the first one instead of golden files.
+
+    conf = app_tests.TestConf(
+        program=path_to_simulator,
+        args=['-n', '1000',
+              '--rng-mode', 'fragment',
+              '--num-threads', '4',
+              '--scheduling', 'static',
+              '-ir', ph.inFile('random.fasta'),
+              '-o', ph.outFile('simulator.left9.static.fq'),
+              '-or', ph.outFile('simulator.right9.static.fq'),
+              ],
+        redir_stdout=ph.outFile('simulator.out9.static.stdout'),
+        redir_stderr=ph.outFile('simulator.out9.static.stderr'))
+    conf_list.append(conf)
+
+    conf = app_tests.TestConf(
+        program=path_to_simulator,
+        args=['-n', '1000',
+              '--rng-mode', 'fragment',
+              '--num-threads', '4',
+              '--scheduling', 'dynamic',
+              '--batch-size', '7',
+              '-ir', ph.inFile('random.fasta'),
+              '-o', ph.outFile('simulator.left9.dynamic.fq'),
+              '-or', ph.outFile('simulator.right9.dynamic.fq'),
+              ],
+        redir_stdout=ph.outFile('simulator.out9.dynamic.stdout'),
+        redir_stderr=ph.outFile('simulator.out9.dynamic.stderr'),
+        to_diff=[(ph.outFile('simulator.left9.static.fq'),
+                  ph.outFile('simulator.left9.dynamic.fq')),
+                 (ph.outFile('simulator.right9.static.fq'),
+                  ph.outFile('simulator.right9.dynamic.fq')),
+                 ])
+    conf_list.append(conf)
+
     # Execute the tests.
     failures = 0
     for conf in conf_list: